@@ -5,11 +5,15 @@ import os
 
 db = SQLAlchemy()
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__, instance_relative_config=True)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
 
+    # 按数据库类型调整连接池参数，SQLite 连接时设置 WAL 等 PRAGMA
+    from .database import configure_app, configure_engine
+    configure_app(app)
     db.init_app(app)
+    configure_engine(app, db)
 
     with app.app_context():
         # 注册传统路由（向后兼容）
@@ -18,6 +22,20 @@ def create_app():
         # 注册新的统一API蓝图
         from .api.course_controller import course_api
         app.register_blueprint(course_api)
+        from .api.trial_course_controller import trial_course_api
+        app.register_blueprint(trial_course_api)
+        from .api.taobao_order_controller import taobao_order_api
+        app.register_blueprint(taobao_order_api)
+        from .api.export_controller import export_api
+        app.register_blueprint(export_api)
+        from .api.customer_controller import customer_api
+        app.register_blueprint(customer_api)
+        from .api.search_controller import search_api
+        app.register_blueprint(search_api)
+        from .api.report_controller import report_api
+        app.register_blueprint(report_api)
+        from .api.backup_controller import backup_api
+        app.register_blueprint(backup_api)
         
         # 确保services目录存在
         services_dir = os.path.join(os.path.dirname(__file__), 'services')
@@ -31,6 +49,35 @@ def create_app():
         
         db.create_all()
 
+        # 变更日志：每个已提交事务追加到 changelog/，恢复时在完整备份之上重放
+        # （最先启用，之后的初始化写入同样被记录）
+        from .services.changelog_service import ChangeLogService
+        ChangeLogService.ensure_initialized()
+
+        # 试听课统计汇总表：首次启用（或表被清空）时从课程表全量构建
+        from .services.trial_stats_service import TrialStatsService
+        TrialStatsService.ensure_initialized()
+
+        # 数据版本号：导出缓存等据此判断数据是否变化
+        from .services.data_version_service import DataVersionService
+        DataVersionService.ensure_initialized()
+
+        # 首页每日新增客户汇总：首次启用时从客户表全量构建
+        from .services.dashboard_service import DashboardService
+        DashboardService.ensure_initialized()
+
+        # 时间分桶汇总：首次启用时全量构建，之后按水位线增量刷新
+        from .services.rollup_service import RollupService
+        RollupService.ensure_initialized()
+
+        # 客户检索键：补齐迁移前已有客户的倒序手机号 / 拼音首字母
+        from .services.customer_lookup_service import CustomerLookupService
+        CustomerLookupService.ensure_initialized()
+
+        # 全文检索索引（FTS5）：建表，升级后首次启动时全量构建
+        from .services.search_service import SearchService
+        SearchService.ensure_initialized()
+
     # favicon 路由，避免 /favicon.ico 404
     @app.route('/favicon.ico')
     def favicon():
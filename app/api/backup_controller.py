@@ -0,0 +1,68 @@
+"""
+在线备份API控制器 - 在应用运行期间提交分步备份并查询进度
+
+    POST /api/v1/admin/backups            提交备份任务（full / incremental），返回任务ID
+    GET  /api/v1/admin/backups            最近的备份任务
+    GET  /api/v1/admin/backups/<job_id>   查询进度
+
+配置 BACKUP_ADMIN_TOKEN 后需携带 X-Admin-Token 请求头；未配置时只接受本机请求。
+"""
+
+from flask import Blueprint, request, jsonify, current_app
+import hmac
+import logging
+
+from ..services.backup_service import BackupService
+from .course_controller import ApiResponse
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+backup_api = Blueprint('backup_api', __name__, url_prefix='/api/v1/admin')
+
+_LOOPBACK_ADDRS = ('127.0.0.1', '::1')
+
+
+@backup_api.before_request
+def _check_admin():
+    token = current_app.config.get('BACKUP_ADMIN_TOKEN')
+    if token:
+        allowed = hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+    else:
+        allowed = request.remote_addr in _LOOPBACK_ADDRS
+    if not allowed:
+        return jsonify(ApiResponse.error("无权访问", 403)), 403
+
+
+@backup_api.route('/backups', methods=['POST'])
+def submit_backup():
+    """
+    提交备份任务
+
+    Request Body:
+        {"mode": "full"}  # full（完整 zip 备份，默认）/ incremental（增量快照）
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        job = BackupService.submit(data.get('mode', 'full'))
+        return jsonify(ApiResponse.success(job, "备份任务已提交")), 202
+    except ValueError as e:
+        return jsonify(ApiResponse.error(str(e))), 400
+    except Exception as e:
+        logger.error(f"提交备份任务失败: {str(e)}")
+        return jsonify(ApiResponse.error("提交备份任务失败", 500)), 500
+
+
+@backup_api.route('/backups', methods=['GET'])
+def list_backup_jobs():
+    """最近的备份任务（新的在前）"""
+    return jsonify(ApiResponse.success(BackupService.list_jobs()))
+
+
+@backup_api.route('/backups/<job_id>', methods=['GET'])
+def get_backup_job(job_id):
+    """查询备份任务进度"""
+    job = BackupService.get_job(job_id)
+    if not job:
+        return jsonify(ApiResponse.error("备份任务不存在", 404)), 404
+    return jsonify(ApiResponse.success(job))
@@ -0,0 +1,79 @@
+"""
+客户API控制器 - 客户检索（课程录入时的异步选择框）、学员批量导入
+"""
+
+from flask import Blueprint, request, jsonify
+import logging
+
+from sqlalchemy.exc import IntegrityError
+
+from .. import db
+from ..services.customer_lookup_service import CustomerLookupService, DEFAULT_LIMIT
+from ..services.student_import_service import StudentImportService
+from .course_controller import ApiResponse
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+customer_api = Blueprint('customer_api', __name__, url_prefix='/api/v1')
+
+
+@customer_api.route('/customers/lookup', methods=['GET'])
+def lookup_customers():
+    """
+    按姓名开头、手机号开头/尾号、拼音首字母检索客户
+
+    Query Parameters:
+        - q: 输入内容
+        - limit: 返回条数 (默认10, 最大50)
+    """
+    try:
+        customers = CustomerLookupService.search(
+            request.args.get('q', ''),
+            limit=request.args.get('limit', DEFAULT_LIMIT, type=int)
+        )
+        return jsonify(ApiResponse.success(customers))
+    except Exception as e:
+        logger.error(f"检索客户失败: {str(e)}")
+        return jsonify(ApiResponse.error("检索客户失败", 500)), 500
+
+
+@customer_api.route('/customers/import', methods=['POST'])
+def import_students():
+    """
+    批量导入学员及试听课（一次提交）
+
+    Request Body:
+        - students: [{name, phone, gender, grade, region, source, has_tutoring_experience,
+                      trial_price, trial_source}]，只有 phone 必填
+        - trial: 批次默认的试听课 {trial_price, source}，为空表示只导入客户
+        - dry_run: 为 true 时只校验不写入
+
+    Returns:
+        data: {total, created_customers, existing_customers, created_trials, skipped_trials,
+               error_count, errors: [{index, phone, message}], items, dry_run}
+    """
+    data = request.get_json(silent=True) or {}
+    dry_run = bool(data.get('dry_run'))
+    try:
+        result = StudentImportService.import_students(
+            data.get('students'), trial_defaults=data.get('trial'), dry_run=dry_run
+        )
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        message = f"新建学员 {result['created_customers']} 名，新建试听课 {result['created_trials']} 条，" \
+                  f"错误 {result['error_count']} 条"
+        return jsonify(ApiResponse.success(result, message))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(ApiResponse.error(str(e))), 400
+    except IntegrityError:
+        # 并发录入了相同手机号
+        db.session.rollback()
+        return jsonify(ApiResponse.error("手机号已被其他请求录入，请重试", 409)), 409
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"批量导入学员失败: {str(e)}")
+        return jsonify(ApiResponse.error("批量导入学员失败", 500)), 500
@@ -0,0 +1,77 @@
+"""
+导出任务API控制器 - 提交后台导出、轮询进度、下载结果
+
+    POST /api/v1/exports                  提交任务，返回任务ID
+    GET  /api/v1/exports/<job_id>         查询进度
+    GET  /api/v1/exports/<job_id>/download 下载已完成的文件
+"""
+
+from flask import Blueprint, request, jsonify, send_file, url_for
+from datetime import datetime
+import logging
+
+from ..services.export_job_service import ExportJobService, STATUS_DONE
+from ..services.export_service import XLSX_MIMETYPE, CSV_MIMETYPE
+from .course_controller import ApiResponse
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+export_api = Blueprint('export_api', __name__, url_prefix='/api/v1')
+
+
+def _with_download_url(job):
+    if job['status'] == STATUS_DONE:
+        job['download_url'] = url_for('export_api.download_export', job_id=job['job_id'])
+    return job
+
+
+@export_api.route('/exports', methods=['POST'])
+def submit_export():
+    """
+    提交导出任务
+
+    Request Body:
+        {
+            "dataset": "taobao_orders",  # taobao_orders / trial_courses / formal_courses
+            "format": "xlsx",            # xlsx / csv，默认 xlsx
+            "filters": {...}             # 与列表接口相同的筛选参数
+        }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        job = ExportJobService.submit(
+            data.get('dataset', ''),
+            data.get('format', 'xlsx'),
+            data.get('filters')
+        )
+        return jsonify(ApiResponse.success(_with_download_url(job), "导出任务已提交")), 202
+    except ValueError as e:
+        return jsonify(ApiResponse.error(str(e))), 400
+    except Exception as e:
+        logger.error(f"提交导出任务失败: {str(e)}")
+        return jsonify(ApiResponse.error("提交导出任务失败", 500)), 500
+
+
+@export_api.route('/exports/<job_id>', methods=['GET'])
+def get_export(job_id):
+    """查询导出任务进度"""
+    job = ExportJobService.get_job(job_id)
+    if not job:
+        return jsonify(ApiResponse.error("导出任务不存在", 404)), 404
+    return jsonify(ApiResponse.success(_with_download_url(job)))
+
+
+@export_api.route('/exports/<job_id>/download', methods=['GET'])
+def download_export(job_id):
+    """下载已完成的导出文件"""
+    export_file = ExportJobService.get_file(job_id)
+    if not export_file:
+        return jsonify(ApiResponse.error("导出文件不存在或已过期，请重新导出", 404)), 404
+    filename = f"{export_file['dataset']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_file['format']}"
+    return send_file(
+        export_file['path'],
+        mimetype=XLSX_MIMETYPE if export_file['format'] == 'xlsx' else CSV_MIMETYPE,
+        as_attachment=True,
+        download_name=filename
+    )
@@ -0,0 +1,57 @@
+"""
+报表API控制器 - 读取时间分桶汇总（日/月趋势）
+"""
+
+from datetime import date
+from flask import Blueprint, request, jsonify
+import logging
+
+from ..services.rollup_service import RollupService, GRAIN_MONTH
+from .course_controller import ApiResponse
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+report_api = Blueprint('report_api', __name__, url_prefix='/api/v1')
+
+
+def _parse_date(name: str):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} 日期格式错误，应为 YYYY-MM-DD')
+
+
+@report_api.route('/reports/<kind>', methods=['GET'])
+def get_report(kind):
+    """
+    按周期获取汇总报表（读取前先按水位线增量刷新汇总表）
+
+    Path Parameters:
+        - kind: trials / formal_revenue / taobao_orders
+
+    Query Parameters:
+        - grain: 粒度 (day/month, 默认month)
+        - start / end: 周期范围 (YYYY-MM-DD, 可选)
+        - breakdown: 分组字段 (trials: source; formal_revenue: payment_channel/course_type;
+          taobao_orders: settled, 可选)
+    """
+    try:
+        start, end = _parse_date('start'), _parse_date('end')
+        RollupService.refresh()
+        rows = RollupService.report(
+            kind,
+            grain=request.args.get('grain', GRAIN_MONTH),
+            start=start,
+            end=end,
+            breakdown=request.args.get('breakdown') or None
+        )
+        return jsonify(ApiResponse.success(rows))
+    except ValueError as e:
+        return jsonify(ApiResponse.error(str(e))), 400
+    except Exception as e:
+        logger.error(f"获取汇总报表失败: {str(e)}")
+        return jsonify(ApiResponse.error("获取汇总报表失败", 500)), 500
@@ -0,0 +1,38 @@
+"""
+全文检索API控制器 - 跨客户、刷单订单的统一检索
+"""
+
+from flask import Blueprint, request, jsonify
+import logging
+
+from ..services.search_service import SearchService, DEFAULT_LIMIT
+from .course_controller import ApiResponse
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+search_api = Blueprint('search_api', __name__, url_prefix='/api/v1')
+
+
+@search_api.route('/search', methods=['GET'])
+def search():
+    """
+    跨实体全文检索，结果按相关度排序
+
+    Query Parameters:
+        - q: 检索内容（姓名、手机号或尾号、地区、年级；中文支持任意位置的连续片段）
+        - type: 只检索指定类型 (customer/taobao_order, 可选)
+        - limit: 返回条数 (默认20, 最大100)
+    """
+    try:
+        result = SearchService.search(
+            request.args.get('q', ''),
+            entity=request.args.get('type') or None,
+            limit=request.args.get('limit', DEFAULT_LIMIT, type=int)
+        )
+        return jsonify(ApiResponse.success(result))
+    except ValueError as e:
+        return jsonify(ApiResponse.error(str(e))), 400
+    except Exception as e:
+        logger.error(f"全文检索失败: {str(e)}")
+        return jsonify(ApiResponse.error("全文检索失败", 500)), 500
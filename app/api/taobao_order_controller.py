@@ -0,0 +1,122 @@
+"""
+刷单订单API控制器 - 服务端分页、排序与筛选，批量结算与导入
+
+参数与刷单页面的筛选控件保持一致：
+    - name: 姓名关键字（对应 searchInput）
+    - level / evaluated / settled: 等级、评价、结算状态
+    - date_from / date_to: 刷单时间范围
+"""
+
+from flask import Blueprint, request, jsonify
+import logging
+
+from .. import db
+from ..services.taobao_order_service import TaobaoOrderService, DEFAULT_PAGE_SIZE
+from ..services.taobao_import_service import TaobaoImportService
+from .course_controller import ApiResponse
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+taobao_order_api = Blueprint('taobao_order_api', __name__, url_prefix='/api/v1')
+
+
+def _filter_conditions():
+    """从查询参数构造筛选条件"""
+    return TaobaoOrderService.filter_conditions(
+        name=request.args.get('name'),
+        level=request.args.get('level'),
+        evaluated=request.args.get('evaluated'),
+        settled=request.args.get('settled'),
+        date_from=request.args.get('date_from'),
+        date_to=request.args.get('date_to')
+    )
+
+
+@taobao_order_api.route('/taobao-orders', methods=['GET'])
+def list_taobao_orders():
+    """
+    键集分页获取刷单订单列表
+
+    Query Parameters:
+        - name / level / evaluated / settled / date_from / date_to: 筛选条件
+        - sort: 排序字段 (order_time/created_at/amount/commission/name, 默认order_time)
+        - order: 排序方向 (asc/desc, 默认desc)
+        - limit: 每页条数 (默认50, 最大200)
+        - cursor: 上一页返回的 next_cursor
+    """
+    try:
+        page = TaobaoOrderService.list_page(
+            _filter_conditions(),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+            sort=request.args.get('sort', 'order_time'),
+            order=request.args.get('order', 'desc')
+        )
+        return jsonify(ApiResponse.success(page))
+    except ValueError as e:
+        return jsonify(ApiResponse.error(str(e))), 400
+    except Exception as e:
+        logger.error(f"获取刷单订单列表失败: {str(e)}")
+        return jsonify(ApiResponse.error("获取刷单订单列表失败", 500)), 500
+
+
+@taobao_order_api.route('/taobao-orders/settle', methods=['POST'])
+def settle_taobao_orders():
+    """
+    批量结算订单（单条 UPDATE，只结算未结算的订单）
+
+    Request Body:
+        - order_ids: 订单ID列表；或
+        - filters: 筛选条件 {name, level, evaluated, date_from, date_to}，至少一个非空
+
+    Returns:
+        data: {settled_count, total_amount, total_commission, settled_at}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        result = TaobaoOrderService.settle(order_ids=data.get('order_ids'), filters=data.get('filters'))
+        db.session.commit()
+        return jsonify(ApiResponse.success(result, f"成功结算 {result['settled_count']} 条订单"))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(ApiResponse.error(str(e))), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"批量结算订单失败: {str(e)}")
+        return jsonify(ApiResponse.error("批量结算订单失败", 500)), 500
+
+
+@taobao_order_api.route('/taobao-orders/import', methods=['POST'])
+def import_taobao_orders():
+    """
+    批量导入刷单订单（xlsx / csv，表头与导出文件一致）
+
+    Form Data:
+        - file: 导入文件
+        - dry_run: 为 true 时只校验不写入
+
+    Returns:
+        data: {total_rows, imported, duplicates, error_count, errors: [{row, message}], dry_run}
+    """
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify(ApiResponse.error("请选择导入文件")), 400
+    dry_run = request.form.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    try:
+        file_format = TaobaoImportService.detect_format(upload.filename)
+        result = TaobaoImportService.import_file(upload.stream, file_format, dry_run=dry_run)
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+        message = f"{'校验' if dry_run else '导入'}完成：有效 {result['imported']} 条，" \
+                  f"重复 {result['duplicates']} 条，错误 {result['error_count']} 条"
+        return jsonify(ApiResponse.success(result, message))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify(ApiResponse.error(str(e))), 400
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"导入刷单订单失败: {str(e)}")
+        return jsonify(ApiResponse.error("导入刷单订单失败", 500)), 500
@@ -0,0 +1,67 @@
+"""
+试听课列表API控制器 - 服务端分页、排序与筛选
+
+参数与试听课页面的筛选控件保持一致：
+    - search: 学员姓名或电话关键字（对应 searchInput）
+    - source: 渠道来源（对应 sourceFilter）
+    - status: 试听课状态（对应 statusFilter）
+"""
+
+from flask import Blueprint, request, jsonify
+import logging
+
+from ..services.trial_course_service import TrialCourseService, DEFAULT_PAGE_SIZE
+from .course_controller import ApiResponse
+
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+trial_course_api = Blueprint('trial_course_api', __name__, url_prefix='/api/v1')
+
+
+def _filter_conditions():
+    """从查询参数构造筛选条件"""
+    return TrialCourseService.filter_conditions(
+        search=request.args.get('search'),
+        source=request.args.get('source'),
+        status=request.args.get('status')
+    )
+
+
+@trial_course_api.route('/trial-courses', methods=['GET'])
+def list_trial_courses():
+    """
+    键集分页获取试听课列表
+
+    Query Parameters:
+        - search / source / status: 筛选条件
+        - sort: 排序字段 (created_at/trial_price, 默认created_at)
+        - order: 排序方向 (asc/desc, 默认desc)
+        - limit: 每页条数 (默认50, 最大200)
+        - cursor: 上一页返回的 next_cursor
+    """
+    try:
+        page = TrialCourseService.list_page(
+            _filter_conditions(),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+            sort=request.args.get('sort', 'created_at'),
+            order=request.args.get('order', 'desc')
+        )
+        return jsonify(ApiResponse.success(page))
+    except ValueError as e:
+        return jsonify(ApiResponse.error(str(e))), 400
+    except Exception as e:
+        logger.error(f"获取试听课列表失败: {str(e)}")
+        return jsonify(ApiResponse.error("获取试听课列表失败", 500)), 500
+
+
+@trial_course_api.route('/trial-courses/stats', methods=['GET'])
+def get_trial_course_stats():
+    """获取筛选结果的统计数据（记录数、售价合计、渠道分布、转化率、分状态统计）"""
+    try:
+        stats = TrialCourseService.filtered_stats(_filter_conditions())
+        return jsonify(ApiResponse.success(stats))
+    except Exception as e:
+        logger.error(f"获取试听课筛选统计失败: {str(e)}")
+        return jsonify(ApiResponse.error("获取试听课筛选统计失败", 500)), 500
@@ -0,0 +1,91 @@
+"""
+数据库引擎配置 - 按数据库类型选择连接池参数，SQLite 连接时设置 PRAGMA
+
+Config.SQLALCHEMY_ENGINE_OPTIONS 中的 pool_size / max_overflow / pool_pre_ping 面向网络数据库；
+对本地 SQLite 文件，连接建立成本很低且不会“断线”，真正的瓶颈是写锁：默认的 rollback
+journal 模式下写入（以及备份）期间读请求全部阻塞。这里：
+
+- SQLite 文件库：QueuePool（连接复用，避免每次重复执行 PRAGMA），去掉 pre_ping；
+- SQLite 内存库：StaticPool，所有线程共享同一连接（否则每个连接各是一个空库）；
+- 每个新连接执行 Config.SQLITE_PRAGMAS（WAL、synchronous=NORMAL、busy_timeout 等），
+  WAL 模式下读写互不阻塞；
+- 其他数据库保持 SQLALCHEMY_ENGINE_OPTIONS 原样。
+"""
+
+from typing import Dict
+import logging
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+logger = logging.getLogger(__name__)
+
+# 只适用于网络数据库的连接池参数
+_NETWORK_POOL_OPTIONS = ('pool_pre_ping', 'pool_recycle')
+
+
+def is_sqlite(uri: str) -> bool:
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_sqlite_memory(uri: str) -> bool:
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config) -> Dict:
+    """
+    根据数据库类型生成 SQLALCHEMY_ENGINE_OPTIONS
+
+    Args:
+        config: app.config
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if not is_sqlite(uri):
+        return options
+
+    for key in _NETWORK_POOL_OPTIONS:
+        options.pop(key, None)
+    connect_args = dict(options.get('connect_args') or {})
+    connect_args.setdefault('check_same_thread', False)
+    options['connect_args'] = connect_args
+
+    if is_sqlite_memory(uri):
+        for key in ('pool_size', 'max_overflow', 'pool_timeout'):
+            options.pop(key, None)
+        options['poolclass'] = StaticPool
+    else:
+        options['poolclass'] = QueuePool
+        options['pool_size'] = config.get('SQLITE_POOL_SIZE', 5)
+        options['max_overflow'] = config.get('SQLITE_MAX_OVERFLOW', 10)
+    return options
+
+
+def install_sqlite_pragmas(engine, pragmas: Dict) -> None:
+    """为引擎的每个新连接执行 PRAGMA（仅 SQLite）"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    if is_sqlite_memory(str(engine.url)):
+        # 内存库不支持 WAL
+        pragmas = {key: value for key, value in pragmas.items() if key != 'journal_mode'}
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f'PRAGMA {key}={value}')
+        finally:
+            cursor.close()
+
+
+def configure_app(app) -> None:
+    """在 db.init_app(app) 之前调用：写入按数据库类型调整后的引擎参数"""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def configure_engine(app, db) -> None:
+    """在 db.init_app(app) 之后、首次连接之前调用：安装 SQLite PRAGMA 钩子"""
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS') or {})
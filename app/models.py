@@ -2,6 +2,13 @@ from . import db
 from datetime import datetime
 
 class Customer(db.Model):
+    __table_args__ = (
+        db.Index('ix_customer_created_at', 'created_at'),  # 客户列表按录入时间排序
+        db.Index('ix_customer_name', 'name'),  # 客户检索：姓名前缀
+        db.Index('ix_customer_phone_reversed', 'phone_reversed'),  # 客户检索：手机尾号
+        db.Index('ix_customer_name_initials', 'name_initials'),  # 客户检索：拼音首字母
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     gender = db.Column(db.String(10))
@@ -11,8 +18,19 @@ class Customer(db.Model):
     source = db.Column(db.String(50)) # 渠道来源
     has_tutoring_experience = db.Column(db.String(10)) # 是否参加过英语课外辅导
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 检索键（由 customer_lookup_service 在写入时维护）
+    phone_reversed = db.Column(db.String(20))  # 倒序手机号，尾号匹配转为前缀匹配
+    name_initials = db.Column(db.String(50))  # 姓名拼音首字母（未安装 pypinyin 时为空）
 
 class Course(db.Model):
+    __table_args__ = (
+        db.Index('ix_course_is_trial_created_at', 'is_trial', 'created_at'),  # 按类型筛选并按录入时间排序/分页
+        db.Index('ix_course_is_trial_status_source', 'is_trial', 'trial_status', 'source'),  # 试听课状态/渠道统计与筛选
+        db.Index('ix_course_customer_is_trial', 'customer_id', 'is_trial'),  # 查询客户的试听课/正课
+        db.Index('ix_course_updated_at', 'updated_at'),  # 汇总表增量刷新（水位线）
+        db.Index('ix_course_created_at', 'created_at'),  # 汇总表按日重算
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), nullable=False)
@@ -45,6 +63,12 @@ class Course(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class TaobaoOrder(db.Model):
+    __table_args__ = (
+        db.Index('ix_taobao_order_order_time', 'order_time'),  # 刷单列表按刷单时间排序/分页
+        db.Index('ix_taobao_order_settled_order_time', 'settled', 'order_time'),  # 按结算状态筛选与汇总
+        db.Index('ix_taobao_order_updated_at', 'updated_at'),  # 汇总表增量刷新（水位线）
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100))
     level = db.Column(db.String(50))
@@ -56,8 +80,128 @@ class TaobaoOrder(db.Model):
     settled = db.Column(db.Boolean, default=False)  # 结算状态
     settled_at = db.Column(db.DateTime)  # 结算时间
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Config(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(50), unique=True, nullable=False)
-    value = db.Column(db.String(200), nullable=False)
\ No newline at end of file
+    value = db.Column(db.String(200), nullable=False)
+
+class TrialCourseStat(db.Model):
+    """试听课统计汇总（按 状态/渠道/退款渠道 物化），随 Course 写入增量维护
+
+    只存储与手续费率无关的原始合计，手续费在读取时按当前费率配置计算，
+    因此修改费率后无需重建。
+    """
+    __table_args__ = (
+        db.UniqueConstraint('status', 'source', 'refund_channel', name='uq_trial_course_stat_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False)  # 试听课状态（空值按 registered 归类）
+    source = db.Column(db.String(50), nullable=False, default='')  # 渠道来源（空值存为''）
+    refund_channel = db.Column(db.String(50), nullable=False, default='')  # 退款渠道（空值存为''）
+    count = db.Column(db.Integer, nullable=False, default=0)  # 试听课数量
+    price_sum = db.Column(db.Float, nullable=False, default=0)  # 试听售价合计
+    cost_sum = db.Column(db.Float, nullable=False, default=0)  # 基础成本合计
+    recorded_fee_sum = db.Column(db.Float, nullable=False, default=0)  # 已记录退款手续费(>0)合计
+    unrecorded_price_sum = db.Column(db.Float, nullable=False, default=0)  # 未记录退款手续费的售价合计
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class DataVersion(db.Model):
+    """业务表数据版本号，表内容经 ORM 写入时递增
+
+    用于判断缓存（如导出文件）是否仍与数据一致。
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), unique=True, nullable=False)  # 业务表名
+    version = db.Column(db.Integer, nullable=False, default=0)  # 版本号
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CustomerDailyStat(db.Model):
+    """每日新增客户数（按 created_at 日期汇总），随 Customer 写入增量维护
+
+    首页“本月新增”读取本月的日汇总行，而不是扫描客户表。
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    stat_date = db.Column(db.Date, unique=True, nullable=False)  # 日期（created_at 的日期部分）
+    new_customers = db.Column(db.Integer, nullable=False, default=0)  # 当日新增客户数
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TrialRollup(db.Model):
+    """试听课按 日/月 × 渠道 汇总（按报名日期归入周期，转化按报名周期统计）
+
+    由 RollupService 按水位线增量刷新。
+    """
+    __table_args__ = (
+        db.UniqueConstraint('grain', 'period_start', 'source', name='uq_trial_rollup_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    grain = db.Column(db.String(10), nullable=False)  # 粒度：day / month
+    period_start = db.Column(db.Date, nullable=False)  # 周期起始日期
+    source = db.Column(db.String(50), nullable=False, default='')  # 渠道来源（空值存为''）
+    registrations = db.Column(db.Integer, nullable=False, default=0)  # 报名数
+    conversions = db.Column(db.Integer, nullable=False, default=0)  # 已转正课数
+    refunds = db.Column(db.Integer, nullable=False, default=0)  # 已退费数
+    trial_revenue = db.Column(db.Float, nullable=False, default=0)  # 试听售价合计
+    refund_amount = db.Column(db.Float, nullable=False, default=0)  # 退费金额合计
+
+class FormalRevenueRollup(db.Model):
+    """正课按 日/月 × 支付渠道 × 课程类型 汇总（手续费在读取时按当前费率计算）"""
+    __table_args__ = (
+        db.UniqueConstraint('grain', 'period_start', 'payment_channel', 'course_type',
+                            name='uq_formal_revenue_rollup_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    grain = db.Column(db.String(10), nullable=False)  # 粒度：day / month
+    period_start = db.Column(db.Date, nullable=False)  # 周期起始日期
+    payment_channel = db.Column(db.String(50), nullable=False, default='')  # 支付渠道（空值存为''）
+    course_type = db.Column(db.String(50), nullable=False, default='')  # 课程类型（空值存为''）
+    courses = db.Column(db.Integer, nullable=False, default=0)  # 正课数
+    sessions = db.Column(db.Integer, nullable=False, default=0)  # 购买节数合计
+    gift_sessions = db.Column(db.Integer, nullable=False, default=0)  # 赠课节数合计
+    gross_revenue = db.Column(db.Float, nullable=False, default=0)  # 节数×单节售价 合计
+    cost = db.Column(db.Float, nullable=False, default=0)  # 成本合计
+
+class TaobaoOrderRollup(db.Model):
+    """刷单订单按 日/月 × 结算状态 汇总（按刷单时间归入周期，无刷单时间时按录入时间）"""
+    __table_args__ = (
+        db.UniqueConstraint('grain', 'period_start', 'settled', name='uq_taobao_order_rollup_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    grain = db.Column(db.String(10), nullable=False)  # 粒度：day / month
+    period_start = db.Column(db.Date, nullable=False)  # 周期起始日期
+    settled = db.Column(db.Boolean, nullable=False, default=False)  # 结算状态
+    orders = db.Column(db.Integer, nullable=False, default=0)  # 订单数
+    amount = db.Column(db.Float, nullable=False, default=0)  # 刷单金额合计
+    commission = db.Column(db.Float, nullable=False, default=0)  # 佣金合计
+    taobao_fee = db.Column(db.Float, nullable=False, default=0)  # 淘宝手续费合计
+
+class RollupWatermark(db.Model):
+    """汇总表增量刷新水位线：各来源表已处理到的 updated_at"""
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), unique=True, nullable=False)  # 来源表名
+    watermark = db.Column(db.DateTime)  # 已处理到的 updated_at
+
+class RollupDirtyDay(db.Model):
+    """待重算的汇总日期：记录删除或移出某日的行（水位线无法发现），下次刷新时重算"""
+    __table_args__ = (
+        db.UniqueConstraint('table_name', 'day', name='uq_rollup_dirty_day_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)  # 来源表名
+    day = db.Column(db.Date, nullable=False)  # 需要重算的日期
+
+class ChangelogPosition(db.Model):
+    """变更日志位置（单行）：最近一个写入变更日志的事务序号，随事务提交
+
+    备份中保存的序号即备份包含的最后一个事务，恢复时从下一个序号开始重放（见 change_log.py）。
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    lsn = db.Column(db.Integer, nullable=False, default=0)  # 事务序号
+    timeline = db.Column(db.String(32), nullable=False)  # 时间线（每次恢复后更换）
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
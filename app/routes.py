@@ -1,10 +1,15 @@
 from flask import render_template, request, redirect, url_for, jsonify, flash, make_response, send_from_directory
 from flask import current_app as app
-from .models import db, Customer, Config, TaobaoOrder, Course
+from .models import db, Customer, TaobaoOrder, Course
+from .services.trial_stats_service import TrialStatsService
+from .services.export_service import ExportService
+from .services.config_service import ConfigService
+from .services.dashboard_service import DashboardService
+from .services.formal_stats_service import FormalStatsService
+from .services.taobao_order_service import TaobaoOrderService
 from datetime import datetime
 import csv
 from io import StringIO, BytesIO
-import pandas as pd
 import os
 
 @app.route('/test-js')
@@ -41,14 +46,10 @@ def test_excel_export():
             {'订单ID': 2, '客户姓名': '测试客户2', '金额': 200}
         ]
         
-        # 创建DataFrame
-        df = pd.DataFrame(data)
-        
         # 创建Excel文件
         output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='测试数据', index=False)
-        
+        ExportService.write_rows_xlsx(output, '测试数据', list(data[0].keys()),
+                                      [list(row.values()) for row in data])
         output.seek(0)
         
         # 创建响应
@@ -63,47 +64,8 @@ def test_excel_export():
 
 @app.route('/')
 def home():
-    # 批量获取配置值
-    configs = {c.key: float(c.value) for c in Config.query.filter(Config.key.in_([
-        'trial_cost', 'course_cost', 'taobao_fee_rate'
-    ])).all()}
-    
-    trial_cost_value = configs.get('trial_cost', 0)
-    course_cost_value = configs.get('course_cost', 0)
-    taobao_fee_rate_value = configs.get('taobao_fee_rate', 0)
-    
-    # 获取统计数据（单次查询）
-    current_month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0)
-    
-    # 分别查询客户和订单统计，避免笛卡尔积
-    from sqlalchemy import case
-    
-    # 客户统计
-    customer_stats = db.session.query(
-        db.func.count(Customer.id).label('total_customers'),
-        db.func.sum(case((Customer.created_at >= current_month_start, 1), else_=0)).label('new_customers')
-    ).first()
-    
-    # 订单统计
-    order_stats = db.session.query(
-        db.func.count(TaobaoOrder.id).label('total_orders'),
-        db.func.coalesce(db.func.sum(TaobaoOrder.amount), 0).label('total_order_amount')
-    ).first()
-    
-    # 获取最近客户（使用索引）
-    recent_customers = Customer.query.with_entities(
-        Customer.name, Customer.phone, Customer.grade, Customer.region, Customer.created_at
-    ).order_by(Customer.created_at.desc()).limit(5).all()
-    
-    return render_template('index.html', 
-                         total_customers=customer_stats.total_customers or 0,
-                         new_customers=customer_stats.new_customers or 0,
-                         trial_cost=trial_cost_value,
-                         course_cost=course_cost_value,
-                         taobao_fee_rate=taobao_fee_rate_value,
-                         total_orders=order_stats.total_orders or 0,
-                         total_order_amount=order_stats.total_order_amount or 0,
-                         recent_customers=recent_customers)
+    # 统计快照缓存在进程内，客户/订单写入后失效；本月新增读取每日汇总表
+    return render_template('index.html', **DashboardService.get_context())
 
 @app.route('/customers', methods=['GET', 'POST'])
 def manage_customers():
@@ -150,25 +112,15 @@ def manage_customers():
 @app.route('/config', methods=['GET', 'POST'])
 def manage_config():
     if request.method == 'POST':
-        # 获取表单数据并更新或创建配置项
-        for key in ['trial_cost', 'course_cost', 'taobao_fee_rate']:
-            config_item = Config.query.filter_by(key=key).first()
-            if not config_item:
-                config_item = Config(key=key)
-                db.session.add(config_item)
-            config_item.value = request.form[key]
-        db.session.commit()
+        # 获取表单数据并更新或创建配置项（提交后配置缓存自动失效）
+        ConfigService.set_values({
+            key: request.form[key] for key in ['trial_cost', 'course_cost', 'taobao_fee_rate']
+        })
         return redirect(url_for('manage_config'))
 
     # 查询现有配置，如果不存在则提供默认值
-    trial_cost = Config.query.filter_by(key='trial_cost').first()
-    course_cost = Config.query.filter_by(key='course_cost').first()
-    taobao_fee_rate = Config.query.filter_by(key='taobao_fee_rate').first()
-    
     config = {
-        'trial_cost': trial_cost.value if trial_cost else '0',
-        'course_cost': course_cost.value if course_cost else '0',
-        'taobao_fee_rate': taobao_fee_rate.value if taobao_fee_rate else '0'
+        key: ConfigService.get(key, '0') for key in ['trial_cost', 'course_cost', 'taobao_fee_rate']
     }
     
     return render_template('config.html', config=config)
@@ -184,8 +136,7 @@ def manage_taobao_orders():
         evaluated = bool(request.form.get('evaluated'))
         
         # 自动计算淘宝手续费
-        taobao_fee_rate_config = Config.query.filter_by(key='taobao_fee_rate').first()
-        taobao_fee_rate = float(taobao_fee_rate_config.value) if taobao_fee_rate_config else 0.6
+        taobao_fee_rate = ConfigService.get_float('taobao_fee_rate', 0.6)
         taobao_fee = amount * (taobao_fee_rate / 100)
         
         # 处理时间格式
@@ -241,16 +192,8 @@ def manage_taobao_orders():
     pending_principal = (stats.pending_amount or 0) + (stats.pending_commission or 0)
     settled_principal = (stats.settled_amount or 0) + (stats.settled_commission or 0)
     
-    # 使用分页和选择性字段查询
-    orders = TaobaoOrder.query.with_entities(
-        TaobaoOrder.id, TaobaoOrder.name, TaobaoOrder.level,
-        TaobaoOrder.amount, TaobaoOrder.commission, TaobaoOrder.taobao_fee,
-        TaobaoOrder.evaluated, TaobaoOrder.order_time, TaobaoOrder.settled, 
-        TaobaoOrder.settled_at, TaobaoOrder.created_at
-    ).order_by(TaobaoOrder.order_time.desc()).all()
-    
+    # 订单列表由页面通过 /api/v1/taobao-orders 分页加载
     return render_template('taobao_orders.html', 
-                         orders=orders,
                          stats={
                              'total_count': stats.total_count or 0,
                              'total_amount': stats.total_amount or 0,
@@ -305,8 +248,7 @@ def update_taobao_order(order_id):
     elif field == 'amount':
         order.amount = float(value)
         # 当修改刷单金额时，自动重新计算淘宝手续费
-        taobao_fee_rate_config = Config.query.filter_by(key='taobao_fee_rate').first()
-        taobao_fee_rate = float(taobao_fee_rate_config.value) if taobao_fee_rate_config else 0.6
+        taobao_fee_rate = ConfigService.get_float('taobao_fee_rate', 0.6)
         order.taobao_fee = order.amount * taobao_fee_rate / 100
     elif field == 'commission':
         order.commission = float(value)
@@ -348,163 +290,38 @@ def delete_taobao_order(order_id):
 
 @app.route('/api/export/taobao-orders')
 def export_taobao_orders():
-    """导出刷单数据为Excel"""
+    """导出刷单数据（流式，?format=xlsx|csv，默认xlsx）"""
     try:
-        app.logger.info("开始导出刷单数据")
-        
-        # 查询所有订单数据，与UI界面保持一致
-        try:
-            orders = TaobaoOrder.query.order_by(TaobaoOrder.order_time.desc()).all()
-            app.logger.info(f"成功查询到 {len(orders)} 条订单")
-        except Exception as query_error:
-            app.logger.error(f"订单查询失败: {str(query_error)}")
-            return jsonify({'error': f'订单查询失败: {str(query_error)}'}), 500
-        
-        if not orders:
+        if not db.session.query(TaobaoOrder.id).first():
             app.logger.info("没有找到订单数据")
             return jsonify({'error': '没有找到订单数据'}), 404
-        
-        # 准备完整的数据，与UI界面显示的字段保持一致
-        data = []
-        for i, order in enumerate(orders):
-            try:
-                data.append({
-                    '序号': i + 1,
-                    '订单ID': order.id,
-                    '客户姓名': order.name or '',
-                    '等级': order.level or '',
-                    '刷单金额': order.amount or 0,
-                    '佣金': order.commission or 0,
-                    '淘宝手续费': order.taobao_fee or 0,
-                    '本金': (order.amount or 0) + (order.commission or 0),
-                    '是否已评价': '是' if order.evaluated else '否',
-                    '订单时间': order.order_time.strftime('%Y-%m-%d %H:%M:%S') if order.order_time else '',
-                    '结算状态': '已结算' if order.settled else '未结算',
-                    '结算时间': order.settled_at.strftime('%Y-%m-%d %H:%M:%S') if order.settled_at else '',
-                    '创建时间': order.created_at.strftime('%Y-%m-%d %H:%M:%S') if order.created_at else ''
-                })
-            except Exception as data_error:
-                app.logger.error(f"处理第{i+1}条订单数据时出错: {str(data_error)}")
-                continue
-        
-        app.logger.info(f"准备了 {len(data)} 条数据")
-        
-        if not data:
-            return jsonify({'error': '没有有效的数据可导出'}), 404
-        
-        # 创建DataFrame
-        try:
-            df = pd.DataFrame(data)
-            app.logger.info("创建DataFrame成功")
-        except Exception as df_error:
-            app.logger.error(f"创建DataFrame失败: {str(df_error)}")
-            return jsonify({'error': f'创建DataFrame失败: {str(df_error)}'}), 500
-        
-        # 创建Excel文件
-        try:
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='刷单数据', index=False)
-            
-            output.seek(0)
-            app.logger.info("Excel文件创建成功")
-        except Exception as excel_error:
-            app.logger.error(f"创建Excel文件失败: {str(excel_error)}")
-            return jsonify({'error': f'创建Excel文件失败: {str(excel_error)}'}), 500
-        
-        # 生成文件名（使用英文避免编码问题）
-        filename = f"taobao_orders_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        # 创建响应
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        app.logger.info("导出完成")
-        return response
-        
+        return ExportService.stream_response('taobao_orders', 'taobao_orders',
+                                             request.args.get('format', 'xlsx'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"导出刷单数据时出错: {str(e)}")
         return jsonify({'error': f'导出失败: {str(e)}'}), 500
 
 @app.route('/api/export/trial-courses')
 def export_trial_courses():
-    """导出试听课数据为Excel（使用现有模型字段）"""
+    """导出试听课数据（流式，?format=xlsx|csv，默认xlsx）"""
     try:
-        courses = Course.query.filter_by(is_trial=True).order_by(Course.created_at.desc()).all()
-
-        data = []
-        for course in courses:
-            customer = db.session.get(Customer, course.customer_id)
-            data.append({
-                '课程ID': course.id,
-                '客户姓名': customer.name if customer else '',
-                '客户电话': customer.phone if customer else '',
-                '课程类型': '试听课',
-                '试听售价': course.trial_price or 0,
-                '渠道来源': course.source or '',
-                '状态': course.trial_status or '',
-                '基础成本': course.cost or 0,
-                '退款金额': course.refund_amount or 0,
-                '退款手续费': course.refund_fee or 0,
-                '退款渠道': course.refund_channel or '',
-                '创建时间': course.created_at.strftime('%Y-%m-%d %H:%M:%S') if course.created_at else ''
-            })
-
-        df = pd.DataFrame(data)
-
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='试听课数据', index=False)
-
-        output.seek(0)
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        response.headers['Content-Disposition'] = f"attachment; filename=trial_courses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return response
+        return ExportService.stream_response('trial_courses', 'trial_courses',
+                                             request.args.get('format', 'xlsx'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'导出失败: {str(e)}'}), 500
 
 @app.route('/api/export/formal-courses')
 def export_formal_courses():
-    """导出正课数据为Excel（使用现有模型字段）"""
+    """导出正课数据（流式，?format=xlsx|csv，默认xlsx）"""
     try:
-        courses = Course.query.filter_by(is_trial=False).order_by(Course.created_at.desc()).all()
-
-        data = []
-        for course in courses:
-            customer = db.session.get(Customer, course.customer_id)
-            price = float(course.price or 0)
-            base_cost = float(course.cost or 0)
-            other_cost = float(course.other_cost or 0)
-            profit = price - base_cost - other_cost
-            data.append({
-                '课程ID': course.id,
-                '客户姓名': customer.name if customer else '',
-                '客户电话': customer.phone if customer else '',
-                '课程类型': course.course_type or '',
-                '购买节数': course.sessions or 0,
-                '赠课节数': course.gift_sessions or 0,
-                '课程售价': price,
-                '课程成本': base_cost,
-                '其他成本': other_cost,
-                '利润': profit,
-                '支付渠道': course.payment_channel or '',
-                '来源': course.source or '',
-                '创建时间': course.created_at.strftime('%Y-%m-%d %H:%M:%S') if course.created_at else ''
-            })
-
-        df = pd.DataFrame(data)
-
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='正课数据', index=False)
-
-        output.seek(0)
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        response.headers['Content-Disposition'] = f"attachment; filename=formal_courses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        return response
+        return ExportService.stream_response('formal_courses', 'formal_courses',
+                                             request.args.get('format', 'xlsx'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'导出失败: {str(e)}'}), 500
 
@@ -544,30 +361,22 @@ def delete_customer_api(customer_id):
 
 @app.route('/api/taobao-orders/settle', methods=['POST'])
 def settle_orders():
-    """批量结算淘宝订单"""
-    order_ids = request.json.get('order_ids', [])
-    if not order_ids:
-        return jsonify({'success': False, 'message': '请选择要结算的订单'})
-    
-    # 更新订单结算状态
-    orders = TaobaoOrder.query.filter(TaobaoOrder.id.in_(order_ids)).all()
-    total_amount = 0
-    total_commission = 0
-    
-    for order in orders:
-        if not order.settled:  # 只结算未结算的订单
-            order.settled = True
-            order.settled_at = datetime.now()
-            total_amount += order.amount or 0
-            total_commission += order.commission or 0
-    
-    db.session.commit()
+    """批量结算淘宝订单（按订单ID或按筛选条件，单条 UPDATE 完成）"""
+    data = request.json or {}
+    try:
+        result = TaobaoOrderService.settle(order_ids=data.get('order_ids'), filters=data.get('filters'))
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
     
     return jsonify({
         'success': True, 
-        'message': f'成功结算 {len(orders)} 条订单',
-        'total_amount': total_amount,
-        'total_commission': total_commission
+        'message': f'成功结算 {result["settled_count"]} 条订单',
+        'settled_count': result['settled_count'],
+        'total_amount': result['total_amount'],
+        'total_commission': result['total_commission'],
+        'data': result
     })
 
 @app.route('/api/taobao-orders/<int:order_id>/quick-edit', methods=['PUT'])
@@ -582,8 +391,7 @@ def quick_edit_order(order_id):
     if 'amount' in data:
         order.amount = float(data['amount'])
         # 当刷单金额更新时，自动重新计算淘宝手续费
-        taobao_fee_config = Config.query.filter_by(key='taobao_fee_rate').first()
-        taobao_fee_rate = float(taobao_fee_config.value) if taobao_fee_config else 0.6
+        taobao_fee_rate = ConfigService.get_float('taobao_fee_rate', 0.6)
         order.taobao_fee = order.amount * taobao_fee_rate / 100
     if 'commission' in data:
         order.commission = float(data['commission'])
@@ -613,11 +421,11 @@ def quick_edit_order(order_id):
 @app.route('/api/config/<config_key>')
 def get_config(config_key):
     """获取系统配置参数"""
-    config_item = Config.query.filter_by(key=config_key).first()
-    if config_item:
+    value = ConfigService.get(config_key)
+    if value is not None:
         return jsonify({
-            'key': config_item.key,
-            'value': config_item.value
+            'key': config_key,
+            'value': value
         })
     else:
         # 返回默认值
@@ -687,8 +495,7 @@ def manage_trial_courses():
             return redirect(url_for('manage_trial_courses'))
         
         # 获取试听课成本配置
-        trial_cost_config = Config.query.filter_by(key='trial_cost').first()
-        base_trial_cost = float(trial_cost_config.value) if trial_cost_config else 0
+        base_trial_cost = ConfigService.get_float('trial_cost', 0)
         
         # 统一规则：试听课成本仅为基础成本，不包含任何渠道手续费
         total_trial_cost = base_trial_cost
@@ -717,161 +524,20 @@ def manage_trial_courses():
     embedded = request.args.get('embedded', 'false').lower() == 'true'
     debug_mode = request.args.get('debug', '0') in ('1', 'true', 'True')
     
-    # 构建试听课查询
-    query = db.session.query(Course, Customer).join(
-        Customer, Course.customer_id == Customer.id
-    ).filter(Course.is_trial == True)
-        
-    trial_courses = query.order_by(Course.created_at.desc()).all()
-    
-    # 获取客户列表用于下拉选择
-    customers = Customer.query.order_by(Customer.name).all()
+    # 试听课列表由前端通过 /api/v1/trial-courses 分页加载（服务端筛选、排序）
     
     # 获取多渠道手续费率配置（默认0）
-    fee_keys = ['taobao_fee_rate', 'xiaohongshu_fee_rate', 'douyin_fee_rate', 'referral_fee_rate']
-    fee_configs = {c.key: c.value for c in Config.query.filter(Config.key.in_(fee_keys)).all()}
-    taobao_fee_rate = float(fee_configs.get('taobao_fee_rate', 0)) / 100
-    xhs_fee_rate = float(fee_configs.get('xiaohongshu_fee_rate', 0)) / 100
-    douyin_fee_rate = float(fee_configs.get('douyin_fee_rate', 0)) / 100
-    referral_fee_rate = float(fee_configs.get('referral_fee_rate', 0)) / 100
-
-    def calc_channel_fee_rate(source_name: str) -> float:
-        if source_name == '淘宝':
-            return taobao_fee_rate
-        if source_name == '小红书':
-            return xhs_fee_rate
-        if source_name == '抖音':
-            return douyin_fee_rate
-        if source_name == '转介绍':
-            return referral_fee_rate
-        return 0.0
+    fee_rates = ConfigService.fee_rates()
+    taobao_fee_rate = fee_rates.get('淘宝', 0.0)
     
-    # 按状态分组统计试听课（使用与页面相同的数据集，确保前后端一致）
-    # 注意：页面表格数据 trial_courses 来源于 Course INNER JOIN Customer 的结果，
-    # 若存在“孤儿”试听课（缺失客户记录），页面不会显示该条，但此前统计会包含，导致不一致。
-    # 这里改为直接使用同一数据源中的 Course 对象集合，保证一致性。
-    trial_courses_list = [course for (course, _) in trial_courses]
+    # 按状态分组统计试听课：读取随课程写入增量维护的物化汇总（trial_course_stat），
+    # 口径与原逐条计算一致（同为 Course INNER JOIN Customer 数据源），避免每次请求全量累计
+    status_stats, total_stats = TrialStatsService.get_stats(fee_rates)
     
-    # 初始化各状态统计
-    status_stats = {
-        'registered': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0},
-        'not_registered': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0},
-        'refunded': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0},
-        'converted': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0},
-        'no_action': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0}
-    }
-    # 调试用明细
-    calc_rows = []
-    
-    # 计算各状态的统计数据
-    for course in trial_courses_list:
-        # 默认状态为空时按“已报名试听课”处理，避免被错误排除
-        status = course.trial_status or 'registered'
-
-        # 未报名：完全不参与统计（不计数、不计收入/成本/费用/利润）
-        if status == 'not_registered':
-            # 调试记录
-            if debug_mode:
-                calc_rows.append({
-                    'id': course.id,
-                    'status': status,
-                    'source': course.source or '',
-                    'trial_price': float(course.trial_price or 0),
-                    'included': False,
-                    'revenue': 0.0,
-                    'cost': float(course.cost or 0),
-                    'fees': 0.0,
-                })
-            continue
-
-        # 每个状态都需要按来源计算渠道费率
-        channel_rate = calc_channel_fee_rate(course.source or '')
-
-        # 按状态计算
-        if status == 'registered':
-            revenue = course.trial_price or 0
-            cost = course.cost or 0
-            fees = (revenue * channel_rate) if revenue else 0
-            profit = revenue - cost  # 修改为不扣除手续费
-        elif status == 'refunded':
-            # 退费（MIGRATION_GUIDE）：收入=0；成本=基础成本C；不再从利润中扣除手续费
-            revenue = 0
-            cost = course.cost or 0
-            refund_channel = (course.refund_channel or '').strip()
-            if refund_channel == '淘宝':
-                fees = 0.0
-            else:
-                # 以退款渠道计算费率；若未配置该渠道费率则回退到淘宝费率
-                channel_r = calc_channel_fee_rate(refund_channel)
-                if not channel_r:
-                    channel_r = taobao_fee_rate or 0.0
-                base_amount = float(course.trial_price or 0)
-                # 若数据库已记录退款手续费且>0，则以记录值为准（人工覆盖）；否则按费率估算
-                recorded_fee = float(course.refund_fee or 0)
-                fees = recorded_fee if recorded_fee > 0 else base_amount * channel_r
-            profit = -cost
-        elif status == 'converted':
-            # 独立核算：与已报名一致
-            revenue = course.trial_price or 0
-            cost = course.cost or 0
-            fees = (revenue * channel_rate) if revenue else 0
-            profit = revenue - cost  # 修改为不扣除手续费
-        elif status == 'no_action':
-            # 视为已支付并完成试听：与已报名一致
-            revenue = course.trial_price or 0
-            cost = course.cost or 0
-            fees = (revenue * channel_rate) if revenue else 0
-            profit = revenue - cost  # 修改为不扣除手续费
-        else:
-            # 未知状态保护
-            revenue = 0
-            cost = 0
-            fees = 0
-            profit = 0
-
-        # 只有参与统计的状态才累计
-        status_stats[status]['count'] += 1
-        
-        # 累加到对应状态
-        status_stats[status]['revenue'] += revenue
-        status_stats[status]['cost'] += cost
-        status_stats[status]['fees'] += fees
-        status_stats[status]['profit'] += profit
-
-        # 记录调试明细
-        if debug_mode:
-            calc_rows.append({
-                'id': course.id,
-                'status': status,
-                'source': course.source or '',
-                'trial_price': float(course.trial_price or 0),
-                'included': True,
-                'revenue': float(revenue or 0),
-                'cost': float(cost or 0),
-                'fees': float(fees or 0),
-            })
-    
-    # 计算总统计
-    total_stats = {
-        # 仅统计纳入口径的状态：已报名、转正、无操作、退费；未报名不计入
-        'total_trials': (
-            status_stats['registered']['count']
-            + status_stats['converted']['count']
-            + status_stats['no_action']['count']
-            + status_stats['refunded']['count']
-        ),
-        'total_revenue': sum(s['revenue'] for s in status_stats.values()),
-        # 修改：总成本 = 基础成本合计（不重复计算手续费）
-        'total_cost': sum(s['cost'] for s in status_stats.values()),
-        # 修改：单独计算总手续费
-        'total_fees': sum(s['fees'] for s in status_stats.values()),
-        # 直接计算总利润 = 总收入 - 总成本
-        'total_profit': sum(s['revenue'] for s in status_stats.values()) - sum(s['cost'] for s in status_stats.values())
-    }
+    # 调试用明细（仅调试模式逐条计算）
+    calc_rows = TrialStatsService.debug_rows() if debug_mode else []
     
     return render_template('trial_courses.html', 
-                         trial_courses=trial_courses,
-                         customers=customers,
                          taobao_fee_rate=taobao_fee_rate,
                          stats=total_stats,
                          status_stats=status_stats,
@@ -891,59 +557,15 @@ def manage_formal_courses():
         
     formal_courses = query.order_by(Course.created_at.desc()).all()
     
-    # 获取客户列表用于下拉选择
-    customers = Customer.query.order_by(Customer.name).all()
-    
-    # 计算正课统计
-    formal_stats_query = db.session.query(
-        db.func.count(Course.id).label('total_courses'),
-        db.func.coalesce(db.func.sum(Course.cost), 0).label('total_cost'),
-        db.func.coalesce(db.func.sum(Course.sessions), 0).label('total_sessions'),
-        db.func.coalesce(db.func.sum(Course.gift_sessions), 0).label('total_gift_sessions')
-    ).filter(Course.is_trial == False)
-        
-    formal_stats = formal_stats_query.first()
-    
-    # 计算实际总收入（考虑手续费）
-    courses_query = Course.query.filter(Course.is_trial == False)
-    courses = courses_query.all()
-    total_revenue = 0
-    total_fees = 0
-    
-    # 获取淘宝手续费率配置
-    taobao_fee_config = Config.query.filter_by(key='taobao_fee_rate').first()
-    taobao_fee_rate = float(taobao_fee_config.value) / 100 if taobao_fee_config else 0.006  # 转换为小数
-    
-    for course in courses:
-        # 计算基础收入：购买节数 × 单节售价
-        base_revenue = course.sessions * course.price
-        
-        # 如果是淘宝支付，扣除手续费
-        if course.payment_channel == '淘宝':
-            fee_amount = base_revenue * taobao_fee_rate
-            actual_revenue = base_revenue - fee_amount
-            total_fees += fee_amount
-        else:
-            actual_revenue = base_revenue
-            
-        total_revenue += actual_revenue
-    
-    # 计算利润
-    total_profit = total_revenue - (formal_stats.total_cost or 0)
+    # 正课统计：单次 SQL 聚合（收入、手续费、成本、课时）
+    fee_rates = FormalStatsService.channel_fee_rates()
+    taobao_fee_rate = fee_rates['淘宝']
+    stats = FormalStatsService.get_stats(fee_rates=fee_rates)
     
     return render_template('formal_courses.html', 
                          formal_courses=formal_courses,
-                         customers=customers,
                          taobao_fee_rate=taobao_fee_rate,
-                         stats={
-                             'total_courses': formal_stats.total_courses or 0,
-                             'total_revenue': total_revenue,
-                             'total_cost': formal_stats.total_cost or 0,
-                             'total_profit': total_profit,
-                             'total_sessions': formal_stats.total_sessions or 0,
-                             'total_gift_sessions': formal_stats.total_gift_sessions or 0,
-                             'total_fees': total_fees
-                         },
+                         stats=stats,
                          embedded=embedded)
 
 @app.route('/convert-trial/<int:trial_id>', methods=['GET', 'POST'])
@@ -961,8 +583,7 @@ def convert_trial_to_course(trial_id):
         other_cost = float(request.form.get('other_cost', 0))
         
         # 获取正课成本配置
-        course_cost_config = Config.query.filter_by(key='course_cost').first()
-        course_cost_per_session = float(course_cost_config.value) if course_cost_config else 0
+        course_cost_per_session = ConfigService.get_float('course_cost', 0)
         
         # 计算总成本
         total_cost = (sessions + gift_sessions) * course_cost_per_session + other_cost
@@ -1097,11 +718,7 @@ def delete_formal_course(course_id):
 def get_course_cost_config():
     """获取正课成本配置"""
     try:
-        config = Config.query.filter_by(key='course_cost').first()
-        if config:
-            return jsonify({'value': config.value})
-        else:
-            return jsonify({'value': '0'})
+        return jsonify({'value': ConfigService.get('course_cost', '0')})
     except Exception as e:
         return jsonify({'value': '0'})
 
@@ -1125,8 +742,7 @@ def update_trial_course(course_id):
         
         # 计算试听课成本
         # 统一规则：course.cost 仅存储“基础试听课成本”，不包含任何渠道手续费，防止与统计中的手续费重复计算
-        base_trial_cost_config = Config.query.filter_by(key='trial_cost').first()
-        base_trial_cost = float(base_trial_cost_config.value) if base_trial_cost_config else 0
+        base_trial_cost = ConfigService.get_float('trial_cost', 0)
         course.cost = base_trial_cost
         
         db.session.commit()
@@ -1160,8 +776,7 @@ def update_formal_course(course_id):
         course.other_cost = float(request.form.get('other_cost', 0))
         
         # 重新计算成本
-        course_cost_config = Config.query.filter_by(key='course_cost').first()
-        course_cost_per_session = float(course_cost_config.value) if course_cost_config else 0
+        course_cost_per_session = ConfigService.get_float('course_cost', 0)
         
         # 计算总成本（购买节数 + 赠课节数）* 单节成本 + 其他成本
         total_cost = (course.sessions + course.gift_sessions) * course_cost_per_session + course.other_cost
@@ -1267,31 +882,23 @@ def trial_courses_revenue_debug():
     }
     """
     try:
-        # 查询所有试听课（不受前端筛选影响）
-        trial_courses_list = Course.query.filter(Course.is_trial == True).order_by(Course.created_at.asc()).all()
-
+        # 查询所有试听课（不受前端筛选影响），逐条口径与页面统计共用同一 SQL 计算引擎
         rows = []
         total_revenue = 0.0
         included_ids = []
 
-        for course in trial_courses_list:
-            status = course.trial_status or 'registered'
-            price = float(course.trial_price or 0.0)
-            customer_name = course.customer.name if getattr(course, 'customer', None) else None
-
-            included = status in ['registered', 'converted', 'no_action', 'refunded']
-            revenue = 0.0
-            if included:
-                revenue = 0.0 if status == 'refunded' else price
+        for row in TrialStatsService.sql_rows(include_orphans=True, ascending=True):
+            revenue = float(row.revenue or 0)
+            if row.included:
                 total_revenue += revenue
-                included_ids.append(course.id)
+                included_ids.append(row.id)
 
             rows.append({
-                'id': course.id,
-                'customer_name': customer_name,
-                'status': status,
-                'trial_price': price,
-                'included': included,
+                'id': row.id,
+                'customer_name': row.customer_name,
+                'status': row.status,
+                'trial_price': float(row.trial_price or 0),
+                'included': bool(row.included),
                 'revenue': revenue
             })
 
@@ -0,0 +1,162 @@
+"""
+在线备份任务服务 - 在应用内后台线程中执行分步备份，轮询进度
+
+备份由根目录的 backup_database.DatabaseBackup 完成：按页分步复制（BACKUP_STEP_PAGES），
+步与步之间让出 BACKUP_STEP_PAUSE 秒；WAL 模式下复制期间持有一个读事务，
+录单等写入不会被阻塞。同一时间只运行一个备份任务，重复提交时返回正在进行的任务。
+
+任务状态保存在进程内存中（与导出任务相同），适用于单进程部署。
+"""
+
+from typing import Dict, List, Optional
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+BACKUP_MODES = ('full', 'incremental')
+
+# 任务状态
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_SKIPPED = 'skipped'
+STATUS_FAILED = 'failed'
+
+# 已结束任务在内存中的保留时间
+JOB_TTL = timedelta(hours=6)
+
+_jobs: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+def _update_job(job_id: str, **fields) -> None:
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(fields)
+
+
+class BackupService:
+    """在线备份任务服务类"""
+
+    @staticmethod
+    def database_path() -> str:
+        """当前应用的 SQLite 数据库文件路径"""
+        url = db.engine.url
+        if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+            raise ValueError('在线备份仅支持 SQLite 文件数据库')
+        return os.path.abspath(url.database)
+
+    @staticmethod
+    def backup_tool():
+        """按应用配置创建备份工具（根目录的 backup_database 模块）"""
+        from backup_database import DatabaseBackup
+        from backup_retention import RetentionPolicy
+        tool = DatabaseBackup(db_path=BackupService.database_path(),
+                              backup_dir=current_app.config.get('BACKUP_DIR'))
+        tool.step_pages = current_app.config.get('BACKUP_STEP_PAGES', tool.step_pages)
+        tool.step_pause = current_app.config.get('BACKUP_STEP_PAUSE', tool.step_pause)
+        tool.retention = RetentionPolicy.from_config(current_app.config.get('BACKUP_RETENTION'))
+        return tool
+
+    @staticmethod
+    def submit(mode: str = 'full') -> Dict:
+        """
+        提交备份任务（后台线程执行）
+
+        Args:
+            mode: full（完整 zip 备份）/ incremental（增量快照）
+
+        Returns:
+            任务信息；已有备份任务进行中时返回该任务
+        """
+        if mode not in BACKUP_MODES:
+            raise ValueError(f'不支持的备份方式: {mode}')
+        tool = BackupService.backup_tool()
+        now = datetime.now()
+
+        with _lock:
+            BackupService._prune_jobs(now)
+            for job in _jobs.values():
+                if job['status'] in (STATUS_PENDING, STATUS_RUNNING):
+                    return BackupService._public(job)
+            job_id = uuid.uuid4().hex
+            _jobs[job_id] = {
+                'job_id': job_id, 'mode': mode, 'status': STATUS_PENDING,
+                'copied_pages': 0, 'total_pages': None, 'result': None, 'error': None,
+                'created_at': now, 'finished_at': None,
+            }
+
+        thread = threading.Thread(target=BackupService._run, args=(tool, job_id, mode),
+                                  name=f'backup-{job_id[:8]}', daemon=True)
+        thread.start()
+        return BackupService.get_job(job_id)
+
+    @staticmethod
+    def get_job(job_id: str) -> Optional[Dict]:
+        with _lock:
+            job = _jobs.get(job_id)
+            return BackupService._public(job) if job else None
+
+    @staticmethod
+    def list_jobs() -> List[Dict]:
+        with _lock:
+            jobs = sorted(_jobs.values(), key=lambda job: job['created_at'], reverse=True)
+            return [BackupService._public(job) for job in jobs]
+
+    @staticmethod
+    def _run(tool, job_id: str, mode: str) -> None:
+        """在后台线程中执行备份（不使用应用的数据库会话）"""
+        _update_job(job_id, status=STATUS_RUNNING)
+        progress = lambda copied, total: _update_job(job_id, copied_pages=copied, total_pages=total)  # noqa: E731
+        try:
+            if mode == 'incremental':
+                manifest = tool.create_incremental_backup(progress=progress)
+                result = manifest['name'] if manifest else None
+                status = STATUS_DONE if manifest else STATUS_SKIPPED
+            else:
+                path = tool.create_backup(progress=progress)
+                if not path:
+                    raise RuntimeError('备份失败，详见服务端输出')
+                result, status = os.path.basename(path), STATUS_DONE
+            _update_job(job_id, status=status, result=result, finished_at=datetime.now())
+            logger.info(f"备份任务 {job_id} 完成: {mode} {result or '无变化'}")
+        except Exception as e:
+            logger.error(f"备份任务 {job_id} 失败: {str(e)}")
+            _update_job(job_id, status=STATUS_FAILED, error=str(e), finished_at=datetime.now())
+
+    @staticmethod
+    def _public(job: Dict) -> Dict:
+        total = job['total_pages']
+        if job['status'] in (STATUS_DONE, STATUS_SKIPPED):
+            percent = 100
+        elif total:
+            percent = min(99, int(job['copied_pages'] * 100 / total))
+        else:
+            percent = 0
+        return {
+            'job_id': job['job_id'],
+            'mode': job['mode'],
+            'status': job['status'],
+            'copied_pages': job['copied_pages'],
+            'total_pages': total,
+            'progress': percent,
+            'result': job['result'],
+            'error': job['error'],
+            'created_at': job['created_at'].isoformat(),
+            'finished_at': job['finished_at'].isoformat() if job['finished_at'] else None,
+        }
+
+    @staticmethod
+    def _prune_jobs(now: datetime) -> None:
+        """清理已结束且超过保留时间的任务记录（调用方持有锁）"""
+        expired = [job_id for job_id, job in _jobs.items()
+                   if job['finished_at'] and now - job['finished_at'] > JOB_TTL]
+        for job_id in expired:
+            del _jobs[job_id]
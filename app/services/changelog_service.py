@@ -0,0 +1,211 @@
+"""
+变更日志服务 - 把客户、课程、刷单订单、系统配置的每个已提交事务追加到变更日志
+
+两次完整备份之间的变更只存在于数据库文件中。这里在会话事件中捕获变更（文件格式、
+重放与分段管理见根目录 change_log.py）：
+
+- after_flush：按主键读出本次 flush 写入后的整行（SQLite 存储值，重放时无需类型转换），
+  删除只记主键；
+- do_orm_execute：经 ORM 执行的批量 INSERT 按主键读出新行；批量 UPDATE / DELETE（如结算）记录
+  实际执行的 SQL 与参数（驱动层，参数已是存储值），一条语句代替逐行镜像，也不需要额外查询受影响的行。
+  重放从备份中的序号精确开始、数据与执行时一致，因此按原语句重放得到相同结果；
+- 事务第一次产生变更时在同一事务中递增 changelog_position.lsn，随事务提交或回滚；
+- after_commit：整个事务作为一行追加到当前分段；回滚时丢弃。
+
+选择逻辑变更（行镜像与批量语句）而不是复制 SQLite 的 WAL 帧：WAL 帧是页级的，检查点之后就被覆盖，
+要拿到每一帧必须接管检查点；页镜像的大小与改动的字段无关（改一个字段也要写整页），
+而且只能重放到完全相同的数据库文件上。绕过 ORM 的原生 SQL 写入不会被记录。
+"""
+
+from typing import Dict, List
+import re
+import logging
+from sqlalchemy import event, inspect
+from change_log import (CAPTURED_TABLES, OP_UPSERT, OP_DELETE, OP_STATEMENT, DEFAULT_SEGMENT_BYTES,
+                        ChangeLogWriter, changelog_dir, new_timeline)
+from .. import db
+from ..database import is_sqlite, is_sqlite_memory
+from ..models import ChangelogPosition
+
+logger = logging.getLogger(__name__)
+
+# session.info 中本事务待写入的变更与 (序号, 时间线)
+_CHANGES_KEY = 'changelog_changes'
+_POSITION_KEY = 'changelog_position'
+# connection.info 中正在捕获的批量 DML 语句 (表名, [(语句, 参数, 是否 executemany)])
+_STATEMENTS_KEY = 'changelog_statements'
+# 按主键读取行时每批的主键数（低于 SQLite 参数上限）
+_CHUNK_SIZE = 500
+_DML_TARGET = re.compile(r'^\s*(?:UPDATE|DELETE\s+FROM)\s+"?(\w+)"?', re.IGNORECASE)
+
+# {数据库URL: ChangeLogWriter}，只有启用了变更日志的数据库才有
+_writers: Dict[str, ChangeLogWriter] = {}
+
+
+class ChangeLogService:
+    """变更日志服务类"""
+
+    @staticmethod
+    def ensure_initialized() -> None:
+        """创建变更日志位置行并为当前数据库打开日志（CHANGELOG_ENABLED 关闭或非 SQLite 文件库时不记录）"""
+        from flask import current_app
+        uri = current_app.config['SQLALCHEMY_DATABASE_URI']
+        if not current_app.config.get('CHANGELOG_ENABLED', True) or not is_sqlite(uri) or is_sqlite_memory(uri):
+            return
+        if not db.session.get(ChangelogPosition, 1):
+            db.session.add(ChangelogPosition(id=1, lsn=0, timeline=new_timeline()))
+            db.session.commit()
+        if not event.contains(db.engine, 'before_cursor_execute', _capture_statement):
+            event.listen(db.engine, 'before_cursor_execute', _capture_statement)
+        url = str(db.engine.url)
+        if url not in _writers:
+            _writers[url] = ChangeLogWriter(
+                changelog_dir(db.engine.url.database),
+                segment_bytes=current_app.config.get('CHANGELOG_SEGMENT_BYTES', DEFAULT_SEGMENT_BYTES),
+                fsync=current_app.config.get('CHANGELOG_FSYNC', False),
+            )
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return str(db.engine.url) in _writers
+
+    @staticmethod
+    def position() -> Dict:
+        """当前数据库的 {'lsn', 'timeline'}"""
+        row = db.session.get(ChangelogPosition, 1)
+        return {'lsn': row.lsn, 'timeline': row.timeline} if row else {'lsn': None, 'timeline': None}
+
+
+def _enabled(session) -> bool:
+    return str(session.get_bind().url) in _writers
+
+
+def _primary_key(obj):
+    # flush 之后新对象的 identity 尚未登记，主键在属性字典中
+    state = inspect(obj)
+    return state.identity[0] if state.identity else state.dict.get('id')
+
+
+def _read_rows(connection, table: str, ids: List) -> List[Dict]:
+    """按主键读取整行（驱动层查询，得到 SQLite 中的存储值）"""
+    rows = []
+    for start in range(0, len(ids), _CHUNK_SIZE):
+        chunk = tuple(ids[start:start + _CHUNK_SIZE])
+        result = connection.exec_driver_sql(
+            f'SELECT * FROM "{table}" WHERE id IN ({", ".join("?" * len(chunk))})', chunk
+        )
+        names = list(result.keys())
+        rows.extend(dict(zip(names, row)) for row in result)
+    return rows
+
+
+def _record(session, connection, changes: List) -> None:
+    """登记本事务的变更；事务第一次产生变更时分配序号"""
+    if not changes:
+        return
+    if _POSITION_KEY not in session.info:
+        # 每个事务都要执行：驱动层单条 UPDATE ... RETURNING，省去编译与再次查询
+        increment = "UPDATE changelog_position SET lsn = lsn + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1"
+        if connection.dialect.update_returning:
+            row = connection.exec_driver_sql(increment + " RETURNING lsn, timeline").first()
+        else:
+            # SQLite 3.35 之前不支持 RETURNING
+            connection.exec_driver_sql(increment)
+            row = connection.exec_driver_sql("SELECT lsn, timeline FROM changelog_position WHERE id = 1").first()
+        if row is None:
+            # 位置行被清空（如重建表）：从新的时间线重新开始
+            row = (1, new_timeline())
+            connection.execute(ChangelogPosition.__table__.insert().values(id=1, lsn=row[0], timeline=row[1]))
+        session.info[_POSITION_KEY] = (row[0], row[1])
+    session.info.setdefault(_CHANGES_KEY, []).extend(changes)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _capture_flushed_rows(session, flush_context):
+    """flush 后记录写入的行镜像与删除的主键"""
+    if not _enabled(session):
+        return
+    upserts: Dict[str, List] = {}
+    for obj in list(session.new) + list(session.dirty):
+        table = getattr(obj, '__tablename__', None)
+        if table in CAPTURED_TABLES and (obj in session.new or session.is_modified(obj, include_collections=False)):
+            upserts.setdefault(table, []).append(_primary_key(obj))
+    deletes = [[obj.__tablename__, OP_DELETE, {'id': _primary_key(obj)}] for obj in session.deleted
+               if getattr(obj, '__tablename__', None) in CAPTURED_TABLES]
+    if not upserts and not deletes:
+        return
+    connection = session.connection()
+    changes = [[table, OP_UPSERT, row] for table, ids in upserts.items() for row in _read_rows(connection, table, ids)]
+    _record(session, connection, changes + deletes)
+
+
+def _capture_statement(conn, cursor, statement, parameters, context, executemany):
+    """批量 UPDATE / DELETE 执行期间记录发给驱动的语句（ORM 同步会话时可能附带的 SELECT 不记录）"""
+    capture = conn.info.get(_STATEMENTS_KEY)
+    if capture is None:
+        return
+    match = _DML_TARGET.match(statement)
+    if match and match.group(1) == capture[0]:
+        capture[1].append((statement, parameters, executemany))
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _capture_bulk_dml(orm_execute_state):
+    """经 ORM 执行的批量 INSERT 记录新行；批量 UPDATE / DELETE 记录执行的语句"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.local_table.name not in CAPTURED_TABLES:
+        return None
+    session = orm_execute_state.session
+    if not _enabled(session):
+        return None
+    table = mapper.local_table
+    connection = session.connection()
+
+    if orm_execute_state.is_insert:
+        # 新行的自增主键大于执行前的最大值；显式指定的更小主键从参数中取得
+        before = connection.exec_driver_sql(f'SELECT MAX(id) FROM "{table.name}"').scalar() or 0
+        result = orm_execute_state.invoke_statement()
+        params = orm_execute_state.parameters
+        params = params if isinstance(params, list) else [params or {}]
+        ids = sorted({item['id'] for item in params if item.get('id') is not None and item['id'] <= before})
+        rows = _read_rows(connection, table.name, ids)
+        newer = connection.exec_driver_sql(f'SELECT * FROM "{table.name}" WHERE id > ? ORDER BY id', (before,))
+        names = list(newer.keys())
+        rows.extend(dict(zip(names, row)) for row in newer)
+        changes = [[table.name, OP_UPSERT, row] for row in rows]
+    else:
+        capture = (table.name, [])
+        connection.info[_STATEMENTS_KEY] = capture
+        try:
+            result = orm_execute_state.invoke_statement()
+        finally:
+            connection.info.pop(_STATEMENTS_KEY, None)
+        changes = [[table.name, OP_STATEMENT, {'sql': statement, 'params': list(parameters), 'many': executemany}]
+                   for statement, parameters, executemany in capture[1]]
+    _record(session, connection, changes)
+    return result
+
+
+@event.listens_for(db.session, 'after_commit')
+def _append_committed(session):
+    """提交后把整个事务追加到变更日志"""
+    changes = session.info.pop(_CHANGES_KEY, None)
+    position = session.info.pop(_POSITION_KEY, None)
+    if not changes or not position:
+        return
+    writer = _writers.get(str(session.get_bind().url))
+    if writer is None:
+        return
+    try:
+        writer.append(position[0], position[1], changes)
+    except OSError as e:
+        # 数据已提交：日志在此序号处出现缺口，重放会停在缺口之前，应尽快做一次完整备份
+        logger.error(f"写入变更日志失败（序号 {position[0]}）: {str(e)}")
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop(_CHANGES_KEY, None)
+    session.info.pop(_POSITION_KEY, None)
@@ -0,0 +1,143 @@
+"""
+系统配置服务 - 带进程级缓存的配置读取与写入
+
+配置表只有十几行，但成本、手续费率在几乎每个写入接口和统计页面中都要读取，
+原先各处分别执行 Config.query.filter_by(key=...)，同一请求内会重复查询。这里：
+
+- 进程内缓存整张配置表的快照，首次读取时加载；
+- 同一请求内固定使用同一份快照（保存在 flask.g），读取结果前后一致；
+- 经 ORM 修改配置（包括 set_values）并提交后立即失效缓存；
+- 另设 CACHE_TTL 兜底，多进程部署或直接改库时最多延迟该时长生效。
+"""
+
+from typing import Dict, Iterable, Optional
+import logging
+import threading
+import time
+from flask import g, has_app_context
+from sqlalchemy import event
+from .. import db
+from ..models import Config
+from .db_cache import PerDatabase
+
+logger = logging.getLogger(__name__)
+
+# 渠道名称 -> 手续费率配置键（配置值单位为百分比）
+CHANNEL_FEE_KEYS = {
+    '淘宝': 'taobao_fee_rate',
+    '小红书': 'xiaohongshu_fee_rate',
+    '抖音': 'douyin_fee_rate',
+    '转介绍': 'referral_fee_rate',
+}
+
+# 缓存有效期（秒）
+CACHE_TTL = 300
+
+_G_KEY = '_config_snapshot'
+_PENDING_KEY = 'config_changed'
+
+_lock = threading.Lock()
+_caches = PerDatabase(lambda: {'values': None, 'loaded_at': 0.0, 'generation': 0})
+
+
+class ConfigService:
+    """系统配置服务类"""
+
+    @staticmethod
+    def snapshot() -> Dict[str, str]:
+        """返回全部配置 {key: value} 的只读快照（同一请求内不变）"""
+        if has_app_context() and _G_KEY in g:
+            return g.get(_G_KEY)
+
+        cache = _caches.get()
+        with _lock:
+            values = cache['values']
+            expired = time.monotonic() - cache['loaded_at'] > CACHE_TTL
+            generation = cache['generation']
+        if values is None or expired:
+            values = {item.key: item.value for item in Config.query.all()}
+            with _lock:
+                # 加载期间若已失效则不写回，避免旧值覆盖
+                if cache['generation'] == generation:
+                    cache.update(values=values, loaded_at=time.monotonic())
+
+        if has_app_context():
+            setattr(g, _G_KEY, values)
+        return values
+
+    @staticmethod
+    def get(key: str, default: Optional[str] = None) -> Optional[str]:
+        """读取字符串配置值"""
+        return ConfigService.snapshot().get(key, default)
+
+    @staticmethod
+    def get_float(key: str, default: float = 0.0) -> float:
+        """读取数值配置，未配置或格式错误时返回默认值"""
+        value = ConfigService.snapshot().get(key)
+        if value is None or value == '':
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            logger.warning(f"配置 {key} 的值不是数字: {value}")
+            return default
+
+    @staticmethod
+    def fee_rates() -> Dict[str, float]:
+        """各渠道手续费率快照（转换为小数，未配置按0处理）"""
+        return {
+            channel: ConfigService.get_float(key, 0.0) / 100
+            for channel, key in CHANNEL_FEE_KEYS.items()
+        }
+
+    @staticmethod
+    def set_values(values: Dict[str, str]) -> None:
+        """写入（新增或更新）多项配置并提交，提交后缓存自动失效"""
+        existing = {item.key: item for item in Config.query.filter(Config.key.in_(list(values))).all()}
+        for key, value in values.items():
+            item = existing.get(key)
+            if not item:
+                item = Config(key=key)
+                db.session.add(item)
+            item.value = value
+        db.session.commit()
+
+    @staticmethod
+    def invalidate() -> None:
+        """清空进程缓存与当前请求的快照"""
+        cache = _caches.get()
+        with _lock:
+            cache.update(values=None, loaded_at=0.0, generation=cache['generation'] + 1)
+        if has_app_context():
+            g.pop(_G_KEY, None)
+
+
+def _touches_config(objects: Iterable) -> bool:
+    return any(isinstance(obj, Config) for obj in objects)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _mark_config_changed(session, flush_context):
+    """记录本事务修改了配置，提交后再失效缓存"""
+    if _touches_config(list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _mark_bulk_config_changed(orm_execute_state):
+    """批量 UPDATE / DELETE 配置表同样需要失效缓存"""
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is Config:
+            orm_execute_state.session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        ConfigService.invalidate()
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_config_change(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
@@ -9,7 +9,8 @@ from typing import List, Dict, Optional, Tuple
 import logging
 from flask import current_app
 from .. import db
-from ..models import Course, Customer, Config
+from ..models import Course, Customer
+from .config_service import ConfigService
 from sqlalchemy import and_, or_
 
 logger = logging.getLogger(__name__)
@@ -94,8 +95,7 @@ class CourseService:
     @staticmethod
     def _get_taobao_fee_rate() -> float:
         """获取淘宝手续费率"""
-        config = Config.query.filter_by(key='taobao_fee_rate').first()
-        return float(config.value) / 100 if config else 0.006
+        return ConfigService.get_float('taobao_fee_rate', 0.6) / 100
     
     @staticmethod
     def _calculate_total_performance(courses: List[Tuple], fee_rate: float) -> Dict:
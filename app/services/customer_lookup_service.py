@@ -0,0 +1,155 @@
+"""
+客户检索服务 - 按姓名前缀、手机尾号、拼音首字母检索客户（typeahead）
+
+课程页面原先为了填充客户下拉框，每次渲染都把全部客户加载为 ORM 对象。这里改为
+前端按输入异步检索，只返回前 N 条匹配：
+
+- 姓名前缀：ix_customer_name；
+- 手机号前缀 / 尾号：phone 唯一索引 / 倒序手机号 phone_reversed（尾号匹配转为前缀匹配）；
+- 拼音首字母：name_initials（如“张三” -> zs），需要可选依赖 pypinyin，未安装时只按姓名和手机号检索。
+
+所有匹配都写成 [前缀, 前缀 + U+10FFFF) 的范围条件，可以直接使用 B-tree 索引
+（SQLite 的 LIKE 'x%' 默认不区分大小写，不能利用普通索引）。
+检索键在 Customer 写入（before_insert / before_update）时维护，已有数据由 ensure_initialized() 补齐。
+"""
+
+from typing import Dict, List, Optional
+import logging
+import re
+from sqlalchemy import event, or_
+from .. import db
+from ..models import Customer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# 手机号前缀/尾号至少输入的位数
+MIN_PHONE_DIGITS = 3
+
+_RANGE_END = '\U0010ffff'
+_NON_ALNUM = re.compile(r'[^0-9a-z]')
+
+_pinyin = None
+
+
+def _load_pinyin():
+    """延迟导入 pypinyin（可选依赖），未安装时返回 False"""
+    global _pinyin
+    if _pinyin is None:
+        try:
+            from pypinyin import lazy_pinyin, Style
+            _pinyin = lambda text: lazy_pinyin(text, style=Style.FIRST_LETTER)  # noqa: E731
+        except ImportError:
+            logger.info("未安装 pypinyin，客户检索不支持拼音首字母")
+            _pinyin = False
+    return _pinyin
+
+
+def pinyin_available() -> bool:
+    return bool(_load_pinyin())
+
+
+def name_initials(name: Optional[str]) -> Optional[str]:
+    """姓名 -> 拼音首字母（小写，仅保留字母数字）；未安装 pypinyin 时返回 None"""
+    pinyin = _load_pinyin()
+    if not pinyin:
+        return None
+    return _NON_ALNUM.sub('', ''.join(pinyin(name or '')).lower())[:50]
+
+
+def reverse_phone(phone: Optional[str]) -> Optional[str]:
+    return phone.strip()[::-1] if phone else None
+
+
+def _prefix(column, value: str):
+    """前缀匹配的范围条件（可使用索引）"""
+    return (column >= value) & (column < value + _RANGE_END)
+
+
+class CustomerLookupService:
+    """客户检索服务类"""
+
+    @staticmethod
+    def search(query: str, limit: int = DEFAULT_LIMIT) -> List[Dict]:
+        """
+        检索客户
+
+        Args:
+            query: 输入内容：姓名开头、手机号开头或尾号（至少 MIN_PHONE_DIGITS 位）、拼音首字母
+            limit: 返回条数（最大 MAX_LIMIT）
+
+        Returns:
+            客户字典列表，按 姓名匹配 > 拼音首字母匹配 > 手机号匹配 排序
+        """
+        query = (query or '').strip()
+        limit = max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+        if not query:
+            return []
+
+        matchers = [_prefix(Customer.name, query)]
+        if query.isdigit():
+            if len(query) >= MIN_PHONE_DIGITS:
+                matchers.append(or_(_prefix(Customer.phone, query),
+                                    _prefix(Customer.phone_reversed, query[::-1])))
+        elif query.isascii() and query.isalpha() and pinyin_available():
+            matchers.append(_prefix(Customer.name_initials, query.lower()))
+
+        # 每类匹配单独查询（各自走索引并限制条数），按优先级合并去重
+        results, seen = [], set()
+        for condition in matchers:
+            rows = Customer.query.filter(condition).order_by(Customer.name, Customer.id).limit(limit).all()
+            for customer in rows:
+                if customer.id not in seen:
+                    seen.add(customer.id)
+                    results.append(CustomerLookupService.format_customer(customer))
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    @staticmethod
+    def format_customer(customer: Customer) -> Dict:
+        return {
+            'id': customer.id,
+            'name': customer.name,
+            'phone': customer.phone,
+            'gender': customer.gender,
+            'grade': customer.grade,
+            'region': customer.region,
+            'source': customer.source,
+            'has_tutoring_experience': customer.has_tutoring_experience,
+        }
+
+    @staticmethod
+    def ensure_initialized() -> int:
+        """
+        补齐缺失的检索键（迁移前已有的客户、绕过 ORM 写入的客户、之后才安装 pypinyin 的情况）
+
+        Returns:
+            更新的客户数
+        """
+        missing = Customer.phone_reversed.is_(None)
+        if pinyin_available():
+            missing = or_(missing, Customer.name_initials.is_(None))
+        customers = Customer.query.filter(missing).all()
+        for customer in customers:
+            _apply_search_keys(customer)
+        if customers:
+            db.session.commit()
+            logger.info(f"补齐 {len(customers)} 个客户的检索键")
+        return len(customers)
+
+
+def _apply_search_keys(customer: Customer) -> None:
+    customer.phone_reversed = reverse_phone(customer.phone)
+    customer.name_initials = name_initials(customer.name)
+
+
+@event.listens_for(Customer, 'before_insert')
+def _set_keys_before_insert(mapper, connection, target):
+    _apply_search_keys(target)
+
+
+@event.listens_for(Customer, 'before_update')
+def _set_keys_before_update(mapper, connection, target):
+    _apply_search_keys(target)
@@ -0,0 +1,265 @@
+"""
+首页统计快照服务 - 进程内缓存首页统计，客户/订单写入后失效
+
+首页是访问最多的页面，每次加载都要做客户计数（含本月新增 CASE）、订单计数与金额合计、
+最近客户四次查询，而这些数字很少变化。这里：
+
+- 计算结果作为快照缓存在进程内，有效期 DASHBOARD_CACHE_TTL（多进程部署或直接改库时的兜底）；
+- 客户、刷单订单经 ORM 写入（包括批量 UPDATE / DELETE）并提交后立即失效；
+- 本月新增客户数可读取每日汇总表 customer_daily_stat（DASHBOARD_DAILY_ROLLUP），
+  最多 31 行求和，不再按 created_at 扫描客户表。日汇总随 Customer 写入增量维护，
+  与业务写入同一事务提交。
+
+配置项（试听课成本等）由 ConfigService 缓存，不放入快照。
+"""
+
+from typing import Dict, Iterable, List
+import logging
+import threading
+import time
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import event, func, insert, inspect, update
+from .. import db
+from ..models import Customer, CustomerDailyStat, TaobaoOrder
+from .config_service import ConfigService
+from .db_cache import PerDatabase
+
+logger = logging.getLogger(__name__)
+
+RECENT_CUSTOMER_LIMIT = 5
+
+_PENDING_KEY = 'dashboard_changed'
+_OLD_DATES_KEY = 'customer_daily_old_dates'
+
+_lock = threading.Lock()
+_caches = PerDatabase(lambda: {'snapshot': None, 'loaded_at': 0.0, 'generation': 0})
+
+
+def _month_start() -> datetime:
+    return datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class DashboardService:
+    """首页统计快照服务类"""
+
+    @staticmethod
+    def get_snapshot() -> Dict:
+        """
+        首页统计快照
+
+        Returns:
+            {'total_customers', 'new_customers', 'total_orders', 'total_order_amount',
+             'recent_customers', 'computed_at'}
+        """
+        month_start = _month_start()
+        ttl = current_app.config.get('DASHBOARD_CACHE_TTL', 60)
+        cache = _caches.get()
+        with _lock:
+            snapshot = cache['snapshot']
+            expired = time.monotonic() - cache['loaded_at'] > ttl
+            generation = cache['generation']
+        if snapshot is not None and not expired and snapshot['month_start'] == month_start:
+            return snapshot
+
+        snapshot = DashboardService.compute(month_start)
+        with _lock:
+            # 计算期间若已失效则不写回，避免旧值覆盖
+            if cache['generation'] == generation:
+                cache.update(snapshot=snapshot, loaded_at=time.monotonic())
+        return snapshot
+
+    @staticmethod
+    def get_context() -> Dict:
+        """首页模板变量：统计快照 + 成本配置"""
+        snapshot = DashboardService.get_snapshot()
+        return {
+            'total_customers': snapshot['total_customers'],
+            'new_customers': snapshot['new_customers'],
+            'total_orders': snapshot['total_orders'],
+            'total_order_amount': snapshot['total_order_amount'],
+            'recent_customers': snapshot['recent_customers'],
+            'trial_cost': ConfigService.get_float('trial_cost', 0),
+            'course_cost': ConfigService.get_float('course_cost', 0),
+            'taobao_fee_rate': ConfigService.get_float('taobao_fee_rate', 0),
+        }
+
+    @staticmethod
+    def compute(month_start: datetime) -> Dict:
+        """直接查询数据库计算统计"""
+        total_customers = db.session.query(func.count(Customer.id)).scalar() or 0
+        if current_app.config.get('DASHBOARD_DAILY_ROLLUP', True):
+            new_customers = DashboardService.new_customers_since(month_start.date())
+        else:
+            new_customers = db.session.query(func.count(Customer.id)).filter(
+                Customer.created_at >= month_start
+            ).scalar() or 0
+
+        order_stats = db.session.query(
+            func.count(TaobaoOrder.id).label('total_orders'),
+            func.coalesce(func.sum(TaobaoOrder.amount), 0).label('total_order_amount')
+        ).one()
+
+        # 最近客户（ix_customer_created_at）
+        recent_customers = [
+            {'name': row.name, 'phone': row.phone, 'grade': row.grade,
+             'region': row.region, 'created_at': row.created_at}
+            for row in db.session.query(
+                Customer.name, Customer.phone, Customer.grade, Customer.region, Customer.created_at
+            ).order_by(Customer.created_at.desc()).limit(RECENT_CUSTOMER_LIMIT)
+        ]
+
+        return {
+            'month_start': month_start,
+            'total_customers': total_customers,
+            'new_customers': new_customers,
+            'total_orders': order_stats.total_orders or 0,
+            'total_order_amount': order_stats.total_order_amount or 0,
+            'recent_customers': recent_customers,
+            'computed_at': datetime.now(),
+        }
+
+    @staticmethod
+    def new_customers_since(start: date) -> int:
+        """从每日汇总表读取 start 起（含）的新增客户数"""
+        return db.session.query(func.coalesce(func.sum(CustomerDailyStat.new_customers), 0)).filter(
+            CustomerDailyStat.stat_date >= start
+        ).scalar() or 0
+
+    @staticmethod
+    def invalidate() -> None:
+        """清空当前数据库的快照缓存"""
+        cache = _caches.get()
+        with _lock:
+            cache.update(snapshot=None, loaded_at=0.0, generation=cache['generation'] + 1)
+
+    @staticmethod
+    def rebuild_daily_stats() -> int:
+        """
+        按客户表全量重建每日汇总
+
+        Returns:
+            汇总行数
+        """
+        day = func.date(Customer.created_at)
+        rows = db.session.query(day.label('day'), func.count(Customer.id).label('count')).filter(
+            Customer.created_at.isnot(None)
+        ).group_by(day).all()
+        CustomerDailyStat.query.delete()
+        db.session.add_all(
+            CustomerDailyStat(stat_date=date.fromisoformat(row.day), new_customers=row.count)
+            for row in rows
+        )
+        db.session.commit()
+        logger.info(f"重建每日新增客户汇总，共 {len(rows)} 天")
+        return len(rows)
+
+    @staticmethod
+    def ensure_initialized() -> None:
+        """日汇总表为空但已有客户时执行一次全量构建（升级后首次启动）"""
+        try:
+            has_stats = db.session.query(CustomerDailyStat.id).first() is not None
+            if not has_stats and db.session.query(Customer.id).first():
+                DashboardService.rebuild_daily_stats()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"初始化每日新增客户汇总失败: {str(e)}")
+
+    @staticmethod
+    def record_new_customers(created_dates: Iterable[date]) -> None:
+        """批量 INSERT（不经过单对象 flush）新增客户后，在同一事务中累加到日汇总"""
+        deltas: Dict[date, int] = {}
+        for stat_date in created_dates:
+            deltas[stat_date] = deltas.get(stat_date, 0) + 1
+        DashboardService._apply_deltas(db.session.connection(), deltas)
+
+    @staticmethod
+    def _created_dates(connection, customer_ids: Iterable[int]) -> List[date]:
+        """直接从数据库读取指定客户的录入日期"""
+        customer_ids = list(customer_ids)
+        if not customer_ids:
+            return []
+        table = Customer.__table__
+        rows = connection.execute(
+            table.select().with_only_columns(table.c.created_at).where(table.c.id.in_(customer_ids))
+        ).fetchall()
+        return [row.created_at.date() for row in rows if row.created_at is not None]
+
+    @staticmethod
+    def _apply_deltas(connection, deltas: Dict[date, int]) -> None:
+        """把增量写入日汇总表（不存在的日期行自动创建）"""
+        table = CustomerDailyStat.__table__
+        for stat_date, delta in deltas.items():
+            if not delta:
+                continue
+            result = connection.execute(
+                update(table).where(table.c.stat_date == stat_date).values(
+                    new_customers=table.c.new_customers + delta,
+                    updated_at=func.current_timestamp()
+                )
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(table).values(stat_date=stat_date, new_customers=delta))
+
+
+def _touched_models(objects: Iterable) -> set:
+    return {type(obj) for obj in objects} & {Customer, TaobaoOrder}
+
+
+def _changed_customer_ids(session, include_new: bool) -> set:
+    """收集本次 flush 中录入日期可能变化（修改 created_at / 删除 / 可选的新增）的客户ID"""
+    ids = {obj.id for obj in session.dirty
+           if isinstance(obj, Customer) and obj.id is not None
+           and inspect(obj).attrs.created_at.history.has_changes()}
+    others = list(session.deleted) + (list(session.new) if include_new else [])
+    ids.update(obj.id for obj in others if isinstance(obj, Customer) and obj.id is not None)
+    return ids
+
+
+@event.listens_for(db.session, 'before_flush')
+def _capture_old_customer_dates(session, flush_context, instances):
+    """flush 前记录受影响客户在数据库中的旧录入日期"""
+    customer_ids = _changed_customer_ids(session, include_new=False)
+    if customer_ids:
+        old_dates = DashboardService._created_dates(session.connection(), customer_ids)
+        session.info.setdefault(_OLD_DATES_KEY, []).extend(old_dates)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _apply_daily_deltas(session, flush_context):
+    """flush 后按 新日期 +1 / 旧日期 -1 更新日汇总，并记录快照需要失效"""
+    if _touched_models(list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info[_PENDING_KEY] = True
+
+    old_dates = session.info.pop(_OLD_DATES_KEY, [])
+    customer_ids = _changed_customer_ids(session, include_new=True)
+    if not customer_ids and not old_dates:
+        return
+    connection = session.connection()
+    deltas: Dict[date, int] = {}
+    for stat_date in old_dates:
+        deltas[stat_date] = deltas.get(stat_date, 0) - 1
+    for stat_date in DashboardService._created_dates(connection, customer_ids):
+        deltas[stat_date] = deltas.get(stat_date, 0) + 1
+    DashboardService._apply_deltas(connection, deltas)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _mark_bulk_dashboard_changed(orm_execute_state):
+    """批量 INSERT / UPDATE / DELETE 客户或订单同样需要失效快照"""
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in (Customer, TaobaoOrder):
+            orm_execute_state.session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        DashboardService.invalidate()
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_dashboard_change(session, previous_transaction):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_OLD_DATES_KEY, None)
@@ -0,0 +1,74 @@
+"""
+数据版本服务 - 记录业务表的写入版本号
+
+每次 flush 写入客户、课程、刷单订单时递增对应表的版本号；经 ORM 执行的批量
+UPDATE / DELETE（query.update() 等）同样会递增。缓存只需比较版本号即可判断数据是否变化，
+无需扫描表内容。绕过 ORM 的原生 SQL 写入需自行调用 DataVersionService.bump()。
+"""
+
+from typing import Dict, Iterable
+import logging
+from sqlalchemy import event, update, func
+from .. import db
+from ..models import DataVersion
+
+logger = logging.getLogger(__name__)
+
+# 需要跟踪版本的业务表
+TRACKED_TABLES = ('customer', 'course', 'taobao_order')
+
+
+class DataVersionService:
+    """数据版本服务类"""
+
+    @staticmethod
+    def ensure_initialized() -> None:
+        """为每张跟踪表预先创建版本行，之后只需 UPDATE，避免并发插入冲突"""
+        existing = {row.table_name for row in DataVersion.query.all()}
+        missing = [name for name in TRACKED_TABLES if name not in existing]
+        if missing:
+            db.session.add_all(DataVersion(table_name=name, version=0) for name in missing)
+            db.session.commit()
+
+    @staticmethod
+    def get_versions(tables: Iterable[str]) -> Dict[str, int]:
+        """读取指定表的当前版本号"""
+        tables = list(tables)
+        rows = db.session.query(DataVersion.table_name, DataVersion.version).filter(
+            DataVersion.table_name.in_(tables)
+        ).all()
+        versions = {name: 0 for name in tables}
+        versions.update({name: version for name, version in rows})
+        return versions
+
+    @staticmethod
+    def bump(connection, tables: Iterable[str]) -> None:
+        """在当前事务中递增指定表的版本号（随事务一起提交或回滚）"""
+        tables = [name for name in tables if name in TRACKED_TABLES]
+        if not tables:
+            return
+        table = DataVersion.__table__
+        connection.execute(
+            update(table).where(table.c.table_name.in_(tables)).values(
+                version=table.c.version + 1, updated_at=func.current_timestamp()
+            )
+        )
+
+
+@event.listens_for(db.session, 'after_flush')
+def _bump_flushed_tables(session, flush_context):
+    """flush 后递增本次写入涉及的表的版本号"""
+    objects = list(session.new) + list(session.dirty) + list(session.deleted)
+    tables = {getattr(obj, '__tablename__', None) for obj in objects}
+    if tables & set(TRACKED_TABLES):
+        DataVersionService.bump(session.connection(), tables)
+
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _bump_bulk_dml_tables(orm_execute_state):
+    """经 ORM 执行的批量 INSERT / UPDATE / DELETE 同样递增版本号"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table.name in TRACKED_TABLES:
+        DataVersionService.bump(orm_execute_state.session.connection(), [mapper.local_table.name])
@@ -0,0 +1,31 @@
+"""
+按数据库区分的进程内缓存
+
+配置、首页统计等进程级缓存以数据库URL为键：同一进程中可能存在多个应用实例（如测试），
+各自连接不同的数据库，缓存不能混用。
+"""
+
+from typing import Callable, Dict, Optional
+from .. import db
+
+
+def current_db_key() -> str:
+    """当前应用数据库的缓存键"""
+    return str(db.engine.url)
+
+
+class PerDatabase:
+    """数据库URL -> 缓存字典，首次访问某个数据库时由 factory 创建"""
+
+    def __init__(self, factory: Callable[[], Dict]):
+        self._factory = factory
+        self._caches: Dict[str, Dict] = {}
+
+    def get(self, key: Optional[str] = None) -> Dict:
+        """返回 key（默认当前数据库）对应的缓存"""
+        if key is None:
+            key = current_db_key()
+        cache = self._caches.get(key)
+        if cache is None:
+            cache = self._caches.setdefault(key, self._factory())
+        return cache
@@ -0,0 +1,243 @@
+"""
+后台导出任务服务 - 线程池执行导出，轮询进度，结果文件按数据版本缓存
+
+导出请求只登记任务并立即返回任务ID，由线程池在后台生成文件，前端轮询进度后下载，
+请求线程不再被长时间占用。生成的文件保存在 EXPORT_CACHE_DIR 中，文件名取自
+数据集、格式、筛选条件与来源表数据版本号（DataVersionService）的哈希：数据未变化时
+重复导出直接复用已有文件。
+
+任务状态保存在进程内存中，适用于单进程部署；进程重启后任务记录丢失，缓存文件仍可复用。
+"""
+
+from typing import Dict, Optional
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from .export_service import ExportService, EXPORT_DATASETS
+from .data_version_service import DataVersionService
+from .taobao_order_service import TaobaoOrderService
+from .trial_course_service import TrialCourseService
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ('xlsx', 'csv')
+
+# 各数据集支持的筛选参数及条件构造函数（与列表页面的筛选一致）
+FILTER_BUILDERS = {
+    'taobao_orders': (TaobaoOrderService.filter_conditions,
+                      ('name', 'level', 'evaluated', 'settled', 'date_from', 'date_to')),
+    'trial_courses': (TrialCourseService.filter_conditions, ('search', 'source', 'status')),
+    'formal_courses': (None, ()),
+}
+
+# 任务状态
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+# 已结束任务在内存中的保留时间
+JOB_TTL = timedelta(hours=1)
+# 缓存目录中最多保留的导出文件数
+MAX_CACHED_FILES = 20
+
+_jobs: Dict[str, Dict] = {}
+_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('EXPORT_JOB_WORKERS', 2),
+                thread_name_prefix='export-job'
+            )
+        return _executor
+
+
+def _update_job(job_id: str, **fields) -> None:
+    with _lock:
+        job = _jobs.get(job_id)
+        if job:
+            job.update(fields)
+
+
+class ExportJobService:
+    """后台导出任务服务类"""
+
+    @staticmethod
+    def cache_dir() -> str:
+        path = current_app.config.get('EXPORT_CACHE_DIR') or os.path.join(current_app.instance_path, 'export_cache')
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def normalize_filters(dataset: str, filters: Optional[Dict]) -> Dict[str, str]:
+        """只保留数据集支持的非空筛选参数，并校验格式（错误时抛出 ValueError）"""
+        builder, allowed = FILTER_BUILDERS[dataset]
+        normalized = {
+            key: str(value).strip()
+            for key, value in (filters or {}).items()
+            if key in allowed and value is not None and str(value).strip() != ''
+        }
+        if builder and normalized:
+            builder(**normalized)
+        return normalized
+
+    @staticmethod
+    def cache_key(dataset: str, export_format: str, filters: Dict[str, str]) -> str:
+        """数据集 + 格式 + 筛选条件 + 来源表数据版本 的哈希"""
+        versions = DataVersionService.get_versions(EXPORT_DATASETS[dataset]['tables'])
+        payload = json.dumps({
+            'dataset': dataset, 'format': export_format, 'filters': filters, 'versions': versions
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def submit(dataset: str, export_format: str = 'xlsx', filters: Optional[Dict] = None) -> Dict:
+        """
+        提交导出任务
+
+        Args:
+            dataset: EXPORT_DATASETS 中的名称
+            export_format: xlsx / csv
+            filters: 筛选参数（见 FILTER_BUILDERS）
+
+        Returns:
+            任务信息；数据未变化且已有缓存文件时直接返回已完成的任务
+        """
+        if dataset not in EXPORT_DATASETS:
+            raise ValueError(f'不支持的导出数据集: {dataset}')
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f'不支持的导出格式: {export_format}')
+        filters = ExportJobService.normalize_filters(dataset, filters)
+
+        key = ExportJobService.cache_key(dataset, export_format, filters)
+        file_path = os.path.join(ExportJobService.cache_dir(), f"{dataset}_{key[:24]}.{export_format}")
+        now = datetime.now()
+
+        with _lock:
+            ExportJobService._prune_jobs(now)
+            # 相同导出正在进行中时复用该任务
+            for job in _jobs.values():
+                if job['cache_key'] == key and job['status'] in (STATUS_PENDING, STATUS_RUNNING):
+                    return ExportJobService._public(job)
+
+            job_id = uuid.uuid4().hex
+            job = {
+                'job_id': job_id, 'dataset': dataset, 'format': export_format, 'filters': filters,
+                'cache_key': key, 'file_path': file_path, 'status': STATUS_PENDING,
+                'processed': 0, 'total': None, 'cached': False, 'error': None,
+                'created_at': now, 'finished_at': None,
+            }
+            _jobs[job_id] = job
+            if os.path.exists(file_path):
+                job.update(status=STATUS_DONE, cached=True, finished_at=now)
+                os.utime(file_path)
+                return ExportJobService._public(job)
+
+        app = current_app._get_current_object()
+        _get_executor().submit(ExportJobService._run, app, job_id)
+        return ExportJobService.get_job(job_id)
+
+    @staticmethod
+    def get_job(job_id: str) -> Optional[Dict]:
+        """查询任务状态"""
+        with _lock:
+            job = _jobs.get(job_id)
+            return ExportJobService._public(job) if job else None
+
+    @staticmethod
+    def get_file(job_id: str) -> Optional[Dict]:
+        """获取已完成任务的文件信息，文件已被清理时返回 None"""
+        with _lock:
+            job = _jobs.get(job_id)
+            if not job or job['status'] != STATUS_DONE or not os.path.exists(job['file_path']):
+                return None
+            return {'path': job['file_path'], 'dataset': job['dataset'], 'format': job['format']}
+
+    @staticmethod
+    def _run(app, job_id: str) -> None:
+        """在线程池中生成导出文件"""
+        with app.app_context():
+            with _lock:
+                job = dict(_jobs[job_id])
+            part_path = job['file_path'] + f'.{job_id}.part'
+            try:
+                builder, _ = FILTER_BUILDERS[job['dataset']]
+                conditions = builder(**job['filters']) if builder and job['filters'] else None
+                total = ExportService.count_rows(job['dataset'], conditions)
+                _update_job(job_id, status=STATUS_RUNNING, total=total)
+
+                progress = lambda count: _update_job(job_id, processed=count)  # noqa: E731
+                if job['format'] == 'xlsx':
+                    count = ExportService.write_xlsx(job['dataset'], part_path, conditions, progress)
+                else:
+                    count = 0
+                    with open(part_path, 'wb') as output:
+                        for chunk in ExportService.iter_csv(job['dataset'], conditions=conditions):
+                            output.write(chunk)
+                            count += chunk.count(b'\n')
+                            progress(max(count - 1, 0))
+                    count = max(count - 1, 0)
+
+                os.replace(part_path, job['file_path'])
+                _update_job(job_id, status=STATUS_DONE, processed=count, finished_at=datetime.now())
+                logger.info(f"导出任务 {job_id} 完成: {job['dataset']} {count} 行")
+                ExportJobService._prune_files(os.path.dirname(job['file_path']))
+            except Exception as e:
+                logger.error(f"导出任务 {job_id} 失败: {str(e)}")
+                _update_job(job_id, status=STATUS_FAILED, error=str(e), finished_at=datetime.now())
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+
+    @staticmethod
+    def _public(job: Dict) -> Dict:
+        """任务对外展示的字段"""
+        total = job['total']
+        if job['status'] == STATUS_DONE:
+            percent = 100
+        elif total:
+            percent = min(99, int(job['processed'] * 100 / total))
+        else:
+            percent = 0
+        return {
+            'job_id': job['job_id'],
+            'dataset': job['dataset'],
+            'format': job['format'],
+            'status': job['status'],
+            'processed': job['processed'],
+            'total': total,
+            'progress': percent,
+            'cached': job['cached'],
+            'error': job['error'],
+            'created_at': job['created_at'].isoformat(),
+        }
+
+    @staticmethod
+    def _prune_jobs(now: datetime) -> None:
+        """清理已结束且超过保留时间的任务记录（调用方持有锁）"""
+        expired = [job_id for job_id, job in _jobs.items()
+                   if job['finished_at'] and now - job['finished_at'] > JOB_TTL]
+        for job_id in expired:
+            del _jobs[job_id]
+
+    @staticmethod
+    def _prune_files(directory: str) -> None:
+        """只保留最近使用的 MAX_CACHED_FILES 个导出文件"""
+        files = [os.path.join(directory, name) for name in os.listdir(directory)
+                 if name.endswith(EXPORT_FORMATS) and not name.endswith('.part')]
+        files.sort(key=os.path.getmtime, reverse=True)
+        for path in files[MAX_CACHED_FILES:]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,254 @@
+"""
+导出服务 - 流式 Excel/CSV 导出
+
+原导出接口先加载全部 ORM 对象，拼成字典列表，再转为 pandas DataFrame 写入 BytesIO，
+发送前内存中同时存在四份数据。这里统一为一条流水线：
+    - 按列查询并以 yield_per 分批从数据库游标读取，不创建 ORM 对象
+    - Excel 写入 openpyxl 只写模式工作簿（行数据落在临时文件），完成后分块发送
+    - CSV 每累积一批行即发送，首字节无需等待全部数据
+两种格式内存占用都与数据量无关。
+
+openpyxl 在首次生成 Excel 时才导入，应用启动（create_app）不加载该依赖。
+"""
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import csv
+import logging
+import tempfile
+from datetime import datetime
+from io import StringIO
+from flask import Response, stream_with_context
+from sqlalchemy import select, func
+from .. import db
+from ..models import Course, Customer, TaobaoOrder
+
+logger = logging.getLogger(__name__)
+
+# 每批从数据库读取的行数
+FETCH_BATCH_SIZE = 1000
+# 文件分块发送大小
+CHUNK_SIZE = 64 * 1024
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_MIMETYPE = 'text/csv; charset=utf-8'
+
+
+def _fmt_time(value: Optional[datetime]) -> str:
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+def _taobao_order_query():
+    return select(
+        TaobaoOrder.id, TaobaoOrder.name, TaobaoOrder.level, TaobaoOrder.amount,
+        TaobaoOrder.commission, TaobaoOrder.taobao_fee, TaobaoOrder.evaluated,
+        TaobaoOrder.order_time, TaobaoOrder.settled, TaobaoOrder.settled_at, TaobaoOrder.created_at
+    ).order_by(TaobaoOrder.order_time.desc())
+
+
+def _taobao_order_row(index: int, row) -> List:
+    return [
+        index, row.id, row.name or '', row.level or '',
+        row.amount or 0, row.commission or 0, row.taobao_fee or 0,
+        (row.amount or 0) + (row.commission or 0),
+        '是' if row.evaluated else '否',
+        _fmt_time(row.order_time),
+        '已结算' if row.settled else '未结算',
+        _fmt_time(row.settled_at),
+        _fmt_time(row.created_at),
+    ]
+
+
+def _course_query(is_trial: bool):
+    # 外连接客户表，替代原实现中逐条 db.session.get(Customer) 的 N+1 查询
+    return select(
+        Course.id, Course.course_type, Course.sessions, Course.gift_sessions, Course.price,
+        Course.trial_price, Course.cost, Course.other_cost, Course.source, Course.payment_channel,
+        Course.trial_status, Course.refund_amount, Course.refund_fee, Course.refund_channel,
+        Course.created_at, Customer.name.label('customer_name'), Customer.phone.label('customer_phone')
+    ).outerjoin(
+        Customer, Course.customer_id == Customer.id
+    ).where(Course.is_trial == is_trial).order_by(Course.created_at.desc())
+
+
+def _trial_course_row(index: int, row) -> List:
+    return [
+        row.id, row.customer_name or '', row.customer_phone or '', '试听课',
+        row.trial_price or 0, row.source or '', row.trial_status or '',
+        row.cost or 0, row.refund_amount or 0, row.refund_fee or 0,
+        row.refund_channel or '', _fmt_time(row.created_at),
+    ]
+
+
+def _formal_course_row(index: int, row) -> List:
+    price = float(row.price or 0)
+    base_cost = float(row.cost or 0)
+    other_cost = float(row.other_cost or 0)
+    return [
+        row.id, row.customer_name or '', row.customer_phone or '', row.course_type or '',
+        row.sessions or 0, row.gift_sessions or 0, price, base_cost, other_cost,
+        price - base_cost - other_cost, row.payment_channel or '', row.source or '',
+        _fmt_time(row.created_at),
+    ]
+
+
+# 导出数据集定义：表头、查询、行转换与来源表，与原导出接口的列保持一致
+EXPORT_DATASETS: Dict[str, Dict] = {
+    'taobao_orders': {
+        'sheet_name': '刷单数据',
+        'headers': ['序号', '订单ID', '客户姓名', '等级', '刷单金额', '佣金', '淘宝手续费', '本金',
+                    '是否已评价', '订单时间', '结算状态', '结算时间', '创建时间'],
+        'query': _taobao_order_query,
+        'row': _taobao_order_row,
+        'tables': ('taobao_order',),
+    },
+    'trial_courses': {
+        'sheet_name': '试听课数据',
+        'headers': ['课程ID', '客户姓名', '客户电话', '课程类型', '试听售价', '渠道来源', '状态',
+                    '基础成本', '退款金额', '退款手续费', '退款渠道', '创建时间'],
+        'query': lambda: _course_query(True),
+        'row': _trial_course_row,
+        'tables': ('course', 'customer'),
+    },
+    'formal_courses': {
+        'sheet_name': '正课数据',
+        'headers': ['课程ID', '客户姓名', '客户电话', '课程类型', '购买节数', '赠课节数', '课程售价',
+                    '课程成本', '其他成本', '利润', '支付渠道', '来源', '创建时间'],
+        'query': lambda: _course_query(False),
+        'row': _formal_course_row,
+        'tables': ('course', 'customer'),
+    },
+}
+
+
+class ExportService:
+    """流式导出服务类"""
+
+    @staticmethod
+    def build_query(dataset: str, conditions: Optional[List] = None):
+        """构造数据集查询，conditions 为附加的筛选条件"""
+        stmt = EXPORT_DATASETS[dataset]['query']()
+        if conditions:
+            stmt = stmt.where(*conditions)
+        return stmt
+
+    @staticmethod
+    def count_rows(dataset: str, conditions: Optional[List] = None) -> int:
+        """统计数据集行数（用于导出进度）"""
+        stmt = ExportService.build_query(dataset, conditions).order_by(None)
+        return db.session.execute(select(func.count()).select_from(stmt.subquery())).scalar() or 0
+
+    @staticmethod
+    def iter_rows(dataset: str, conditions: Optional[List] = None) -> Iterator[List]:
+        """按批从数据库游标读取数据集并逐行转换为导出值"""
+        to_row: Callable = EXPORT_DATASETS[dataset]['row']
+        stmt = ExportService.build_query(dataset, conditions).execution_options(yield_per=FETCH_BATCH_SIZE)
+        for index, row in enumerate(db.session.execute(stmt), start=1):
+            yield to_row(index, row)
+
+    @staticmethod
+    def write_xlsx(dataset: str, output, conditions: Optional[List] = None,
+                   progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        把数据集写入只写模式工作簿
+
+        Args:
+            dataset: EXPORT_DATASETS 中的名称
+            output: 文件路径或可写二进制文件对象
+            conditions: 附加的筛选条件
+            progress: 进度回调，每写入一批调用一次，参数为已写入行数
+
+        Returns:
+            写入的数据行数
+        """
+        definition = EXPORT_DATASETS[dataset]
+        return ExportService.write_rows_xlsx(output, definition['sheet_name'], definition['headers'],
+                                             ExportService.iter_rows(dataset, conditions), progress)
+
+    @staticmethod
+    def write_rows_xlsx(output, sheet_name: str, headers: List, rows: Iterable[List],
+                        progress: Optional[Callable[[int], None]] = None) -> int:
+        """把任意行迭代器写入只写模式工作簿，返回写入的数据行数"""
+        from openpyxl import Workbook  # 延迟导入，见模块说明
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(headers)
+        count = 0
+        for values in rows:
+            sheet.append(values)
+            count += 1
+            if progress and count % FETCH_BATCH_SIZE == 0:
+                progress(count)
+        workbook.save(output)
+        return count
+
+    @staticmethod
+    def iter_csv(dataset: str, batch_size: int = FETCH_BATCH_SIZE,
+                 conditions: Optional[List] = None) -> Iterator[bytes]:
+        """逐批生成 CSV 字节块（带 BOM，Excel 可直接识别中文）"""
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_DATASETS[dataset]['headers'])
+        yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+        pending = 0
+        for values in ExportService.iter_rows(dataset, conditions):
+            writer.writerow(values)
+            pending += 1
+            if pending >= batch_size:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        if pending:
+            yield buffer.getvalue().encode('utf-8')
+
+    @staticmethod
+    def stream_response(dataset: str, filename_prefix: str, export_format: str = 'xlsx') -> Response:
+        """
+        构造流式下载响应
+
+        Args:
+            dataset: EXPORT_DATASETS 中的名称
+            filename_prefix: 下载文件名前缀（使用英文避免编码问题）
+            export_format: xlsx / csv
+
+        Returns:
+            Flask 流式响应；格式不支持时抛出 ValueError
+        """
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if export_format == 'csv':
+            body = stream_with_context(ExportService.iter_csv(dataset))
+            mimetype = CSV_MIMETYPE
+        elif export_format == 'xlsx':
+            # xlsx 为 zip 格式，需在工作簿完成后才能写出目录；先写入临时文件再分块发送
+            spool = tempfile.TemporaryFile()
+            try:
+                count = ExportService.write_xlsx(dataset, spool)
+            except Exception:
+                spool.close()
+                raise
+            logger.info(f"导出 {dataset} 完成，共 {count} 行")
+            spool.seek(0)
+            body = ExportService._iter_file(spool)
+            mimetype = XLSX_MIMETYPE
+        else:
+            raise ValueError(f'不支持的导出格式: {export_format}')
+
+        response = Response(body, mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename_prefix}_{timestamp}.{export_format}"'
+        return response
+
+    @staticmethod
+    def _iter_file(file_obj) -> Iterator[bytes]:
+        """分块读取临时文件，发送完毕后关闭（临时文件随之删除）"""
+        try:
+            while True:
+                chunk = file_obj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            file_obj.close()
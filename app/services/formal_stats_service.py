@@ -0,0 +1,99 @@
+"""
+正课统计服务 - 单次 SQL 聚合计算收入、手续费、成本与课时
+
+正课管理页面原先先做一次成本/课时聚合，再把全部正课重新加载为 ORM 对象，
+在 Python 中逐条计算 节数×单节售价 与淘宝手续费。这里用一条带 CASE 的聚合查询
+同时得到全部指标，并支持按课程类型、支付渠道分组。
+
+口径与原页面一致：
+- 基础收入 = 购买节数 × 单节售价
+- 手续费 = 基础收入 × 支付渠道费率（目前只有淘宝支付收取手续费）
+- 收入 = 基础收入 - 手续费；利润 = 收入 - 成本
+"""
+
+from typing import Dict, List, Optional
+import logging
+from sqlalchemy import func, case, literal
+from .. import db
+from ..models import Course
+from .config_service import ConfigService
+
+logger = logging.getLogger(__name__)
+
+# 支持的分组维度
+BREAKDOWN_FIELDS = {
+    'course_type': Course.course_type,
+    'payment_channel': Course.payment_channel,
+}
+
+
+class FormalStatsService:
+    """正课统计服务类"""
+
+    @staticmethod
+    def channel_fee_rates() -> Dict[str, float]:
+        """收取手续费的支付渠道 -> 费率（小数）"""
+        return {'淘宝': ConfigService.get_float('taobao_fee_rate', 0.6) / 100}
+
+    @staticmethod
+    def _aggregates(fee_rates: Dict[str, float]) -> List:
+        base_revenue = func.coalesce(Course.sessions, 0) * func.coalesce(Course.price, 0)
+        fee = case(
+            *[(Course.payment_channel == channel, base_revenue * literal(rate))
+              for channel, rate in fee_rates.items()],
+            else_=0
+        ) if fee_rates else literal(0)
+        return [
+            func.count(Course.id).label('total_courses'),
+            func.coalesce(func.sum(base_revenue), 0).label('gross_revenue'),
+            func.coalesce(func.sum(fee), 0).label('total_fees'),
+            func.coalesce(func.sum(Course.cost), 0).label('total_cost'),
+            func.coalesce(func.sum(Course.sessions), 0).label('total_sessions'),
+            func.coalesce(func.sum(Course.gift_sessions), 0).label('total_gift_sessions'),
+        ]
+
+    @staticmethod
+    def _format(row) -> Dict:
+        gross_revenue = float(row.gross_revenue or 0)
+        total_fees = float(row.total_fees or 0)
+        total_revenue = gross_revenue - total_fees
+        total_cost = float(row.total_cost or 0)
+        return {
+            'total_courses': row.total_courses or 0,
+            'gross_revenue': gross_revenue,
+            'total_revenue': total_revenue,
+            'total_fees': total_fees,
+            'total_cost': total_cost,
+            'total_profit': total_revenue - total_cost,
+            'total_sessions': int(row.total_sessions or 0),
+            'total_gift_sessions': int(row.total_gift_sessions or 0),
+        }
+
+    @staticmethod
+    def get_stats(conditions: Optional[List] = None, breakdown: Optional[str] = None,
+                  fee_rates: Optional[Dict[str, float]] = None):
+        """
+        计算正课统计
+
+        Args:
+            conditions: 附加筛选条件
+            breakdown: 分组维度（course_type / payment_channel），为空时返回总计
+            fee_rates: 支付渠道费率，默认读取当前配置
+
+        Returns:
+            breakdown 为空时返回统计字典；否则返回 {分组值: 统计字典}（空值归为 '未设置'）
+        """
+        if breakdown is not None and breakdown not in BREAKDOWN_FIELDS:
+            raise ValueError(f'不支持的分组维度: {breakdown}')
+        if fee_rates is None:
+            fee_rates = FormalStatsService.channel_fee_rates()
+
+        query = db.session.query(*FormalStatsService._aggregates(fee_rates)).filter(
+            Course.is_trial == False, *(conditions or [])
+        )
+        if breakdown is None:
+            return FormalStatsService._format(query.one())
+
+        group = func.coalesce(func.nullif(BREAKDOWN_FIELDS[breakdown], ''), '未设置')
+        rows = query.add_columns(group.label('group_key')).group_by(group).order_by(group).all()
+        return {row.group_key: FormalStatsService._format(row) for row in rows}
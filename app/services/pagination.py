@@ -0,0 +1,78 @@
+"""
+键集分页工具 - 游标编码与 (排序字段, id) 条件构造
+
+游标为上一页最后一行的 [排序值, id] 的 base64 JSON。排序字段允许为空：
+与 SQLite 的排序规则一致，NULL 视为最小值（升序在前、降序在后）。
+"""
+
+from typing import Tuple
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+# 排序值类型
+KIND_DATETIME = 'datetime'
+KIND_NUMBER = 'number'
+KIND_STRING = 'string'
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """把上一页最后一行的 (排序值, id) 编码为游标"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor: str, kind: str) -> Tuple:
+    """解析游标，格式错误时抛出 ValueError"""
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if sort_value is not None:
+            if kind == KIND_DATETIME:
+                sort_value = datetime.fromisoformat(sort_value)
+            elif kind == KIND_NUMBER:
+                sort_value = float(sort_value)
+            else:
+                sort_value = str(sort_value)
+        return sort_value, int(row_id)
+    except Exception:
+        raise ValueError('无效的分页游标')
+
+
+def keyset_condition(sort_column, id_column, sort_value, last_id: int, descending: bool):
+    """
+    构造“位于游标之后”的条件
+
+    Args:
+        sort_column: 排序字段
+        id_column: 主键字段（排序值相同时的次序）
+        sort_value: 上一页最后一行的排序值（可为 None）
+        last_id: 上一页最后一行的主键
+        descending: 是否降序
+    """
+    if descending:
+        if sort_value is None:
+            return and_(sort_column.is_(None), id_column < last_id)
+        return or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < last_id),
+            sort_column.is_(None)
+        )
+    if sort_value is None:
+        return or_(
+            and_(sort_column.is_(None), id_column > last_id),
+            sort_column.isnot(None)
+        )
+    return or_(
+        sort_column > sort_value,
+        and_(sort_column == sort_value, id_column > last_id)
+    )
+
+
+def keyset_order(sort_column, id_column, descending: bool) -> Tuple:
+    """与 keyset_condition 对应的排序子句"""
+    if descending:
+        return sort_column.desc(), id_column.desc()
+    return sort_column.asc(), id_column.asc()
@@ -0,0 +1,436 @@
+"""
+时间分桶汇总服务 - 试听课、正课收入、刷单订单的 日/月 汇总表与增量刷新
+
+原有统计都是全表重算的全时段合计，没有按时间的趋势数据。这里维护三张汇总表
+（TrialRollup / FormalRevenueRollup / TaobaoOrderRollup），每张同时存储 day 与 month 两种粒度：
+
+- 增量刷新按水位线进行：只处理 updated_at 大于上次水位线的行，找出它们所在的日期后
+  按日整体重算（按日重算幂等，水位线前后留有重叠也不会重复累加），再由日汇总重算所在月份；
+- 删除行、修改归属日期的行无法通过水位线发现，由 session 钩子在 flush 时记录其原日期
+  （RollupDirtyDay），下次刷新时一并重算；
+- 首次启用或 full=True 时全量重建。
+
+区间报表只读取汇总表，耗时与明细表行数无关。正课手续费在读取时按当前费率计算，
+修改费率后无需重建。绕过 ORM 的删除（原生 SQL、query.delete()）需执行 refresh_rollups.py --full。
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, case, delete, event, func, inspect, insert, or_, select
+from .. import db
+from ..models import (Course, TaobaoOrder, TrialRollup, FormalRevenueRollup, TaobaoOrderRollup,
+                      RollupWatermark, RollupDirtyDay)
+from .formal_stats_service import FormalStatsService
+
+logger = logging.getLogger(__name__)
+
+GRAIN_DAY = 'day'
+GRAIN_MONTH = 'month'
+GRAINS = (GRAIN_DAY, GRAIN_MONTH)
+
+# 水位线回看时长：容忍提交顺序与 updated_at 时间戳不一致的情况（按日重算幂等）
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+_DIRTY_KEY = 'rollup_dirty_days'
+_refresh_lock = threading.Lock()
+
+# 来源表 -> 归属时间表达式、触发重算的字段
+SOURCES = {
+    'course': {
+        'model': Course,
+        'time': Course.created_at,
+        'time_fields': ('created_at',),
+        'range': lambda start, end: and_(Course.created_at >= start, Course.created_at < end),
+    },
+    'taobao_order': {
+        'model': TaobaoOrder,
+        'time': func.coalesce(TaobaoOrder.order_time, TaobaoOrder.created_at),
+        'time_fields': ('order_time', 'created_at'),
+        # 拆成两个可走索引的范围条件
+        'range': lambda start, end: or_(
+            and_(TaobaoOrder.order_time >= start, TaobaoOrder.order_time < end),
+            and_(TaobaoOrder.order_time.is_(None), TaobaoOrder.created_at >= start,
+                 TaobaoOrder.created_at < end)
+        ),
+    },
+}
+
+# 报表名称 -> 汇总表定义
+ROLLUPS = {
+    'trials': {
+        'model': TrialRollup,
+        'source': 'course',
+        'condition': Course.is_trial == True,
+        'keys': {'source': func.coalesce(Course.source, '')},
+        'measures': {
+            'registrations': func.count(Course.id),
+            'conversions': func.sum(case((Course.trial_status == 'converted', 1), else_=0)),
+            'refunds': func.sum(case((Course.trial_status == 'refunded', 1), else_=0)),
+            'trial_revenue': func.coalesce(func.sum(Course.trial_price), 0),
+            'refund_amount': func.coalesce(func.sum(Course.refund_amount), 0),
+        },
+    },
+    'formal_revenue': {
+        'model': FormalRevenueRollup,
+        'source': 'course',
+        'condition': Course.is_trial == False,
+        'keys': {
+            'payment_channel': func.coalesce(Course.payment_channel, ''),
+            'course_type': func.coalesce(Course.course_type, ''),
+        },
+        'measures': {
+            'courses': func.count(Course.id),
+            'sessions': func.coalesce(func.sum(Course.sessions), 0),
+            'gift_sessions': func.coalesce(func.sum(Course.gift_sessions), 0),
+            'gross_revenue': func.coalesce(
+                func.sum(func.coalesce(Course.sessions, 0) * func.coalesce(Course.price, 0)), 0),
+            'cost': func.coalesce(func.sum(Course.cost), 0),
+        },
+    },
+    'taobao_orders': {
+        'model': TaobaoOrderRollup,
+        'source': 'taobao_order',
+        'condition': None,
+        'keys': {'settled': func.coalesce(TaobaoOrder.settled, False)},
+        'measures': {
+            'orders': func.count(TaobaoOrder.id),
+            'amount': func.coalesce(func.sum(TaobaoOrder.amount), 0),
+            'commission': func.coalesce(func.sum(TaobaoOrder.commission), 0),
+            'taobao_fee': func.coalesce(func.sum(TaobaoOrder.taobao_fee), 0),
+        },
+    },
+}
+
+
+def _to_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _contiguous_ranges(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """日期集合 -> 连续区间 [(起始日, 结束日)]，按区间查询以利用索引"""
+    ranges = []
+    for day in sorted(set(days)):
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def _rollups_for_source(source: str) -> List[str]:
+    return [name for name, spec in ROLLUPS.items() if spec['source'] == source]
+
+
+class RollupService:
+    """时间分桶汇总服务类"""
+
+    @staticmethod
+    def refresh(full: bool = False) -> Dict[str, int]:
+        """
+        刷新汇总表
+
+        Args:
+            full: 是否全量重建（否则只按水位线与待重算日期增量刷新）
+
+        Returns:
+            {来源表: 重算的天数}，全量重建时为 -1
+        """
+        with _refresh_lock:
+            result = {}
+            for source in SOURCES:
+                watermark = RollupService._get_watermark(source)
+                if full or watermark is None:
+                    RollupService._rebuild_source(source)
+                    result[source] = -1
+                else:
+                    result[source] = RollupService._refresh_source(source, watermark)
+            db.session.commit()
+            return result
+
+    @staticmethod
+    def ensure_initialized() -> None:
+        """尚未建立水位线时执行一次全量构建（升级后首次启动）"""
+        try:
+            if not RollupWatermark.query.first():
+                RollupService.refresh(full=True)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"初始化时间分桶汇总失败: {str(e)}")
+
+    @staticmethod
+    def report(kind: str, grain: str = GRAIN_MONTH, start: Optional[date] = None,
+               end: Optional[date] = None, breakdown: Optional[str] = None) -> List[Dict]:
+        """
+        按周期读取汇总
+
+        Args:
+            kind: trials / formal_revenue / taobao_orders
+            grain: day / month
+            start / end: 周期起始日期范围（含），为空表示不限
+            breakdown: 分组字段（见 ROLLUPS[kind]['keys']），为空时每个周期一行合计
+
+        Returns:
+            按周期升序的行列表，每行含 period、分组字段与各项合计；
+            formal_revenue 另含按当前费率计算的 fees / revenue / profit
+        """
+        if kind not in ROLLUPS:
+            raise ValueError(f'不支持的报表: {kind}')
+        if grain not in GRAINS:
+            raise ValueError(f'不支持的粒度: {grain}')
+        spec = ROLLUPS[kind]
+        if breakdown is not None and breakdown not in spec['keys']:
+            raise ValueError(f'不支持的分组字段: {breakdown}')
+        model = spec['model']
+
+        query = model.query.filter(model.grain == grain)
+        if start:
+            query = query.filter(model.period_start >= (_month_start(start) if grain == GRAIN_MONTH else start))
+        if end:
+            query = query.filter(model.period_start <= end)
+        fee_rates = FormalStatsService.channel_fee_rates() if kind == 'formal_revenue' else {}
+
+        rows: Dict[Tuple, Dict] = {}
+        for item in query.order_by(model.period_start).all():
+            group = getattr(item, breakdown) if breakdown else None
+            key = (item.period_start, group)
+            row = rows.get(key)
+            if row is None:
+                period = item.period_start.strftime('%Y-%m' if grain == GRAIN_MONTH else '%Y-%m-%d')
+                row = rows[key] = {'period': period}
+                if breakdown:
+                    row[breakdown] = group
+                row.update({measure: 0 for measure in spec['measures']})
+                if kind == 'formal_revenue':
+                    row['fees'] = 0.0
+            for measure in spec['measures']:
+                row[measure] += getattr(item, measure) or 0
+            if kind == 'formal_revenue':
+                row['fees'] += (item.gross_revenue or 0) * fee_rates.get(item.payment_channel, 0)
+
+        result = list(rows.values())
+        if kind == 'formal_revenue':
+            for row in result:
+                row['revenue'] = row['gross_revenue'] - row['fees']
+                row['profit'] = row['revenue'] - row['cost']
+        return result
+
+    @staticmethod
+    def _get_watermark(source: str) -> Optional[datetime]:
+        item = RollupWatermark.query.filter_by(table_name=source).first()
+        return item.watermark if item else None
+
+    @staticmethod
+    def _set_watermark(source: str, value: Optional[datetime]) -> None:
+        item = RollupWatermark.query.filter_by(table_name=source).first()
+        if item is None:
+            item = RollupWatermark(table_name=source)
+            db.session.add(item)
+        # 空表也写入水位线，表示已完成初始构建
+        item.watermark = value or datetime(1970, 1, 1)
+
+    @staticmethod
+    def _max_updated_at(source: str) -> Optional[datetime]:
+        model = SOURCES[source]['model']
+        return db.session.query(func.max(model.updated_at)).scalar()
+
+    @staticmethod
+    def _refresh_source(source: str, watermark: datetime) -> int:
+        """按水位线与待重算日期增量刷新一张来源表对应的汇总"""
+        config = SOURCES[source]
+        model = config['model']
+        new_watermark = RollupService._max_updated_at(source) or watermark
+
+        days: Set[date] = set()
+        if new_watermark > watermark:
+            day = func.date(config['time'])
+            rows = db.session.query(day).filter(
+                model.updated_at > watermark - WATERMARK_OVERLAP,
+                model.updated_at <= new_watermark
+            ).distinct().all()
+            days.update(_to_date(row[0]) for row in rows if row[0] is not None)
+
+        dirty = RollupDirtyDay.query.filter_by(table_name=source).all()
+        days.update(item.day for item in dirty)
+        for item in dirty:
+            db.session.delete(item)
+
+        if days:
+            RollupService._recompute_days(source, days)
+        RollupService._set_watermark(source, max(new_watermark, watermark))
+        return len(days)
+
+    @staticmethod
+    def _rebuild_source(source: str) -> None:
+        """全量重建一张来源表对应的汇总"""
+        new_watermark = RollupService._max_updated_at(source)
+        for name in _rollups_for_source(source):
+            model = ROLLUPS[name]['model']
+            db.session.execute(delete(model))
+            RollupService._insert_day_rows(name, None)
+        months = {
+            _month_start(item[0])
+            for name in _rollups_for_source(source)
+            for item in db.session.query(ROLLUPS[name]['model'].period_start).filter(
+                ROLLUPS[name]['model'].grain == GRAIN_DAY).distinct()
+        }
+        RollupService._recompute_months(source, months)
+        db.session.execute(delete(RollupDirtyDay).where(RollupDirtyDay.table_name == source))
+        RollupService._set_watermark(source, new_watermark)
+        logger.info(f"全量重建 {source} 时间分桶汇总")
+
+    @staticmethod
+    def _recompute_days(source: str, days: Set[date]) -> None:
+        """重算指定日期的日汇总，以及这些日期所在月份的月汇总"""
+        for first, last in _contiguous_ranges(days):
+            for name in _rollups_for_source(source):
+                model = ROLLUPS[name]['model']
+                db.session.execute(delete(model).where(
+                    model.grain == GRAIN_DAY, model.period_start >= first, model.period_start <= last
+                ))
+                RollupService._insert_day_rows(name, (first, last))
+        RollupService._recompute_months(source, {_month_start(day) for day in days})
+
+    @staticmethod
+    def _insert_day_rows(name: str, day_range: Optional[Tuple[date, date]]) -> None:
+        """从明细表按日聚合并写入日汇总（day_range 为空表示全部日期）"""
+        spec = ROLLUPS[name]
+        config = SOURCES[spec['source']]
+        day = func.date(config['time'])
+        keys = list(spec['keys'].items())
+        measures = list(spec['measures'].items())
+
+        query = db.session.query(
+            day.label('period_start'),
+            *[expr.label(key) for key, expr in keys],
+            *[expr.label(measure) for measure, expr in measures]
+        ).filter(config['time'].isnot(None))
+        if spec['condition'] is not None:
+            query = query.filter(spec['condition'])
+        if day_range:
+            first, last = day_range
+            query = query.filter(config['range'](
+                datetime.combine(first, datetime.min.time()),
+                datetime.combine(last + timedelta(days=1), datetime.min.time())
+            ))
+        query = query.group_by(day, *[expr for _, expr in keys])
+
+        values = []
+        for row in query.all():
+            item = {'grain': GRAIN_DAY, 'period_start': _to_date(row.period_start)}
+            item.update({key: getattr(row, key) for key, _ in keys})
+            item.update({measure: getattr(row, measure) or 0 for measure, _ in measures})
+            values.append(item)
+        if values:
+            db.session.execute(insert(spec['model']), values)
+
+    @staticmethod
+    def _recompute_months(source: str, months: Set[date]) -> None:
+        """由日汇总重算指定月份的月汇总"""
+        for month in months:
+            for name in _rollups_for_source(source):
+                spec = ROLLUPS[name]
+                model = spec['model']
+                db.session.execute(delete(model).where(
+                    model.grain == GRAIN_MONTH, model.period_start == month
+                ))
+                key_columns = [getattr(model, key) for key in spec['keys']]
+                rows = db.session.query(
+                    *key_columns,
+                    *[func.sum(getattr(model, measure)).label(measure) for measure in spec['measures']]
+                ).filter(
+                    model.grain == GRAIN_DAY, model.period_start >= month,
+                    model.period_start < _next_month(month)
+                ).group_by(*key_columns).all()
+                values = []
+                for row in rows:
+                    item = {'grain': GRAIN_MONTH, 'period_start': month}
+                    item.update({key: getattr(row, key) for key in spec['keys']})
+                    item.update({measure: getattr(row, measure) or 0 for measure in spec['measures']})
+                    values.append(item)
+                if values:
+                    db.session.execute(insert(model), values)
+
+
+def _source_of(obj) -> Optional[str]:
+    for source, config in SOURCES.items():
+        if isinstance(obj, config['model']):
+            return source
+    return None
+
+
+def _bucket_day(source: str, values: Dict) -> Optional[date]:
+    if source == 'taobao_order':
+        return _to_date(values.get('order_time') or values.get('created_at'))
+    return _to_date(values.get('created_at'))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _capture_dirty_days(session, flush_context, instances):
+    """记录删除行与修改了归属时间的行的原日期（水位线只能发现行的新日期）"""
+    days = session.info.setdefault(_DIRTY_KEY, set())
+    for obj in session.deleted:
+        source = _source_of(obj)
+        if source and obj.id is not None:
+            fields = SOURCES[source]['time_fields']
+            day = _bucket_day(source, {field: getattr(obj, field) for field in fields})
+            if day:
+                days.add((source, day))
+    for obj in session.dirty:
+        source = _source_of(obj)
+        if not source or obj.id is None:
+            continue
+        state = inspect(obj)
+        fields = SOURCES[source]['time_fields']
+        histories = {field: state.attrs[field].history for field in fields}
+        if not any(history.has_changes() for history in histories.values()):
+            continue
+        old_values = {
+            field: (history.deleted[0] if history.deleted else getattr(obj, field))
+            for field, history in histories.items()
+        }
+        day = _bucket_day(source, old_values)
+        if day:
+            days.add((source, day))
+    if not days:
+        session.info.pop(_DIRTY_KEY, None)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_dirty_days(session, flush_context):
+    """与业务写入同一事务中写入待重算日期"""
+    days = session.info.pop(_DIRTY_KEY, None)
+    if not days:
+        return
+    connection = session.connection()
+    table = RollupDirtyDay.__table__
+    existing = {
+        (row.table_name, row.day) for row in connection.execute(
+            select(table.c.table_name, table.c.day).where(
+                table.c.day.in_({day for _, day in days})
+            )
+        )
+    }
+    missing = [{'table_name': source, 'day': day} for source, day in days if (source, day) not in existing]
+    if missing:
+        connection.execute(insert(table), missing)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_dirty_days(session, previous_transaction):
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,341 @@
+"""
+全文检索服务 - SQLite FTS5 索引客户与刷单订单，中文按二元组（bigram）切分
+
+原先的搜索只在浏览器中过滤已渲染的行，或在 SQL 中做 LIKE '%关键字%' 全表扫描。这里维护一张
+FTS5 虚拟表 search_index：
+
+- 索引内容：Customer.name / phone / region / grade，TaobaoOrder.name；
+- 分词在 Python 中完成（sqlite3 模块无法注册自定义 FTS5 分词器）：中文连续片段切为二元组，
+  并补上片段末字，单字查询用前缀匹配即可命中任意位置；字母数字按整词索引，
+  手机号额外索引后四位；结果以空格分隔写入，由 unicode61 分词器按空格切分；
+- 查询同样切分：多字中文为二元组短语（要求相邻），单字与字母数字为前缀匹配，各部分之间为 AND；
+- rowid = 实体ID × 实体数 + 实体编号，增删改按 rowid 定位；
+- 经 ORM 的写入在 after_flush 中同步索引（与业务写入同一事务）；绕过 ORM 的写入可用
+  rebuild_search_index.py 重建。已删除记录残留的索引行在查询时过滤。
+
+数据库不支持 FTS5（或非 SQLite）时退化为 LIKE 查询。
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import re
+import time
+from sqlalchemy import event, inspect, or_, text
+from .. import db
+from ..models import Course, Customer, TaobaoOrder
+from .db_cache import current_db_key
+
+logger = logging.getLogger(__name__)
+
+# 实体名称 -> (rowid 编号, 模型, 索引字段)
+ENTITIES = {
+    'customer': (0, Customer, ('name', 'phone', 'region', 'grade')),
+    'taobao_order': (1, TaobaoOrder, ('name',)),
+}
+_ENTITY_COUNT = len(ENTITIES)
+_ENTITY_BY_CODE = {code: name for name, (code, _, _) in ENTITIES.items()}
+_ENTITY_BY_MODEL = {model: name for name, (_, model, _) in ENTITIES.items()}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# 重建索引时的批量大小
+REBUILD_BATCH = 5000
+# 手机号等长数字额外索引的尾号位数
+PHONE_SUFFIX_DIGITS = 4
+
+_CJK_OR_ALNUM = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+')
+_CJK = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+
+_CREATE_INDEX_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index "
+    "USING fts5(content, tokenize = 'unicode61 remove_diacritics 0')"
+)
+
+# 已启用 FTS 索引的数据库（键为 current_db_key()）
+_enabled_urls = set()
+
+
+def _segments(value: Optional[str]) -> List[str]:
+    """文本 -> 中文片段 / 字母数字片段（小写）"""
+    return _CJK_OR_ALNUM.findall(str(value).lower()) if value else []
+
+
+def _is_cjk(segment: str) -> bool:
+    return bool(_CJK.match(segment))
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """
+    建索引用的切分
+
+    中文片段：二元组 + 片段末字（张三丰 -> 张三 三丰 丰）；
+    字母数字：整词，7 位以上的数字再加上后四位（手机尾号）。
+    """
+    tokens = []
+    for segment in _segments(value):
+        if _is_cjk(segment):
+            tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+            tokens.append(segment[-1])
+        else:
+            tokens.append(segment)
+            if segment.isdigit() and len(segment) >= 7:
+                tokens.append(segment[-PHONE_SUFFIX_DIGITS:])
+    return tokens
+
+
+def build_match(query: Optional[str]) -> Optional[str]:
+    """
+    用户输入 -> FTS5 MATCH 表达式
+
+    多字中文为二元组短语，单字与字母数字为前缀匹配，各部分之间为 AND；
+    无可检索内容时返回 None。分词结果只含中文与 [0-9a-z]，无需转义。
+    """
+    parts = []
+    for segment in _segments(query):
+        if _is_cjk(segment) and len(segment) > 1:
+            bigrams = ' '.join(segment[i:i + 2] for i in range(len(segment) - 1))
+            parts.append(f'"{bigrams}"')
+        else:
+            parts.append(f'"{segment}"*')
+    return ' '.join(parts) or None
+
+
+def _document(obj, fields: Iterable[str]) -> str:
+    return ' '.join(token for field in fields for token in tokenize(getattr(obj, field)))
+
+
+def _rowid(entity: str, entity_id: int) -> int:
+    return entity_id * _ENTITY_COUNT + ENTITIES[entity][0]
+
+
+def _split_rowid(rowid: int) -> Tuple[str, int]:
+    return _ENTITY_BY_CODE[rowid % _ENTITY_COUNT], rowid // _ENTITY_COUNT
+
+
+class SearchService:
+    """全文检索服务类"""
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return current_db_key() in _enabled_urls
+
+    @staticmethod
+    def ensure_initialized() -> None:
+        """创建 FTS5 索引表；索引为空但已有数据时全量构建（升级后首次启动）"""
+        if db.engine.dialect.name != 'sqlite':
+            logger.info("非 SQLite 数据库，全文检索使用 LIKE 查询")
+            return
+        try:
+            db.session.execute(text(_CREATE_INDEX_SQL))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"当前 SQLite 不支持 FTS5，全文检索使用 LIKE 查询: {str(e)}")
+            return
+        _enabled_urls.add(current_db_key())
+
+        try:
+            indexed = db.session.execute(text("SELECT rowid FROM search_index LIMIT 1")).first()
+            has_data = any(db.session.query(model.id).first() for _, model, _ in ENTITIES.values())
+            if not indexed and has_data:
+                SearchService.rebuild()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"初始化全文检索索引失败: {str(e)}")
+
+    @staticmethod
+    def rebuild() -> int:
+        """
+        按当前数据全量重建索引
+
+        Returns:
+            索引的记录数
+        """
+        if not SearchService.is_enabled():
+            raise RuntimeError('全文检索索引未启用')
+        connection = db.session.connection()
+        connection.execute(text("DELETE FROM search_index"))
+        total = 0
+        insert_sql = text("INSERT INTO search_index (rowid, content) VALUES (:rowid, :content)")
+        for entity, (_, model, fields) in ENTITIES.items():
+            columns = [model.id] + [getattr(model, field) for field in fields]
+            batch = []
+            for row in db.session.query(*columns).order_by(model.id).yield_per(REBUILD_BATCH):
+                batch.append({'rowid': _rowid(entity, row.id), 'content': _document(row, fields)})
+                if len(batch) >= REBUILD_BATCH:
+                    connection.execute(insert_sql, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                connection.execute(insert_sql, batch)
+                total += len(batch)
+        connection.execute(text("INSERT INTO search_index (search_index) VALUES ('optimize')"))
+        db.session.commit()
+        logger.info(f"全文检索索引重建完成，共 {total} 条")
+        return total
+
+    @staticmethod
+    def index_rows(entity: str, rows: Iterable[Dict]) -> int:
+        """
+        为绕过 ORM 单对象 flush 的批量写入（如批量导入）写入索引行，与写入同一事务
+
+        Args:
+            entity: 实体名称
+            rows: 含 id 与索引字段的字典
+
+        Returns:
+            写入的索引行数
+        """
+        if not SearchService.is_enabled():
+            return 0
+        fields = ENTITIES[entity][2]
+        params = [{'rowid': _rowid(entity, row['id']),
+                   'content': ' '.join(token for field in fields for token in tokenize(row.get(field)))}
+                  for row in rows]
+        if params:
+            db.session.connection().execute(
+                text("INSERT OR REPLACE INTO search_index (rowid, content) VALUES (:rowid, :content)"), params
+            )
+        return len(params)
+
+    @staticmethod
+    def search(query: str, entity: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Dict:
+        """
+        跨实体检索
+
+        Args:
+            query: 检索内容（姓名、手机号或尾号、地区、年级）
+            entity: 只检索指定实体（customer / taobao_order），为空表示全部
+            limit: 返回条数（最大 MAX_LIMIT）
+
+        Returns:
+            {'query', 'hits': [...], 'took_ms', 'engine': 'fts5' / 'like'}，hits 按相关度排序
+        """
+        if entity is not None and entity not in ENTITIES:
+            raise ValueError(f'不支持的检索类型: {entity}')
+        limit = max(1, min(limit or DEFAULT_LIMIT, MAX_LIMIT))
+        started = time.perf_counter()
+
+        if SearchService.is_enabled():
+            engine = 'fts5'
+            ranked = SearchService._fts_search(query, entity, limit)
+        else:
+            engine = 'like'
+            ranked = SearchService._like_search(query, entity, limit)
+        hits = SearchService._hydrate(ranked)[:limit]
+
+        return {
+            'query': query,
+            'hits': hits,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
+            'engine': engine,
+        }
+
+    @staticmethod
+    def _fts_search(query: str, entity: Optional[str], limit: int) -> List[Tuple[str, int, float]]:
+        match = build_match(query)
+        if not match:
+            return []
+        sql = "SELECT rowid, bm25(search_index) AS score FROM search_index WHERE search_index MATCH :match"
+        params = {'match': match, 'limit': limit * 2}
+        if entity is not None:
+            sql += " AND rowid % :count = :code"
+            params.update(count=_ENTITY_COUNT, code=ENTITIES[entity][0])
+        # 多取一些，容忍已删除记录残留的索引行
+        sql += " ORDER BY score LIMIT :limit"
+        rows = db.session.execute(text(sql), params).fetchall()
+        return [(*_split_rowid(row.rowid), row.score) for row in rows]
+
+    @staticmethod
+    def _like_search(query: str, entity: Optional[str], limit: int) -> List[Tuple[str, int, float]]:
+        query = (query or '').strip()
+        if not query:
+            return []
+        pattern = f"%{query}%"
+        ranked = []
+        for name, (_, model, fields) in ENTITIES.items():
+            if entity is not None and name != entity:
+                continue
+            condition = or_(*[getattr(model, field).like(pattern) for field in fields])
+            ids = db.session.query(model.id).filter(condition).order_by(model.id.desc()).limit(limit).all()
+            ranked.extend((name, row.id, 0.0) for row in ids)
+        return ranked
+
+    @staticmethod
+    def _hydrate(ranked: List[Tuple[str, int, float]]) -> List[Dict]:
+        """按实体批量加载记录并保持相关度顺序，跳过已删除的记录"""
+        ids_by_entity: Dict[str, List[int]] = {}
+        for name, entity_id, _ in ranked:
+            ids_by_entity.setdefault(name, []).append(entity_id)
+
+        records = {}
+        for name, ids in ids_by_entity.items():
+            model = ENTITIES[name][1]
+            for obj in model.query.filter(model.id.in_(ids)).all():
+                records[(name, obj.id)] = obj
+
+        trial_ids = {}
+        customer_ids = ids_by_entity.get('customer')
+        if customer_ids:
+            rows = db.session.query(Course.customer_id, Course.id).filter(
+                Course.is_trial == True, Course.customer_id.in_(customer_ids)
+            ).all()
+            trial_ids = {customer_id: course_id for customer_id, course_id in rows}
+
+        hits = []
+        for name, entity_id, score in ranked:
+            obj = records.get((name, entity_id))
+            if obj is None:
+                continue
+            if name == 'customer':
+                hit = {
+                    'type': name, 'id': obj.id, 'title': obj.name, 'subtitle': obj.phone,
+                    'data': {'phone': obj.phone, 'region': obj.region, 'grade': obj.grade,
+                             'trial_course_id': trial_ids.get(obj.id)},
+                }
+            else:
+                hit = {
+                    'type': name, 'id': obj.id, 'title': obj.name,
+                    'subtitle': obj.order_time.strftime('%Y-%m-%d %H:%M') if obj.order_time else '',
+                    'data': {'amount': obj.amount, 'level': obj.level, 'settled': bool(obj.settled)},
+                }
+            hit['score'] = round(-score, 4)
+            hits.append(hit)
+        return hits
+
+
+def _index_changes(session) -> Tuple[Dict[int, str], List[int]]:
+    """收集本次 flush 需要写入 / 删除的索引行"""
+    upserts, deletes = {}, []
+    for obj in list(session.new) + list(session.dirty):
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity is None or obj.id is None:
+            continue
+        fields = ENTITIES[entity][2]
+        if obj not in session.new:
+            state = inspect(obj)
+            if not any(state.attrs[field].history.has_changes() for field in fields):
+                continue
+        upserts[_rowid(entity, obj.id)] = _document(obj, fields)
+    for obj in session.deleted:
+        entity = _ENTITY_BY_MODEL.get(type(obj))
+        if entity is not None and obj.id is not None:
+            deletes.append(_rowid(entity, obj.id))
+    return upserts, deletes
+
+
+@event.listens_for(db.session, 'after_flush')
+def _sync_search_index(session, flush_context):
+    """与业务写入同一事务中同步索引"""
+    if str(session.get_bind().url) not in _enabled_urls:
+        return
+    upserts, deletes = _index_changes(session)
+    if not upserts and not deletes:
+        return
+    connection = session.connection()
+    stale = deletes + list(upserts)
+    connection.execute(text("DELETE FROM search_index WHERE rowid = :rowid"),
+                       [{'rowid': rowid} for rowid in stale])
+    if upserts:
+        connection.execute(text("INSERT INTO search_index (rowid, content) VALUES (:rowid, :content)"),
+                           [{'rowid': rowid, 'content': content} for rowid, content in upserts.items()])
@@ -0,0 +1,235 @@
+"""
+学员批量导入服务 - 批量新建客户与试听课，一次提交
+
+逐个录入学员时，每人都要单独查询手机号、flush 并提交一次。这里一次处理一批学员：
+
+- 批次内手机号先去重，已有客户用一条 phone IN (...) 查询（phone 唯一索引）一次解析；
+- “每个客户只能有一条试听课”按集合判断：一条 customer_id IN (...) 查询已有试听课的客户；
+- 新客户、试听课各用一条多行 INSERT 写入（insertmanyvalues），批量 INSERT 不触发单对象 flush 事件，
+  客户检索键、全文检索、每日新增客户、试听课汇总在同一事务中显式维护；
+- 调用方提交一次；有错误的行单独报告，不影响其它行。dry_run 只校验不写入。
+"""
+
+from typing import Dict, List, Optional, Set
+import logging
+from datetime import datetime
+from sqlalchemy import insert
+from .. import db
+from ..models import Course, Customer
+from .config_service import ConfigService
+from .customer_lookup_service import name_initials, reverse_phone
+from .dashboard_service import DashboardService
+from .search_service import SearchService
+from .trial_stats_service import TrialStatsService
+
+logger = logging.getLogger(__name__)
+
+# 单次导入的最大学员数
+MAX_IMPORT_STUDENTS = 2000
+# IN 查询每批的参数个数（低于 SQLite 默认的变量上限）
+LOOKUP_CHUNK = 900
+
+CUSTOMER_FIELDS = ('name', 'phone', 'gender', 'grade', 'region', 'source', 'has_tutoring_experience')
+_MAX_LENGTHS = {'name': 100, 'phone': 20, 'gender': 10, 'grade': 50, 'region': 100, 'source': 50,
+                'has_tutoring_experience': 10}
+
+
+def _text(value) -> Optional[str]:
+    text = '' if value is None else str(value).strip()
+    return text or None
+
+
+def _chunks(values: List, size: int = LOOKUP_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class StudentImportService:
+    """学员批量导入服务类"""
+
+    @staticmethod
+    def normalize(student: Dict, trial_defaults: Dict) -> Dict:
+        """
+        校验并转换一个学员，错误时抛出 ValueError
+
+        试听课售价取学员自身的 trial_price，否则取批次默认值；为空表示只导入客户
+        """
+        if not isinstance(student, dict):
+            raise ValueError('学员信息格式错误')
+        customer = {field: _text(student.get(field)) for field in CUSTOMER_FIELDS}
+        if not customer['phone']:
+            raise ValueError('缺少联系电话')
+        for field, max_length in _MAX_LENGTHS.items():
+            if customer[field] and len(customer[field]) > max_length:
+                raise ValueError(f'{field} 过长')
+        if not customer['name']:
+            # 与单个录入一致：姓名为空时用手机号后4位作为临时姓名
+            customer['name'] = f"学员{customer['phone'][-4:]}"
+
+        price = student.get('trial_price', trial_defaults.get('trial_price'))
+        trial = None
+        if _text(price) is not None:
+            try:
+                price = float(price)
+            except (TypeError, ValueError):
+                raise ValueError(f'试听课售价格式错误: {price}')
+            if price < 0:
+                raise ValueError('试听课售价不能为负数')
+            source = _text(student.get('trial_source')) or _text(trial_defaults.get('source'))
+            if not source:
+                raise ValueError('缺少试听课渠道来源')
+            trial = {'trial_price': price, 'source': source}
+        return {'customer': customer, 'trial': trial}
+
+    @staticmethod
+    def import_students(students: List[Dict], trial_defaults: Optional[Dict] = None,
+                        dry_run: bool = False) -> Dict:
+        """
+        批量导入学员及试听课（调用方负责提交）
+
+        Args:
+            students: [{name, phone, gender, grade, region, source, has_tutoring_experience,
+                        trial_price, trial_source}]，只有 phone 必填
+            trial_defaults: 批次默认的试听课 {trial_price, source}
+            dry_run: 只校验不写入
+
+        Returns:
+            {'total', 'created_customers', 'existing_customers', 'created_trials', 'skipped_trials',
+             'error_count', 'errors': [{'index', 'phone', 'message'}], 'items': [...], 'dry_run'}，
+            index 为学员在请求中的序号（从 0 开始）；请求格式错误时抛出 ValueError
+        """
+        if not isinstance(students, list) or not students:
+            raise ValueError('学员列表不能为空')
+        if len(students) > MAX_IMPORT_STUDENTS:
+            raise ValueError(f'单次最多导入 {MAX_IMPORT_STUDENTS} 名学员')
+        trial_defaults = trial_defaults or {}
+        if not isinstance(trial_defaults, dict):
+            raise ValueError('试听课默认信息格式错误')
+
+        result = {'total': len(students), 'created_customers': 0, 'existing_customers': 0,
+                  'created_trials': 0, 'skipped_trials': 0, 'error_count': 0, 'errors': [],
+                  'items': [], 'dry_run': dry_run}
+
+        # 逐行校验，批次内重复手机号只保留第一次出现
+        rows, first_index = [], {}
+        for index, student in enumerate(students):
+            try:
+                row = StudentImportService.normalize(student, trial_defaults)
+                phone = row['customer']['phone']
+                if phone in first_index:
+                    raise ValueError(f'与第 {first_index[phone] + 1} 名学员手机号重复')
+            except ValueError as e:
+                phone = _text(student.get('phone')) if isinstance(student, dict) else None
+                result['errors'].append({'index': index, 'phone': phone, 'message': str(e)})
+                continue
+            first_index[phone] = index
+            rows.append((index, row))
+        result['error_count'] = len(result['errors'])
+
+        existing = StudentImportService._existing_customers(list(first_index))
+        with_trial = StudentImportService._customers_with_trial([customer_id for customer_id, _ in existing.values()])
+
+        new_customers, new_trials = [], []
+        for index, row in rows:
+            customer_data, trial_data = row['customer'], row['trial']
+            phone = customer_data['phone']
+            item = {'index': index, 'phone': phone}
+            if phone in existing:
+                customer_id, name = existing[phone]
+                item.update(customer_id=customer_id, name=name, customer='existing')
+                result['existing_customers'] += 1
+            else:
+                customer_id = None
+                new_customers.append(customer_data)
+                item.update(customer_id=None, name=customer_data['name'], customer='created')
+                result['created_customers'] += 1
+
+            if trial_data is None:
+                item['trial'] = None
+            elif customer_id in with_trial:
+                item['trial'] = 'exists'
+                result['skipped_trials'] += 1
+            else:
+                new_trials.append((item, trial_data))
+                item['trial'] = 'created'
+                result['created_trials'] += 1
+            result['items'].append(item)
+
+        if not dry_run:
+            StudentImportService._insert(new_customers, new_trials, result['items'])
+
+        logger.info(f"学员批量导入{'校验' if dry_run else ''}: 共 {result['total']} 名，"
+                    f"新建客户 {result['created_customers']}，已有客户 {result['existing_customers']}，"
+                    f"新建试听课 {result['created_trials']}，错误 {result['error_count']}")
+        return result
+
+    @staticmethod
+    def _insert(new_customers: List[Dict], new_trials: List[tuple], items: List[Dict]) -> None:
+        """
+        客户、试听课各一条多行 INSERT（insertmanyvalues），并在同一事务中维护派生数据
+
+        RETURNING 带回手机号 / 客户ID 用于对应（二者在本批次内唯一），不依赖返回顺序。
+        批量 INSERT 不经过单对象 flush 事件，这里显式维护客户检索键、全文检索索引、每日新增客户
+        与试听课汇总；数据版本与首页快照由批量写入的 do_orm_execute 事件处理。
+        """
+        now = datetime.utcnow()
+        customer_ids = {}
+        if new_customers:
+            params = [dict(customer, created_at=now, phone_reversed=reverse_phone(customer['phone']),
+                           name_initials=name_initials(customer['name'])) for customer in new_customers]
+            rows = db.session.execute(
+                insert(Customer).returning(Customer.id, Customer.phone, Customer.name,
+                                           Customer.region, Customer.grade),
+                params, execution_options={'render_nulls': True}
+            ).all()
+            customer_ids = {row.phone: row.id for row in rows}
+            SearchService.index_rows('customer', [row._asdict() for row in rows])
+            DashboardService.record_new_customers([now.date()] * len(rows))
+            for item in items:
+                if item['customer'] == 'created':
+                    item['customer_id'] = customer_ids[item['phone']]
+
+        if new_trials:
+            # 统一规则：试听课成本仅为基础成本，不包含任何渠道手续费
+            trial_cost = ConfigService.get_float('trial_cost', 0)
+            params = [{
+                'name': '试听课',
+                'customer_id': item['customer_id'],
+                'is_trial': True,
+                'trial_price': trial['trial_price'],
+                'source': trial['source'],
+                'cost': trial_cost,
+                'trial_status': 'registered',
+                'created_at': now,
+                'updated_at': now,
+            } for item, trial in new_trials]
+            rows = db.session.execute(
+                insert(Course).returning(Course.id, Course.customer_id),
+                params, execution_options={'render_nulls': True}
+            ).all()
+            course_ids = {row.customer_id: row.id for row in rows}
+            for item, _ in new_trials:
+                item['trial_course_id'] = course_ids[item['customer_id']]
+            TrialStatsService.record_inserted(list(course_ids.values()))
+
+    @staticmethod
+    def _existing_customers(phones: List[str]) -> Dict[str, tuple]:
+        """手机号 -> (客户ID, 姓名)，按批 IN 查询"""
+        existing = {}
+        for chunk in _chunks(phones):
+            rows = db.session.query(Customer.phone, Customer.id, Customer.name).filter(
+                Customer.phone.in_(chunk)
+            ).all()
+            existing.update({row.phone: (row.id, row.name) for row in rows})
+        return existing
+
+    @staticmethod
+    def _customers_with_trial(customer_ids: List[int]) -> Set[int]:
+        """已有试听课的客户ID（ix_course_customer_is_trial）"""
+        with_trial = set()
+        for chunk in _chunks(customer_ids):
+            rows = db.session.query(Course.customer_id).filter(
+                Course.customer_id.in_(chunk), Course.is_trial == True
+            ).distinct().all()
+            with_trial.update(row.customer_id for row in rows)
+        return with_trial
@@ -0,0 +1,261 @@
+"""
+刷单订单批量导入服务 - 流式解析 xlsx / csv，校验后在同一事务中分批插入
+
+刷单页面原先只能逐条表单录入。这里：
+
+- xlsx 以只读模式逐行读取（openpyxl read_only），csv 逐行读取，不把整个文件载入内存；
+- 表头与导出文件一致（见 EXPORT_DATASETS['taobao_orders']），可直接导入本系统导出的文件；
+  只有“刷单金额/金额”与“订单时间”为必填列；
+- 淘宝手续费统一按当前配置的 taobao_fee_rate 计算（读取一次）；
+- 以 (订单时间, 客户姓名, 刷单金额) 判断重复：按批次用 order_time IN (...) 走 ix_taobao_order_order_time
+  查询已有订单，文件内的重复行同样跳过；
+- 每 IMPORT_BATCH_SIZE 行执行一次多行 INSERT，全部批次在同一事务中，结束时提交一次；
+- 逐行记录校验错误（行号与原因），有效行照常导入；dry_run 只校验不写入。
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import csv
+import io
+import logging
+from datetime import datetime
+from sqlalchemy import insert
+from .. import db
+from ..models import TaobaoOrder
+from .config_service import ConfigService
+from .search_service import SearchService
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ('xlsx', 'csv')
+IMPORT_BATCH_SIZE = 1000
+# 查重 IN 查询每批的参数个数（低于 SQLite 默认的变量上限 999，批次最多有 IMPORT_BATCH_SIZE 个不同时间）
+LOOKUP_CHUNK = 900
+# 返回结果中最多列出的错误行数
+MAX_REPORTED_ERRORS = 200
+
+# 表头 -> 字段（兼容导出文件与简化模板）
+HEADER_FIELDS = {
+    '客户姓名': 'name',
+    '姓名': 'name',
+    '等级': 'level',
+    '刷单金额': 'amount',
+    '金额': 'amount',
+    '佣金': 'commission',
+    '是否已评价': 'evaluated',
+    '订单时间': 'order_time',
+    '刷单时间': 'order_time',
+    '结算状态': 'settled',
+    '结算时间': 'settled_at',
+}
+REQUIRED_FIELDS = ('amount', 'order_time')
+
+_TRUE_VALUES = {'是', '已评价', '已结算', 'true', '1', 'yes', 'y'}
+_FALSE_VALUES = {'否', '未评价', '未结算', 'false', '0', 'no', 'n', ''}
+_DATETIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y/%m/%d %H:%M:%S', '%Y/%m/%d %H:%M',
+                     '%Y-%m-%d', '%Y/%m/%d')
+
+
+def _text(value) -> str:
+    return '' if value is None else str(value).strip()
+
+
+def _parse_number(value, label: str, default: Optional[float] = None) -> Optional[float]:
+    if _text(value) == '':
+        if default is None:
+            raise ValueError(f'缺少{label}')
+        return default
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{label}格式错误: {value}')
+    if number < 0:
+        raise ValueError(f'{label}不能为负数: {value}')
+    return number
+
+
+def _parse_bool(value, label: str) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = _text(value).lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError(f'{label}无法识别: {value}')
+
+
+def _parse_datetime(value, label: str, required: bool) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0)
+    text = _text(value)
+    if not text:
+        if required:
+            raise ValueError(f'缺少{label}')
+        return None
+    text = text.replace('T', ' ')
+    for fmt in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f'{label}格式错误: {value}')
+
+
+def _dedupe_key(name: Optional[str], order_time: datetime, amount: float) -> Tuple:
+    return (name or '', order_time, round(amount, 2))
+
+
+class TaobaoImportService:
+    """刷单订单批量导入服务类"""
+
+    @staticmethod
+    def detect_format(filename: Optional[str]) -> str:
+        """按扩展名判断文件格式，不支持时抛出 ValueError"""
+        extension = (filename or '').rsplit('.', 1)[-1].lower() if '.' in (filename or '') else ''
+        if extension not in IMPORT_FORMATS:
+            raise ValueError(f"仅支持 {' / '.join(IMPORT_FORMATS)} 文件")
+        return extension
+
+    @staticmethod
+    def iter_rows(stream, file_format: str) -> Iterator[Tuple[int, Dict]]:
+        """
+        逐行读取文件
+
+        Args:
+            stream: 二进制文件对象（需可 seek，xlsx 为 zip 格式）
+            file_format: xlsx / csv
+
+        Yields:
+            (行号, {字段: 原始值})，行号与表格软件中显示的一致（表头为第1行）
+        """
+        if file_format not in IMPORT_FORMATS:
+            raise ValueError(f'不支持的导入格式: {file_format}')
+        if file_format == 'xlsx':
+            from openpyxl import load_workbook
+            workbook = load_workbook(stream, read_only=True, data_only=True)
+            try:
+                rows = workbook.active.iter_rows(values_only=True)
+                yield from TaobaoImportService._map_rows(rows)
+            finally:
+                workbook.close()
+        else:
+            text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+            try:
+                yield from TaobaoImportService._map_rows(csv.reader(text_stream))
+            finally:
+                text_stream.detach()
+
+    @staticmethod
+    def _map_rows(rows: Iterable) -> Iterator[Tuple[int, Dict]]:
+        header = next(iter(rows), None)
+        if header is None:
+            raise ValueError('文件为空')
+        columns = {index: HEADER_FIELDS[_text(name)] for index, name in enumerate(header)
+                   if _text(name) in HEADER_FIELDS}
+        missing = [field for field in REQUIRED_FIELDS if field not in columns.values()]
+        if missing:
+            labels = {'amount': '刷单金额', 'order_time': '订单时间'}
+            raise ValueError(f"缺少必填列: {', '.join(labels[field] for field in missing)}")
+
+        for row_number, row in enumerate(rows, start=2):
+            if not row or all(_text(value) == '' for value in row):
+                continue
+            values = {}
+            for index, field in columns.items():
+                # 同一字段有多个候选列时取第一个非空值
+                if index < len(row) and _text(values.get(field)) == '':
+                    values[field] = row[index]
+            yield row_number, values
+
+    @staticmethod
+    def validate_row(values: Dict, fee_rate: float) -> Dict:
+        """校验并转换一行，错误时抛出 ValueError"""
+        amount = _parse_number(values.get('amount'), '刷单金额')
+        settled = _parse_bool(values.get('settled'), '结算状态')
+        name = _text(values.get('name')) or None
+        if name and len(name) > 100:
+            raise ValueError('客户姓名过长')
+        return {
+            'name': name,
+            'level': _text(values.get('level')) or None,
+            'amount': amount,
+            'commission': _parse_number(values.get('commission'), '佣金', default=0.0),
+            'taobao_fee': amount * fee_rate / 100,
+            'evaluated': _parse_bool(values.get('evaluated'), '是否已评价'),
+            'order_time': _parse_datetime(values.get('order_time'), '订单时间', required=True),
+            'settled': settled,
+            'settled_at': _parse_datetime(values.get('settled_at'), '结算时间', required=False) if settled else None,
+        }
+
+    @staticmethod
+    def import_file(stream, file_format: str, dry_run: bool = False) -> Dict:
+        """
+        导入刷单订单（dry_run 时只校验；否则调用方负责提交）
+
+        Returns:
+            {'total_rows', 'imported', 'duplicates', 'error_count', 'errors': [{'row', 'message'}], 'dry_run'}；
+            文件格式或表头错误时抛出 ValueError
+        """
+        fee_rate = ConfigService.get_float('taobao_fee_rate', 0.6)
+        now = datetime.utcnow()
+        result = {'total_rows': 0, 'imported': 0, 'duplicates': 0, 'error_count': 0,
+                  'errors': [], 'dry_run': dry_run}
+        seen = set()
+        batch: List[Dict] = []
+
+        for row_number, values in TaobaoImportService.iter_rows(stream, file_format):
+            result['total_rows'] += 1
+            try:
+                order = TaobaoImportService.validate_row(values, fee_rate)
+            except ValueError as e:
+                result['error_count'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append({'row': row_number, 'message': str(e)})
+                continue
+
+            key = _dedupe_key(order['name'], order['order_time'], order['amount'])
+            if key in seen:
+                result['duplicates'] += 1
+                continue
+            seen.add(key)
+            order.update(created_at=now, updated_at=now)
+            batch.append(order)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                TaobaoImportService._flush_batch(batch, result, dry_run)
+                batch = []
+        if batch:
+            TaobaoImportService._flush_batch(batch, result, dry_run)
+
+        logger.info(f"刷单订单导入{'校验' if dry_run else ''}: 共 {result['total_rows']} 行，"
+                    f"导入 {result['imported']}，重复 {result['duplicates']}，错误 {result['error_count']}")
+        return result
+
+    @staticmethod
+    def _existing_keys(batch: List[Dict]) -> set:
+        """按订单时间（索引）查询批次中可能重复的已有订单"""
+        times = list({order['order_time'] for order in batch})
+        existing = set()
+        for start in range(0, len(times), LOOKUP_CHUNK):
+            rows = db.session.query(TaobaoOrder.name, TaobaoOrder.order_time, TaobaoOrder.amount).filter(
+                TaobaoOrder.order_time.in_(times[start:start + LOOKUP_CHUNK])
+            ).all()
+            existing.update(_dedupe_key(row.name, row.order_time, row.amount or 0) for row in rows)
+        return existing
+
+    @staticmethod
+    def _flush_batch(batch: List[Dict], result: Dict, dry_run: bool) -> None:
+        existing = TaobaoImportService._existing_keys(batch)
+        new_orders = [order for order in batch
+                      if _dedupe_key(order['name'], order['order_time'], order['amount']) not in existing]
+        result['duplicates'] += len(batch) - len(new_orders)
+        if not new_orders:
+            return
+        if not dry_run:
+            # 多行 INSERT（insertmanyvalues）：render_nulls 避免按空值字段拆分批次；
+            # RETURNING 直接带回索引字段，不依赖返回顺序（sort_by_parameter_order 在 SQLite 上会退化为逐行 INSERT）
+            rows = db.session.execute(
+                insert(TaobaoOrder).returning(TaobaoOrder.id, TaobaoOrder.name), new_orders,
+                execution_options={'render_nulls': True}
+            ).all()
+            SearchService.index_rows('taobao_order', [{'id': row.id, 'name': row.name} for row in rows])
+        result['imported'] += len(new_orders)
@@ -0,0 +1,229 @@
+"""
+刷单订单服务 - 服务端筛选、排序与键集分页，批量结算
+
+刷单页面原先一次性渲染全部订单，再在浏览器中逐行筛选和排序（applyFiltersAndSort），
+订单表每天增长，首屏时间随之线性增长。这里把筛选与排序下推到 SQL，
+默认按 (order_time, id) 倒序做键集分页，首屏只取一页数据。
+
+批量结算同样在 SQL 中完成：UPDATE ... WHERE 条件 AND 未结算，不再逐条加载 ORM 对象。
+"""
+
+from typing import Dict, Iterable, List, Optional
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, update
+from .. import db
+from ..models import TaobaoOrder
+from .pagination import (encode_cursor, decode_cursor, keyset_condition, keyset_order,
+                         KIND_DATETIME, KIND_NUMBER, KIND_STRING)
+
+logger = logging.getLogger(__name__)
+
+# 允许的排序字段 -> (SQL 字段, 游标值类型)
+SORT_FIELDS = {
+    'order_time': (TaobaoOrder.order_time, KIND_DATETIME),
+    'created_at': (TaobaoOrder.created_at, KIND_DATETIME),
+    'amount': (TaobaoOrder.amount, KIND_NUMBER),
+    'commission': (TaobaoOrder.commission, KIND_NUMBER),
+    'name': (TaobaoOrder.name, KIND_STRING),
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# 按ID结算时每条 UPDATE 的最大ID数（旧版 SQLite 单条语句最多 999 个参数）
+SETTLE_ID_CHUNK = 900
+# 按筛选结算时允许的筛选参数（结算状态固定为未结算）
+SETTLE_FILTERS = ('name', 'level', 'evaluated', 'date_from', 'date_to')
+
+
+def _parse_bool(value: Optional[str]) -> Optional[bool]:
+    """解析 true/false 参数，空值返回 None（不筛选）"""
+    if value is None or value == '':
+        return None
+    if value.lower() in ('true', '1', 'yes'):
+        return True
+    if value.lower() in ('false', '0', 'no'):
+        return False
+    raise ValueError(f'无效的布尔参数: {value}')
+
+
+def _parse_date(value: Optional[str], end_of_day: bool = False) -> Optional[datetime]:
+    """解析日期/时间参数；仅有日期且作为结束时间时取次日零点（不含）"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('T', ' '))
+    except ValueError:
+        raise ValueError(f'无效的日期参数: {value}')
+    if end_of_day and len(value) <= 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+class TaobaoOrderService:
+    """刷单订单服务类"""
+
+    @staticmethod
+    def filter_conditions(name: Optional[str] = None,
+                          level: Optional[str] = None,
+                          evaluated: Optional[str] = None,
+                          settled: Optional[str] = None,
+                          date_from: Optional[str] = None,
+                          date_to: Optional[str] = None) -> List:
+        """
+        构造订单筛选条件
+
+        Args:
+            name: 姓名关键字（模糊匹配）
+            level: 淘宝等级（精确匹配）
+            evaluated / settled: 'true' / 'false'，空值不筛选
+            date_from / date_to: 刷单时间范围（YYYY-MM-DD 或 ISO 时间，结束日期包含当天）
+
+        Returns:
+            SQL 条件列表；参数格式错误时抛出 ValueError
+        """
+        conditions = []
+        name = (name or '').strip()
+        if name:
+            conditions.append(TaobaoOrder.name.ilike(f"%{name}%"))
+        if level:
+            conditions.append(TaobaoOrder.level == level)
+
+        evaluated_value = _parse_bool(evaluated)
+        if evaluated_value is not None:
+            conditions.append(TaobaoOrder.evaluated == evaluated_value)
+        settled_value = _parse_bool(settled)
+        if settled_value is not None:
+            conditions.append(TaobaoOrder.settled == settled_value)
+
+        start = _parse_date(date_from)
+        if start:
+            conditions.append(TaobaoOrder.order_time >= start)
+        end = _parse_date(date_to, end_of_day=True)
+        if end:
+            # 仅日期时 end 已是次日零点，用开区间；带时间时包含该时刻
+            if len(date_to) <= 10:
+                conditions.append(TaobaoOrder.order_time < end)
+            else:
+                conditions.append(TaobaoOrder.order_time <= end)
+        return conditions
+
+    @staticmethod
+    def list_page(conditions: List, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                  sort: str = 'order_time', order: str = 'desc') -> Dict:
+        """
+        键集分页查询订单
+
+        Returns:
+            {'items': [...], 'next_cursor': str 或 None}
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError('不支持的排序字段')
+        if order not in ('asc', 'desc'):
+            raise ValueError('排序方向参数无效')
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sort_column, kind = SORT_FIELDS[sort]
+        descending = order == 'desc'
+
+        query = TaobaoOrder.query.filter(*conditions)
+        if cursor:
+            sort_value, last_id = decode_cursor(cursor, kind)
+            query = query.filter(keyset_condition(sort_column, TaobaoOrder.id, sort_value, last_id, descending))
+        query = query.order_by(*keyset_order(sort_column, TaobaoOrder.id, descending))
+
+        # 多取一条判断是否还有下一页
+        orders = query.limit(limit + 1).all()
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+
+        next_cursor = None
+        if has_more and orders:
+            last_order = orders[-1]
+            next_cursor = encode_cursor(getattr(last_order, sort_column.key), last_order.id)
+
+        return {
+            'items': [TaobaoOrderService.format_order(order) for order in orders],
+            'next_cursor': next_cursor
+        }
+
+    @staticmethod
+    def format_order(order: TaobaoOrder) -> Dict:
+        """格式化订单数据"""
+        return {
+            'id': order.id,
+            'name': order.name,
+            'level': order.level,
+            'amount': float(order.amount or 0),
+            'commission': float(order.commission or 0),
+            'taobao_fee': float(order.taobao_fee or 0),
+            'evaluated': bool(order.evaluated),
+            'order_time': order.order_time.isoformat() if order.order_time else None,
+            'settled': bool(order.settled),
+            'settled_at': order.settled_at.isoformat() if order.settled_at else None,
+            'created_at': order.created_at.isoformat() if order.created_at else None
+        }
+
+    @staticmethod
+    def settle(order_ids: Optional[Iterable] = None, filters: Optional[Dict] = None) -> Dict:
+        """
+        批量结算未结算的订单（同一事务内完成，调用方负责提交）
+
+        Args:
+            order_ids: 订单ID列表
+            filters: 按筛选条件结算（见 SETTLE_FILTERS），至少包含一个非空条件
+
+        Returns:
+            {'settled_count', 'total_amount', 'total_commission', 'settled_at'}，
+            只统计本次实际由未结算变为已结算的订单；参数错误时抛出 ValueError
+        """
+        if order_ids:
+            try:
+                ids = sorted({int(order_id) for order_id in order_ids})
+            except (TypeError, ValueError):
+                raise ValueError('订单ID格式错误')
+            condition_groups = [[TaobaoOrder.id.in_(ids[i:i + SETTLE_ID_CHUNK])]
+                                for i in range(0, len(ids), SETTLE_ID_CHUNK)]
+        elif filters:
+            unknown = set(filters) - set(SETTLE_FILTERS)
+            if unknown:
+                raise ValueError(f"不支持的筛选参数: {', '.join(sorted(unknown))}")
+            params = {key: str(value).strip() for key, value in filters.items()
+                      if value is not None and str(value).strip() != ''}
+            if not params:
+                raise ValueError('请至少指定一个筛选条件')
+            condition_groups = [TaobaoOrderService.filter_conditions(**params)]
+        else:
+            raise ValueError('请选择要结算的订单')
+
+        settled_at = datetime.now()
+        unsettled = or_(TaobaoOrder.settled == False, TaobaoOrder.settled.is_(None))
+        result = {'settled_count': 0, 'total_amount': 0.0, 'total_commission': 0.0}
+        for conditions in condition_groups:
+            count, amount, commission = TaobaoOrderService._settle_where([unsettled, *conditions], settled_at)
+            result['settled_count'] += count
+            result['total_amount'] += amount
+            result['total_commission'] += commission
+        result['settled_at'] = settled_at.isoformat()
+        return result
+
+    @staticmethod
+    def _settle_where(conditions: List, settled_at: datetime):
+        """单条 UPDATE 结算满足条件的订单，返回 (数量, 金额合计, 佣金合计)"""
+        statement = update(TaobaoOrder).where(*conditions).values(settled=True, settled_at=settled_at)
+        options = {'synchronize_session': False}
+        if db.engine.dialect.update_returning:
+            # RETURNING 直接得到本次被更新的行，统计与更新严格一致
+            rows = db.session.execute(
+                statement.returning(TaobaoOrder.amount, TaobaoOrder.commission), execution_options=options
+            ).all()
+            return (len(rows), float(sum(row.amount or 0 for row in rows)),
+                    float(sum(row.commission or 0 for row in rows)))
+
+        # 不支持 RETURNING 的数据库：先在同一事务内汇总，再更新
+        totals = db.session.query(
+            func.coalesce(func.sum(TaobaoOrder.amount), 0),
+            func.coalesce(func.sum(TaobaoOrder.commission), 0)
+        ).filter(*conditions).one()
+        count = db.session.execute(statement, execution_options=options).rowcount
+        return count, float(totals[0]), float(totals[1])
@@ -0,0 +1,184 @@
+"""
+试听课列表服务 - 服务端筛选、排序与键集分页
+
+试听课页面原先把全部试听课渲染进 DOM，再由浏览器逐行隐藏完成筛选，
+页面体积和渲染时间随学员数量无限增长。这里把搜索、渠道、状态筛选与排序
+下推到 SQL，按 (排序字段, id) 做键集分页，筛选后的统计也在数据库中完成。
+"""
+
+from typing import Dict, List, Optional
+import logging
+from sqlalchemy import func, case, or_
+from .. import db
+from ..models import Course, Customer
+from .trial_stats_service import TrialStatsService
+from .pagination import (encode_cursor, decode_cursor, keyset_condition, keyset_order,
+                         KIND_DATETIME, KIND_NUMBER)
+
+logger = logging.getLogger(__name__)
+
+# 允许的排序字段 -> SQL 表达式
+SORT_FIELDS = {
+    'created_at': Course.created_at,
+    'trial_price': func.coalesce(Course.trial_price, 0.0),
+}
+SORT_KINDS = {
+    'created_at': KIND_DATETIME,
+    'trial_price': KIND_NUMBER,
+}
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class TrialCourseService:
+    """试听课列表服务类"""
+
+    @staticmethod
+    def filter_conditions(search: Optional[str] = None,
+                          source: Optional[str] = None,
+                          status: Optional[str] = None) -> List:
+        """
+        构造与页面筛选控件一致的 SQL 条件
+
+        Args:
+            search: 学员姓名或电话关键字（模糊匹配，不区分大小写）
+            source: 渠道来源（精确匹配）
+            status: 试听课状态（空状态按 registered 处理）
+
+        Returns:
+            SQL 条件列表
+        """
+        conditions = [Course.is_trial == True]
+        search = (search or '').strip()
+        if search:
+            pattern = f"%{search}%"
+            conditions.append(or_(Customer.name.ilike(pattern), Customer.phone.like(pattern)))
+        if source:
+            conditions.append(Course.source == source)
+        if status:
+            conditions.append(func.coalesce(func.nullif(Course.trial_status, ''), 'registered') == status)
+        return conditions
+
+    @staticmethod
+    def list_page(conditions: List, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                  sort: str = 'created_at', order: str = 'desc') -> Dict:
+        """
+        键集分页查询试听课
+
+        Args:
+            conditions: filter_conditions() 返回的条件
+            cursor: 上一页返回的 next_cursor，为空表示第一页
+            limit: 每页条数（最大 MAX_PAGE_SIZE）
+            sort: 排序字段（created_at / trial_price）
+            order: asc / desc
+
+        Returns:
+            {'items': [...], 'next_cursor': str 或 None}
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError('不支持的排序字段')
+        if order not in ('asc', 'desc'):
+            raise ValueError('排序方向参数无效')
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        sort_column = SORT_FIELDS[sort]
+        descending = order == 'desc'
+
+        query = db.session.query(Course, Customer).join(
+            Customer, Course.customer_id == Customer.id
+        ).filter(*conditions)
+
+        if cursor:
+            sort_value, last_id = decode_cursor(cursor, SORT_KINDS[sort])
+            query = query.filter(keyset_condition(sort_column, Course.id, sort_value, last_id, descending))
+        query = query.order_by(*keyset_order(sort_column, Course.id, descending))
+
+        # 多取一条判断是否还有下一页
+        results = query.limit(limit + 1).all()
+        has_more = len(results) > limit
+        results = results[:limit]
+
+        taobao_fee_rate = TrialStatsService.load_fee_rates().get('淘宝', 0.0)
+        items = [TrialCourseService.format_row(course, customer, taobao_fee_rate)
+                 for course, customer in results]
+
+        next_cursor = None
+        if has_more and results:
+            last_course = results[-1][0]
+            last_value = last_course.created_at if sort == 'created_at' else float(last_course.trial_price or 0)
+            next_cursor = encode_cursor(last_value, last_course.id)
+
+        return {'items': items, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def row_fee(course, taobao_fee_rate: float) -> float:
+        """单条试听课在列表中展示的手续费（与原模板计算一致）"""
+        rate = taobao_fee_rate or 0.006
+        if course.trial_status == 'refunded':
+            if (course.refund_channel or '') == '淘宝':
+                return 0.0
+            recorded_fee = float(course.refund_fee or 0)
+            return recorded_fee if recorded_fee > 0 else float(course.trial_price or 0) * rate
+        if course.source == '淘宝':
+            return float(course.trial_price or 0) * rate
+        return 0.0
+
+    @staticmethod
+    def format_row(course, customer, taobao_fee_rate: float) -> Dict:
+        """格式化列表行数据"""
+        return {
+            'id': course.id,
+            'customer_name': customer.name,
+            'customer_gender': customer.gender,
+            'customer_grade': customer.grade,
+            'customer_region': customer.region,
+            'customer_phone': customer.phone,
+            'has_tutoring_experience': customer.has_tutoring_experience,
+            'trial_price': float(course.trial_price or 0),
+            'source': course.source,
+            'fee': TrialCourseService.row_fee(course, taobao_fee_rate),
+            'created_at': course.created_at.strftime('%Y-%m-%d %H:%M') if course.created_at else None,
+            'trial_status': course.trial_status or 'registered',
+            'refund_amount': float(course.refund_amount or 0),
+            'refund_fee': float(course.refund_fee or 0),
+            'refund_channel': course.refund_channel,
+            'converted_to_course': course.converted_to_course,
+        }
+
+    @staticmethod
+    def filtered_stats(conditions: List) -> Dict:
+        """
+        计算筛选结果的统计数据（替代浏览器端 updateFilterStats / updateChartsWithFilteredData）
+
+        Returns:
+            count / total_price / source_counts / conversion / status_stats / total_stats
+        """
+        base = db.session.query(Course.id).join(
+            Customer, Course.customer_id == Customer.id
+        ).filter(*conditions)
+
+        status = func.coalesce(func.nullif(Course.trial_status, ''), 'registered')
+        summary = base.with_entities(
+            func.count(Course.id).label('count'),
+            func.coalesce(func.sum(Course.trial_price), 0).label('total_price'),
+            func.coalesce(func.sum(case((status == 'converted', 1), else_=0)), 0).label('converted'),
+        ).one()
+
+        source_label = func.coalesce(func.nullif(Course.source, ''), '-')
+        source_counts = {
+            row.source: row.count
+            for row in base.with_entities(
+                source_label.label('source'), func.count(Course.id).label('count')
+            ).group_by(source_label).order_by(func.count(Course.id).desc())
+        }
+
+        status_stats, total_stats = TrialStatsService.sql_stats(conditions)
+
+        return {
+            'count': summary.count or 0,
+            'total_price': float(summary.total_price or 0),
+            'source_counts': source_counts,
+            'conversion': {'total': summary.count or 0, 'converted': int(summary.converted or 0)},
+            'status_stats': status_stats,
+            'total_stats': total_stats,
+        }
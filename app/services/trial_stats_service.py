@@ -0,0 +1,460 @@
+"""
+试听课统计服务 - 物化汇总表的增量维护与读取
+
+试听课管理页面原先每次请求都加载全部试听课并在 Python 中逐条累计，
+数据量越大越慢。这里把统计口径拆成与费率无关的原始合计，
+按 (状态, 渠道来源, 退款渠道) 物化到 trial_course_stat 表：
+
+- Course 的新增/修改/删除通过 Session 的 flush 事件增量更新汇总表，
+  与业务写入处于同一事务，回滚时一起回滚；
+- 页面只读取少量汇总行，再按当前费率配置计算手续费；
+- rebuild()/verify() 用于全量重建与校验（见 rebuild_trial_stats.py）；
+- sql_stats()/sql_rows() 把同一口径下推为 SQL（CASE + GROUP BY），
+  供调试接口与校验使用，不加载 ORM 对象。
+"""
+
+from typing import Dict, List, Optional, Tuple
+import logging
+from sqlalchemy import event, select, update, insert, delete, func, case, cast, true, Float
+from .. import db
+from ..models import Course, Customer, Config, TrialCourseStat
+from .config_service import ConfigService, CHANNEL_FEE_KEYS
+
+logger = logging.getLogger(__name__)
+
+# 试听课全部状态（页面按此顺序展示）
+TRIAL_STATUSES = ['registered', 'not_registered', 'refunded', 'converted', 'no_action']
+
+# 纳入统计口径的状态（未报名 not_registered 完全不计入）
+INCLUDED_STATUSES = ('registered', 'converted', 'no_action', 'refunded')
+
+# 汇总表中可累加的数值字段
+SUM_FIELDS = ('count', 'price_sum', 'cost_sum', 'recorded_fee_sum', 'unrecorded_price_sum')
+
+# 参与汇总的课程字段（Course JOIN Customer，保持与页面表格同一数据源）
+_ROW_COLUMNS = (
+    Course.id, Course.is_trial, Course.trial_status, Course.source,
+    Course.refund_channel, Course.trial_price, Course.cost, Course.refund_fee
+)
+
+_PENDING_KEY = '_trial_stat_old_rows'
+
+
+class TrialStatsService:
+    """试听课统计服务类"""
+
+    @staticmethod
+    def contribution(row) -> Optional[Tuple[Tuple[str, str, str], Dict[str, float]]]:
+        """
+        计算单条课程记录对汇总表的贡献
+
+        Args:
+            row: 含 is_trial/trial_status/source/refund_channel/trial_price/cost/refund_fee 的行
+
+        Returns:
+            (汇总键, 各合计字段增量)；非试听课返回 None
+        """
+        if not row.is_trial:
+            return None
+
+        price = float(row.trial_price or 0)
+        recorded_fee = float(row.refund_fee or 0)
+        key = (
+            row.trial_status or 'registered',
+            row.source or '',
+            (row.refund_channel or '').strip()
+        )
+        values = {
+            'count': 1,
+            'price_sum': price,
+            'cost_sum': float(row.cost or 0),
+            'recorded_fee_sum': recorded_fee if recorded_fee > 0 else 0.0,
+            'unrecorded_price_sum': 0.0 if recorded_fee > 0 else price,
+        }
+        return key, values
+
+    @staticmethod
+    def accumulate(rows, sign: int = 1, groups: Optional[Dict] = None) -> Dict:
+        """把多条课程记录的贡献按汇总键累加到 groups 中"""
+        groups = {} if groups is None else groups
+        for row in rows:
+            item = TrialStatsService.contribution(row)
+            if item is None:
+                continue
+            key, values = item
+            bucket = groups.setdefault(key, dict.fromkeys(SUM_FIELDS, 0))
+            for field in SUM_FIELDS:
+                bucket[field] += sign * values[field]
+        return groups
+
+    @staticmethod
+    def load_fee_rates() -> Dict[str, float]:
+        """读取各渠道手续费率（转换为小数，未配置按0处理）"""
+        return ConfigService.fee_rates()
+
+    @staticmethod
+    def build_stats(groups: Dict, fee_rates: Dict[str, float]) -> Tuple[Dict, Dict]:
+        """
+        由汇总行计算页面所需的 status_stats 与 total_stats
+
+        口径与原逐条计算完全一致：
+        - not_registered 完全不参与统计
+        - registered / converted / no_action：收入=售价，手续费=售价×渠道费率
+        - refunded：收入=0；退款渠道为淘宝时手续费=0，否则优先使用已记录的退款手续费，
+          未记录时按退款渠道费率估算（未配置则回退淘宝费率）
+        - 利润 = 收入 - 成本（不扣除手续费）
+        """
+        status_stats = {
+            status: {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0}
+            for status in TRIAL_STATUSES
+        }
+        taobao_rate = fee_rates.get('淘宝', 0.0)
+
+        for (status, source, refund_channel), sums in groups.items():
+            # 未报名与未知状态不参与统计
+            if status == 'not_registered' or status not in status_stats:
+                continue
+
+            cost = sums['cost_sum']
+            if status == 'refunded':
+                revenue = 0
+                if refund_channel == '淘宝':
+                    fees = 0.0
+                else:
+                    refund_rate = fee_rates.get(refund_channel, 0.0) or taobao_rate
+                    fees = sums['recorded_fee_sum'] + sums['unrecorded_price_sum'] * refund_rate
+                profit = -cost
+            else:
+                revenue = sums['price_sum']
+                fees = revenue * fee_rates.get(source, 0.0)
+                profit = revenue - cost
+
+            bucket = status_stats[status]
+            bucket['count'] += int(sums['count'])
+            bucket['revenue'] += revenue
+            bucket['cost'] += cost
+            bucket['fees'] += fees
+            bucket['profit'] += profit
+
+        total_revenue = sum(s['revenue'] for s in status_stats.values())
+        total_cost = sum(s['cost'] for s in status_stats.values())
+        total_stats = {
+            # 仅统计纳入口径的状态：已报名、转正、无操作、退费；未报名不计入
+            'total_trials': sum(
+                status_stats[s]['count'] for s in INCLUDED_STATUSES
+            ),
+            'total_revenue': total_revenue,
+            'total_cost': total_cost,
+            'total_fees': sum(s['fees'] for s in status_stats.values()),
+            'total_profit': total_revenue - total_cost
+        }
+        return status_stats, total_stats
+
+    @staticmethod
+    def load_groups() -> Dict:
+        """读取物化汇总表"""
+        groups = {}
+        for stat in TrialCourseStat.query.all():
+            groups[(stat.status, stat.source, stat.refund_channel)] = {
+                field: getattr(stat, field) or 0 for field in SUM_FIELDS
+            }
+        return groups
+
+    @staticmethod
+    def scan_groups() -> Dict:
+        """全量扫描课程表得到汇总（用于重建与校验）"""
+        rows = db.session.query(*_ROW_COLUMNS).join(
+            Customer, Course.customer_id == Customer.id
+        ).filter(Course.is_trial == True).yield_per(2000)
+        return TrialStatsService.accumulate(rows)
+
+    @staticmethod
+    def get_stats(fee_rates: Optional[Dict[str, float]] = None) -> Tuple[Dict, Dict]:
+        """读取物化汇总并计算 status_stats / total_stats"""
+        if fee_rates is None:
+            fee_rates = TrialStatsService.load_fee_rates()
+        return TrialStatsService.build_stats(TrialStatsService.load_groups(), fee_rates)
+
+    @staticmethod
+    def rebuild() -> int:
+        """
+        按当前课程表全量重建汇总表
+
+        Returns:
+            重建后的汇总行数
+        """
+        groups = TrialStatsService.scan_groups()
+        db.session.execute(delete(TrialCourseStat))
+        if groups:
+            db.session.execute(insert(TrialCourseStat), [
+                dict(status=status, source=source, refund_channel=refund_channel, **sums)
+                for (status, source, refund_channel), sums in groups.items()
+            ])
+        db.session.commit()
+        logger.info(f"试听课统计汇总重建完成，共 {len(groups)} 行")
+        return len(groups)
+
+    @staticmethod
+    def verify(tolerance: float = 0.01) -> List[Dict]:
+        """
+        校验汇总表与全量扫描结果是否一致
+
+        Returns:
+            不一致项列表，每项包含 key/field/stored/expected；为空表示一致
+        """
+        stored = TrialStatsService.load_groups()
+        expected = TrialStatsService.scan_groups()
+        mismatches = []
+        for key in set(stored) | set(expected):
+            stored_sums = stored.get(key, dict.fromkeys(SUM_FIELDS, 0))
+            expected_sums = expected.get(key, dict.fromkeys(SUM_FIELDS, 0))
+            for field in SUM_FIELDS:
+                if abs((stored_sums[field] or 0) - (expected_sums[field] or 0)) > tolerance:
+                    mismatches.append({
+                        'key': key,
+                        'field': field,
+                        'stored': stored_sums[field],
+                        'expected': expected_sums[field]
+                    })
+        return mismatches
+
+    @staticmethod
+    def ensure_initialized() -> None:
+        """汇总表为空但已有试听课时执行一次全量构建（升级后首次启动）"""
+        try:
+            has_stats = db.session.query(TrialCourseStat.id).first() is not None
+            if not has_stats and db.session.query(Course.id).filter(Course.is_trial == True).first():
+                TrialStatsService.rebuild()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"初始化试听课统计汇总失败: {str(e)}")
+
+    @staticmethod
+    def _sql_expressions() -> Dict:
+        """
+        构造 SQL 层的统计口径表达式（与 build_stats 口径一致）
+
+        手续费率由 config 表按键透视为一行子查询后连接进来，
+        状态/渠道规则用 CASE 表达式实现，数据库直接返回计算结果。
+        """
+        rate_columns = [
+            func.coalesce(func.max(case(
+                (Config.key == key, cast(Config.value, Float)), else_=None
+            )), 0).label(key)
+            for key in CHANNEL_FEE_KEYS.values()
+        ]
+        rates = select(*rate_columns).subquery('fee_rates')
+
+        def channel_rate(channel_column):
+            return case(
+                *[(channel_column == channel, getattr(rates.c, key) / 100.0)
+                  for channel, key in CHANNEL_FEE_KEYS.items()],
+                else_=0.0
+            )
+
+        status = func.coalesce(func.nullif(Course.trial_status, ''), 'registered')
+        price = func.coalesce(Course.trial_price, 0.0)
+        cost = func.coalesce(Course.cost, 0.0)
+        recorded_fee = func.coalesce(Course.refund_fee, 0.0)
+        refund_channel = func.trim(func.coalesce(Course.refund_channel, ''))
+        # 退款渠道未配置费率（或为0）时回退淘宝费率
+        refund_rate = func.coalesce(
+            func.nullif(channel_rate(refund_channel), 0.0),
+            rates.c.taobao_fee_rate / 100.0
+        )
+
+        included = status.in_(INCLUDED_STATUSES)
+        revenue = case((status == 'refunded', 0.0), else_=price)
+        fees = case(
+            (status == 'refunded', case(
+                (refund_channel == '淘宝', 0.0),
+                (recorded_fee > 0, recorded_fee),
+                else_=price * refund_rate
+            )),
+            else_=price * channel_rate(Course.source)
+        )
+        profit = case((status == 'refunded', -cost), else_=price - cost)
+
+        return {
+            'rates': rates,
+            'status': status,
+            'included': included,
+            'revenue': revenue,
+            'cost': cost,
+            'fees': fees,
+            'profit': profit,
+        }
+
+    @staticmethod
+    def sql_stats(conditions: Optional[List] = None) -> Tuple[Dict, Dict]:
+        """
+        单条 GROUP BY 语句在数据库中计算 status_stats / total_stats
+
+        不加载任何 ORM 对象，用于调试接口、汇总表校验与筛选统计。
+
+        Args:
+            conditions: 额外的筛选条件（可引用 Course / Customer 字段）
+        """
+        expr = TrialStatsService._sql_expressions()
+        stmt = select(
+            expr['status'].label('status'),
+            func.count(Course.id).label('count'),
+            func.sum(expr['revenue']).label('revenue'),
+            func.sum(expr['cost']).label('cost'),
+            func.sum(expr['fees']).label('fees'),
+            func.sum(expr['profit']).label('profit'),
+        ).select_from(Course).join(
+            Customer, Course.customer_id == Customer.id
+        ).join(
+            expr['rates'], true()
+        ).where(
+            Course.is_trial == True, expr['included'], *(conditions or [])
+        ).group_by(expr['status'])
+
+        status_stats = {
+            status: {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0}
+            for status in TRIAL_STATUSES
+        }
+        for row in db.session.execute(stmt):
+            status_stats[row.status] = {
+                'count': row.count,
+                'revenue': row.revenue or 0,
+                'cost': row.cost or 0,
+                'fees': row.fees or 0,
+                'profit': row.profit or 0,
+            }
+
+        total_revenue = sum(s['revenue'] for s in status_stats.values())
+        total_cost = sum(s['cost'] for s in status_stats.values())
+        total_stats = {
+            'total_trials': sum(status_stats[s]['count'] for s in INCLUDED_STATUSES),
+            'total_revenue': total_revenue,
+            'total_cost': total_cost,
+            'total_fees': sum(s['fees'] for s in status_stats.values()),
+            'total_profit': total_revenue - total_cost
+        }
+        return status_stats, total_stats
+
+    @staticmethod
+    def sql_rows(include_orphans: bool = False, ascending: bool = False):
+        """
+        逐条返回试听课的统计明细（口径表达式与 sql_stats 共用）
+
+        Args:
+            include_orphans: 是否包含缺失客户记录的试听课（LEFT JOIN）
+            ascending: 是否按创建时间升序
+
+        Returns:
+            行迭代器，字段为 id/customer_name/status/source/trial_price/included/revenue/cost/fees
+        """
+        expr = TrialStatsService._sql_expressions()
+        stmt = select(
+            Course.id,
+            Customer.name.label('customer_name'),
+            expr['status'].label('status'),
+            func.coalesce(Course.source, '').label('source'),
+            func.coalesce(Course.trial_price, 0.0).label('trial_price'),
+            expr['included'].label('included'),
+            case((expr['included'], expr['revenue']), else_=0.0).label('revenue'),
+            expr['cost'].label('cost'),
+            case((expr['included'], expr['fees']), else_=0.0).label('fees'),
+        ).select_from(Course).join(
+            Customer, Course.customer_id == Customer.id, isouter=include_orphans
+        ).join(
+            expr['rates'], true()
+        ).where(Course.is_trial == True).order_by(
+            Course.created_at.asc() if ascending else Course.created_at.desc()
+        )
+        return db.session.execute(stmt)
+
+    @staticmethod
+    def debug_rows() -> List[Dict]:
+        """逐条输出试听课的统计明细（仅调试模式使用）"""
+        return [{
+            'id': row.id,
+            'status': row.status,
+            'source': row.source,
+            'trial_price': float(row.trial_price),
+            'included': bool(row.included),
+            'revenue': float(row.revenue or 0),
+            'cost': float(row.cost or 0),
+            'fees': float(row.fees or 0),
+        } for row in TrialStatsService.sql_rows()]
+
+    @staticmethod
+    def record_inserted(course_ids) -> None:
+        """批量 INSERT（不经过单对象 flush）新增课程后，在同一事务中累加到汇总表"""
+        connection = db.session.connection()
+        rows = TrialStatsService._select_rows(connection, course_ids)
+        TrialStatsService._apply_deltas(connection, TrialStatsService.accumulate(rows, sign=1))
+
+    @staticmethod
+    def _select_rows(connection, course_ids) -> List:
+        """直接从数据库读取指定课程的汇总相关字段"""
+        if not course_ids:
+            return []
+        stmt = select(*_ROW_COLUMNS).join(
+            Customer, Course.customer_id == Customer.id
+        ).where(Course.id.in_(list(course_ids)))
+        return connection.execute(stmt).all()
+
+    @staticmethod
+    def _apply_deltas(connection, groups: Dict) -> None:
+        """把增量写入汇总表（不存在的汇总行自动创建）"""
+        table = TrialCourseStat.__table__
+        for (status, source, refund_channel), sums in groups.items():
+            if not any(sums.values()):
+                continue
+            condition = (
+                (table.c.status == status)
+                & (table.c.source == source)
+                & (table.c.refund_channel == refund_channel)
+            )
+            result = connection.execute(
+                update(table).where(condition).values(
+                    updated_at=func.current_timestamp(),
+                    **{field: getattr(table.c, field) + sums[field] for field in SUM_FIELDS}
+                )
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(table).values(
+                    status=status, source=source, refund_channel=refund_channel, **sums
+                ))
+
+
+def _changed_course_ids(session, include_new: bool) -> set:
+    """收集本次 flush 中被修改/删除（以及可选的新增）的课程ID"""
+    objects = list(session.dirty) + list(session.deleted)
+    if include_new:
+        objects += list(session.new)
+    return {obj.id for obj in objects if isinstance(obj, Course) and obj.id is not None}
+
+
+@event.listens_for(db.session, 'before_flush')
+def _capture_old_trial_rows(session, flush_context, instances):
+    """flush 前记录受影响课程在数据库中的旧值"""
+    course_ids = _changed_course_ids(session, include_new=False)
+    if course_ids:
+        old_rows = TrialStatsService._select_rows(session.connection(), course_ids)
+        session.info.setdefault(_PENDING_KEY, []).extend(old_rows)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _apply_trial_stat_deltas(session, flush_context):
+    """flush 后按 新值 - 旧值 增量更新汇总表"""
+    old_rows = session.info.pop(_PENDING_KEY, [])
+    course_ids = _changed_course_ids(session, include_new=True)
+    if not course_ids and not old_rows:
+        return
+
+    connection = session.connection()
+    new_rows = TrialStatsService._select_rows(connection, course_ids)
+    groups = TrialStatsService.accumulate(old_rows, sign=-1)
+    TrialStatsService.accumulate(new_rows, sign=1, groups=groups)
+    TrialStatsService._apply_deltas(connection, groups)
+
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_pending_trial_rows(session, previous_transaction):
+    """flush 失败回滚时丢弃已记录的旧值，避免带入下一次 flush"""
+    session.info.pop(_PENDING_KEY, None)
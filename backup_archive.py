@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+备份归档写入 - 一次流式读取数据库快照，同时计算哈希并多线程压缩写入 zip
+
+原流程先用备份API复制出完整的 .sqlite 文件，再读两遍（计算哈希、zipfile 单线程压缩）。这里只读一遍：
+
+- WAL 模式下先做 TRUNCATE 检查点，再在源库上开启读事务。WAL 为空时该读事务直接读取数据库文件，
+  之后其他连接的提交只追加到 WAL，检查点也不能回写主文件，因此可以按页直接读取数据库文件，
+  不产生中间文件；非 WAL 模式或检查点未能完成（写入繁忙）时，退回备份API分步复制到临时文件再读取；
+- 读取的同时计算 SHA-256 与 CRC32；
+- 按块（默认 1MB）交给线程池压缩（zlib 压缩时释放 GIL）。每块以前一块末尾 32KB 作为字典，
+  以 Z_SYNC_FLUSH 结束（最后一块 Z_FINISH），拼接后即为一个完整的 DEFLATE 流（pigz 的做法），
+  zipfile、unzip 等标准工具都能直接解压；
+- 数据超过 4GB 时自动写入 ZIP64 字段。
+
+标准库中没有多线程的 zstd / xz 实现，zip 中的 zstd 条目 zipfile 也无法解压（还原依赖 zipfile），
+因此只使用 DEFLATE。
+"""
+
+import os
+import time
+import zlib
+import struct
+import sqlite3
+import hashlib
+import datetime
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from backup_catalog import table_row_counts
+from change_log import read_position
+
+# 每个压缩块的大小（会按页大小对齐）
+BLOCK_SIZE = 1024 * 1024
+# DEFLATE 回看窗口大小，用作下一块的预置字典
+DICT_SIZE = 32 * 1024
+COMPRESS_LEVEL = 6
+# 锁字节页的偏移：SQLite 从不使用该页，Windows 上这一区域被文件锁占用而无法读取，按全零处理
+PENDING_BYTE = 0x40000000
+ZIP64_LIMIT = (1 << 32) - 1
+# 使用 ZIP64 时文件头中大小、偏移字段填写的标记值
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP_DEFLATED = 8
+
+# 一致快照：顺序读取的文件对象、数据大小、页大小、方式（direct / copy），
+# 以及读取同一快照的数据库连接（可用于统计行数）
+Snapshot = namedtuple('Snapshot', 'file size page_size method conn')
+
+
+def default_workers():
+    return max(1, os.cpu_count() or 1)
+
+
+def _dos_datetime(value):
+    dos_date = (value.year - 1980) << 9 | value.month << 5 | value.day
+    dos_time = value.hour << 11 | value.minute << 5 | value.second // 2
+    return dos_time, dos_date
+
+
+def _compress_block(data, zdict, last, level):
+    if zdict:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class ParallelDeflate:
+    """按块并行压缩为一个 DEFLATE 流，按输入顺序产出压缩数据"""
+
+    def __init__(self, workers=None, level=COMPRESS_LEVEL):
+        self.workers = workers or default_workers()
+        self.level = level
+
+    def compress(self, blocks):
+        """
+        Args:
+            blocks: 可迭代的 (数据, 是否最后一块)
+
+        Yields:
+            压缩后的数据（顺序与输入一致）
+        """
+        pending = deque()
+        previous = b''
+        # 同时在途的块数有上限，内存占用约为 2 × workers × 块大小
+        limit = self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='deflate') as pool:
+            for data, last in blocks:
+                pending.append(pool.submit(_compress_block, data, previous[-DICT_SIZE:], last, self.level))
+                previous = data
+                while len(pending) >= limit:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+class StreamingZipWriter:
+    """单条目 zip 写入：先写本地文件头，数据写完后回填 CRC 与大小，再写中央目录（输出须可 seek）"""
+
+    def __init__(self, fileobj, arcname, size_hint, date_time=None):
+        self.fileobj = fileobj
+        self.name = arcname.encode('utf-8')
+        self.flags = 0x800 if not arcname.isascii() else 0
+        self.dos_time, self.dos_date = _dos_datetime(date_time or datetime.datetime.now())
+        # 压缩后可能略大于原始数据（不可压缩内容），预留余量决定是否使用 ZIP64
+        self.zip64 = size_hint + size_hint // 100 + 65536 >= ZIP64_LIMIT
+        self.version = 45 if self.zip64 else 20
+        self.header_offset = fileobj.tell()
+        self.crc = 0
+        self.size = 0
+        self.compressed_size = 0
+        self._write_local_header()
+
+    def _write_local_header(self):
+        if self.zip64:
+            extra = struct.pack('<HHQQ', 1, 16, self.size, self.compressed_size)
+            sizes = (ZIP64_MARKER, ZIP64_MARKER)
+        else:
+            extra = b''
+            sizes = (self.compressed_size, self.size)
+        self.fileobj.write(struct.pack('<IHHHHHIIIHH', 0x04034b50, self.version, self.flags, ZIP_DEFLATED,
+                                       self.dos_time, self.dos_date, self.crc, sizes[0], sizes[1],
+                                       len(self.name), len(extra)))
+        self.fileobj.write(self.name + extra)
+
+    def update_raw(self, raw):
+        """累计原始数据的 CRC 与大小"""
+        self.crc = zlib.crc32(raw, self.crc)
+        self.size += len(raw)
+
+    def write_compressed(self, compressed):
+        self.fileobj.write(compressed)
+        self.compressed_size += len(compressed)
+
+    def close(self):
+        if not self.zip64 and (self.size > ZIP64_LIMIT or self.compressed_size > ZIP64_LIMIT):
+            raise ValueError('数据超过预估大小，无法写入非 ZIP64 文件头')
+        end_of_data = self.fileobj.tell()
+        self.fileobj.seek(self.header_offset)
+        self._write_local_header()
+        self.fileobj.seek(end_of_data)
+
+        if self.zip64:
+            extra = struct.pack('<HHQQ', 1, 16, self.size, self.compressed_size)
+            sizes = (ZIP64_MARKER, ZIP64_MARKER)
+        else:
+            extra = b''
+            sizes = (self.compressed_size, self.size)
+        central_offset = end_of_data
+        central = struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, self.version, self.version, self.flags,
+                              ZIP_DEFLATED, self.dos_time, self.dos_date, self.crc, sizes[0], sizes[1],
+                              len(self.name), len(extra), 0, 0, 0, 0o644 << 16, self.header_offset)
+        central += self.name + extra
+        self.fileobj.write(central)
+
+        if self.zip64:
+            end64_offset = self.fileobj.tell()
+            self.fileobj.write(struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, self.version, self.version,
+                                           0, 0, 1, 1, len(central), central_offset))
+            self.fileobj.write(struct.pack('<IIQI', 0x07064b50, 0, end64_offset, 1))
+            central_offset_field = min(central_offset, ZIP64_MARKER)
+        else:
+            central_offset_field = central_offset
+        self.fileobj.write(struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, 1, 1, len(central),
+                                       central_offset_field, 0))
+
+
+def iter_blocks(f, size, page_size, block_size=BLOCK_SIZE):
+    """
+    按块读取数据库文件的前 size 字节，锁字节页以全零代替
+
+    Yields:
+        (数据, 是否最后一块)；size 为 0 时产出一个空的最后一块
+    """
+    block_size = max(block_size // page_size, 1) * page_size
+    if size == 0:
+        yield b'', True
+        return
+    offset = 0
+    while offset < size:
+        length = min(block_size, size - offset)
+        f.seek(offset)
+        if offset <= PENDING_BYTE < offset + length:
+            head = PENDING_BYTE - offset
+            skip = min(page_size, length - head)
+            data = f.read(head)
+            f.seek(PENDING_BYTE + skip)
+            data += bytes(skip) + f.read(length - head - skip)
+        else:
+            data = f.read(length)
+        if len(data) != length:
+            raise IOError(f'读取数据库文件不完整: 偏移 {offset}，期望 {length} 字节，实际 {len(data)} 字节')
+        offset += length
+        yield data, offset >= size
+
+
+@contextmanager
+def database_snapshot(db_path, copy_database=None, temp_path=None):
+    """
+    打开数据库的一致快照用于顺序读取
+
+    Args:
+        copy_database: 退回方式使用的复制函数 copy_database(源, 目标)
+        temp_path: 退回方式使用的临时文件路径
+
+    Yields:
+        Snapshot；方式为 direct（直接读取数据库文件）或 copy（临时副本）
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        direct = False
+        if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal':
+            busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+            conn.execute("BEGIN")
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            # 读事务开始后 WAL 仍为空：该事务读取的就是数据库文件本身，且在事务结束前不会被检查点改写
+            wal_path = db_path + '-wal'
+            direct = not busy and (not os.path.exists(wal_path) or os.path.getsize(wal_path) == 0)
+        if direct:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            with open(db_path, 'rb') as f:
+                yield Snapshot(f, page_count * page_size, page_size, 'direct', conn)
+            return
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+    finally:
+        conn.close()
+
+    if copy_database is None or temp_path is None:
+        raise ValueError('无法直接读取数据库文件，且未提供临时副本的复制方式')
+    try:
+        copy_database(db_path, temp_path)
+        copy_conn = sqlite3.connect(temp_path)
+        try:
+            page_size = copy_conn.execute("PRAGMA page_size").fetchone()[0]
+            with open(temp_path, 'rb') as f:
+                yield Snapshot(f, os.path.getsize(temp_path), page_size, 'copy', copy_conn)
+        finally:
+            copy_conn.close()
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_backup_archive(db_path, zip_path, arcname, progress=None, workers=None,
+                         level=COMPRESS_LEVEL, block_size=BLOCK_SIZE, copy_database=None, count_rows=False):
+    """
+    一次读取数据库快照，计算 SHA-256 并多线程压缩写入 zip（先写临时文件，完成后重命名）
+
+    Args:
+        arcname: zip 中的文件名
+        progress: 进度回调 progress(已读取页数, 总页数)
+        copy_database: 无法直接读取时的复制函数，见 database_snapshot
+        count_rows: 是否在同一快照上统计各表行数并读取变更日志位置
+
+    Returns:
+        {'path', 'size', 'compressed_size', 'sha256', 'row_counts', 'changelog', 'method', 'seconds'}，
+        changelog 为备份包含的最后一个事务 {'timeline', 'lsn'}（未启用变更日志时为 None）
+    """
+    started = time.perf_counter()
+    temp_zip = zip_path + '.tmp'
+    temp_db = zip_path + '.sqlite.tmp'
+    db_hash = hashlib.sha256()
+    deflate = ParallelDeflate(workers=workers, level=level)
+    row_counts, position = None, None
+    try:
+        with database_snapshot(db_path, copy_database, temp_db) as snapshot, open(temp_zip, 'wb') as out:
+            f, size, page_size, method = snapshot.file, snapshot.size, snapshot.page_size, snapshot.method
+            if count_rows:
+                row_counts = table_row_counts(snapshot.conn)
+                position = read_position(snapshot.conn)
+            writer = StreamingZipWriter(out, arcname, size)
+            total_pages = size // page_size
+
+            def blocks():
+                # 哈希、CRC 与读取在同一遍中完成，压缩在线程池中进行
+                for data, last in iter_blocks(f, size, page_size, block_size):
+                    db_hash.update(data)
+                    writer.update_raw(data)
+                    if progress:
+                        progress(writer.size // page_size, total_pages)
+                    yield data, last
+
+            for compressed in deflate.compress(blocks()):
+                writer.write_compressed(compressed)
+            writer.close()
+        os.replace(temp_zip, zip_path)
+    finally:
+        if os.path.exists(temp_zip):
+            os.remove(temp_zip)
+
+    return {
+        'path': zip_path,
+        'size': writer.size,
+        'compressed_size': os.path.getsize(zip_path),
+        'sha256': db_hash.hexdigest(),
+        'row_counts': row_counts,
+        'changelog': position and {'timeline': position[1], 'lsn': position[0]},
+        'method': method,
+        'seconds': time.perf_counter() - started,
+    }
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+备份索引 - backups/catalog.jsonl
+
+每次备份（完整 zip 备份、增量快照）写入一条记录：文件名、类型、创建时间、备份大小、数据库大小、
+SHA-256、各表行数、保留层级，以及备份包含的最后一个变更日志事务（见 change_log.py）。
+状态查询、备份列表与过期清理只读取这一个文件，不再逐个列出、stat 备份文件或从文件名中解析时间。
+
+- 每次修改都先写（每个写入者独有的）临时文件再重命名（原子替换）；读取结果按索引文件的大小与修改时间缓存；
+- 读取-修改-写入期间持有锁文件 backups/catalog.lock（见 backup_lock.py）：应用内的备份线程与
+  计划任务 smart_backup.py / auto_backup.py 是不同的进程，否则会互相覆盖对方登记的记录；
+- 备份目录中还没有索引时，首次读取会扫描一次已有备份（database_backup_*.zip、manifests/snapshot_*.json）
+  生成索引。旧 zip 备份会流式解压一遍计算哈希，但没有行数；
+- 手动删除或复制备份文件后，可运行 python backup_catalog.py rebuild 重新核对。
+
+用法:
+    python backup_catalog.py            # 列出索引中的备份
+    python backup_catalog.py rebuild    # 按目录中实际存在的备份重新生成索引
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import zipfile
+import datetime
+import tempfile
+import threading
+import contextlib
+from backup_lock import file_lock
+
+CATALOG_FILE = 'catalog.jsonl'
+LOCK_FILE = 'catalog.lock'
+KIND_FULL = 'full'
+KIND_SNAPSHOT = 'snapshot'
+# 新备份的默认保留层级
+DEFAULT_TIER = 'daily'
+
+_TIME_PATTERN = re.compile(r'(\d{8}_\d{6})')
+
+# {索引路径: ((大小, 修改时间), 记录列表)}
+_cache = {}
+# 进程内的锁（可重入）；最外层持有时再加锁文件，{索引路径: 嵌套层数}
+_lock = threading.RLock()
+_lock_depth = {}
+
+
+def table_row_counts(conn):
+    """各表行数（不含 sqlite_ 内部表与虚拟表）"""
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+        "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name")]
+    return {name: conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for name in names}
+
+
+def parse_backup_time(filename):
+    """从 database_backup_YYYYmmdd_HHMMSS.zip、snapshot_YYYYmmdd_HHMMSS[_n].json 中解析时间"""
+    match = _TIME_PATTERN.search(filename)
+    if not match:
+        return None
+    try:
+        return datetime.datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+    except ValueError:
+        return None
+
+
+class BackupCatalog:
+    def __init__(self, backup_dir=None):
+        self.backup_dir = backup_dir or 'backups'
+        self.path = os.path.join(self.backup_dir, CATALOG_FILE)
+        self.lock_path = os.path.join(self.backup_dir, LOCK_FILE)
+
+    @staticmethod
+    def created_time(entry):
+        return datetime.datetime.fromisoformat(entry['created_at'])
+
+    # ---------- 查询 ----------
+
+    def entries(self, kind=None):
+        """按创建时间升序返回记录（副本）"""
+        return [dict(entry) for entry in self._load() if kind is None or entry['kind'] == kind]
+
+    def latest(self, kind=KIND_FULL):
+        entries = self.entries(kind)
+        return entries[-1] if entries else None
+
+    def get(self, filename):
+        return next((dict(entry) for entry in self._load() if entry['file'] == filename), None)
+
+    # ---------- 修改 ----------
+
+    def add(self, entry):
+        """添加（或按文件名替换）一条记录"""
+        entry = dict(entry)
+        entry.setdefault('tier', DEFAULT_TIER)
+        with self._locked():
+            entries = [item for item in self._load() if item['file'] != entry['file']]
+            entries.append(entry)
+            self._write(entries)
+        return entry
+
+    def update(self, filename, **fields):
+        with self._locked():
+            entries = self._load()
+            for entry in entries:
+                if entry['file'] == filename:
+                    entry.update(fields)
+            self._write(entries)
+
+    def set_tiers(self, tiers):
+        """批量更新保留层级 {文件名: 层级}（一次写入）"""
+        with self._locked():
+            entries = self._load()
+            for entry in entries:
+                if entry['file'] in tiers:
+                    entry['tier'] = tiers[entry['file']]
+            self._write(entries)
+
+    def remove(self, filenames):
+        filenames = set(filenames)
+        if not filenames:
+            return
+        with self._locked():
+            self._write([entry for entry in self._load() if entry['file'] not in filenames])
+
+    def rebuild(self):
+        """
+        按目录中实际存在的备份重新生成索引：已有记录保留（哈希、行数、保留层级），
+        缺失的文件删除记录，未登记的文件补充记录
+
+        Returns:
+            (新增数量, 删除数量)
+        """
+        with self._locked():
+            known = {entry['file']: entry for entry in self._read_file()} if os.path.exists(self.path) else {}
+            entries, found = [], set()
+            for filename, kind in self._scan():
+                found.add(filename)
+                entries.append(known.get(filename) or self._describe(filename, kind))
+            self._write(entries)
+        added = len(found - set(known))
+        removed = len(set(known) - found)
+        return added, removed
+
+    # ---------- 内部 ----------
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """读取-修改-写入期间独占索引：线程之间用进程内的锁，进程之间用锁文件（嵌套时只加一次）"""
+        with _lock:
+            depth = _lock_depth.get(self.path, 0)
+            _lock_depth[self.path] = depth + 1
+            try:
+                if depth:
+                    yield
+                else:
+                    with file_lock(self.lock_path):
+                        yield
+            finally:
+                _lock_depth[self.path] = depth
+
+    def _load(self):
+        """读取索引（带缓存）；备份目录存在但没有索引时扫描一次已有备份"""
+        with _lock:
+            if not os.path.exists(self.path):
+                if not os.path.isdir(self.backup_dir):
+                    return []
+                with self._locked():
+                    # 等锁期间可能已由其他进程生成
+                    if not os.path.exists(self.path):
+                        self.rebuild()
+            stat = os.stat(self.path)
+            key = (stat.st_size, stat.st_mtime_ns)
+            cached = _cache.get(self.path)
+            if cached and cached[0] == key:
+                return [dict(entry) for entry in cached[1]]
+            entries = self._read_file()
+            _cache[self.path] = (key, entries)
+            return [dict(entry) for entry in entries]
+
+    def _read_file(self):
+        entries = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+        return entries
+
+    def _write(self, entries):
+        """原子写入索引（先写本次写入独有的临时文件再重命名），调用方持有 _locked()"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        entries = sorted(entries, key=lambda entry: (entry['created_at'], entry['file']))
+        fd, temp_path = tempfile.mkstemp(prefix=CATALOG_FILE + '.', suffix='.tmp', dir=self.backup_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            # mkstemp 创建的文件只有所有者可读，与原来的索引文件保持一致
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+            raise
+        stat = os.stat(self.path)
+        _cache[self.path] = ((stat.st_size, stat.st_mtime_ns), entries)
+
+    def _scan(self):
+        """列出目录中的备份文件 (文件名, 类型)"""
+        for filename in sorted(os.listdir(self.backup_dir)):
+            if filename.startswith('database_backup_') and filename.endswith('.zip'):
+                yield filename, KIND_FULL
+        manifest_dir = os.path.join(self.backup_dir, 'manifests')
+        if os.path.isdir(manifest_dir):
+            for filename in sorted(os.listdir(manifest_dir)):
+                if filename.startswith('snapshot_') and filename.endswith('.json'):
+                    yield filename, KIND_SNAPSHOT
+
+    def _describe(self, filename, kind):
+        """为索引建立之前的备份生成记录"""
+        if kind == KIND_SNAPSHOT:
+            with open(os.path.join(self.backup_dir, 'manifests', filename), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            return {
+                'file': filename, 'kind': KIND_SNAPSHOT, 'created_at': manifest['created_at'],
+                'size': manifest.get('new_bytes'), 'db_size': manifest.get('db_size'),
+                'sha256': manifest.get('db_hash'), 'row_counts': manifest.get('row_counts'),
+                'changelog': manifest.get('changelog'),
+                'tier': DEFAULT_TIER,
+            }
+
+        path = os.path.join(self.backup_dir, filename)
+        created = parse_backup_time(filename) or datetime.datetime.fromtimestamp(os.path.getmtime(path))
+        db_hash, db_size = None, None
+        try:
+            with zipfile.ZipFile(path) as zipf:
+                member = zipf.infolist()[0]
+                digest = hashlib.sha256()
+                with zipf.open(member) as f:
+                    for data in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(data)
+                db_hash, db_size = digest.hexdigest(), member.file_size
+        except (zipfile.BadZipFile, IndexError, OSError) as e:
+            print(f"⚠️  无法读取备份 {filename}: {e}")
+        return {
+            'file': filename, 'kind': KIND_FULL, 'created_at': created.isoformat(timespec='seconds'),
+            'size': os.path.getsize(path), 'db_size': db_size, 'sha256': db_hash, 'row_counts': None,
+            'tier': DEFAULT_TIER,
+        }
+
+
+def main():
+    catalog = BackupCatalog()
+    if len(sys.argv) > 1 and sys.argv[1] == 'rebuild':
+        added, removed = catalog.rebuild()
+        print(f"✅ 索引已重新生成: 新增 {added} 条，删除 {removed} 条")
+        return
+    entries = catalog.entries()
+    if not entries:
+        print("索引中没有备份")
+        return
+    print(f"\n{'文件名':<40} {'类型':<9} {'层级':<8} {'大小':>12}  创建时间")
+    print("-" * 92)
+    for entry in reversed(entries):
+        print(f"{entry['file']:<40} {entry['kind']:<9} {entry['tier']:<8} {entry['size'] or 0:>12}  {entry['created_at']}")
+
+
+if __name__ == '__main__':
+    main()
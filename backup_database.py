@@ -3,20 +3,36 @@
 """
 数据库备份工具
 用于定期备份SQLite数据库，防止数据丢失
+
+复制按页分步进行（每步 step_pages 页，步与步之间让出 step_pause 秒），可通过回调报告进度。
+WAL 模式下复制期间在源库上保持一个读事务：快照一致，其他连接的写入既不被阻塞，
+也不会使复制从头重新开始。
+
+完整备份由 backup_archive 一遍读取快照，同时计算 SHA-256 并多线程压缩写入 zip。
+每次备份都登记到备份索引（backup_catalog），列表与过期清理只读取索引，不扫描备份目录；
+过期清理按分层保留策略（backup_retention，GFS）进行。
+两次备份之间的事务记录在变更日志中（change_log），恢复时可在备份之上重放。
 """
 
 import os
-import shutil
+import time
 import sqlite3
 import datetime
-import zipfile
-import hashlib
+from backup_archive import write_backup_archive
+from backup_catalog import BackupCatalog, KIND_FULL
+from backup_retention import RetentionPolicy, print_plan
+from change_log import changelog_dir, prune_segments
 
 class DatabaseBackup:
-    def __init__(self):
-        self.db_path = 'instance/database.sqlite'
-        self.backup_dir = 'backups'
-        self.retention_days = 30  # 保留最近30天的备份
+    def __init__(self, db_path=None, backup_dir=None):
+        self.db_path = db_path or 'instance/database.sqlite'
+        self.backup_dir = backup_dir or 'backups'
+        self.retention = RetentionPolicy.from_config()  # 分层保留策略（config.BACKUP_RETENTION）
+        self.last_cleanup = None  # 最近一次清理的保留计划
+        self.step_pages = 1024  # 每步复制的页数（-1 表示一次复制全部）
+        self.step_pause = 0.005  # 每步之间让出的秒数
+        self.compress_workers = None  # 压缩线程数（默认CPU核数）
+        self.catalog = BackupCatalog(self.backup_dir)  # 备份索引 backups/catalog.jsonl
         
     def ensure_backup_dir(self):
         """确保备份目录存在"""
@@ -24,16 +40,45 @@ class DatabaseBackup:
             os.makedirs(self.backup_dir)
             print(f"创建备份目录: {self.backup_dir}")
     
-    def get_file_hash(self, file_path):
-        """计算文件MD5哈希值"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+    def copy_database(self, source_path, target_path, progress=None, pages=None):
+        """
+        使用SQLite备份API复制数据库（包含WAL中已提交但未写回主文件的数据）
+
+        Args:
+            progress: 进度回调 progress(已复制页数, 总页数)，每步调用一次
+            pages: 每步复制的页数，默认 self.step_pages
+        """
+        pages = self.step_pages if pages is None else pages
+        source_conn = sqlite3.connect(source_path, isolation_level=None)
+        target_conn = sqlite3.connect(target_path)
+        try:
+            journal_mode = source_conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if journal_mode.lower() == 'wal':
+                # 保持读事务：各步读取同一快照，其他连接的写入不会导致复制重新开始
+                source_conn.execute("BEGIN")
+                source_conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+            def on_step(status, remaining, total):
+                if progress:
+                    progress(total - remaining, total)
+                if remaining and self.step_pause:
+                    time.sleep(self.step_pause)
+
+            source_conn.backup(target_conn, pages=pages, progress=on_step)
+        finally:
+            source_conn.close()
+            target_conn.close()
     
-    def create_backup(self):
-        """创建数据库备份"""
+    def create_backup(self, progress=None):
+        """
+        创建数据库备份
+
+        Args:
+            progress: 进度回调 progress(已复制页数, 总页数)
+
+        Returns:
+            压缩备份文件路径；失败时返回 False
+        """
         if not os.path.exists(self.db_path):
             print(f"错误: 数据库文件不存在 - {self.db_path}")
             return False
@@ -41,128 +86,133 @@ class DatabaseBackup:
         self.ensure_backup_dir()
         
         # 生成备份文件名（包含时间戳）
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        now = datetime.datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         backup_filename = f"database_backup_{timestamp}.sqlite"
-        backup_path = os.path.join(self.backup_dir, backup_filename)
+        zip_path = os.path.join(self.backup_dir, f"database_backup_{timestamp}.zip")
+        counter = 1
+        while os.path.exists(zip_path):
+            # 同一秒内多次备份（如恢复前的备份）：追加序号，不覆盖已有备份
+            zip_path = os.path.join(self.backup_dir, f"database_backup_{timestamp}_{counter}.zip")
+            counter += 1
         
         try:
-            # 使用SQLite的备份API进行安全备份
-            source_conn = sqlite3.connect(self.db_path)
-            backup_conn = sqlite3.connect(backup_path)
-            
-            # 执行备份
-            source_conn.backup(backup_conn)
-            
-            source_conn.close()
-            backup_conn.close()
-            
-            # 计算文件哈希值
-            file_hash = self.get_file_hash(backup_path)
-            file_size = os.path.getsize(backup_path)
+            # 一遍读取快照：同时计算哈希、统计行数并多线程压缩，不生成未压缩的中间文件
+            result = write_backup_archive(self.db_path, zip_path, backup_filename, progress=progress,
+                                          workers=self.compress_workers, copy_database=self.copy_database,
+                                          count_rows=True)
+            self.catalog.add({
+                'file': os.path.basename(zip_path),
+                'kind': KIND_FULL,
+                'created_at': now.isoformat(timespec='seconds'),
+                'size': result['compressed_size'],
+                'db_size': result['size'],
+                'sha256': result['sha256'],
+                'row_counts': result['row_counts'],
+                'changelog': result['changelog'],
+            })
             
             print(f"✅ 备份成功创建:")
-            print(f"   文件: {backup_path}")
-            print(f"   大小: {file_size} 字节")
-            print(f"   MD5: {file_hash}")
-            
-            # 创建压缩备份
-            zip_path = backup_path.replace('.sqlite', '.zip')
-            with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                zipf.write(backup_path, backup_filename)
-            
-            # 删除未压缩的备份文件
-            os.remove(backup_path)
             print(f"   压缩备份: {zip_path}")
+            print(f"   大小: {result['size']} 字节（压缩后 {result['compressed_size']} 字节）")
+            print(f"   SHA-256: {result['sha256']}")
+            print(f"   耗时: {result['seconds']:.2f}s")
             
             # 清理旧备份
             self.cleanup_old_backups()
             
-            return True
+            return zip_path
             
         except Exception as e:
             print(f"❌ 备份失败: {e}")
             return False
     
-    def cleanup_old_backups(self):
-        """清理旧的备份文件，只保留最近30天的备份"""
-        if not os.path.exists(self.backup_dir):
-            return
-            
-        current_time = datetime.datetime.now()
-        cutoff_time = current_time - datetime.timedelta(days=self.retention_days)
+    def cleanup_old_backups(self, dry_run=False):
+        """
+        按分层保留策略（hourly / daily / weekly / monthly）清理完整备份与增量快照
+
+        Args:
+            dry_run: 只计算并显示保留计划，不删除文件
+
+        Returns:
+            保留计划 {'keep': [...], 'delete': [...]}
+        """
+        plan = self.retention.plan(self.catalog)
+        self.last_cleanup = plan
+        if dry_run:
+            print_plan(plan)
+            return plan
+        
+        # 先更新索引再删除文件：中途失败时索引不会指向已删除的备份
+        self.catalog.remove(entry['file'] for entry in plan['delete'])
+        self.catalog.set_tiers({entry['file']: entry['tier'] for entry in plan['keep']})
+        
+        deleted_snapshots = False
+        for entry in plan['delete']:
+            if entry['kind'] == KIND_FULL:
+                file_path = os.path.join(self.backup_dir, entry['file'])
+            else:
+                file_path = os.path.join(self.backup_dir, 'manifests', entry['file'])
+                deleted_snapshots = True
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            created = BackupCatalog.created_time(entry)
+            print(f"🗑️  删除过期备份: {entry['file']} (创建于 {created.strftime('%Y-%m-%d %H:%M:%S')})")
         
-        deleted_count = 0
-        for filename in os.listdir(self.backup_dir):
-            if filename.startswith('database_backup_') and filename.endswith('.zip'):
-                file_path = os.path.join(self.backup_dir, filename)
-                file_time = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-                
-                # 删除超过30天的备份
-                if file_time < cutoff_time:
-                    os.remove(file_path)
-                    print(f"🗑️  删除过期备份: {filename} (创建于 {file_time.strftime('%Y-%m-%d %H:%M:%S')})")
-                    deleted_count += 1
+        if deleted_snapshots:
+            # 删除不再被任何快照引用的数据块
+            from incremental_backup import IncrementalBackup
+            IncrementalBackup(self.db_path, self.backup_dir).collect_garbage()
         
-        if deleted_count > 0:
-            print(f"📊 清理完成，删除了 {deleted_count} 个过期备份文件")
+        if plan['keep']:
+            # 早于最早保留备份的变更日志分段：其中的事务都已包含在保留的备份中
+            oldest = min(BackupCatalog.created_time(entry) for entry in plan['keep'])
+            pruned = prune_segments(changelog_dir(self.db_path), oldest)
+            if pruned:
+                print(f"🗑️  删除 {pruned} 个不再需要的变更日志分段")
+        
+        if plan['delete']:
+            print(f"📊 清理完成，删除了 {len(plan['delete'])} 个过期备份，保留 {len(plan['keep'])} 个")
         else:
             print("📊 没有过期的备份文件需要清理")
+        return plan
     
     def list_backups(self):
-        """列出所有备份文件"""
-        if not os.path.exists(self.backup_dir):
-            print("没有找到备份目录")
-            return
-        
-        backup_files = []
-        for filename in os.listdir(self.backup_dir):
-            if filename.startswith('database_backup_') and filename.endswith('.zip'):
-                file_path = os.path.join(self.backup_dir, filename)
-                file_size = os.path.getsize(file_path)
-                file_time = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-                backup_files.append((filename, file_size, file_time))
-        
-        if not backup_files:
+        """列出所有备份（完整备份与增量快照，读取备份索引）"""
+        entries = self.catalog.entries()
+        if not entries:
             print("没有找到备份文件")
             return
         
-        backup_files.sort(key=lambda x: x[2], reverse=True)
-        
         print("\n📁 数据库备份列表:")
-        print("-" * 60)
-        for filename, size, time in backup_files:
-            print(f"{filename:<35} {size:>8} 字节  {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        print("-" * 72)
+        for entry in reversed(entries):
+            created = BackupCatalog.created_time(entry)
+            kind = '完整' if entry['kind'] == KIND_FULL else '增量'
+            print(f"{entry['file']:<35} {kind}  {entry['size'] or 0:>10} 字节  {created.strftime('%Y-%m-%d %H:%M:%S')}")
     
-    def restore_backup(self, backup_filename):
-        """从备份恢复数据库"""
-        backup_path = os.path.join(self.backup_dir, backup_filename)
-        
-        if not os.path.exists(backup_path):
-            print(f"错误: 备份文件不存在 - {backup_path}")
-            return False
+    def create_incremental_backup(self, progress=None):
+        """创建增量快照（只保存变化的数据块，无变化时跳过），见 incremental_backup.py"""
+        from incremental_backup import IncrementalBackup
+        manifest = IncrementalBackup(self.db_path, self.backup_dir).create_snapshot(progress=progress)
+        if manifest:
+            self.cleanup_old_backups()
+        return manifest
+    
+    def restore_backup(self, backup_filename, mode='online', replay=False):
+        """
+        从备份恢复数据库（.zip 完整备份或 snapshot_*.json 增量快照，也可传入时间点），见 backup_restore.py：
+        解压到目标旁的临时文件，校验哈希、完整性与行数后，先备份当前数据库再写入
         
+        Args:
+            mode: online（备份API写入，应用运行时也安全）/ swap（应用停止时原子替换文件）
+            replay: 是否在备份之上重放变更日志（到最新，或到传入的时间点）
+        """
+        from backup_restore import RestoreEngine, RestoreError
         try:
-            # 创建当前数据库的备份
-            if os.path.exists(self.db_path):
-                current_backup = f"database_before_restore_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.sqlite"
-                shutil.copy2(self.db_path, os.path.join(self.backup_dir, current_backup))
-                print(f"当前数据库已备份为: {current_backup}")
-            
-            # 解压备份文件
-            temp_db_path = backup_path.replace('.zip', '.sqlite')
-            with zipfile.ZipFile(backup_path, 'r') as zipf:
-                zipf.extractall(self.backup_dir)
-            
-            # 恢复数据库
-            shutil.copy2(temp_db_path, self.db_path)
-            
-            # 清理临时文件
-            os.remove(temp_db_path)
-            
-            print(f"✅ 数据库恢复成功: {backup_filename}")
+            RestoreEngine(self).restore(backup_filename, mode=mode, replay=replay)
             return True
-            
-        except Exception as e:
+        except (RestoreError, OSError, sqlite3.Error) as e:
             print(f"❌ 恢复失败: {e}")
             return False
 
@@ -178,9 +228,10 @@ def main():
         print("1. 创建备份")
         print("2. 列出备份")
         print("3. 恢复备份")
-        print("4. 退出")
+        print("4. 创建增量备份")
+        print("5. 退出")
         
-        choice = input("\n请输入选项 (1-4): ").strip()
+        choice = input("\n请输入选项 (1-5): ").strip()
         
         if choice == '1':
             backup_tool.create_backup()
@@ -188,10 +239,13 @@ def main():
             backup_tool.list_backups()
         elif choice == '3':
             backup_tool.list_backups()
-            backup_name = input("\n请输入要恢复的备份文件名: ").strip()
+            backup_name = input("\n请输入要恢复的备份文件名或时间点 (如 2025-08-20T12:00): ").strip()
             if backup_name:
-                backup_tool.restore_backup(backup_name)
+                replay = input("是否在备份之上重放变更日志（到最新或该时间点）? (y/N): ").strip().lower() == 'y'
+                backup_tool.restore_backup(backup_name, replay=replay)
         elif choice == '4':
+            backup_tool.create_incremental_backup()
+        elif choice == '5':
             print("退出备份工具")
             break
         else:
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+备份目录中的跨进程锁文件
+
+应用内的备份线程与计划任务（smart_backup.py / auto_backup.py）是不同的进程，线程锁管不到彼此。
+锁文件以 O_CREAT | O_EXCL 创建（Windows 与 POSIX 都是原子的），退出时删除；
+进程异常退出留下的锁文件超过 LOCK_STALE_SECONDS 后视为失效。
+"""
+
+import os
+import time
+import datetime
+import contextlib
+
+# 等待锁的最长时间，以及锁文件超过多久视为进程异常退出后残留
+LOCK_TIMEOUT = 600
+LOCK_STALE_SECONDS = 3600
+LOCK_POLL_INTERVAL = 0.1
+
+
+@contextlib.contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT):
+    """
+    独占锁文件 path（不可重入）
+
+    Raises:
+        TimeoutError: 超过 timeout 秒仍被占用
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"锁文件被占用: {path}")
+            time.sleep(LOCK_POLL_INTERVAL)
+    try:
+        os.write(fd, f"{os.getpid()} {datetime.datetime.now().isoformat(timespec='seconds')}".encode())
+        os.close(fd)
+        yield
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
@@ -5,44 +5,33 @@
 """
 
 import os
-import datetime
 from backup_database import DatabaseBackup
+from backup_catalog import BackupCatalog, KIND_FULL
+from backup_retention import TIERS
 
 class BackupManager:
     def __init__(self):
         self.backup_tool = DatabaseBackup()
-        self.backup_dir = "backups"
+        self.backup_dir = self.backup_tool.backup_dir
         
     def get_backup_info(self):
-        """获取备份信息"""
-        if not os.path.exists(self.backup_dir):
-            return {
-                'total_files': 0,
-                'total_size': 0,
-                'oldest_backup': None,
-                'newest_backup': None,
-                'files': []
-            }
-        
+        """获取备份信息（读取备份索引，不扫描备份目录）"""
         backup_files = []
         total_size = 0
         
-        for filename in os.listdir(self.backup_dir):
-            if filename.startswith('database_backup_') and filename.endswith('.zip'):
-                file_path = os.path.join(self.backup_dir, filename)
-                file_size = os.path.getsize(file_path)
-                file_time = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
-                
-                backup_files.append({
-                    'filename': filename,
-                    'size': file_size,
-                    'time': file_time,
-                    'path': file_path
-                })
-                total_size += file_size
-        
-        backup_files.sort(key=lambda x: x['time'])
-        
+        for entry in self.backup_tool.catalog.entries(KIND_FULL):
+            backup_files.append({
+                'filename': entry['file'],
+                'size': entry['size'] or 0,
+                'time': BackupCatalog.created_time(entry),
+                'path': os.path.join(self.backup_dir, entry['file']),
+                'sha256': entry.get('sha256'),
+                'row_counts': entry.get('row_counts'),
+                'tier': entry.get('tier')
+            })
+            total_size += entry['size'] or 0
+        
+        # 索引记录已按创建时间升序排列
         return {
             'total_files': len(backup_files),
             'total_size': total_size,
@@ -51,6 +40,11 @@ class BackupManager:
             'files': backup_files
         }
     
+    def get_retention_plan(self):
+        """按分层保留策略预演清理（不删除文件），返回 {文件名: 计划层级}，不在其中的备份将被删除"""
+        plan = self.backup_tool.retention.plan(self.backup_tool.catalog)
+        return {entry['file']: entry['tier'] for entry in plan['keep']}
+    
     def format_size(self, size_bytes):
         """格式化文件大小"""
         if size_bytes < 1024:
@@ -72,14 +66,17 @@ class BackupManager:
         print("   • 手动备份: 随时可执行")
         
         print("\n🗂️ 备份保留策略:")
-        print(f"   • 保留时间: 最近 {self.backup_tool.retention_days} 天的备份")
-        print("   • 自动清理: 超过30天的备份自动删除")
+        counts = self.backup_tool.retention.counts
+        print("   • 分层保留: 每小时/每天/每周/每月各保留最新的一个备份")
+        print(f"   • 保留数量: 最近 {counts['hourly']} 小时、{counts['daily']} 天、"
+              f"{counts['weekly']} 周、{counts['monthly']} 个月（config.py BACKUP_RETENTION）")
+        print(f"   • 自动清理: 每次备份后删除不在任何层级中的备份，最多保留 {self.backup_tool.retention.max_backups} 个")
         print("   • 压缩存储: 所有备份都经过ZIP压缩")
         
         print("\n💾 备份内容:")
         print("   • 完整数据库: 每次备份都是完整的数据库副本")
         print("   • 包含所有表: 客户、员工、课程、订单等所有数据")
-        print("   • MD5校验: 每个备份都有完整性校验")
+        print("   • SHA-256校验: 每个备份都记录哈希与各表行数（backups/catalog.jsonl）")
         
         print("\n🛡️ 数据安全:")
         print("   • 本地存储: 备份文件存储在 backups/ 目录")
@@ -114,19 +111,16 @@ class BackupManager:
             else:
                 print(f"⏱️ 时间跨度: {hours}小时")
             
-            # 检查是否有过期备份
-            current_time = datetime.datetime.now()
-            cutoff_time = current_time - datetime.timedelta(days=self.backup_tool.retention_days)
-            
-            expired_count = 0
-            for file_info in info['files']:
-                if file_info['time'] < cutoff_time:
-                    expired_count += 1
+            # 按保留策略检查是否有待清理的备份
+            planned = self.get_retention_plan()
+            expired_count = len([f for f in info['files'] if f['filename'] not in planned])
+            tier_counts = [f"{tier} {list(planned.values()).count(tier)}" for tier in TIERS]
+            print(f"🗂️ 保留层级: {'，'.join(tier_counts)}")
             
             if expired_count > 0:
                 print(f"⚠️ 状态: 发现 {expired_count} 个过期备份，下次备份时将自动清理")
             else:
-                print(f"✅ 状态: 正常 (所有备份都在30天保留期内)")
+                print(f"✅ 状态: 正常 (所有备份都在保留策略内)")
         else:
             print("❌ 状态: 未找到备份文件")
     
@@ -147,8 +141,7 @@ class BackupManager:
         # 按时间倒序显示（最新的在前）
         files = sorted(info['files'], key=lambda x: x['time'], reverse=True)
         
-        current_time = datetime.datetime.now()
-        cutoff_time = current_time - datetime.timedelta(days=self.backup_tool.retention_days)
+        planned = self.get_retention_plan()
         
         for i, file_info in enumerate(files):
             filename = file_info['filename']
@@ -158,10 +151,10 @@ class BackupManager:
             # 标记状态
             if i == 0:
                 status = "最新"
-            elif file_info['time'] < cutoff_time:
+            elif file_info['filename'] not in planned:
                 status = "过期"
             else:
-                status = "保留"
+                status = f"保留 ({planned[file_info['filename']]})"
             
             print(f"{filename:<35} {size:<10} {time_str:<20} {status}")
     
@@ -180,12 +173,12 @@ class BackupManager:
         # 计算平均文件大小
         avg_size = info['total_size'] / info['total_files']
         
-        # 估算30天保留期的最大存储使用（假设每天1次备份）
-        max_backups_30days = 30  # 30天最多30个备份
-        max_usage = avg_size * max_backups_30days
+        # 分层保留下备份数量的上限为各层级数量之和
+        max_backups = self.backup_tool.retention.max_backups
+        max_usage = avg_size * max_backups
         
         print(f"📊 平均备份大小: {self.format_size(avg_size)}")
-        print(f"📊 最大存储使用: {self.format_size(max_usage)} (30天保留期，约30个备份)")
+        print(f"📊 最大存储使用: {self.format_size(max_usage)} (分层保留，最多{max_backups}个备份)")
         
         # 估算每月存储增长
         print(f"📊 月增长估算: 0 (自动清理过期备份，总量稳定)")
@@ -194,7 +187,7 @@ class BackupManager:
         print("\n💡 存储优化:")
         print("   • 自动清理确保存储使用稳定")
         print("   • ZIP压缩减少约60-80%存储空间")
-        print("   • 可根据需要调整保留数量")
+        print("   • 可在 config.py 的 BACKUP_RETENTION 中调整各层级保留数量")
 
 def main():
     """主函数"""
@@ -216,7 +209,7 @@ def main():
     
     print("\n" + "="*60)
     print("🎯 总结:")
-    print("   • 备份不会无限增长，有自动清理机制")
+    print("   • 备份不会无限增长，分层保留在数量有界的同时保留长期历史")
     print("   • 智能备份避免频繁重复备份")
     print("   • 存储使用量稳定可控")
     print("="*60)
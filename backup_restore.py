@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库恢复引擎 - 解压一次、校验后再替换
+
+原来的恢复流程先完整复制当前数据库，再把 zip 解压到 backups/，再整库复制到 instance/，
+共三次整库写入，且不做任何校验。这里：
+
+1. 按文件名或时间点（该时间之前最近的一个备份）在备份索引中找到备份；
+2. 直接解压（或按增量快照清单拼接）到目标数据库旁边的临时文件，同时校验 SHA-256；
+3. 对临时文件执行 PRAGMA integrity_check，并把各表行数与索引中记录的行数比对；
+4. 可选（--replay）：在临时文件上重放变更日志中备份之后的事务（到最新，或到指定的时间点），
+   并在临时文件上重建汇总表与全文检索索引，见 change_log.py；
+5. 校验通过后先为当前数据库做一次压缩的完整备份（登记在索引中，可用同样方式恢复）；
+   临时文件中的数据版本号调到高于当前数据库，导出缓存不会命中恢复前生成的文件；
+6. 应用到目标数据库，两种方式：
+   - online（默认）：通过 SQLite 备份API写入现有数据库，应用仍持有连接时也安全；
+   - swap：检查点并确认没有其他连接在使用 WAL 后，用 os.replace 原子替换数据库文件，
+     不再写入整库数据，适合应用已停止时使用。
+
+任一步骤失败都不会改动当前数据库。每个阶段输出进度与耗时。
+恢复后数据库进入新的变更日志时间线，之后的重放不会混入被放弃的事务。
+
+用法:
+    python backup_restore.py database_backup_20250820_120523.zip
+    python backup_restore.py snapshot_20250820_120523.json
+    python backup_restore.py 2025-08-20T12:00          # 该时间点之前最近的备份
+    python backup_restore.py latest --replay           # 最新的备份 + 变更日志，恢复到最后一个已提交事务
+    python backup_restore.py 2025-08-20T12:00 --replay # 恢复到该时间点（备份 + 重放到该时间）
+    python backup_restore.py <备份或时间点> --swap     # 应用已停止时原子替换文件
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import hashlib
+import zipfile
+import datetime
+from backup_catalog import BackupCatalog, KIND_SNAPSHOT, table_row_counts
+from change_log import (ChangeLogError, changelog_dir, replay as replay_changes, rebuild_derived, start_timeline,
+                        record_branch)
+
+MODE_ONLINE = 'online'
+MODE_SWAP = 'swap'
+# 最新的备份（完整备份或增量快照）
+LATEST = 'latest'
+# 解压时每次读写的大小
+COPY_BUFFER = 1024 * 1024
+
+
+class RestoreError(Exception):
+    """备份不存在、校验失败或无法安全替换时抛出，当前数据库保持不变"""
+
+
+def print_progress(stage, done, total):
+    """默认进度输出：每 10% 输出一次"""
+    if not total:
+        return
+    percent = done * 100 // total
+    if done == total or percent // 10 != (done - 1) * 100 // total // 10:
+        print(f"   {stage}: {percent}%")
+
+
+class RestoreEngine:
+    def __init__(self, backup_tool, export_cache_dir=None):
+        """
+        Args:
+            backup_tool: backup_database.DatabaseBackup（目标数据库路径、备份目录与索引）
+            export_cache_dir: 导出缓存目录，默认 config.Config.EXPORT_CACHE_DIR
+        """
+        self.backup_tool = backup_tool
+        self.db_path = backup_tool.db_path
+        self.backup_dir = backup_tool.backup_dir
+        self.catalog = backup_tool.catalog
+        if export_cache_dir is None:
+            try:
+                from config import Config
+                export_cache_dir = getattr(Config, 'EXPORT_CACHE_DIR', None)
+            except ImportError:
+                export_cache_dir = None
+        self.export_cache_dir = export_cache_dir
+
+    def resolve(self, target):
+        """
+        查找要恢复的备份
+
+        Args:
+            target: 备份文件名、清单名、latest，或时间点（datetime / ISO 格式字符串），
+                    时间点取该时间之前（含）最近的完整备份或增量快照
+
+        Returns:
+            备份索引记录
+        """
+        if target == LATEST:
+            entries = self.catalog.entries()
+            if not entries:
+                raise RestoreError("没有备份")
+            return entries[-1]
+        when = target
+        if isinstance(target, str):
+            entry = self.catalog.get(target)
+            if not entry and (os.path.exists(os.path.join(self.backup_dir, target)) or
+                              os.path.exists(os.path.join(self.backup_dir, 'manifests', target))):
+                # 手动放入备份目录、尚未登记的备份
+                self.catalog.rebuild()
+                entry = self.catalog.get(target)
+            if entry:
+                return entry
+            try:
+                when = datetime.datetime.fromisoformat(target)
+            except ValueError:
+                raise RestoreError(f"备份不存在: {target}")
+        candidates = [entry for entry in self.catalog.entries()
+                      if BackupCatalog.created_time(entry) <= when]
+        if not candidates:
+            raise RestoreError(f"{when} 之前没有备份")
+        return candidates[-1]
+
+    def point_in_time(self, target):
+        """target 为时间点时返回该时间，为文件名或 latest 时返回 None"""
+        if isinstance(target, datetime.datetime):
+            return target
+        if target == LATEST or self.catalog.get(target):
+            return None
+        try:
+            return datetime.datetime.fromisoformat(target)
+        except ValueError:
+            return None
+
+    def extract(self, entry, output_path, progress=None):
+        """把备份解压到 output_path 并校验哈希（与索引中记录的 SHA-256 比对）"""
+        if entry['kind'] == KIND_SNAPSHOT:
+            from incremental_backup import IncrementalBackup
+            incremental = IncrementalBackup(self.db_path, self.backup_dir)
+            # 拼接时逐块校验，完成后校验整库哈希
+            try:
+                incremental.materialize(entry['file'], output_path,
+                                        progress=lambda done, total: progress and progress('拼接', done, total))
+            except (ValueError, OSError) as e:
+                raise RestoreError(f"增量快照无法还原: {entry['file']} ({e})")
+            return
+
+        zip_path = os.path.join(self.backup_dir, entry['file'])
+        if not os.path.exists(zip_path):
+            raise RestoreError(f"备份文件不存在: {zip_path}")
+        digest = hashlib.sha256()
+        try:
+            with zipfile.ZipFile(zip_path) as zipf:
+                member = zipf.infolist()[0]
+                done = 0
+                # zipfile 读取时同时校验 CRC
+                with zipf.open(member) as source, open(output_path, 'wb') as target:
+                    for data in iter(lambda: source.read(COPY_BUFFER), b''):
+                        digest.update(data)
+                        target.write(data)
+                        done += len(data)
+                        if progress:
+                            progress('解压', done, member.file_size)
+        except (zipfile.BadZipFile, IndexError) as e:
+            raise RestoreError(f"备份文件损坏: {entry['file']} ({e})")
+        if entry.get('sha256') and digest.hexdigest() != entry['sha256']:
+            raise RestoreError(f"备份校验失败（SHA-256 不一致）: {entry['file']}")
+
+    def verify(self, entry, path):
+        """完整性检查，并与索引中记录的各表行数比对；返回实际行数"""
+        conn = sqlite3.connect(path)
+        try:
+            result = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+            if result != ['ok']:
+                raise RestoreError(f"完整性检查失败: {'; '.join(result[:5])}")
+            row_counts = table_row_counts(conn)
+        except sqlite3.DatabaseError as e:
+            raise RestoreError(f"备份不是有效的数据库: {e}")
+        finally:
+            conn.close()
+        expected = entry.get('row_counts')
+        if expected is not None and expected != row_counts:
+            diff = sorted(name for name in set(expected) | set(row_counts)
+                          if expected.get(name) != row_counts.get(name))
+            raise RestoreError(f"行数与备份记录不一致: {', '.join(diff)}")
+        return row_counts
+
+    def restore(self, target, mode=MODE_ONLINE, keep_current=True, progress=print_progress, replay=False):
+        """
+        恢复数据库
+
+        Args:
+            target: 见 resolve
+            mode: online（备份API写入现有数据库）/ swap（原子替换文件，需没有其他连接）
+            keep_current: 恢复前是否为当前数据库做一次完整备份
+            progress: 进度回调 progress(阶段, 已完成, 总数)
+            replay: 是否在备份之上重放变更日志（target 为时间点时重放到该时间）
+
+        Returns:
+            {'backup', 'mode', 'row_counts', 'replayed', 'safety_backup', 'timings'}，
+            replayed 见 change_log.replay（未重放时为 None）
+        """
+        if mode not in (MODE_ONLINE, MODE_SWAP):
+            raise ValueError(f"不支持的恢复方式: {mode}")
+        timings = {}
+        started = time.perf_counter()
+        entry = self.resolve(target)
+        print(f"🔄 恢复备份: {entry['file']}（{entry['created_at']}）")
+
+        target_dir = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(target_dir, exist_ok=True)
+        # 临时文件与目标数据库位于同一目录（同一文件系统），swap 方式可直接重命名
+        temp_path = os.path.join(target_dir, f".{os.path.basename(self.db_path)}.restore.tmp")
+        safety_backup = None
+        try:
+            stage = time.perf_counter()
+            self.extract(entry, temp_path, progress)
+            timings['extract'] = time.perf_counter() - stage
+            print(f"   解压完成: {timings['extract']:.2f}s")
+
+            stage = time.perf_counter()
+            row_counts = self.verify(entry, temp_path)
+            timings['verify'] = time.perf_counter() - stage
+            checked = '，行数与备份记录一致' if entry.get('row_counts') is not None else ''
+            print(f"   完整性检查通过{checked}: {timings['verify']:.2f}s")
+
+            replayed = None
+            if replay:
+                stage = time.perf_counter()
+                replayed = self.replay(temp_path, self.point_in_time(target), progress)
+                timings['replay'] = time.perf_counter() - stage
+                print(f"   重放变更日志: {replayed['transactions']} 个事务"
+                      f"（序号 {replayed['from_lsn']} → {replayed['to_lsn']}）: {timings['replay']:.2f}s")
+                if replayed['stopped']:
+                    print(f"   {replayed['stopped']}")
+            # 恢复后的数据库进入新的时间线，恢复成功后才登记分叉点
+            branch = start_timeline(temp_path)
+
+            if keep_current and os.path.exists(self.db_path):
+                stage = time.perf_counter()
+                # 先解压再备份：保留策略清理不会删掉正在恢复的备份
+                safety_backup = self.backup_tool.create_backup()
+                if not safety_backup:
+                    raise RestoreError("恢复前备份当前数据库失败，已取消恢复")
+                timings['safety_backup'] = time.perf_counter() - stage
+                print(f"   当前数据库已备份为: {os.path.basename(safety_backup)}")
+
+            self.advance_data_versions(temp_path)
+            stage = time.perf_counter()
+            if mode == MODE_SWAP:
+                self._swap(temp_path)
+            else:
+                self._apply_online(temp_path, progress)
+            timings['apply'] = time.perf_counter() - stage
+            record_branch(changelog_dir(self.db_path), branch)
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(temp_path + suffix):
+                    os.remove(temp_path + suffix)
+
+        timings['total'] = time.perf_counter() - started
+        print(f"✅ 数据库恢复成功: {entry['file']}（{mode}，总耗时 {timings['total']:.2f}s）")
+        return {'backup': entry['file'], 'mode': mode, 'row_counts': row_counts, 'replayed': replayed,
+                'safety_backup': safety_backup and os.path.basename(safety_backup), 'timings': timings}
+
+    def replay(self, temp_path, until=None, progress=None):
+        """在解压出的备份上重放变更日志并重建派生数据（应用前完成，运行中的应用不会看到空的汇总表），再次检查完整性"""
+        try:
+            result = replay_changes(temp_path, changelog_dir(self.db_path), until=until, progress=progress)
+        except ChangeLogError as e:
+            raise RestoreError(str(e))
+        if result['transactions']:
+            rebuild_derived(temp_path)
+        conn = sqlite3.connect(temp_path)
+        try:
+            check = [row[0] for row in conn.execute("PRAGMA quick_check")]
+        finally:
+            conn.close()
+        if check != ['ok']:
+            raise RestoreError(f"重放变更日志后完整性检查失败: {'; '.join(check[:5])}")
+        return result
+
+    def advance_data_versions(self, temp_path):
+        """
+        把临时文件中的数据版本号调到高于当前数据库（max(两者) + 1），在应用之前完成，两种方式都生效。
+
+        恢复会让版本号回到备份时的值，之后的写入再把它递增到恢复前用过的值，
+        导出缓存（按数据版本号命名）就会命中按被放弃的数据生成的文件。
+        当前数据库不可读（文件丢失或损坏）时不知道用过哪些版本号，改为清空导出缓存。
+        """
+        current = _current_data_versions(self.db_path)
+        conn = sqlite3.connect(temp_path)
+        try:
+            with conn:
+                restored = _read_data_versions(conn)
+                if restored is not None:
+                    now = str(datetime.datetime.utcnow())
+                    for name in set(restored) | set(current or {}):
+                        version = max(restored.get(name, 0), (current or {}).get(name, 0)) + 1
+                        if name in restored:
+                            conn.execute("UPDATE data_version SET version = ?, updated_at = ? WHERE table_name = ?",
+                                         (version, now, name))
+                        else:
+                            conn.execute("INSERT INTO data_version (table_name, version, updated_at) VALUES (?, ?, ?)",
+                                         (name, version, now))
+        finally:
+            conn.close()
+        if (current is None or (restored is None and current)) and \
+                self.export_cache_dir and os.path.isdir(self.export_cache_dir):
+            # 不知道恢复前的版本号，或备份早于数据版本号（应用启动时从 0 重新开始）
+            shutil.rmtree(self.export_cache_dir, ignore_errors=True)
+            print("   已清空导出缓存")
+
+    def _apply_online(self, temp_path, progress=None):
+        """通过备份API写入现有数据库：由 SQLite 负责加锁，其他连接随后读到恢复后的数据"""
+        source = sqlite3.connect(temp_path)
+        target = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            on_step = (lambda status, remaining, total: progress('写入', total - remaining, total)) if progress else None
+            source.backup(target, pages=self.backup_tool.step_pages, progress=on_step)
+        finally:
+            source.close()
+            target.close()
+
+    def _swap(self, temp_path):
+        """
+        原子替换数据库文件。先把 WAL 全部写回并确认没有进行中的读写，否则残留的 WAL 会被应用到新文件上。
+        空闲的连接无法检测（替换后它们仍读取旧文件），因此只应在应用停止时使用
+        """
+        if os.path.exists(self.db_path):
+            conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=1)
+            try:
+                if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal':
+                    busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+                    wal_path = self.db_path + '-wal'
+                    if busy or (os.path.exists(wal_path) and os.path.getsize(wal_path) > 0):
+                        raise RestoreError("数据库仍在被其他连接使用，无法替换文件；请停止应用或改用 online 方式")
+                # 确认没有其他连接正在写入（回滚日志模式下也确认没有读取）
+                try:
+                    conn.execute("BEGIN EXCLUSIVE")
+                    conn.execute("ROLLBACK")
+                except sqlite3.OperationalError:
+                    raise RestoreError("数据库被其他连接锁定，无法替换文件；请停止应用或改用 online 方式")
+            finally:
+                conn.close()
+        os.replace(temp_path, self.db_path)
+        # 旧数据库的共享内存索引不再对应新文件，删除后由下一个连接重建
+        shm_path = self.db_path + '-shm'
+        if os.path.exists(shm_path):
+            os.remove(shm_path)
+
+
+def _read_data_versions(conn):
+    """{表名: 版本号}；没有 data_version 表时返回 None"""
+    try:
+        return dict(conn.execute("SELECT table_name, version FROM data_version"))
+    except sqlite3.OperationalError:
+        return None
+
+
+def _current_data_versions(db_path):
+    """当前数据库的数据版本号（没有 data_version 表时为空）；文件不存在或无法读取时返回 None"""
+    if not os.path.exists(db_path):
+        return None
+    try:
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            versions = _read_data_versions(conn)
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError:
+        return None
+    return versions or {}
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    from backup_database import DatabaseBackup
+    mode = MODE_SWAP if '--swap' in sys.argv[2:] else MODE_ONLINE
+    try:
+        RestoreEngine(DatabaseBackup()).restore(sys.argv[1], mode=mode, replay='--replay' in sys.argv[2:])
+    except RestoreError as e:
+        print(f"❌ 恢复失败: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+备份分层保留策略（祖父-父-子，GFS）
+
+原来的清理只有“保留最近30天”一条规则：30天内的备份全部保留，更早的全部删除，
+备份目录一直很大，却没有更长期的历史。分层保留按时间段挑选代表性备份：
+
+    hourly   最近 N 个有备份的小时，每小时保留最新的一个
+    daily    最近 N 个有备份的日期，每天保留最新的一个
+    weekly   最近 N 个有备份的周（ISO 周），每周保留最新的一个
+    monthly  最近 N 个有备份的月份，每月保留最新的一个
+
+同一个备份可同时满足多个层级，记为最高的层级（monthly > weekly > daily > hourly）；
+最新的备份总是保留。保留数量之和就是备份数量的上限，磁盘占用有界，而覆盖的时间跨度逐渐变长。
+完整备份与增量快照分别按同一策略计算；删除增量快照后会清理不再被引用的数据块。
+
+保留数量在 config.py 的 BACKUP_RETENTION 中配置。
+
+用法:
+    python backup_retention.py            # 预演：显示保留与删除计划，不删除任何文件
+    python backup_retention.py apply      # 按计划删除
+"""
+
+import sys
+from backup_catalog import BackupCatalog, KIND_FULL, KIND_SNAPSHOT
+
+# 由低到高的保留层级
+TIERS = ('hourly', 'daily', 'weekly', 'monthly')
+DEFAULT_COUNTS = {'hourly': 24, 'daily': 7, 'weekly': 4, 'monthly': 12}
+# 不属于任何层级、仅因是最新备份而保留
+TIER_LATEST = 'latest'
+
+_BUCKETS = {
+    'hourly': lambda t: (t.year, t.month, t.day, t.hour),
+    'daily': lambda t: t.date(),
+    'weekly': lambda t: t.isocalendar()[:2],
+    'monthly': lambda t: (t.year, t.month),
+}
+
+
+class RetentionPolicy:
+    def __init__(self, hourly=None, daily=None, weekly=None, monthly=None):
+        given = {'hourly': hourly, 'daily': daily, 'weekly': weekly, 'monthly': monthly}
+        self.counts = {}
+        for tier in TIERS:
+            count = DEFAULT_COUNTS[tier] if given[tier] is None else int(given[tier])
+            if count < 0:
+                raise ValueError(f'保留数量不能为负数: {tier}={count}')
+            self.counts[tier] = count
+
+    @classmethod
+    def from_config(cls, counts=None):
+        """按给定数量或 config.Config.BACKUP_RETENTION 创建策略（未配置的层级使用默认值）"""
+        if counts is None:
+            try:
+                from config import Config
+                counts = getattr(Config, 'BACKUP_RETENTION', None)
+            except ImportError:
+                counts = None
+        return cls(**(counts or {}))
+
+    @property
+    def max_backups(self):
+        """每种备份保留数量的上限"""
+        return max(sum(self.counts.values()), 1)
+
+    def describe(self):
+        return '，'.join(f"{tier} {self.counts[tier]}" for tier in TIERS)
+
+    def select(self, entries):
+        """
+        计算要保留的备份
+
+        Args:
+            entries: 同一类型的备份索引记录
+
+        Returns:
+            {文件名: 保留层级}；不在其中的备份应删除
+        """
+        ordered = sorted(entries, key=lambda entry: (entry['created_at'], entry['file']), reverse=True)
+        keep = {}
+        for tier in TIERS:
+            limit = self.counts[tier]
+            seen = set()
+            for entry in ordered:
+                if len(seen) >= limit:
+                    break
+                bucket = _BUCKETS[tier](BackupCatalog.created_time(entry))
+                if bucket in seen:
+                    continue
+                # 每个时间段内最新的备份代表该时间段；层级由低到高计算，高层级覆盖低层级
+                seen.add(bucket)
+                keep[entry['file']] = tier
+        if ordered and ordered[0]['file'] not in keep:
+            keep[ordered[0]['file']] = TIER_LATEST
+        return keep
+
+    def plan(self, catalog):
+        """
+        预演：按备份索引生成保留计划（不修改任何文件）
+
+        Returns:
+            {'keep': [记录...], 'delete': [记录...]}，记录中的 tier 为计划后的层级
+        """
+        keep, delete = [], []
+        for kind in (KIND_FULL, KIND_SNAPSHOT):
+            entries = catalog.entries(kind)
+            tiers = self.select(entries)
+            for entry in entries:
+                if entry['file'] in tiers:
+                    entry['tier'] = tiers[entry['file']]
+                    keep.append(entry)
+                else:
+                    delete.append(entry)
+        return {'keep': keep, 'delete': delete}
+
+
+def print_plan(plan):
+    print(f"\n📋 保留计划: 保留 {len(plan['keep'])} 个，删除 {len(plan['delete'])} 个")
+    print("-" * 72)
+    rows = [(entry, entry['tier']) for entry in plan['keep']] + [(entry, '删除') for entry in plan['delete']]
+    for entry, status in sorted(rows, key=lambda row: row[0]['created_at'], reverse=True):
+        print(f"{entry['file']:<40} {entry['created_at']:<20} {status}")
+
+
+def main():
+    from backup_database import DatabaseBackup
+    backup_tool = DatabaseBackup()
+    apply = len(sys.argv) > 1 and sys.argv[1] == 'apply'
+    print(f"保留策略: {backup_tool.retention.describe()}")
+    if apply:
+        backup_tool.cleanup_old_backups()
+    else:
+        print_plan(backup_tool.retention.plan(backup_tool.catalog))
+        print("\n（预演，未删除任何文件；执行 python backup_retention.py apply 按计划删除）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+变更日志（连续备份）- 两次完整备份之间的数据保护
+
+完整备份由 auto_backup.py / smart_backup.py 定期执行（smart_backup 距上次备份超过 20 小时才备份），
+两次备份之间数据库损坏会丢失这段时间的全部录入。应用在每个事务提交后，把客户、课程、刷单订单、
+系统配置的变更作为一行 JSON 追加到变更日志（捕获见 app/services/changelog_service.py）：
+
+    {"lsn":42,"ts":"2025-08-20T12:00:01.123456","changes":[["customer","u",{"id":7,"name":"...",...}],
+                                                           ["course","d",{"id":9}]]}
+
+- u：写入后的整行（SQLite 存储值，重放时 INSERT OR REPLACE）；d：删除，只记主键；
+  s：批量 UPDATE / DELETE（如按条件结算）执行的 SQL 与参数 {"sql", "params", "many"}，按原语句重放；
+- lsn 是事务序号：事务第一次产生变更时在同一事务中递增数据库里的 changelog_position，
+  随事务一起提交或回滚，SQLite 写锁保证序号顺序就是提交顺序。备份中保存的序号正好是
+  备份包含的最后一个事务，重放从下一个序号开始，不会重复也不会遗漏；
+- 分段文件 changelog/changes_<时间线>_<起始序号>.jsonl（数据库文件旁），
+  超过 CHANGELOG_SEGMENT_BYTES 后换新分段；早于最早保留备份的分段在清理旧备份时删除；
+- 恢复（backup_restore.py --replay）时在解压出的备份上按序号重放之后的事务，可截止到某个时间点；
+  序号出现缺口（事务已提交但日志未写入）时停在缺口之前；
+- 每次恢复都开启新的时间线，timelines.jsonl 记录分叉点：从更早的备份重放时沿分叉走到最新的时间线，
+  恢复时放弃的那段“未来”不会混入。
+
+绕过 ORM 的原生 SQL 写入不会记录到变更日志，执行后应立即做一次完整备份。
+
+用法:
+    python change_log.py                          # 日志状态：当前序号、分段、最近备份之后的事务数
+    python change_log.py replay <数据库文件> [时间点]  # 在数据库文件上重放（通常由 backup_restore.py --replay 调用）
+"""
+
+import os
+import re
+import sys
+import json
+import uuid
+import sqlite3
+import datetime
+import threading
+
+# 记录变更的业务表
+CAPTURED_TABLES = ('customer', 'course', 'taobao_order', 'config')
+OP_UPSERT = 'u'
+OP_DELETE = 'd'
+OP_STATEMENT = 's'
+TIMELINES_FILE = 'timelines.jsonl'
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+# 重放绕过了维护派生数据的 ORM 事件：重放时清空，再由 rebuild_derived 全量重建
+DERIVED_TABLES = ('trial_course_stat', 'customer_daily_stat', 'rollup_watermark', 'rollup_dirty_day',
+                  'search_index')
+
+# 与 app.models.ChangelogPosition 建表语句一致（备份早于变更日志启用时由恢复流程补建）
+_POSITION_DDL = (
+    "CREATE TABLE IF NOT EXISTS changelog_position (id INTEGER NOT NULL, lsn INTEGER NOT NULL, "
+    "timeline VARCHAR(32) NOT NULL, updated_at DATETIME, PRIMARY KEY (id))"
+)
+_SEGMENT_PATTERN = re.compile(r'^changes_([0-9a-f]+)_(\d+)\.jsonl$')
+
+
+class ChangeLogError(Exception):
+    """数据库中没有变更日志位置等无法重放的情况"""
+
+
+def changelog_dir(db_path):
+    """变更日志目录：数据库文件旁的 changelog/"""
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), 'changelog')
+
+
+def new_timeline():
+    return uuid.uuid4().hex[:16]
+
+
+def read_position(conn):
+    """数据库中记录的 (序号, 时间线)；没有变更日志位置时返回 None"""
+    try:
+        row = conn.execute("SELECT lsn, timeline FROM changelog_position WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return (row[0], row[1]) if row else None
+
+
+def list_segments(log_dir):
+    """[(时间线, 起始序号, 路径)]，按起始序号排序"""
+    if not os.path.isdir(log_dir):
+        return []
+    segments = []
+    for filename in os.listdir(log_dir):
+        match = _SEGMENT_PATTERN.match(filename)
+        if match:
+            segments.append((match.group(1), int(match.group(2)), os.path.join(log_dir, filename)))
+    return sorted(segments, key=lambda segment: (segment[1], segment[2]))
+
+
+def read_timelines(log_dir):
+    """分叉记录（按写入顺序）"""
+    path = os.path.join(log_dir, TIMELINES_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_segment(path):
+    """逐行读取分段；崩溃时写了一半的行（无法解析）跳过"""
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def timeline_path(log_dir, timeline, lsn):
+    """
+    从 (时间线, 序号) 出发沿分叉记录走到最新的时间线
+
+    Returns:
+        [(时间线, 该时间线上的最后一个序号，最新的时间线为 None)]
+    """
+    branches = read_timelines(log_dir)
+    path = []
+    while True:
+        # 只有在当前位置之后分叉的时间线才是当前数据的后续；多次分叉时取最近一次恢复
+        children = [branch for branch in branches
+                    if branch['parent'] == timeline and branch['branch_lsn'] >= lsn]
+        if not children:
+            path.append((timeline, None))
+            return path
+        child = children[-1]
+        path.append((timeline, child['branch_lsn']))
+        timeline, lsn = child['timeline'], child['branch_lsn']
+
+
+def pending_transactions(log_dir, timeline, lsn, until=None):
+    """
+    (时间线, 序号) 之后按顺序需要重放的事务
+
+    Args:
+        until: 时间点，只返回此时间（含）之前提交的事务
+
+    Returns:
+        (事务记录列表（附加 tl 字段：所属时间线）, 提前停止的原因或 None)
+    """
+    records = []
+    expected = lsn + 1
+    for current, end in timeline_path(log_dir, timeline, lsn):
+        # 多个进程可能交错写入分段，读入后按序号排列
+        found = {}
+        for segment_timeline, _, path in list_segments(log_dir):
+            if segment_timeline != current:
+                continue
+            for record in read_segment(path):
+                if record['lsn'] >= expected and (end is None or record['lsn'] <= end):
+                    found[record['lsn']] = record
+        while expected in found:
+            record = found.pop(expected)
+            if until is not None and datetime.datetime.fromisoformat(record['ts']) > until:
+                return records, f"已到时间点 {until.isoformat(sep=' ')}"
+            record['tl'] = current
+            records.append(record)
+            expected += 1
+        if found or (end is not None and expected <= end):
+            # 序号缺口：之后的事务无法保证一致，停在缺口之前
+            return records, f"变更日志在序号 {expected} 处中断（时间线 {current}）"
+    return records, None
+
+
+def replay(db_path, log_dir=None, until=None, progress=None):
+    """
+    在数据库文件上重放变更日志：数据库中记录的序号之后的全部事务（或到 until 为止），
+    在一个事务中完成，失败时数据库不变。重放后派生数据被清空，需再调用 rebuild_derived
+
+    Args:
+        progress: 进度回调 progress(阶段, 已完成, 总数)
+
+    Returns:
+        {'timeline', 'from_lsn', 'to_lsn', 'transactions', 'changes', 'stopped'}
+    """
+    log_dir = log_dir or changelog_dir(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        position = read_position(conn)
+        if position is None:
+            raise ChangeLogError("数据库中没有变更日志位置（备份早于变更日志启用），无法重放")
+        lsn, timeline = position
+        records, stopped = pending_transactions(log_dir, timeline, lsn, until)
+        changes = 0
+        with conn:
+            for index, record in enumerate(records, 1):
+                for table, op, row in record['changes']:
+                    if op == OP_DELETE:
+                        conn.execute(f'DELETE FROM "{table}" WHERE id = ?', (row['id'],))
+                    elif op == OP_STATEMENT:
+                        if row['many']:
+                            conn.executemany(row['sql'], row['params'])
+                        else:
+                            # 语句可能带 RETURNING，读完结果以结束语句
+                            conn.execute(row['sql'], row['params']).fetchall()
+                    else:
+                        names = list(row)
+                        columns = ', '.join(f'"{name}"' for name in names)
+                        conn.execute(
+                            f'INSERT OR REPLACE INTO "{table}" ({columns}) VALUES ({", ".join("?" * len(names))})',
+                            [row[name] for name in names]
+                        )
+                    changes += 1
+                if progress:
+                    progress('重放', index, len(records))
+            if records:
+                last = records[-1]
+                conn.execute("UPDATE changelog_position SET lsn = ?, timeline = ?, updated_at = ? WHERE id = 1",
+                             (last['lsn'], last['tl'], str(datetime.datetime.utcnow())))
+                _invalidate_derived(conn, {change[0] for record in records for change in record['changes']})
+    finally:
+        conn.close()
+    return {
+        'timeline': records[-1]['tl'] if records else timeline,
+        'from_lsn': lsn,
+        'to_lsn': records[-1]['lsn'] if records else lsn,
+        'transactions': len(records),
+        'changes': changes,
+        'stopped': stopped,
+    }
+
+
+def _invalidate_derived(conn, tables):
+    """清空派生数据（与重放后的数据不再一致）并递增数据版本号（导出缓存等随之失效）"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for name in DERIVED_TABLES:
+        if name in existing:
+            conn.execute(f'DELETE FROM "{name}"')
+    if 'data_version' in existing and tables:
+        conn.execute(
+            f"UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+            f"WHERE table_name IN ({', '.join('?' * len(tables))})", sorted(tables)
+        )
+
+
+def rebuild_derived(db_path):
+    """
+    在重放后的数据库文件上重建派生数据：以该文件启动一次应用（不记录变更日志），
+    由各服务的 ensure_initialized 按当前数据全量构建被清空的表，之后把 WAL 写回数据库文件。
+
+    必须在文件投入使用之前执行：运行中的应用会把增量写入空的派生表，
+    之后 ensure_initialized 看到非空表就不再重建，统计永久缺少重放的那部分数据。
+    """
+    from app import create_app, db
+    from config import Config
+
+    class RebuildConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(db_path)
+        CHANGELOG_ENABLED = False
+
+    app = create_app(RebuildConfig)
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def start_timeline(db_path):
+    """
+    恢复时在（解压出的）数据库上开启新时间线；没有变更日志位置的旧备份补建位置表
+
+    Returns:
+        分叉记录，恢复成功后交给 record_branch 写入
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.execute(_POSITION_DDL)
+            position = read_position(conn)
+            timeline = new_timeline()
+            now = str(datetime.datetime.utcnow())
+            if position:
+                conn.execute("UPDATE changelog_position SET timeline = ?, updated_at = ? WHERE id = 1",
+                             (timeline, now))
+            else:
+                conn.execute("INSERT INTO changelog_position (id, lsn, timeline, updated_at) VALUES (1, 0, ?, ?)",
+                             (timeline, now))
+    finally:
+        conn.close()
+    lsn, parent = position or (0, None)
+    return {'timeline': timeline, 'parent': parent, 'branch_lsn': lsn,
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds')}
+
+
+def record_branch(log_dir, branch):
+    """恢复成功后登记分叉点（恢复失败时不登记，避免重放走到从未使用的时间线）"""
+    if branch['parent'] is None:
+        return
+    os.makedirs(log_dir, exist_ok=True)
+    with open(os.path.join(log_dir, TIMELINES_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(branch, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def prune_segments(log_dir, before):
+    """
+    删除最后修改时间早于 before（最早保留的备份的创建时间）的分段：其中的事务都已包含在保留的备份中。
+    最新的分段可能正在写入，总是保留
+
+    Returns:
+        删除的分段数
+    """
+    segments = sorted(list_segments(log_dir), key=lambda segment: os.path.getmtime(segment[2]))
+    removed = 0
+    for _, _, path in segments[:-1]:
+        if datetime.datetime.fromtimestamp(os.path.getmtime(path)) < before:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def segment_stats(log_dir):
+    """(分段数, 总字节数)"""
+    segments = list_segments(log_dir)
+    return len(segments), sum(os.path.getsize(path) for _, _, path in segments)
+
+
+class ChangeLogWriter:
+    """
+    变更日志写入（线程安全）
+
+    每个事务一行，写入后 flush 到操作系统（应用进程崩溃不丢失）；fsync=True 时每次提交都落盘，
+    断电也不丢失，但每次提交多一次磁盘同步。多个进程写同一目录时各自追加整行，重放时按序号排列
+    """
+
+    def __init__(self, log_dir, segment_bytes=DEFAULT_SEGMENT_BYTES, fsync=False):
+        self.log_dir = log_dir
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._file = None
+        self._timeline = None
+        self._lock = threading.Lock()
+
+    def append(self, lsn, timeline, changes, ts=None):
+        line = json.dumps({'lsn': lsn, 'ts': (ts or datetime.datetime.now()).isoformat(), 'changes': changes},
+                          ensure_ascii=False, separators=(',', ':')) + '\n'
+        data = line.encode('utf-8')
+        with self._lock:
+            f = self._segment(lsn, timeline, len(data))
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _segment(self, lsn, timeline, size):
+        """当前分段；时间线变化（恢复之后）或写满时换新分段"""
+        if (self._file is not None and self._timeline == timeline and
+                os.fstat(self._file.fileno()).st_size + size <= self.segment_bytes):
+            return self._file
+        self._close()
+        os.makedirs(self.log_dir, exist_ok=True)
+        # 应用重启或其他进程已创建了未写满的分段时继续写入
+        segments = [segment for segment in list_segments(self.log_dir) if segment[0] == timeline]
+        if segments and os.path.getsize(segments[-1][2]) + size <= self.segment_bytes:
+            path = segments[-1][2]
+        else:
+            path = os.path.join(self.log_dir, f"changes_{timeline}_{lsn:012d}.jsonl")
+        self._file = open(path, 'ab')
+        self._timeline = timeline
+        if self._file.tell() > 0:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    # 上次崩溃留下写了一半的行：换行隔开，读取时跳过
+                    self._file.write(b'\n')
+        return self._file
+
+
+def status(db_path, catalog=None):
+    """
+    变更日志状态
+
+    Returns:
+        {'lsn', 'timeline', 'segments', 'bytes', 'backup', 'pending'}；数据库未启用变更日志时 lsn 为 None
+        （此时不读取备份索引）。
+        pending 为最近一次备份之后已记录在变更日志中的事务数（无法确定时为 None）
+    """
+    position = None
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            position = read_position(conn)
+        finally:
+            conn.close()
+    segments, size = segment_stats(changelog_dir(db_path))
+    result = {'lsn': None, 'timeline': None, 'segments': segments, 'bytes': size, 'backup': None, 'pending': None}
+    if position:
+        result['lsn'], result['timeline'] = position
+    entries = catalog.entries() if catalog and position else []
+    latest = entries[-1] if entries else None
+    if latest:
+        result['backup'] = latest['file']
+        backup_position = latest.get('changelog')
+        if position and backup_position and backup_position['timeline'] == position[1]:
+            result['pending'] = position[0] - backup_position['lsn']
+    return result
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == 'replay':
+        until = datetime.datetime.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else None
+        try:
+            result = replay(sys.argv[2], until=until)
+            if result['transactions']:
+                rebuild_derived(sys.argv[2])
+        except ChangeLogError as e:
+            print(f"❌ 重放失败: {e}")
+            sys.exit(1)
+        print(f"✅ 重放 {result['transactions']} 个事务、{result['changes']} 项变更"
+              f"（序号 {result['from_lsn']} → {result['to_lsn']}）")
+        if result['stopped']:
+            print(f"   {result['stopped']}")
+        return
+
+    from backup_database import DatabaseBackup
+    backup_tool = DatabaseBackup()
+    info = status(backup_tool.db_path, backup_tool.catalog)
+    if info['lsn'] is None:
+        print("数据库尚未启用变更日志（启动一次应用后自动启用）")
+        return
+    print(f"当前序号: {info['lsn']}（时间线 {info['timeline']}）")
+    print(f"日志分段: {info['segments']} 个，{info['bytes'] / 1024:.1f} KB（{changelog_dir(backup_tool.db_path)}）")
+    if info['backup']:
+        pending = '未知（备份早于变更日志启用或在其他时间线上）' if info['pending'] is None else f"{info['pending']} 个事务"
+        print(f"最近备份: {info['backup']}，之后可重放: {pending}")
+    else:
+        print("还没有备份：变更日志需要在完整备份之上重放")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,13 +6,52 @@ class Config:
         'sqlite:///' + os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance/database.sqlite')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
-    # 数据库性能优化
+    # 数据库性能优化（网络数据库适用；SQLite 由 app/database.py 按类型调整）
     SQLALCHEMY_ENGINE_OPTIONS = {
         'pool_size': 10,
         'pool_recycle': 3600,
         'pool_pre_ping': True,
         'max_overflow': 20
     }
+
+    # SQLite 连接池与每个连接执行的 PRAGMA
+    SQLITE_POOL_SIZE = 5
+    SQLITE_MAX_OVERFLOW = 10
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',       # 读写并发：写入与备份期间读请求不再阻塞
+        'synchronous': 'NORMAL',     # WAL 下 NORMAL 即可保证一致性，提交时少一次 fsync
+        'cache_size': -64000,        # 页缓存约 64MB（负数单位为 KB）
+        'mmap_size': 268435456,      # 256MB 内存映射读取
+        'temp_store': 'MEMORY',      # 排序/临时表放在内存
+        'busy_timeout': 5000,        # 写锁冲突时最多等待 5 秒，而不是立即报 database is locked
+    }
     
     # 缓存配置
-    SEND_FILE_MAX_AGE_DEFAULT = 3600
\ No newline at end of file
+    SEND_FILE_MAX_AGE_DEFAULT = 3600
+
+    # 首页统计快照：进程内缓存有效期（秒），客户/订单经 ORM 写入提交后立即失效；
+    # 是否从每日汇总表（customer_daily_stat）读取本月新增客户数
+    DASHBOARD_CACHE_TTL = 60
+    DASHBOARD_DAILY_ROLLUP = True
+
+    # 后台导出任务：线程数与结果文件缓存目录
+    EXPORT_JOB_WORKERS = 2
+    EXPORT_CACHE_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance/export_cache')
+
+    # 在线备份（/api/v1/admin/backups）：备份目录、每步复制页数与步间让出时间；
+    # 设置 BACKUP_ADMIN_TOKEN 后请求需携带 X-Admin-Token 头，未设置时只接受本机请求
+    BACKUP_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'backups')
+    BACKUP_STEP_PAGES = 1024
+    BACKUP_STEP_PAUSE = 0.005
+    BACKUP_ADMIN_TOKEN = os.environ.get('BACKUP_ADMIN_TOKEN')
+
+    # 备份分层保留（GFS）：每个层级保留的时间段个数，完整备份与增量快照分别计算
+    # （见 backup_retention.py，python backup_retention.py 可预演保留计划）
+    BACKUP_RETENTION = {'hourly': 24, 'daily': 7, 'weekly': 4, 'monthly': 12}
+
+    # 变更日志（连续备份）：每个已提交事务追加到数据库文件旁的 changelog/，
+    # 恢复时在完整备份之上重放（python backup_restore.py latest --replay，见 change_log.py）。
+    # CHANGELOG_FSYNC 开启后每次提交都落盘（断电也不丢失），否则只写入操作系统缓存（应用崩溃不丢失）
+    CHANGELOG_ENABLED = True
+    CHANGELOG_SEGMENT_BYTES = 16 * 1024 * 1024
+    CHANGELOG_FSYNC = False
@@ -0,0 +1,40 @@
+"""
+pytest 公共夹具
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from app import create_app
+from config import Config as AppConfig
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """
+    创建使用临时 SQLite 文件库的应用：make_app(db_path=None, **config)
+
+    每个应用默认使用 tmp_path 下单独的子目录（数据库、变更日志、导出缓存、备份目录互不干扰），
+    传入 db_path 时使用该数据库文件（如同一个数据库重启应用）；其他关键字参数覆盖配置项。
+    临时目录由 pytest 管理。
+    """
+    counter = iter(range(1, 1000))
+
+    def factory(db_path=None, **config):
+        work_dir = tmp_path / f'app{next(counter)}'
+        work_dir.mkdir()
+        if db_path is None:
+            db_path = str(work_dir / 'database.sqlite')
+
+        class TestConfig(AppConfig):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+            EXPORT_CACHE_DIR = str(work_dir / 'export_cache')
+            BACKUP_DIR = str(work_dir / 'backups')
+
+        for key, value in config.items():
+            setattr(TestConfig, key, value)
+        return create_app(TestConfig)
+
+    return factory
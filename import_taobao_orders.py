@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+刷单订单批量导入脚本
+
+表头与刷单页面导出的文件一致，至少包含“刷单金额（或金额）”与“订单时间”列。
+重复订单（订单时间、客户姓名、刷单金额均相同）自动跳过；全部有效行在同一事务中写入。
+
+用法:
+    python import_taobao_orders.py orders.xlsx
+    python import_taobao_orders.py orders.csv --dry-run   # 只校验不写入
+"""
+
+import argparse
+import sys
+import time
+from app import create_app, db
+from app.services.taobao_import_service import TaobaoImportService
+
+
+def import_taobao_orders(path, dry_run=False):
+    """导入文件，返回是否成功（存在错误行时仍导入有效行，但返回 False）"""
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            file_format = TaobaoImportService.detect_format(path)
+            with open(path, 'rb') as stream:
+                result = TaobaoImportService.import_file(stream, file_format, dry_run=dry_run)
+            if dry_run:
+                db.session.rollback()
+            else:
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"✗ 导入失败: {e}")
+            return False
+
+        for error in result['errors']:
+            print(f"  - 第 {error['row']} 行: {error['message']}")
+        if result['error_count'] > len(result['errors']):
+            print(f"  - ……另有 {result['error_count'] - len(result['errors'])} 行错误未列出")
+        print(f"{'✓' if not result['error_count'] else '!'} {'校验' if dry_run else '导入'}完成: "
+              f"共 {result['total_rows']} 行，有效 {result['imported']}，重复 {result['duplicates']}，"
+              f"错误 {result['error_count']}，耗时 {time.perf_counter() - started:.2f}s")
+        return result['error_count'] == 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='刷单订单批量导入')
+    parser.add_argument('path', help='xlsx / csv 文件路径')
+    parser.add_argument('--dry-run', action='store_true', help='只校验不写入')
+    args = parser.parse_args()
+    sys.exit(0 if import_taobao_orders(args.path, dry_run=args.dry_run) else 1)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量备份工具 - 按内容寻址的分块存储 + 每次快照一个清单文件
+
+完整备份每次都复制、压缩整个数据库，即使数据没有变化。增量备份把数据库快照切成固定大小的块
+（按页对齐，SQLite 修改数据时只改动少量页），以 SHA-256 命名保存：
+
+    backups/chunks/ab/ab12....z        压缩后的数据块（已存在则跳过）
+    backups/manifests/snapshot_YYYYmmdd_HHMMSS.json   快照清单：块列表、整库哈希等
+
+- 数据库文件与 -wal 文件的大小、修改时间都未变化时直接跳过，不读取数据库；
+- 整库哈希与上一个清单相同（如只发生了检查点）时同样跳过，不写入新清单；
+- 备份耗时与占用空间随变化量增长，而不是随数据库大小增长；
+- 每个快照同时登记到备份索引 backups/catalog.jsonl（见 backup_catalog.py）；
+- 创建快照与回收数据块通过锁文件 backups/chunks.lock 互斥：快照复用已存在的数据块，
+  同时进行的回收可能在清单写入之前删掉它。
+
+用法:
+    python incremental_backup.py            # 创建增量快照
+    python incremental_backup.py list       # 列出快照
+    python incremental_backup.py gc         # 删除不再被任何清单引用的数据块
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import datetime
+from backup_database import DatabaseBackup
+from backup_catalog import KIND_SNAPSHOT, table_row_counts
+from backup_lock import LOCK_TIMEOUT, file_lock
+from change_log import read_position
+
+# 数据块大小（SQLite 页大小的整数倍）
+CHUNK_SIZE = 256 * 1024
+MANIFEST_VERSION = 1
+
+
+class IncrementalBackup:
+    def __init__(self, db_path=None, backup_dir=None):
+        self.backup_tool = DatabaseBackup(db_path=db_path, backup_dir=backup_dir)
+        self.db_path = self.backup_tool.db_path
+        self.backup_dir = self.backup_tool.backup_dir
+        self.chunk_dir = os.path.join(self.backup_dir, 'chunks')
+        self.manifest_dir = os.path.join(self.backup_dir, 'manifests')
+        self.lock_path = os.path.join(self.backup_dir, 'chunks.lock')
+        self.chunk_size = CHUNK_SIZE
+
+    def chunk_lock(self, timeout=LOCK_TIMEOUT):
+        """
+        独占数据块存储（创建快照 / 回收数据块），见 backup_lock.py
+
+        Raises:
+            TimeoutError: 超过 timeout 秒仍被占用
+        """
+        return file_lock(self.lock_path, timeout)
+
+    # ---------- 数据块存储 ----------
+
+    def chunk_path(self, chunk_hash):
+        return os.path.join(self.chunk_dir, chunk_hash[:2], chunk_hash + '.z')
+
+    def put_chunk(self, data):
+        """保存数据块，返回 (哈希, 新写入的压缩字节数)；已存在时不重复写入"""
+        chunk_hash = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(chunk_hash)
+        if os.path.exists(path):
+            return chunk_hash, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data, 6)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(temp_path, path)
+        return chunk_hash, len(compressed)
+
+    def read_chunk(self, chunk_hash):
+        """读取并校验数据块"""
+        with open(self.chunk_path(chunk_hash), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != chunk_hash:
+            raise ValueError(f"数据块校验失败: {chunk_hash}")
+        return data
+
+    # ---------- 清单 ----------
+
+    def list_manifests(self):
+        """按时间顺序返回清单文件名"""
+        if not os.path.exists(self.manifest_dir):
+            return []
+        return sorted(f for f in os.listdir(self.manifest_dir)
+                      if f.startswith('snapshot_') and f.endswith('.json'))
+
+    def load_manifest(self, name):
+        with open(os.path.join(self.manifest_dir, name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def latest_manifest(self):
+        names = self.list_manifests()
+        return self.load_manifest(names[-1]) if names else None
+
+    def write_manifest(self, manifest):
+        """原子写入清单（先写临时文件再重命名）"""
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        path = os.path.join(self.manifest_dir, manifest['name'])
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, path)
+        return path
+
+    def _manifest_name(self, timestamp):
+        """清单文件名；同一秒内多次快照时追加序号（按文件名排序仍保持时间顺序）"""
+        base = f"snapshot_{timestamp.strftime('%Y%m%d_%H%M%S')}"
+        name, counter = f"{base}.json", 1
+        while os.path.exists(os.path.join(self.manifest_dir, name)):
+            name, counter = f"{base}_{counter}.json", counter + 1
+        return name
+
+    def fingerprint(self):
+        """数据库文件与 -wal 文件的 (大小, 修改时间)，用于快速判断是否有变化"""
+        result = {}
+        for suffix in ('', '-wal'):
+            path = self.db_path + suffix
+            if os.path.exists(path):
+                stat = os.stat(path)
+                result[suffix or 'db'] = [stat.st_size, stat.st_mtime_ns]
+        return result
+
+    # ---------- 备份 / 还原 ----------
+
+    def create_snapshot(self, progress=None):
+        """
+        创建增量快照
+
+        Args:
+            progress: 复制快照时的进度回调 progress(已复制页数, 总页数)
+
+        Returns:
+            清单字典；数据库无变化而跳过时返回 None
+        """
+        if not os.path.exists(self.db_path):
+            print(f"错误: 数据库文件不存在 - {self.db_path}")
+            return None
+        self.backup_tool.ensure_backup_dir()
+
+        try:
+            with self.chunk_lock():
+                return self._create_snapshot(progress)
+        except TimeoutError as e:
+            print(f"错误: {e}")
+            return None
+
+    def _create_snapshot(self, progress=None):
+        """在持有数据块存储锁时执行：复用的数据块在清单写入前不会被回收"""
+        fingerprint = self.fingerprint()
+        latest = self.latest_manifest()
+        if latest and latest.get('fingerprint') == fingerprint:
+            print("⏭️  数据库文件未变化，跳过增量备份")
+            return None
+
+        started = time.perf_counter()
+        timestamp = datetime.datetime.now()
+        # 先用备份API得到一致的快照（包含WAL中已提交的数据），再分块
+        temp_path = os.path.join(self.backup_dir, f".incremental_{timestamp.strftime('%Y%m%d_%H%M%S')}.tmp")
+        try:
+            self.backup_tool.copy_database(self.db_path, temp_path, progress=progress)
+            conn = sqlite3.connect(temp_path)
+            try:
+                row_counts = table_row_counts(conn)
+                position = read_position(conn)
+            finally:
+                conn.close()
+            db_hash = hashlib.sha256()
+            chunks, new_chunks, new_bytes, db_size = [], 0, 0, 0
+            with open(temp_path, 'rb') as f:
+                for data in iter(lambda: f.read(self.chunk_size), b''):
+                    db_hash.update(data)
+                    db_size += len(data)
+                    chunk_hash, written = self.put_chunk(data)
+                    chunks.append(chunk_hash)
+                    if written:
+                        new_chunks += 1
+                        new_bytes += written
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        db_hash = db_hash.hexdigest()
+        if latest and latest.get('db_hash') == db_hash:
+            # 内容未变（例如只发生了检查点）：记下新的文件指纹，下次可直接跳过
+            latest['fingerprint'] = fingerprint
+            self.write_manifest(latest)
+            print("⏭️  数据库内容未变化，跳过增量备份")
+            return None
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'name': self._manifest_name(timestamp),
+            'created_at': timestamp.isoformat(timespec='seconds'),
+            'db_size': db_size,
+            'db_hash': db_hash,
+            'chunk_size': self.chunk_size,
+            'chunks': chunks,
+            'new_chunks': new_chunks,
+            'new_bytes': new_bytes,
+            'row_counts': row_counts,
+            'changelog': position and {'timeline': position[1], 'lsn': position[0]},
+            'fingerprint': fingerprint,
+        }
+        self.write_manifest(manifest)
+        self.backup_tool.catalog.add({
+            'file': manifest['name'],
+            'kind': KIND_SNAPSHOT,
+            'created_at': manifest['created_at'],
+            'size': new_bytes,
+            'db_size': db_size,
+            'sha256': db_hash,
+            'row_counts': row_counts,
+            'changelog': manifest['changelog'],
+        })
+        print(f"✅ 增量快照: {manifest['name']}")
+        print(f"   数据库大小: {db_size} 字节，共 {len(chunks)} 块")
+        print(f"   新增数据块: {new_chunks} 个，{new_bytes} 字节")
+        print(f"   耗时: {time.perf_counter() - started:.2f}s")
+        return manifest
+
+    def materialize(self, name, output_path, progress=None):
+        """
+        按清单还原出数据库文件并校验整库哈希
+
+        Args:
+            progress: 进度回调 progress(已完成块数, 总块数)
+        """
+        manifest = self.load_manifest(name)
+        db_hash = hashlib.sha256()
+        temp_path = output_path + '.tmp'
+        total = len(manifest['chunks'])
+        try:
+            with open(temp_path, 'wb') as f:
+                for done, chunk_hash in enumerate(manifest['chunks'], 1):
+                    data = self.read_chunk(chunk_hash)
+                    db_hash.update(data)
+                    f.write(data)
+                    if progress:
+                        progress(done, total)
+            if db_hash.hexdigest() != manifest['db_hash']:
+                raise ValueError(f"快照校验失败: {name}")
+            os.replace(temp_path, output_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return output_path
+
+    def collect_garbage(self, timeout=LOCK_TIMEOUT):
+        """删除不再被任何清单引用的数据块，返回删除数量（等待进行中的快照写完清单）"""
+        if not os.path.exists(self.chunk_dir):
+            return 0
+        try:
+            with self.chunk_lock(timeout):
+                return self._collect_garbage()
+        except TimeoutError as e:
+            print(f"⚠️  跳过数据块回收: {e}")
+            return 0
+
+    def _collect_garbage(self):
+        referenced = set()
+        for name in self.list_manifests():
+            referenced.update(self.load_manifest(name)['chunks'])
+        deleted = 0
+        for prefix in os.listdir(self.chunk_dir):
+            prefix_dir = os.path.join(self.chunk_dir, prefix)
+            for filename in os.listdir(prefix_dir):
+                if filename.endswith('.z') and filename[:-2] not in referenced:
+                    os.remove(os.path.join(prefix_dir, filename))
+                    deleted += 1
+        if deleted:
+            print(f"🗑️  删除未引用的数据块: {deleted} 个")
+        return deleted
+
+    def list_snapshots(self):
+        """列出增量快照（读取备份索引，不逐个打开清单）"""
+        entries = self.backup_tool.catalog.entries(KIND_SNAPSHOT)
+        if not entries:
+            print("没有找到增量快照")
+            return
+        print("\n📁 增量快照列表:")
+        print("-" * 70)
+        for entry in reversed(entries):
+            print(f"{entry['file']:<34} {entry['db_size']:>12} 字节  新增 {entry['size']:>10} 字节")
+
+
+def main():
+    backup = IncrementalBackup()
+    command = sys.argv[1] if len(sys.argv) > 1 else 'create'
+    if command == 'list':
+        backup.list_snapshots()
+    elif command == 'gc':
+        backup.collect_garbage()
+    else:
+        backup.create_snapshot()
+
+
+if __name__ == '__main__':
+    main()
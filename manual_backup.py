@@ -9,6 +9,7 @@ import os
 import sys
 from datetime import datetime
 from backup_database import DatabaseBackup
+from backup_catalog import BackupCatalog, KIND_FULL
 
 def manual_backup():
     """执行手动备份"""
@@ -68,20 +69,18 @@ def show_backup_status():
     print("\n📊 备份状态:")
     print("-" * 30)
     
-    # 检查备份目录
-    backup_dir = 'backups'
-    if os.path.exists(backup_dir):
-        backup_files = [f for f in os.listdir(backup_dir) if f.endswith('.zip')]
-        print(f"📁 备份文件数量: {len(backup_files)}")
+    # 检查备份目录（读取备份索引，不扫描备份目录）
+    backup_tool = DatabaseBackup()
+    if os.path.exists(backup_tool.backup_dir):
+        backup_entries = backup_tool.catalog.entries(KIND_FULL)
+        print(f"📁 备份文件数量: {len(backup_entries)}")
         
-        if backup_files:
-            # 最新备份
-            backup_files.sort(reverse=True)
-            latest_backup = backup_files[0]
-            backup_path = os.path.join(backup_dir, latest_backup)
-            backup_time = datetime.fromtimestamp(os.path.getmtime(backup_path))
+        if backup_entries:
+            # 最新备份（索引记录已按创建时间升序排列）
+            latest_backup = backup_entries[-1]
+            backup_time = BackupCatalog.created_time(latest_backup)
             
-            print(f"🕒 最新备份: {latest_backup}")
+            print(f"🕒 最新备份: {latest_backup['file']}")
             print(f"⏰ 备份时间: {backup_time.strftime('%Y-%m-%d %H:%M:%S')}")
             
             # 计算距离现在的时间
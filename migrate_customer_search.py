@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：为customer表添加客户检索字段 phone_reversed、name_initials
+
+字段值在应用启动时由 CustomerLookupService.ensure_initialized() 补齐，
+对应索引由 migrate_indexes.py 补建。可重复执行。
+
+用法: python migrate_customer_search.py [数据库路径]
+"""
+
+import os
+import sqlite3
+import sys
+
+COLUMNS = {
+    'phone_reversed': 'VARCHAR(20)',
+    'name_initials': 'VARCHAR(50)',
+}
+
+
+def migrate_customer_search(db_path='instance/database.sqlite', verbose=True):
+    """
+    添加缺失的检索字段
+
+    Returns:
+        新增的字段名列表；数据库或customer表不存在时返回 None
+    """
+    if not os.path.exists(db_path):
+        if verbose:
+            print(f"数据库文件 {db_path} 不存在")
+        return None
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(customer)")
+        existing = {col[1] for col in cursor.fetchall()}
+        if not existing:
+            # 表尚未创建时由 db.create_all() 创建
+            return None
+
+        added = []
+        for name, column_type in COLUMNS.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE customer ADD COLUMN {name} {column_type}")
+                added.append(name)
+                if verbose:
+                    print(f"✅ 添加字段 customer.{name}")
+        conn.commit()
+        if verbose and not added:
+            print("ℹ️  检索字段已存在，无需迁移")
+        return added
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("开始迁移客户检索字段...")
+    result = migrate_customer_search(sys.argv[1] if len(sys.argv) > 1 else 'instance/database.sqlite')
+    if result is None:
+        print("❌ 迁移未执行")
+    else:
+        print("✅ 迁移完成，检索键将在应用启动时补齐")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：为已有数据库补建 app/models.py 中声明的索引
+
+db.create_all() 只创建缺失的表，不会给已存在的表补建索引。本脚本从模型元数据生成
+CREATE INDEX IF NOT EXISTS 语句，可重复执行；建完索引后执行 ANALYZE 更新查询规划统计。
+
+用法: python migrate_indexes.py [数据库路径]
+"""
+
+import os
+import sqlite3
+import sys
+
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex
+
+from app import db
+import app.models  # noqa: F401  注册模型元数据
+
+
+def index_statements():
+    """模型中声明的全部索引 -> [(表名, 索引名, CREATE INDEX 语句)]"""
+    statements = []
+    for table in db.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=sqlite.dialect()))
+            statements.append((table.name, index.name, sql.strip()))
+    return statements
+
+
+def migrate_indexes(db_path='instance/database.sqlite', verbose=True):
+    """
+    补建缺失的索引
+
+    Returns:
+        新建的索引名列表；数据库不存在时返回 None
+    """
+    if not os.path.exists(db_path):
+        if verbose:
+            print(f"数据库文件 {db_path} 不存在")
+        return None
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {row[0] for row in cursor.fetchall()}
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        existing = {row[0] for row in cursor.fetchall()}
+
+        created = []
+        for table, name, sql in index_statements():
+            # 表尚未创建时由 db.create_all() 连同索引一起创建
+            if table not in tables or name in existing:
+                continue
+            cursor.execute(sql)
+            created.append(name)
+            if verbose:
+                print(f"✅ 创建索引 {name} ON {table}")
+
+        if created:
+            cursor.execute("ANALYZE")
+        conn.commit()
+        if verbose and not created:
+            print("ℹ️  索引已是最新")
+        return created
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("开始补建索引...")
+    result = migrate_indexes(sys.argv[1] if len(sys.argv) > 1 else 'instance/database.sqlite')
+    if result is None:
+        print("❌ 索引迁移未执行")
+    else:
+        print("✅ 索引迁移完成")
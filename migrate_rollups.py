@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+数据库迁移脚本：为汇总表增量刷新准备水位线字段
+
+- taobao_order 表添加 updated_at 字段；
+- 补齐 course / taobao_order 中为空的 updated_at（取 created_at），否则增量刷新无法发现这些行。
+
+汇总表本身由 db.create_all() 创建，对应索引由 migrate_indexes.py 补建。可重复执行。
+
+用法: python migrate_rollups.py [数据库路径]
+"""
+
+import os
+import sqlite3
+import sys
+
+WATERMARK_TABLES = ('course', 'taobao_order')
+
+
+def migrate_rollups(db_path='instance/database.sqlite', verbose=True):
+    """
+    添加并补齐 updated_at
+
+    Returns:
+        补齐 updated_at 的行数；数据库不存在时返回 None
+    """
+    if not os.path.exists(db_path):
+        if verbose:
+            print(f"数据库文件 {db_path} 不存在")
+        return None
+
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        filled = 0
+        for table in WATERMARK_TABLES:
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = {col[1] for col in cursor.fetchall()}
+            if not columns:
+                # 表尚未创建时由 db.create_all() 创建
+                continue
+            if 'updated_at' not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME")
+                if verbose:
+                    print(f"✅ 添加字段 {table}.updated_at")
+            cursor.execute(f"UPDATE {table} SET updated_at = created_at "
+                           f"WHERE updated_at IS NULL AND created_at IS NOT NULL")
+            filled += cursor.rowcount
+        conn.commit()
+        if verbose:
+            print(f"ℹ️  补齐 updated_at {filled} 行")
+        return filled
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    print("开始迁移汇总表水位线字段...")
+    result = migrate_rollups(sys.argv[1] if len(sys.argv) > 1 else 'instance/database.sqlite')
+    if result is None:
+        print("❌ 迁移未执行")
+    else:
+        print("✅ 迁移完成")
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+全文检索索引重建脚本
+
+经 ORM 的写入会自动同步索引；直接改库、批量导入等绕过 ORM 的写入后执行本脚本重建。
+
+用法:
+    python rebuild_search_index.py
+"""
+
+import sys
+import time
+from app import create_app
+from app.services.search_service import SearchService
+
+
+def rebuild_search_index():
+    """全量重建全文检索索引，返回是否成功"""
+    app = create_app()
+    with app.app_context():
+        if not SearchService.is_enabled():
+            print("✗ 当前数据库不支持 FTS5，全文检索使用 LIKE 查询，无需重建")
+            return False
+        started = time.perf_counter()
+        total = SearchService.rebuild()
+        print(f"✓ 已重建全文检索索引，共 {total} 条，耗时 {time.perf_counter() - started:.1f}s")
+        return True
+
+
+if __name__ == '__main__':
+    sys.exit(0 if rebuild_search_index() else 1)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+试听课统计汇总重建/校验脚本
+
+用法:
+    python rebuild_trial_stats.py           # 校验汇总表，与全量扫描不一致时重建
+    python rebuild_trial_stats.py --check   # 只校验，不修改数据
+    python rebuild_trial_stats.py --force   # 无论是否一致都重建
+"""
+
+import argparse
+import sys
+from app import create_app
+from app.services.trial_stats_service import TrialStatsService
+
+
+def rebuild_trial_stats(check_only=False, force=False):
+    """校验试听课统计汇总表，必要时按全量扫描结果重建
+
+    返回校验（或重建后）是否一致。
+    """
+    app = create_app()
+    with app.app_context():
+        mismatches = TrialStatsService.verify()
+        if mismatches:
+            print(f"发现 {len(mismatches)} 处汇总与全量扫描不一致：")
+            for item in mismatches[:20]:
+                status, source, refund_channel = item['key']
+                print(f"  - [{status}/{source or '-'}/{refund_channel or '-'}] {item['field']}: "
+                      f"汇总={item['stored']} 全量={item['expected']}")
+        else:
+            print("✓ 试听课统计汇总与全量扫描一致")
+
+        # 交叉校验：汇总表口径 vs SQL GROUP BY 引擎口径
+        stored_stats, _ = TrialStatsService.get_stats()
+        sql_stats, _ = TrialStatsService.sql_stats()
+        for status, figures in sql_stats.items():
+            for field, value in figures.items():
+                if abs((stored_stats[status][field] or 0) - (value or 0)) > 0.01:
+                    print(f"  - SQL口径不一致 [{status}] {field}: 汇总={stored_stats[status][field]} SQL={value}")
+
+        if check_only or (not mismatches and not force):
+            return not mismatches
+
+        row_count = TrialStatsService.rebuild()
+        print(f"✓ 已重建试听课统计汇总，共 {row_count} 行")
+
+        remaining = TrialStatsService.verify()
+        if remaining:
+            print(f"✗ 重建后仍有 {len(remaining)} 处不一致")
+            return False
+        print("✓ 重建后校验通过")
+        return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='试听课统计汇总重建/校验')
+    parser.add_argument('--check', action='store_true', help='只校验，不重建')
+    parser.add_argument('--force', action='store_true', help='强制重建')
+    args = parser.parse_args()
+    sys.exit(0 if rebuild_trial_stats(check_only=args.check, force=args.force) else 1)
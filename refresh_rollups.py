@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+时间分桶汇总刷新脚本（可由定时任务调用）
+
+用法:
+    python refresh_rollups.py          # 按水位线增量刷新
+    python refresh_rollups.py --full   # 全量重建（绕过 ORM 删除数据后使用）
+"""
+
+import argparse
+import sys
+import time
+from app import create_app
+from app.services.rollup_service import RollupService
+
+
+def refresh_rollups(full=False):
+    """刷新汇总表，返回是否成功"""
+    app = create_app()
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            result = RollupService.refresh(full=full)
+        except Exception as e:
+            print(f"✗ 刷新失败: {e}")
+            return False
+        for source, days in result.items():
+            print(f"  - {source}: {'全量重建' if days < 0 else f'重算 {days} 天'}")
+        print(f"✓ 刷新完成，耗时 {time.perf_counter() - started:.2f}s")
+        return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='时间分桶汇总刷新')
+    parser.add_argument('--full', action='store_true', help='全量重建')
+    args = parser.parse_args()
+    sys.exit(0 if refresh_rollups(full=args.full) else 1)
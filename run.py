@@ -33,6 +33,27 @@ def check_and_migrate_database():
     finally:
         conn.close()
 
+    # 客户检索字段（值在应用启动时补齐）
+    try:
+        from migrate_customer_search import migrate_customer_search
+        migrate_customer_search(db_path, verbose=False)
+    except Exception as e:
+        print(f"客户检索字段迁移过程中出现错误: {e}")
+
+    # 汇总表增量刷新所需的 updated_at 字段
+    try:
+        from migrate_rollups import migrate_rollups
+        migrate_rollups(db_path, verbose=False)
+    except Exception as e:
+        print(f"汇总表字段迁移过程中出现错误: {e}")
+
+    # 补建模型中声明的索引（可重复执行）
+    try:
+        from migrate_indexes import migrate_indexes
+        migrate_indexes(db_path, verbose=False)
+    except Exception as e:
+        print(f"索引迁移过程中出现错误: {e}")
+
 # 启动前检查数据库
 check_and_migrate_database()
 
@@ -2,7 +2,10 @@
 # -*- coding: utf-8 -*-
 """
 智能备份脚本 - 解决凌晨关机问题
-支持多时段备份和开机自动补偿
+支持多时段备份和开机自动补偿；备份后按分层保留策略（backup_retention）清理
+两次备份之间的事务记录在变更日志中（change_log），status 显示最近备份之后可重放的事务数
+
+用法: python smart_backup.py [status | force | incremental | retention]
 """
 
 import os
@@ -10,6 +13,8 @@ import sys
 import time
 import datetime
 from backup_database import DatabaseBackup
+from backup_catalog import BackupCatalog, KIND_FULL
+from change_log import status as changelog_status
 
 class SmartBackup:
     def __init__(self):
@@ -30,28 +35,12 @@ class SmartBackup:
         print(f"{timestamp} - {message}")
     
     def check_last_backup(self):
-        """检查最后一次备份时间"""
+        """检查最后一次备份时间（读取备份索引）"""
         try:
-            backup_dir = "backups"
-            if not os.path.exists(backup_dir):
+            latest = self.backup_tool.catalog.latest(KIND_FULL)
+            if not latest:
                 return None, "无备份记录"
-            
-            backup_files = [f for f in os.listdir(backup_dir) if f.endswith('.zip')]
-            if not backup_files:
-                return None, "无备份文件"
-            
-            # 获取最新的备份文件
-            backup_files.sort(reverse=True)
-            latest_backup = backup_files[0]
-            
-            # 从文件名提取时间
-            try:
-                time_str = latest_backup.replace('database_backup_', '').replace('.zip', '')
-                last_backup_time = datetime.datetime.strptime(time_str, '%Y%m%d_%H%M%S')
-                return last_backup_time, f"最后备份: {latest_backup}"
-            except:
-                return None, f"无法解析备份时间: {latest_backup}"
-                
+            return BackupCatalog.created_time(latest), f"最后备份: {latest['file']}"
         except Exception as e:
             return None, f"检查备份失败: {e}"
     
@@ -103,6 +92,8 @@ class SmartBackup:
                     size = os.path.getsize(backup_file)
                     self.log_message(f"备份文件大小: {size} 字节")
                 
+                # create_backup 之后已按分层保留策略清理
+                self.log_retention(self.backup_tool.last_cleanup)
                 return True
             else:
                 self.log_message("备份失败: 未生成备份文件")
@@ -112,6 +103,15 @@ class SmartBackup:
             self.log_message(f"备份过程出错: {e}")
             return False
     
+    def log_retention(self, plan):
+        """记录分层保留策略的清理结果"""
+        if not plan:
+            return
+        self.log_message(f"保留策略: {self.backup_tool.retention.describe()}；"
+                         f"保留 {len(plan['keep'])} 个，删除 {len(plan['delete'])} 个")
+        for entry in plan['delete']:
+            self.log_message(f"删除过期备份: {entry['file']}")
+    
     def show_backup_status(self):
         """显示备份状态"""
         print("\n" + "="*50)
@@ -130,15 +130,19 @@ class SmartBackup:
         
         # 检查备份文件数量
         try:
-            backup_dir = "backups"
-            if os.path.exists(backup_dir):
-                backup_files = [f for f in os.listdir(backup_dir) if f.endswith('.zip')]
-                print(f"备份文件数量: {len(backup_files)}")
-            else:
-                print("备份文件数量: 0")
-        except:
+            print(f"备份文件数量: {len(self.backup_tool.catalog.entries(KIND_FULL))}")
+        except Exception:
             print("备份文件数量: 无法检查")
         
+        # 变更日志：两次备份之间的事务，恢复时可在最近的备份之上重放
+        info = changelog_status(self.backup_tool.db_path, self.backup_tool.catalog)
+        if info['lsn'] is None:
+            print("变更日志: 未启用")
+        elif info['pending'] is None:
+            print(f"变更日志: 当前序号 {info['lsn']}（最近备份之后的事务数未知）")
+        else:
+            print(f"变更日志: 最近备份之后 {info['pending']} 个事务可重放（backup_restore.py latest --replay）")
+        
         # 判断备份建议
         need_backup, reason = self.should_backup()
         if need_backup:
@@ -160,6 +164,16 @@ def main():
             smart_backup.log_message("强制执行备份")
             smart_backup.backup_tool.create_backup()
             return
+        elif sys.argv[1] == "retention":
+            # 预演分层保留策略，不删除文件
+            smart_backup.backup_tool.cleanup_old_backups(dry_run=True)
+            return
+        elif sys.argv[1] == "incremental":
+            # 增量快照：数据库无变化时直接跳过，只保存变化的数据块
+            smart_backup.log_message("执行增量备份")
+            manifest = smart_backup.backup_tool.create_incremental_backup()
+            smart_backup.log_message(f"增量快照: {manifest['name']}" if manifest else "数据库无变化，跳过增量备份")
+            return
     
     # 默认执行智能备份
     smart_backup.execute_backup()
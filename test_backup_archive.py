@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+测试备份归档写入：一遍读取快照并多线程压缩，zip 可被 zipfile 正常解压，哈希与内容一致，无中间文件。
+"""
+
+import sys
+import os
+import io
+import hashlib
+import sqlite3
+import zipfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+import backup_archive
+from backup_archive import database_snapshot, iter_blocks, write_backup_archive
+from backup_database import DatabaseBackup
+
+
+def _make_db(tmp_path, journal_mode='wal', rows=3000):
+    workdir = str(tmp_path)
+    db_path = os.path.join(workdir, 'source.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, payload TEXT)")
+    conn.executemany("INSERT INTO t (payload) VALUES (?)", [(f'订单{i:06d}' * 20,) for i in range(rows)])
+    conn.commit()
+    conn.close()
+    return workdir, db_path
+
+
+def _extract(zip_path, workdir):
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.testzip() is None
+        name = zipf.namelist()[0]
+        zipf.extract(name, workdir)
+    return os.path.join(workdir, name)
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_direct_snapshot_parallel_blocks(tmp_path):
+    workdir, db_path = _make_db(tmp_path)
+    # 保留未检查点的 WAL 内容：快照前会先做检查点
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO t (payload) VALUES ('in wal')")
+    conn.commit()
+
+    steps = []
+    zip_path = os.path.join(workdir, 'backup.zip')
+    result = write_backup_archive(db_path, zip_path, 'database_backup.sqlite', workers=3, block_size=16384,
+                                  progress=lambda copied, total: steps.append((copied, total)))
+    conn.close()
+
+    assert result['method'] == 'direct'
+    assert steps[-1][0] == steps[-1][1] and len(steps) > 3
+    assert not [name for name in os.listdir(workdir) if name.endswith('.tmp')]
+
+    restored = _extract(zip_path, os.path.join(workdir, 'out'))
+    assert result['sha256'] == _sha256(restored) and result['size'] == os.path.getsize(restored)
+    check = sqlite3.connect(restored)
+    assert check.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+    assert check.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 3001
+    check.close()
+
+
+def test_snapshot_is_consistent_while_writers_commit(tmp_path):
+    workdir, db_path = _make_db(tmp_path)
+    with database_snapshot(db_path) as snapshot:
+        assert snapshot.method == 'direct'
+        writer = sqlite3.connect(db_path, timeout=0)
+        for _ in range(50):
+            writer.execute("INSERT INTO t (payload) VALUES (?)", ('x' * 4000,))
+            writer.commit()
+        # 写入只进入 WAL，读取的数据库文件保持快照时的内容
+        blocks = iter_blocks(snapshot.file, snapshot.size, snapshot.page_size, 8192)
+        data = b''.join(block for block, last in blocks)
+        writer.close()
+
+    copy_path = os.path.join(workdir, 'copy.sqlite')
+    with open(copy_path, 'wb') as out:
+        out.write(data)
+    check = sqlite3.connect(copy_path)
+    assert check.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 3000
+    check.close()
+
+
+def test_fallback_copy_for_rollback_journal(tmp_path):
+    workdir, db_path = _make_db(tmp_path, journal_mode='delete', rows=200)
+    tool = DatabaseBackup(db_path=db_path, backup_dir=os.path.join(workdir, 'backups'))
+    zip_path = tool.create_backup()
+
+    assert zip_path and sorted(os.listdir(tool.backup_dir)) == ['catalog.jsonl', os.path.basename(zip_path)]
+    restored = _extract(zip_path, os.path.join(workdir, 'out'))
+    check = sqlite3.connect(restored)
+    assert check.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 200
+    check.close()
+
+
+def test_zip64_and_lock_byte_page(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup_archive, 'ZIP64_LIMIT', 1024)
+    monkeypatch.setattr(backup_archive, 'PENDING_BYTE', 8192)
+    workdir, db_path = _make_db(tmp_path, rows=100)
+    zip_path = os.path.join(workdir, 'backup.zip')
+    result = write_backup_archive(db_path, zip_path, 'db.sqlite', workers=2, block_size=4096)
+
+    with zipfile.ZipFile(zip_path) as zipf:
+        info = zipf.getinfo('db.sqlite')
+        assert info.file_size == result['size'] > 1024
+        data = zipf.read('db.sqlite')
+    # 锁字节页以全零写入，其余内容与源文件一致
+    with open(db_path, 'rb') as f:
+        source = f.read(result['size'])
+    page_size = 4096
+    assert data[8192:8192 + page_size] == bytes(page_size)
+    assert data[:8192] == source[:8192] and data[8192 + page_size:] == source[8192 + page_size:]
+
+
+def test_iter_blocks_empty_and_short_read():
+    assert list(iter_blocks(io.BytesIO(b''), 0, 4096)) == [(b'', True)]
+    with pytest.raises(IOError):
+        list(iter_blocks(io.BytesIO(b'x' * 100), 4096, 4096))
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+测试备份索引：备份时登记哈希与行数，旧备份目录首次读取时迁移，状态与列表查询不再扫描目录；
+多个进程同时登记时不丢失记录。
+"""
+
+import sys
+import os
+import sqlite3
+import zipfile
+import multiprocessing
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backup_catalog import BackupCatalog, KIND_FULL, KIND_SNAPSHOT
+from backup_database import DatabaseBackup
+from backup_manager import BackupManager
+from smart_backup import SmartBackup
+
+
+def _make_tool(tmp_path):
+    workdir = str(tmp_path)
+    db_path = os.path.join(workdir, 'database.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE customer (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("CREATE TABLE course (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO customer (name) VALUES (?)", [(f'客户{i}',) for i in range(25)])
+    conn.execute("INSERT INTO course (name) VALUES ('数学')")
+    conn.commit()
+    conn.close()
+    return DatabaseBackup(db_path=db_path, backup_dir=os.path.join(workdir, 'backups'))
+
+
+def test_backups_are_recorded_and_queries_skip_directory_scans(tmp_path, monkeypatch):
+    tool = _make_tool(tmp_path)
+    zip_path = tool.create_backup()
+    manifest = tool.create_incremental_backup()
+
+    full = tool.catalog.latest(KIND_FULL)
+    # 备份后立即按保留策略分层：最新的备份是本月的代表
+    assert full['file'] == os.path.basename(zip_path) and full['tier'] == 'monthly'
+    assert full['row_counts'] == {'course': 1, 'customer': 25}
+    assert full['size'] == os.path.getsize(zip_path)
+    snapshot = tool.catalog.latest(KIND_SNAPSHOT)
+    assert snapshot['file'] == manifest['name'] and snapshot['sha256'] == manifest['db_hash']
+    assert snapshot['row_counts'] == full['row_counts']
+
+    # 索引建立后，状态、列表与清理都不再列出备份目录
+    def no_listdir(path):
+        raise AssertionError(f'不应扫描目录: {path}')
+    monkeypatch.setattr(os, 'listdir', no_listdir)
+    smart = SmartBackup()
+    smart.backup_tool = tool
+    last_time, status = smart.check_last_backup()
+    assert last_time == BackupCatalog.created_time(full) and full['file'] in status
+    manager = BackupManager()
+    manager.backup_tool, manager.backup_dir = tool, tool.backup_dir
+    info = manager.get_backup_info()
+    assert info['total_files'] == 1 and info['newest_backup']['sha256'] == full['sha256']
+    tool.list_backups()
+    tool.cleanup_old_backups()
+
+
+def test_existing_backups_are_migrated_and_rebuilt(tmp_path):
+    backup_dir = str(tmp_path)
+    legacy = os.path.join(backup_dir, 'database_backup_20250802_131317.zip')
+    with zipfile.ZipFile(legacy, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr('database_backup_20250802_131317.sqlite', b'sqlite data' * 100)
+    with open(os.path.join(backup_dir, 'database_backup_20250803_020002.zip'), 'wb') as f:
+        f.write(b'not a zip')
+
+    catalog = BackupCatalog(backup_dir)
+    entries = catalog.entries()
+    assert [entry['created_at'] for entry in entries] == ['2025-08-02T13:13:17', '2025-08-03T02:00:02']
+    assert entries[0]['db_size'] == 1100 and entries[0]['sha256'] and entries[1]['sha256'] is None
+    assert os.path.exists(catalog.path)
+
+    # 手动删除文件后重新核对：保留已有记录的字段，删除缺失文件的记录
+    catalog.update(entries[0]['file'], tier='monthly')
+    os.remove(os.path.join(backup_dir, entries[1]['file']))
+    assert catalog.rebuild() == (0, 1)
+    assert [(entry['file'], entry['tier']) for entry in catalog.entries()] == [(entries[0]['file'], 'monthly')]
+
+    assert BackupCatalog(os.path.join(backup_dir, 'missing')).entries() == []
+
+
+def _add_entries(backup_dir, prefix, count):
+    catalog = BackupCatalog(backup_dir)
+    for i in range(count):
+        catalog.add({'file': f'{prefix}_{i}.zip', 'kind': KIND_FULL, 'created_at': f'2025-08-02T13:{i:02d}:00'})
+
+
+def test_concurrent_writers_in_separate_processes(tmp_path):
+    backup_dir = str(tmp_path / 'backups')
+    BackupCatalog(backup_dir).add({'file': 'first.zip', 'kind': KIND_FULL, 'created_at': '2025-08-01T00:00:00'})
+    # 应用内备份线程与计划任务是不同的进程：各自的读取-修改-写入不能覆盖对方的记录
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_add_entries, args=(backup_dir, f'writer{n}', 20)) for n in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+    assert len(BackupCatalog(backup_dir).entries()) == 61
+    assert sorted(os.listdir(backup_dir)) == ['catalog.jsonl']
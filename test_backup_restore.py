@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+测试恢复引擎：解压到目标旁的临时文件，校验哈希、完整性与行数后再应用；按时间点选择备份；
+校验失败时当前数据库保持不变；swap 方式原子替换文件，数据库仍在使用时拒绝替换。
+"""
+
+import sys
+import os
+import sqlite3
+import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from backup_catalog import KIND_FULL
+from backup_database import DatabaseBackup
+from backup_restore import RestoreEngine, RestoreError, MODE_SWAP
+
+
+def _make_tool(tmp_path, rows=50):
+    workdir = str(tmp_path)
+    db_path = os.path.join(workdir, 'instance', 'database.sqlite')
+    os.makedirs(os.path.dirname(db_path))
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE customer (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO customer (name) VALUES (?)", [(f'客户{i}',) for i in range(rows)])
+    conn.commit()
+    conn.close()
+    return DatabaseBackup(db_path=db_path, backup_dir=os.path.join(workdir, 'backups'))
+
+
+def _count(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM customer").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _delete_rows(db_path, keep):
+    conn = sqlite3.connect(db_path)
+    conn.execute("DELETE FROM customer WHERE id > ?", (keep,))
+    conn.commit()
+    conn.close()
+
+
+def test_online_restore_verifies_and_keeps_current(tmp_path):
+    tool = _make_tool(tmp_path)
+    zip_path = tool.create_backup()
+    # 应用仍持有连接
+    app_conn = sqlite3.connect(tool.db_path)
+    _delete_rows(tool.db_path, 10)
+
+    stages = set()
+    result = RestoreEngine(tool).restore(os.path.basename(zip_path),
+                                         progress=lambda stage, done, total: stages.add(stage))
+    assert app_conn.execute("SELECT COUNT(*) FROM customer").fetchone()[0] == 50
+    app_conn.close()
+
+    assert result['row_counts'] == {'customer': 50} and stages == {'解压', '写入'}
+    assert {'extract', 'verify', 'safety_backup', 'apply', 'total'} <= set(result['timings'])
+    # 恢复前的数据库做了一次完整备份，可以再恢复回去
+    safety = tool.catalog.get(result['safety_backup'])
+    assert safety['row_counts'] == {'customer': 10}
+    # 目标目录中没有残留的临时文件
+    assert not [n for n in os.listdir(os.path.dirname(tool.db_path)) if n.endswith('.tmp')]
+
+    assert tool.restore_backup(result['safety_backup'])
+    assert _count(tool.db_path) == 10
+
+
+def test_point_in_time_and_snapshot_restore(tmp_path):
+    tool = _make_tool(tmp_path)
+    first = os.path.basename(tool.create_backup())
+    _delete_rows(tool.db_path, 30)
+    snapshot = tool.create_incremental_backup()
+    _delete_rows(tool.db_path, 5)
+    base = datetime.datetime(2026, 10, 1, 12)
+    tool.catalog.update(first, created_at=base.isoformat())
+    tool.catalog.update(snapshot['name'], created_at=(base + datetime.timedelta(hours=2)).isoformat())
+
+    engine = RestoreEngine(tool)
+    assert engine.resolve('2026-10-01T13:00')['file'] == first
+    with pytest.raises(RestoreError):
+        engine.resolve('2026-10-01T11:00')
+
+    result = engine.restore('2026-10-01T14:30', keep_current=False)
+    assert result['backup'] == snapshot['name'] and _count(tool.db_path) == 30
+
+
+def test_verification_failures_leave_database_unchanged(tmp_path):
+    tool = _make_tool(tmp_path)
+    name = os.path.basename(tool.create_backup())
+    _delete_rows(tool.db_path, 20)
+    engine = RestoreEngine(tool)
+
+    tool.catalog.update(name, row_counts={'customer': 51})
+    with pytest.raises(RestoreError, match='行数'):
+        engine.restore(name, keep_current=False)
+
+    tool.catalog.update(name, sha256='0' * 64)
+    with pytest.raises(RestoreError, match='SHA-256'):
+        engine.restore(name, keep_current=False)
+
+    with pytest.raises(RestoreError):
+        engine.restore('database_backup_19990101_000000.zip')
+    assert _count(tool.db_path) == 20
+    assert len(tool.catalog.entries(KIND_FULL)) == 1
+    assert not [n for n in os.listdir(os.path.dirname(tool.db_path)) if n.endswith('.tmp')]
+
+
+def test_swap_replaces_file_atomically_only_when_idle(tmp_path):
+    tool = _make_tool(tmp_path)
+    name = os.path.basename(tool.create_backup())
+    _delete_rows(tool.db_path, 1)
+
+    # 有连接正在读取 WAL 中的数据时拒绝替换
+    writer = sqlite3.connect(tool.db_path)
+    writer.execute("INSERT INTO customer (name) VALUES ('wal')")
+    writer.commit()
+    reader = sqlite3.connect(tool.db_path)
+    reader.execute("BEGIN")
+    reader.execute("SELECT COUNT(*) FROM customer").fetchone()
+    with pytest.raises(RestoreError):
+        RestoreEngine(tool).restore(name, mode=MODE_SWAP, keep_current=False)
+    reader.close()
+    writer.close()
+    assert _count(tool.db_path) == 2
+
+    inode = os.stat(tool.db_path).st_ino
+    result = RestoreEngine(tool).restore(name, mode=MODE_SWAP, keep_current=False)
+    assert result['mode'] == MODE_SWAP and os.stat(tool.db_path).st_ino != inode
+    assert _count(tool.db_path) == 50
+    conn = sqlite3.connect(tool.db_path)
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == 'ok'
+    conn.close()
+
+
+def _versions(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return dict(conn.execute("SELECT table_name, version FROM data_version"))
+    finally:
+        conn.close()
+
+
+def _set_version(db_path, table, version):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT OR REPLACE INTO data_version (table_name, version) VALUES (?, ?)", (table, version))
+    conn.commit()
+    conn.close()
+
+
+def test_restore_advances_data_versions_past_current(tmp_path):
+    tool = _make_tool(tmp_path)
+    conn = sqlite3.connect(tool.db_path)
+    conn.execute("CREATE TABLE data_version (id INTEGER PRIMARY KEY, table_name VARCHAR(50) UNIQUE NOT NULL, "
+                 "version INTEGER NOT NULL, updated_at DATETIME)")
+    conn.commit()
+    conn.close()
+    _set_version(tool.db_path, 'customer', 3)
+    name = os.path.basename(tool.create_backup())
+    cache_dir = os.path.join(os.path.dirname(tool.backup_dir), 'export_cache')
+    os.makedirs(cache_dir)
+    engine = RestoreEngine(tool, export_cache_dir=cache_dir)
+
+    # 恢复前的写入用过的版本号，恢复后不会再出现（导出缓存不会命中旧文件）
+    _set_version(tool.db_path, 'customer', 7)
+    _set_version(tool.db_path, 'course', 2)
+    engine.restore(name, keep_current=False)
+    assert _versions(tool.db_path) == {'customer': 8, 'course': 3}
+
+    _set_version(tool.db_path, 'customer', 12)
+    engine.restore(name, mode=MODE_SWAP, keep_current=False)
+    assert _versions(tool.db_path) == {'customer': 13, 'course': 4}
+    assert os.path.isdir(cache_dir)
+
+    # 数据库文件丢失：不知道用过的版本号，清空导出缓存
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(tool.db_path + suffix):
+            os.remove(tool.db_path + suffix)
+    engine.restore(name, mode=MODE_SWAP, keep_current=False)
+    assert _versions(tool.db_path) == {'customer': 4} and not os.path.exists(cache_dir)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分层保留策略（GFS）：每个层级每个时间段保留最新的一个备份，数量有界而覆盖时间逐渐变长；
+预演不删除文件，清理同步更新备份索引，删除增量快照后回收数据块。
+"""
+
+import os
+import sys
+import sqlite3
+import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from backup_catalog import BackupCatalog, KIND_FULL, KIND_SNAPSHOT
+from backup_database import DatabaseBackup
+from backup_retention import RetentionPolicy, TIER_LATEST
+from smart_backup import SmartBackup
+
+
+def _entry(created, kind=KIND_FULL):
+    return {'file': f"database_backup_{created.strftime('%Y%m%d_%H%M%S')}.zip", 'kind': kind,
+            'created_at': created.isoformat(timespec='seconds'), 'size': 3}
+
+
+def test_gfs_selection_is_bounded_and_covers_a_year():
+    policy = RetentionPolicy(hourly=24, daily=7, weekly=4, monthly=12)
+    now = datetime.datetime(2026, 10, 17, 12, 30)
+    # 一年多以来每小时一个备份
+    entries = [_entry(now - datetime.timedelta(hours=hours)) for hours in range(400 * 24)]
+    keep = policy.select(entries)
+
+    assert len(keep) <= policy.max_backups == 47
+    assert keep[entries[0]['file']] == 'monthly'  # 最新的备份同时是本月的代表，记为最高层级
+    kept = sorted(BackupCatalog.created_time(entry) for entry in entries if entry['file'] in keep)
+    # 包括本月在内的12个月
+    assert kept[0] == datetime.datetime(2025, 11, 30, 23, 30)
+    # 最近24小时每小时一个
+    assert len([t for t in kept if now - t < datetime.timedelta(hours=24)]) == 24
+    # 每个月只保留该月最新的备份（之前的月份即月末最后一个小时）
+    monthly = [BackupCatalog.created_time(entry) for entry in entries if keep.get(entry['file']) == 'monthly']
+    assert len(monthly) == 12
+    assert all((t + datetime.timedelta(hours=1)).month != t.month for t in monthly[1:])
+
+    # 稀疏的备份：按“有备份的时间段”计数，全部保留
+    sparse = [_entry(now - datetime.timedelta(days=days)) for days in (1, 29, 31, 45)]
+    assert set(policy.select(sparse)) == {entry['file'] for entry in sparse}
+
+    # 所有层级为 0 时仍保留最新的备份
+    assert RetentionPolicy(hourly=0, daily=0, weekly=0, monthly=0).select(sparse) == {sparse[0]['file']: TIER_LATEST}
+
+
+def test_policy_from_config():
+    policy = RetentionPolicy.from_config({'daily': 3})
+    assert policy.counts == {'hourly': 24, 'daily': 3, 'weekly': 4, 'monthly': 12}
+    with pytest.raises(ValueError):
+        RetentionPolicy(weekly=-1)
+
+
+def test_cleanup_dry_run_and_apply(tmp_path):
+    backup_dir = str(tmp_path)
+    backup_tool = DatabaseBackup(db_path=os.path.join(backup_dir, 'missing.sqlite'), backup_dir=backup_dir)
+    backup_tool.retention = RetentionPolicy(hourly=2, daily=2, weekly=0, monthly=0)
+    now = datetime.datetime.now().replace(minute=30)
+    created = [now - datetime.timedelta(hours=hours) for hours in (0, 0.5, 1, 26, 27, 50)]
+    for time in created:
+        entry = backup_tool.catalog.add(_entry(time))
+        with open(os.path.join(backup_dir, entry['file']), 'wb') as f:
+            f.write(b'zip')
+
+    plan = backup_tool.cleanup_old_backups(dry_run=True)
+    assert len(plan['delete']) == 3
+    assert len([name for name in os.listdir(backup_dir) if name.endswith('.zip')]) == 6
+
+    backup_tool.cleanup_old_backups()
+    entries = backup_tool.catalog.entries()
+    # 最近两个小时各一个（最新的同时是今天的代表），以及昨天最新的一个
+    assert [entry['created_at'] for entry in entries] == \
+        [created[i].isoformat(timespec='seconds') for i in (3, 2, 0)]
+    assert [entry['tier'] for entry in entries] == ['daily', 'hourly', 'daily']
+    assert sorted(name for name in os.listdir(backup_dir) if name.endswith('.zip')) == \
+        sorted(entry['file'] for entry in entries)
+
+
+def test_snapshot_retention_collects_chunks_and_smart_backup_logs(tmp_path):
+    db_path = str(tmp_path / 'database.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, payload BLOB)")
+    conn.commit()
+    backup_tool = DatabaseBackup(db_path=db_path, backup_dir=str(tmp_path / 'backups'))
+    backup_tool.retention = RetentionPolicy(hourly=1, daily=0, weekly=0, monthly=0)
+    for i in range(3):
+        conn.execute("INSERT INTO t (payload) VALUES (?)", (os.urandom(300 * 1024),))
+        conn.commit()
+        assert backup_tool.create_incremental_backup()
+        # 把已有快照移到更早的小时，使每个快照处在不同的时间段
+        for entry in backup_tool.catalog.entries(KIND_SNAPSHOT):
+            created = BackupCatalog.created_time(entry) - datetime.timedelta(hours=1)
+            backup_tool.catalog.update(entry['file'], created_at=created.isoformat(timespec='seconds'))
+    conn.close()
+
+    backup_tool.cleanup_old_backups()
+    snapshots = backup_tool.catalog.entries(KIND_SNAPSHOT)
+    assert len(snapshots) == 1
+    assert os.listdir(tmp_path / 'backups' / 'manifests') == [snapshots[0]['file']]
+    # 只剩最新快照引用的数据块
+    from incremental_backup import IncrementalBackup
+    incremental = IncrementalBackup(db_path, backup_tool.backup_dir)
+    referenced = set(incremental.load_manifest(snapshots[0]['file'])['chunks'])
+    stored = {name[:-2] for prefix in os.listdir(incremental.chunk_dir)
+              for name in os.listdir(os.path.join(incremental.chunk_dir, prefix))}
+    assert stored == referenced
+
+    smart = SmartBackup()
+    smart.backup_tool = backup_tool
+    smart.log_file = str(tmp_path / 'smart_backup_log.txt')
+    assert smart.execute_backup()
+    with open(smart.log_file, encoding='utf-8') as f:
+        log = f.read()
+    assert '保留策略: hourly 1' in log
+    assert len(backup_tool.catalog.entries(KIND_FULL)) == 1
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+测试变更日志：已提交事务（单对象 flush 与批量 DML）逐个记录，回滚不记录；备份登记变更日志位置，
+丢失数据库后由最新备份 + 重放恢复到最后一个已提交事务；分段轮换、写了一半的行、序号缺口与时间点。
+"""
+
+import sys
+import os
+import json
+import shutil
+import sqlite3
+import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import insert, update, delete
+from app import db
+from app.models import Customer, Course, TaobaoOrder, TrialCourseStat, CustomerDailyStat
+from app.services.changelog_service import ChangeLogService
+from app.services.config_service import ConfigService
+from app.services.search_service import SearchService
+from app.services.trial_stats_service import TrialStatsService
+from backup_database import DatabaseBackup
+from backup_restore import RestoreEngine, MODE_SWAP
+from change_log import (CAPTURED_TABLES, TIMELINES_FILE, ChangeLogWriter, changelog_dir, list_segments,
+                        prune_segments, read_position, replay, start_timeline)
+
+
+def _table_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {name: conn.execute(f'SELECT * FROM "{name}" ORDER BY id').fetchall() for name in CAPTURED_TABLES}
+    finally:
+        conn.close()
+
+
+def _position(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return read_position(conn)
+    finally:
+        conn.close()
+
+
+def test_latest_backup_plus_replay_recovers_lost_database(make_app, tmp_path):
+    workdir = str(tmp_path)
+    db_path = os.path.join(workdir, 'instance', 'database.sqlite')
+    os.makedirs(os.path.dirname(db_path))
+    tool = DatabaseBackup(db_path=db_path, backup_dir=os.path.join(workdir, 'backups'))
+    app = make_app(db_path)
+    with app.app_context():
+        customer = Customer(name='张三', phone='13800000001')
+        db.session.add_all([customer, TaobaoOrder(name='买家', amount=100, commission=5)])
+        db.session.commit()
+        tool.create_backup()
+        base = tool.catalog.latest()
+        # 备份登记了它包含的最后一个事务
+        assert base['changelog'] == {'timeline': ChangeLogService.position()['timeline'],
+                                     'lsn': ChangeLogService.position()['lsn']}
+
+        customer.name = '张三丰'
+        db.session.add(Course(name='试听课', customer_id=customer.id, is_trial=True, trial_price=20))
+        db.session.commit()
+        db.session.execute(insert(TaobaoOrder), [{'name': f'批量{i}', 'amount': i} for i in range(5)])
+        db.session.execute(update(TaobaoOrder).where(TaobaoOrder.amount < 3).values(settled=True))
+        db.session.commit()
+        db.session.execute(delete(TaobaoOrder).where(TaobaoOrder.name == '批量4'))
+        ConfigService.set_values({'trial_cost': '12'})
+        # 回滚的事务不记录
+        db.session.add(Customer(name='未提交', phone='13800000009'))
+        db.session.flush()
+        db.session.rollback()
+        position = ChangeLogService.position()
+        db.session.remove()
+        db.engine.dispose()
+
+    expected = _table_rows(db_path)
+    assert position['lsn'] == base['changelog']['lsn'] + 3
+    # 数据库文件丢失，只剩备份与变更日志
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    engine = RestoreEngine(tool, export_cache_dir=os.path.join(workdir, 'export_cache'))
+    result = engine.restore('latest', mode=MODE_SWAP, keep_current=False, progress=None, replay=True)
+    assert result['backup'] == base['file'] and result['replayed']['transactions'] == 3
+    assert result['replayed']['stopped'] is None
+    assert _table_rows(db_path) == expected
+    # 恢复后进入新的时间线，序号接着已重放的最后一个事务
+    lsn, timeline = _position(db_path)
+    assert lsn == position['lsn'] and timeline != position['timeline']
+    with open(os.path.join(changelog_dir(db_path), TIMELINES_FILE), encoding='utf-8') as f:
+        assert json.loads(f.readline())['parent'] == position['timeline']
+
+    # 派生数据在恢复时已重建；新时间线上的写入同样可以从原来的备份重放得到
+    app = make_app(db_path)
+    with app.app_context():
+        assert TrialCourseStat.query.count() > 0
+        db.session.add(Customer(name='李四', phone='13800000002'))
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+    expected = _table_rows(db_path)
+    result = engine.restore(base['file'], keep_current=False, progress=None, replay=True)
+    assert result['replayed']['transactions'] == 4
+    assert _table_rows(db_path) == expected
+
+
+def _assert_derived_consistent():
+    assert TrialStatsService.verify() == []
+    assert TrialStatsService.get_stats()[1]['total_trials'] == TrialStatsService.sql_stats()[1]['total_trials']
+    assert db.session.query(db.func.sum(CustomerDailyStat.new_customers)).scalar() == Customer.query.count()
+
+
+def test_online_restore_with_replay_while_app_is_running(make_app, tmp_path):
+    workdir = str(tmp_path)
+    db_path = os.path.join(workdir, 'instance', 'database.sqlite')
+    os.makedirs(os.path.dirname(db_path))
+    tool = DatabaseBackup(db_path=db_path, backup_dir=os.path.join(workdir, 'backups'))
+
+    def add_trial(n):
+        customer = Customer(name=f'学员{n}', phone=f'1380000{n:04d}')
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add(Course(name='试听课', customer_id=customer.id, is_trial=True, trial_price=20))
+        db.session.commit()
+
+    app = make_app(db_path)
+    with app.app_context():
+        add_trial(1)
+        tool.create_backup()
+        for n in range(2, 5):
+            add_trial(n)
+
+        # 应用不停止：online 恢复 + 重放，之后应用继续写入
+        result = RestoreEngine(tool).restore('latest', keep_current=False, progress=None, replay=True)
+        assert result['replayed']['transactions'] == 3
+        add_trial(5)
+        assert TrialStatsService.get_stats()[1]['total_trials'] == 5
+        _assert_derived_consistent()
+        assert len(SearchService.search('学员3', entity='customer')['hits']) == 1
+        db.session.remove()
+        db.engine.dispose()
+
+    # 重启后派生数据仍与业务数据一致
+    app = make_app(db_path)
+    with app.app_context():
+        assert TrialStatsService.get_stats()[1]['total_trials'] == 5
+        _assert_derived_consistent()
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_segments_rotation_torn_line_gap_and_point_in_time(tmp_path):
+    workdir = str(tmp_path)
+    db_path = os.path.join(workdir, 'database.sqlite')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE customer (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.commit()
+    conn.close()
+    timeline = start_timeline(db_path)['timeline']
+    log_dir = changelog_dir(db_path)
+
+    writer = ChangeLogWriter(log_dir, segment_bytes=200)
+    started = datetime.datetime(2026, 10, 1, 12)
+    for lsn in (1, 2, 3, 4, 5, 6, 8):
+        writer.append(lsn, timeline, [['customer', 'u', {'id': lsn, 'name': f'客户{lsn}'}]],
+                      ts=started + datetime.timedelta(minutes=lsn))
+    writer.close()
+    assert len(list_segments(log_dir)) > 1
+
+    # 时间点：只重放该时间之前提交的事务
+    point_copy = os.path.join(workdir, 'point.sqlite')
+    shutil.copy(db_path, point_copy)
+    result = replay(point_copy, log_dir, until=started + datetime.timedelta(minutes=3))
+    assert result['transactions'] == 3 and '时间点' in result['stopped']
+
+    # 序号 7 缺失：停在缺口之前
+    result = replay(db_path, log_dir)
+    assert (result['from_lsn'], result['to_lsn']) == (0, 6) and '序号 7' in result['stopped']
+    assert _position(db_path) == (6, timeline)
+
+    # 崩溃留下写了一半的行：读取时跳过，之后的追加不受影响
+    last_segment = list_segments(log_dir)[-1][2]
+    with open(last_segment, 'ab') as f:
+        f.write(b'{"lsn":7,"ts":"2026-10')
+    writer = ChangeLogWriter(log_dir, segment_bytes=10 * 1024)
+    writer.append(7, timeline, [['customer', 'd', {'id': 1}]], ts=started + datetime.timedelta(minutes=7))
+    writer.close()
+    result = replay(db_path, log_dir)
+    assert (result['transactions'], result['to_lsn'], result['stopped']) == (2, 8, None)
+    conn = sqlite3.connect(db_path)
+    assert [row[0] for row in conn.execute("SELECT id FROM customer ORDER BY id")] == [2, 3, 4, 5, 6, 8]
+    conn.close()
+
+    # 早于最早保留备份的分段可以删除，最新的分段总是保留
+    for _, _, path in list_segments(log_dir):
+        os.utime(path, (started.timestamp(), started.timestamp()))
+    segments = len(list_segments(log_dir))
+    assert prune_segments(log_dir, started + datetime.timedelta(days=1)) == segments - 1
+    assert len(list_segments(log_dir)) == 1
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+测试配置缓存：重复读取不查库，ORM 写入提交后立即失效，回滚不影响缓存。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event, text
+from app import db
+from app.models import Config
+from app.services.config_service import ConfigService
+from app.services.course_service import CourseService
+
+
+def test_config_cache_invalidation(make_app):
+    app = make_app()
+    with app.app_context():
+        ConfigService.set_values({'taobao_fee_rate': '0.6', 'course_cost': '80'})
+        assert ConfigService.fee_rates()['淘宝'] == 0.006
+        assert ConfigService.get_float('course_cost') == 80
+
+        # 缓存命中后不再查询配置表
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        for _ in range(5):
+            CourseService._get_taobao_fee_rate()
+            ConfigService.fee_rates()
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        assert not [s for s in statements if 'FROM config' in s]
+
+        # 绕过 ORM 直接改库不会触发失效（TTL 前返回缓存值）
+        db.session.execute(text("UPDATE config SET value = '5' WHERE key = 'course_cost'"))
+        db.session.commit()
+        assert ConfigService.get('course_cost') == '80'
+
+        # ORM 修改提交后立即生效
+        item = Config.query.filter_by(key='taobao_fee_rate').first()
+        item.value = '1.2'
+        db.session.commit()
+        assert abs(CourseService._get_taobao_fee_rate() - 0.012) < 1e-12
+        assert ConfigService.get('course_cost') == '5'
+
+        # 回滚的修改不影响缓存
+        item.value = '9'
+        db.session.flush()
+        db.session.rollback()
+        assert ConfigService.get_float('taobao_fee_rate') == 1.2
+
+        # 未配置与格式错误时使用默认值
+        assert ConfigService.get_float('trial_cost', 0.5) == 0.5
+        ConfigService.set_values({'trial_cost': 'abc'})
+        assert ConfigService.get_float('trial_cost', 0.5) == 0.5
+
+
+def test_config_cache_is_per_database(make_app):
+    first, second = make_app(), make_app()
+    with first.app_context():
+        ConfigService.set_values({'course_cost': '80'})
+        assert ConfigService.get('course_cost') == '80'
+    with second.app_context():
+        assert ConfigService.get('course_cost') is None
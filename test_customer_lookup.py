@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+测试客户检索：姓名前缀、手机号开头/尾号、拼音首字母（需要 pypinyin），检索键随写入维护。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import text
+from app import db
+from app.models import Customer
+from app.services.customer_lookup_service import CustomerLookupService, pinyin_available
+
+
+def _seed():
+    db.session.add_all([
+        Customer(name='张三', phone='13800001234'),
+        Customer(name='张三丰', phone='13900005678'),
+        Customer(name='李四', phone='15000001234'),
+        Customer(name='王五', phone='18600009999'),
+    ])
+    db.session.commit()
+
+
+def _names(results):
+    return [item['name'] for item in results]
+
+
+def test_lookup_by_name_and_phone(make_app):
+    app = make_app()
+    with app.app_context():
+        _seed()
+        client = app.test_client()
+
+        data = client.get('/api/v1/customers/lookup?q=张三').get_json()
+        assert data['success'] and _names(data['data']) == ['张三', '张三丰']
+
+        # 手机号开头与尾号
+        assert _names(CustomerLookupService.search('1860')) == ['王五']
+        assert sorted(_names(CustomerLookupService.search('1234'))) == ['张三', '李四']
+        # 过短的数字不按手机号匹配
+        assert CustomerLookupService.search('12') == []
+        assert CustomerLookupService.search('  ') == []
+        assert len(CustomerLookupService.search('张', limit=1)) == 1
+
+        # 修改手机号后检索键同步更新
+        customer = Customer.query.filter_by(name='王五').first()
+        customer.phone = '18700004321'
+        db.session.commit()
+        assert _names(CustomerLookupService.search('4321')) == ['王五']
+
+        # 绕过 ORM 写入的客户由 ensure_initialized 补齐
+        db.session.execute(text("INSERT INTO customer (name, phone) VALUES ('赵六', '13600002468')"))
+        db.session.commit()
+        assert CustomerLookupService.search('2468') == []
+        assert CustomerLookupService.ensure_initialized() == 1
+        assert _names(CustomerLookupService.search('2468')) == ['赵六']
+
+
+def test_lookup_by_pinyin_initials(make_app):
+    if not pinyin_available():
+        pytest.skip('未安装 pypinyin')
+    app = make_app()
+    with app.app_context():
+        _seed()
+        assert _names(CustomerLookupService.search('zs')) == ['张三', '张三丰']
+        assert _names(CustomerLookupService.search('ZSF')) == ['张三丰']
+        assert _names(CustomerLookupService.search('ls')) == ['李四']
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+测试首页统计快照：缓存命中不查库，客户/订单写入提交后失效，每日新增汇总随写入增量维护。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+from sqlalchemy import event, func
+from app import db
+from app.models import Customer, CustomerDailyStat, TaobaoOrder
+from app.services.dashboard_service import DashboardService
+
+
+def _scan_new_customers():
+    month_start = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return Customer.query.filter(Customer.created_at >= month_start).count()
+
+
+def test_dashboard_snapshot_cache_and_daily_rollup(make_app):
+    app = make_app()
+    with app.app_context():
+        old = datetime.now().replace(day=1) - timedelta(days=40)
+        db.session.add_all([
+            Customer(name='本月一', phone='13800000001'),
+            Customer(name='本月二', phone='13800000002'),
+            Customer(name='上月', phone='13800000003', created_at=old),
+            TaobaoOrder(name='买家', amount=100, commission=5),
+        ])
+        db.session.commit()
+
+        snapshot = DashboardService.get_snapshot()
+        assert snapshot['total_customers'] == 3
+        assert snapshot['new_customers'] == _scan_new_customers() == 2
+        assert snapshot['total_orders'] == 1 and snapshot['total_order_amount'] == 100
+        assert len(snapshot['recent_customers']) == 3
+
+        # 缓存命中时不查询数据库
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        assert DashboardService.get_snapshot() is snapshot
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        assert statements == []
+
+        # 订单写入提交后失效
+        db.session.add(TaobaoOrder(name='买家2', amount=50, commission=5))
+        db.session.commit()
+        assert DashboardService.get_snapshot()['total_order_amount'] == 150
+
+        # 客户改录入日期、删除后日汇总同步
+        moved = Customer.query.filter_by(name='本月二').first()
+        moved.created_at = old
+        db.session.commit()
+        assert DashboardService.get_snapshot()['new_customers'] == _scan_new_customers() == 1
+
+        db.session.delete(Customer.query.filter_by(name='本月一').first())
+        db.session.commit()
+        snapshot = DashboardService.get_snapshot()
+        assert snapshot['total_customers'] == 2 and snapshot['new_customers'] == 0
+        assert db.session.query(func.sum(CustomerDailyStat.new_customers)).scalar() == 2
+
+        # 回滚的写入不影响汇总
+        db.session.add(Customer(name='回滚', phone='13800000004'))
+        db.session.flush()
+        db.session.rollback()
+        assert DashboardService.new_customers_since(datetime.now().replace(day=1).date()) == 0
+
+        # 全量重建与增量结果一致
+        before = {row.stat_date: row.new_customers for row in CustomerDailyStat.query if row.new_customers}
+        DashboardService.rebuild_daily_stats()
+        assert {row.stat_date: row.new_customers for row in CustomerDailyStat.query} == before
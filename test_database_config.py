@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+测试数据库引擎配置：SQLite 连接应用 WAL 等 PRAGMA，并按库类型选择连接池。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy.pool import QueuePool, StaticPool
+from app import db
+from app.database import engine_options
+from config import Config as AppConfig
+
+
+def test_sqlite_file_pragmas_and_pool(make_app):
+    app = make_app()
+    with app.app_context():
+        pragma = lambda name: db.session.execute(db.text(f'PRAGMA {name}')).scalar()  # noqa: E731
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == AppConfig.SQLITE_PRAGMAS['busy_timeout']
+        assert pragma('temp_store') == 2  # MEMORY
+        assert isinstance(db.engine.pool, QueuePool)
+        assert db.engine.pool.size() == AppConfig.SQLITE_POOL_SIZE
+
+
+def test_engine_options_by_backend():
+    memory = engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+                             'SQLALCHEMY_ENGINE_OPTIONS': AppConfig.SQLALCHEMY_ENGINE_OPTIONS})
+    assert memory['poolclass'] is StaticPool
+    assert 'pool_size' not in memory and 'pool_pre_ping' not in memory
+
+    # 网络数据库保持原有连接池参数
+    postgres = engine_options({'SQLALCHEMY_DATABASE_URI': 'postgresql://u:p@localhost/db',
+                               'SQLALCHEMY_ENGINE_OPTIONS': AppConfig.SQLALCHEMY_ENGINE_OPTIONS})
+    assert postgres == AppConfig.SQLALCHEMY_ENGINE_OPTIONS
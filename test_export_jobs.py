@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+测试后台导出任务：提交/轮询/下载、按数据版本复用缓存文件、筛选条件。
+"""
+
+import sys
+import os
+import csv
+import time
+from io import StringIO
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import TaobaoOrder
+from app.services.data_version_service import DataVersionService
+
+
+def _seed(count=30):
+    base_time = datetime(2025, 3, 1)
+    for i in range(count):
+        db.session.add(TaobaoOrder(name=f'买家{i}', level='钻1' if i % 2 else '钻2', amount=100 + i,
+                                   commission=5, taobao_fee=0.6, settled=i % 3 == 0,
+                                   order_time=base_time + timedelta(hours=i)))
+    db.session.commit()
+
+
+def _submit_and_wait(client, payload):
+    response = client.post('/api/v1/exports', json=payload)
+    assert response.status_code == 202
+    job = response.get_json()['data']
+    deadline = time.time() + 10
+    while job['status'] not in ('done', 'failed') and time.time() < deadline:
+        time.sleep(0.05)
+        job = client.get(f"/api/v1/exports/{job['job_id']}").get_json()['data']
+    assert job['status'] == 'done', job
+    return job
+
+
+def test_export_job_cache_and_filters(make_app):
+    app = make_app()
+    with app.app_context():
+        _seed()
+        client = app.test_client()
+        payload = {'dataset': 'taobao_orders', 'format': 'csv', 'filters': {'level': '钻1', 'sort': 'amount'}}
+
+        job = _submit_and_wait(client, payload)
+        assert job['cached'] is False and job['progress'] == 100
+        rows = list(csv.reader(StringIO(client.get(job['download_url']).data.decode('utf-8-sig'))))
+        assert len(rows) == 16 and all(row[3] == '钻1' for row in rows[1:])
+
+        # 数据未变化：直接复用缓存文件
+        again = client.post('/api/v1/exports', json=payload).get_json()['data']
+        assert again['status'] == 'done' and again['cached'] is True
+
+        # 修改订单后版本号变化，重新生成
+        order = TaobaoOrder.query.filter_by(level='钻1').first()
+        order.amount = 999
+        db.session.commit()
+        assert _submit_and_wait(client, payload)['cached'] is False
+
+        # 批量 UPDATE 同样使缓存失效
+        version = DataVersionService.get_versions(['taobao_order'])['taobao_order']
+        TaobaoOrder.query.filter_by(level='钻1').update({'settled': True})
+        db.session.commit()
+        assert DataVersionService.get_versions(['taobao_order'])['taobao_order'] == version + 1
+        assert _submit_and_wait(client, payload)['cached'] is False
+
+
+def test_export_job_validation(make_app):
+    app = make_app()
+    with app.app_context():
+        client = app.test_client()
+        assert client.post('/api/v1/exports', json={'dataset': 'nope'}).status_code == 400
+        assert client.post('/api/v1/exports', json={'dataset': 'taobao_orders', 'format': 'pdf'}).status_code == 400
+        assert client.post('/api/v1/exports', json={
+            'dataset': 'taobao_orders', 'filters': {'settled': 'maybe'}
+        }).status_code == 400
+        assert client.get('/api/v1/exports/unknown').status_code == 404
+        assert client.get('/api/v1/exports/unknown/download').status_code == 404
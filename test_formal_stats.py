@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+测试正课统计：单次 SQL 聚合结果与逐条计算一致，分组统计与非法分组维度。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import Customer, Course
+from app.services.config_service import ConfigService
+from app.services.formal_stats_service import FormalStatsService
+
+
+COURSES = [
+    # course_type, payment_channel, sessions, price, cost, gift_sessions
+    ('单词课', '淘宝', 10, 100.0, 300.0, 2),
+    ('单词课', '微信', 20, 90.0, 500.0, 0),
+    ('语法课', '淘宝', 5, 120.0, 150.0, 1),
+    ('阅读课', None, 8, 110.0, 200.0, None),
+]
+
+
+def _seed():
+    customer = Customer(name='统计测试', phone='13800009999')
+    db.session.add(customer)
+    db.session.flush()
+    for i, (course_type, channel, sessions, price, cost, gift) in enumerate(COURSES):
+        db.session.add(Course(name=f'正课{i}', customer_id=customer.id, is_trial=False,
+                              course_type=course_type, payment_channel=channel, sessions=sessions,
+                              price=price, cost=cost, gift_sessions=gift))
+    # 试听课不计入正课统计
+    db.session.add(Course(name='试听', customer_id=customer.id, is_trial=True, trial_price=50,
+                          sessions=1, price=50, cost=10, payment_channel='淘宝'))
+    db.session.commit()
+
+
+def _expected(courses, fee_rate):
+    revenue = sum(s * p for _, _, s, p, _, _ in courses)
+    fees = sum(s * p * fee_rate for _, ch, s, p, _, _ in courses if ch == '淘宝')
+    cost = sum(c for *_, c, _ in courses)
+    return revenue - fees, fees, cost
+
+
+def test_formal_stats_totals_and_breakdown(make_app):
+    app = make_app()
+    with app.app_context():
+        ConfigService.set_values({'taobao_fee_rate': '0.6'})
+        _seed()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        stats = FormalStatsService.get_stats()
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        assert len([s for s in statements if 'FROM course' in s]) == 1
+
+        revenue, fees, cost = _expected(COURSES, 0.006)
+        assert stats['total_courses'] == 4
+        assert stats['total_revenue'] == pytest.approx(revenue)
+        assert stats['total_fees'] == pytest.approx(fees)
+        assert stats['total_cost'] == pytest.approx(cost)
+        assert stats['total_profit'] == pytest.approx(revenue - cost)
+        assert stats['total_sessions'] == 43
+        assert stats['total_gift_sessions'] == 3
+
+        by_type = FormalStatsService.get_stats(breakdown='course_type')
+        assert set(by_type) == {'单词课', '语法课', '阅读课'}
+        assert by_type['单词课']['total_courses'] == 2
+        assert by_type['单词课']['total_revenue'] == pytest.approx(_expected(COURSES[:2], 0.006)[0])
+
+        by_channel = FormalStatsService.get_stats(breakdown='payment_channel')
+        assert set(by_channel) == {'淘宝', '微信', '未设置'}
+        assert by_channel['淘宝']['total_fees'] == pytest.approx(fees)
+        assert by_channel['微信']['total_fees'] == 0
+
+        with pytest.raises(ValueError):
+            FormalStatsService.get_stats(breakdown='customer_id')
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+测试增量备份：无变化时跳过，只保存变化的数据块，按清单还原的数据库与源库一致；
+创建快照与回收数据块互斥。
+"""
+
+import sys
+import os
+import time
+import sqlite3
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from incremental_backup import IncrementalBackup
+from backup_database import DatabaseBackup
+
+
+def _make_db(path, rows=20000):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE customer (id INTEGER PRIMARY KEY, name TEXT, note TEXT)")
+    conn.executemany("INSERT INTO customer (name, note) VALUES (?, ?)",
+                     [(f'客户{i}', 'x' * 100) for i in range(rows)])
+    conn.commit()
+    return conn
+
+
+def _dump(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT id, name, note FROM customer ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_incremental_snapshots(tmp_path):
+    work_dir = str(tmp_path)
+    db_path = os.path.join(work_dir, 'database.sqlite')
+    backup_dir = os.path.join(work_dir, 'backups')
+    conn = _make_db(db_path)
+    backup = IncrementalBackup(db_path, backup_dir)
+
+    first = backup.create_snapshot()
+    assert first is not None and first['new_chunks'] == len(first['chunks'])
+    # 无变化：跳过
+    assert backup.create_snapshot() is None
+
+    conn.execute("UPDATE customer SET name = '改名' WHERE id = 5")
+    conn.commit()
+    second = backup.create_snapshot()
+    assert second is not None
+    # 只修改了一页：大部分数据块复用
+    assert 0 < second['new_chunks'] < len(second['chunks']) / 2
+    assert len(backup.list_manifests()) == 2
+
+    restored = os.path.join(work_dir, 'restored.sqlite')
+    backup.materialize(second['name'], restored)
+    assert _dump(restored) == _dump(db_path)
+
+    # 删除旧清单后回收不再引用的数据块
+    os.remove(os.path.join(backup.manifest_dir, first['name']))
+    assert backup.collect_garbage() == second['new_chunks']
+    backup.materialize(second['name'], restored)
+    conn.close()
+
+
+def test_restore_snapshot_through_database_backup(tmp_path):
+    work_dir = str(tmp_path)
+    db_path = os.path.join(work_dir, 'database.sqlite')
+    conn = _make_db(db_path, rows=100)
+    tool = DatabaseBackup(db_path=db_path, backup_dir=os.path.join(work_dir, 'backups'))
+    manifest = tool.create_incremental_backup()
+    conn.execute("DELETE FROM customer")
+    conn.commit()
+    conn.close()
+
+    assert tool.restore_backup(manifest['name'])
+    assert len(_dump(db_path)) == 100
+
+
+def test_garbage_collection_waits_for_snapshot_in_progress(tmp_path):
+    work_dir = str(tmp_path)
+    db_path = os.path.join(work_dir, 'database.sqlite')
+    conn = _make_db(db_path, rows=100)
+    backup = IncrementalBackup(db_path, os.path.join(work_dir, 'backups'))
+    first = backup.create_snapshot()
+    os.remove(os.path.join(backup.manifest_dir, first['name']))
+
+    # 快照进行中：数据块已写入（或复用）但清单尚未写入，回收要等快照完成
+    results = []
+    with backup.chunk_lock():
+        worker = threading.Thread(target=lambda: results.append(backup.collect_garbage()))
+        worker.start()
+        time.sleep(0.3)
+        assert worker.is_alive()
+        assert backup.collect_garbage(timeout=0.1) == 0
+        backup.write_manifest(dict(first, name='snapshot_20991231_000000.json'))
+    worker.join()
+    assert results == [0] and not os.path.exists(backup.lock_path)
+    assert backup.materialize('snapshot_20991231_000000.json', os.path.join(work_dir, 'restored.sqlite'))
+
+    # 进程异常退出留下的锁文件过期后不再阻塞
+    with open(backup.lock_path, 'w') as f:
+        f.write('0')
+    os.utime(backup.lock_path, (time.time() - 7200, time.time() - 7200))
+    conn.execute("DELETE FROM customer WHERE id > 50")
+    conn.commit()
+    conn.close()
+    assert backup.create_snapshot() is not None
+    assert not os.path.exists(backup.lock_path)
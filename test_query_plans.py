@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+测试主要列表/统计查询的 EXPLAIN QUERY PLAN：必须命中索引，不能退化为全表扫描或临时排序；
+以及索引迁移脚本可重复执行。
+"""
+
+import sys
+import os
+import sqlite3
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import Customer, Course, TaobaoOrder
+from app.services.taobao_order_service import TaobaoOrderService
+from app.services.trial_course_service import TrialCourseService
+from app.services.pagination import keyset_order
+from migrate_indexes import migrate_indexes, index_statements
+
+
+def _plan(query):
+    """返回查询计划的 detail 列表"""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def _assert_indexed(query, table, ordered=True):
+    details = _plan(query)
+    full_scans = [d for d in details if d.startswith(f'SCAN {table}') and 'USING' not in d]
+    assert not full_scans, details
+    assert any(d.startswith(('SEARCH ' + table, 'SCAN ' + table)) and 'INDEX' in d for d in details), details
+    if ordered:
+        assert not any('TEMP B-TREE' in d for d in details), details
+
+
+def test_hot_queries_use_indexes(make_app):
+    app = make_app()
+    with app.app_context():
+        # 试听课列表：is_trial 筛选 + created_at 倒序键集分页
+        query = db.session.query(Course, Customer).join(Customer, Course.customer_id == Customer.id).filter(
+            *TrialCourseService.filter_conditions()
+        ).order_by(*keyset_order(Course.created_at, Course.id, True)).limit(51)
+        _assert_indexed(query, 'course')
+
+        # 正课列表
+        _assert_indexed(Course.query.filter(Course.is_trial == False).order_by(Course.created_at.desc()), 'course')
+
+        # 试听课状态/渠道统计
+        _assert_indexed(
+            db.session.query(Course.trial_status, Course.source, db.func.count(Course.id))
+            .filter(Course.is_trial == True, Course.trial_status == 'refunded')
+            .group_by(Course.trial_status, Course.source), 'course', ordered=False)
+
+        # 客户的试听课（添加试听课时的重复检查）
+        _assert_indexed(Course.query.filter_by(customer_id=1, is_trial=True), 'course', ordered=False)
+
+        # 刷单列表：默认按刷单时间倒序，以及按结算状态筛选
+        _assert_indexed(TaobaoOrder.query.order_by(
+            *keyset_order(TaobaoOrder.order_time, TaobaoOrder.id, True)).limit(51), 'taobao_order')
+        _assert_indexed(TaobaoOrder.query.filter(
+            *TaobaoOrderService.filter_conditions(settled='false')
+        ).order_by(TaobaoOrder.order_time.desc()), 'taobao_order')
+
+        # 客户列表
+        _assert_indexed(Customer.query.order_by(Customer.created_at.desc()), 'customer')
+
+
+def test_migrate_indexes_is_idempotent(make_app, tmp_path):
+    db_path = str(tmp_path / 'test_query_plans.sqlite')
+    app = make_app(db_path)
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+    # 模拟旧数据库：删除模型声明的索引
+    expected = [name for _, name, _ in index_statements()]
+    conn = sqlite3.connect(db_path)
+    for name in expected:
+        conn.execute(f'DROP INDEX {name}')
+    conn.commit()
+    conn.close()
+
+    assert sorted(migrate_indexes(db_path, verbose=False)) == sorted(expected)
+    assert migrate_indexes(db_path, verbose=False) == []
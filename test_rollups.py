@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试时间分桶汇总：日/月报表与明细一致，增量刷新（新增、修改、删除、改日期）与全量重建结果一致。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from datetime import datetime
+from app import db
+from app.models import Customer, Course, TaobaoOrder, TrialRollup, FormalRevenueRollup, TaobaoOrderRollup
+from app.services.config_service import ConfigService
+from app.services.rollup_service import RollupService
+
+
+def _snapshot():
+    """汇总表全部内容（用于比较增量与全量结果）"""
+    result = {}
+    for model in (TrialRollup, FormalRevenueRollup, TaobaoOrderRollup):
+        columns = [c.name for c in model.__table__.columns if c.name != 'id']
+        result[model.__tablename__] = sorted(
+            tuple(getattr(row, name) for name in columns) for row in model.query.all()
+        )
+    return result
+
+
+def _seed():
+    customer = Customer(name='汇总测试', phone='13800007777')
+    db.session.add(customer)
+    db.session.flush()
+    db.session.add_all([
+        Course(name='试听课', customer_id=customer.id, is_trial=True, trial_price=10, source='淘宝',
+               trial_status='converted', created_at=datetime(2024, 1, 5, 9)),
+        Course(name='试听课', customer_id=customer.id, is_trial=True, trial_price=20, source='抖音',
+               trial_status='refunded', refund_amount=20, created_at=datetime(2024, 1, 20, 9)),
+        Course(name='试听课', customer_id=customer.id, is_trial=True, trial_price=30, source='淘宝',
+               created_at=datetime(2024, 2, 3, 9)),
+        Course(name='正课', customer_id=customer.id, is_trial=False, sessions=10, price=100, cost=300,
+               payment_channel='淘宝', course_type='单词课', created_at=datetime(2024, 1, 5, 10)),
+        Course(name='正课', customer_id=customer.id, is_trial=False, sessions=5, price=80, cost=100,
+               payment_channel='微信', course_type='语法课', created_at=datetime(2024, 2, 10, 10)),
+        TaobaoOrder(name='买家1', amount=100, commission=5, taobao_fee=0.6, settled=True,
+                    order_time=datetime(2024, 1, 5, 12)),
+        TaobaoOrder(name='买家2', amount=50, commission=3, taobao_fee=0.3,
+                    order_time=datetime(2024, 1, 6, 12)),
+    ])
+    db.session.commit()
+
+
+def test_rollup_reports_and_incremental_refresh(make_app):
+    app = make_app()
+    with app.app_context():
+        ConfigService.set_values({'taobao_fee_rate': '1'})
+        _seed()
+        RollupService.refresh()
+
+        trials = RollupService.report('trials', 'month')
+        assert [(row['period'], row['registrations'], row['conversions'], row['refunds']) for row in trials] == [
+            ('2024-01', 2, 1, 1), ('2024-02', 1, 0, 0)]
+        by_source = RollupService.report('trials', 'month', breakdown='source', end=datetime(2024, 1, 31).date())
+        assert {(row['source'], row['trial_revenue']) for row in by_source} == {('淘宝', 10), ('抖音', 20)}
+
+        formal = RollupService.report('formal_revenue', 'month')
+        assert formal[0]['gross_revenue'] == 1000 and formal[0]['fees'] == pytest.approx(10)
+        assert formal[0]['profit'] == pytest.approx(1000 - 10 - 300)
+        assert formal[1]['fees'] == 0
+
+        orders = RollupService.report('taobao_orders', 'day', breakdown='settled')
+        assert [(row['period'], row['settled'], row['amount']) for row in orders] == [
+            ('2024-01-05', True, 100), ('2024-01-06', False, 50)]
+
+        # 增量：新增、修改字段、修改归属日期、删除
+        order = TaobaoOrder.query.filter_by(name='买家2').first()
+        order.settled = True
+        moved = TaobaoOrder.query.filter_by(name='买家1').first()
+        moved.order_time = datetime(2024, 3, 1, 12)
+        trial = Course.query.filter_by(is_trial=True, source='抖音').first()
+        db.session.delete(trial)
+        db.session.add(TaobaoOrder(name='买家3', amount=10, commission=1, order_time=datetime(2024, 1, 6, 13)))
+        db.session.commit()
+
+        result = RollupService.refresh()
+        assert result['taobao_order'] >= 2 and result['course'] >= 1
+        incremental = _snapshot()
+        RollupService.refresh(full=True)
+        assert _snapshot() == incremental
+
+        orders = RollupService.report('taobao_orders', 'month')
+        assert [(row['period'], row['orders'], row['amount']) for row in orders] == [
+            ('2024-01', 2, 60), ('2024-03', 1, 100)]
+        assert RollupService.report('trials', 'month')[0]['registrations'] == 1
+
+        # 无变化时不重算
+        assert RollupService.refresh() == {'course': 0, 'taobao_order': 0}
+
+        response = app.test_client().get('/api/v1/reports/formal_revenue?grain=month&breakdown=course_type')
+        data = response.get_json()
+        assert data['success'] and {row['course_type'] for row in data['data']} == {'单词课', '语法课'}
+        assert app.test_client().get('/api/v1/reports/unknown').status_code == 400
+        assert app.test_client().get('/api/v1/reports/trials?start=2024-13-01').status_code == 400
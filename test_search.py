@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+测试全文检索：中文二元组与单字、手机尾号、跨实体排序，ORM 增删改同步索引，LIKE 兜底。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime
+from sqlalchemy import text
+from app import db
+from app.models import Customer, Course, TaobaoOrder
+from app.services import search_service
+from app.services.search_service import SearchService
+
+
+def _seed():
+    zhang = Customer(name='张三丰', phone='13800001234', region='成都', grade='初中')
+    db.session.add_all([
+        zhang,
+        Customer(name='李四', phone='15000005678', region='北京', grade='高中'),
+        TaobaoOrder(name='张三丰', amount=100, commission=5, order_time=datetime(2024, 5, 1, 10, 0)),
+        TaobaoOrder(name='王五', amount=80, commission=5, order_time=datetime(2024, 5, 2, 10, 0)),
+    ])
+    db.session.flush()
+    db.session.add(Course(name='试听课', customer_id=zhang.id, is_trial=True, trial_price=9.9))
+    db.session.commit()
+    return zhang
+
+
+def _hits(query, **kwargs):
+    return [(hit['type'], hit['title']) for hit in SearchService.search(query, **kwargs)['hits']]
+
+
+def test_fts_search_and_sync(make_app):
+    app = make_app()
+    with app.app_context():
+        assert SearchService.is_enabled()
+        zhang = _seed()
+
+        response = app.test_client().get('/api/v1/search?q=三丰').get_json()
+        assert response['success'] and response['data']['engine'] == 'fts5'
+        assert sorted(hit['type'] for hit in response['data']['hits']) == ['customer', 'taobao_order']
+        customer_hit = [hit for hit in response['data']['hits'] if hit['type'] == 'customer'][0]
+        assert customer_hit['data']['trial_course_id'] is not None
+
+        assert _hits('丰', entity='customer') == [('customer', '张三丰')]
+        assert _hits('1234') == [('customer', '张三丰')]
+        assert _hits('北京 高中') == [('customer', '李四')]
+        assert _hits('张丰') == []
+        assert _hits('王五', entity='taobao_order') == [('taobao_order', '王五')]
+        assert SearchService.search('   ')['hits'] == []
+
+        # 修改、删除经 ORM 同步索引
+        zhang.name = '张无忌'
+        db.session.commit()
+        assert _hits('无忌') == [('customer', '张无忌')]
+        assert _hits('三丰', entity='customer') == []
+
+        order = TaobaoOrder.query.filter_by(name='王五').first()
+        db.session.delete(order)
+        db.session.commit()
+        assert _hits('王五') == []
+        count = db.session.execute(text("SELECT count(*) FROM search_index")).scalar()
+        assert count == 3
+
+        # 绕过 ORM 写入后重建
+        db.session.execute(text("INSERT INTO customer (name, phone) VALUES ('赵六', '13600002468')"))
+        db.session.commit()
+        assert _hits('赵六') == []
+        assert SearchService.rebuild() == 4
+        assert _hits('赵六') == [('customer', '赵六')]
+
+
+def test_like_fallback(make_app):
+    app = make_app()
+    with app.app_context():
+        _seed()
+        search_service._enabled_urls.discard(str(db.engine.url))
+        try:
+            result = SearchService.search('三丰')
+            assert result['engine'] == 'like'
+            assert sorted(hit['type'] for hit in result['hits']) == ['customer', 'taobao_order']
+        finally:
+            search_service._enabled_urls.add(str(db.engine.url))
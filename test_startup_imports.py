@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+测试应用启动不加载 pandas / openpyxl（导出依赖应在首次导出时延迟导入）。
+"""
+
+import sys
+import os
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_create_app_does_not_import_heavy_modules(tmp_path):
+    db_path = str(tmp_path / 'test_startup_imports.sqlite')
+    code = f'''
+import json, sys
+sys.path.insert(0, {ROOT!r})
+from app import create_app
+from config import Config
+
+class TestConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + {db_path!r}
+
+create_app(TestConfig)
+print(json.dumps([name for name in ('pandas', 'numpy', 'openpyxl') if name in sys.modules]))
+'''
+    # 在全新进程中检查，避免受其他测试已导入模块的影响
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True,
+                            text=True, cwd=ROOT).stdout
+    assert json.loads(output.strip().splitlines()[-1]) == []
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+测试流式导出：xlsx 只写工作簿与分块 CSV 的内容与原导出列一致。
+"""
+
+import sys
+import os
+import csv
+from io import BytesIO, StringIO
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from flask import current_app
+from openpyxl import load_workbook
+from app import db
+from app.models import Customer, Course, TaobaoOrder
+from app.services.export_service import ExportService, EXPORT_DATASETS
+
+
+def _seed():
+    base_time = datetime(2025, 1, 1)
+    for i in range(5):
+        customer = Customer(name=f'学员{i}', phone=f'1380000000{i}')
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add(Course(customer_id=customer.id, is_trial=True, name='试听课',
+                              trial_price=19.9, cost=10, source='淘宝', created_at=base_time + timedelta(hours=i)))
+        db.session.add(Course(customer_id=customer.id, is_trial=False, name='正课', course_type='单词课',
+                              sessions=10, price=1000, cost=300, other_cost=50, payment_channel='微信',
+                              created_at=base_time + timedelta(hours=i)))
+    for i in range(2500):
+        db.session.add(TaobaoOrder(name=f'买家{i}', level='钻1', amount=100, commission=5,
+                                   taobao_fee=0.6, order_time=base_time + timedelta(minutes=i)))
+    db.session.commit()
+
+
+def _export(dataset, export_format='xlsx'):
+    with current_app.test_request_context():
+        return ExportService.stream_response(dataset, dataset, export_format)
+
+
+def test_xlsx_export_matches_columns(make_app):
+    app = make_app()
+    with app.app_context():
+        _seed()
+        response = _export('formal_courses')
+        assert response.status_code == 200
+        sheet = load_workbook(BytesIO(response.get_data()), read_only=True)['正课数据']
+        rows = list(sheet.values)
+        assert list(rows[0]) == EXPORT_DATASETS['formal_courses']['headers']
+        assert len(rows) == 6
+        # 利润 = 售价 - 成本 - 其他成本
+        assert rows[1][9] == 650
+
+        response = _export('taobao_orders')
+        sheet = load_workbook(BytesIO(response.get_data()), read_only=True)['刷单数据']
+        assert sum(1 for _ in sheet.values) == 2501
+
+
+def test_csv_export_streams_in_chunks(make_app):
+    app = make_app()
+    with app.app_context():
+        _seed()
+        chunks = list(ExportService.iter_csv('taobao_orders', batch_size=1000))
+        # 表头 + 3 批数据
+        assert len(chunks) == 4
+
+        response = _export('trial_courses', 'csv')
+        assert response.mimetype == 'text/csv'
+        rows = list(csv.reader(StringIO(response.get_data().decode('utf-8-sig'))))
+        assert rows[0] == EXPORT_DATASETS['trial_courses']['headers']
+        assert len(rows) == 6 and rows[1][1].startswith('学员')
+
+        with pytest.raises(ValueError):
+            _export('trial_courses', 'pdf')
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+测试学员批量导入：已有手机号一次解析、每个客户只建一条试听课、批量插入一次提交，相关汇总同步更新。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+from app import db
+from app.models import Course, Customer
+from app.services.customer_lookup_service import CustomerLookupService
+from app.services.dashboard_service import DashboardService
+from app.services.data_version_service import DataVersionService
+from app.services.search_service import SearchService
+from app.services.trial_stats_service import TrialStatsService
+
+
+def test_import_students_with_trials(make_app):
+    app = make_app()
+    with app.app_context():
+        with_trial = Customer(name='老学员', phone='13900000001')
+        without_trial = Customer(name='无试听', phone='13900000002')
+        db.session.add_all([with_trial, without_trial])
+        db.session.flush()
+        db.session.add(Course(name='试听课', customer_id=with_trial.id, is_trial=True, trial_price=20,
+                              source='淘宝', trial_status='registered'))
+        db.session.commit()
+
+        version = DataVersionService.get_versions(['course'])['course']
+
+        students = [{'name': f'新学员{i}', 'phone': f'1380000{i:04d}', 'grade': '初中'} for i in range(30)]
+        students += [
+            {'name': '老学员', 'phone': '13900000001'},           # 已有试听课：跳过
+            {'phone': '13900000002', 'trial_price': 39},        # 已有客户：补建试听课
+            {'name': '重复', 'phone': '13800000000'},            # 批次内重复
+            {'name': '无手机号'},
+            {'name': '价格错误', 'phone': '13700000000', 'trial_price': 'abc'},
+        ]
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        client = app.test_client()
+        response = client.post('/api/v1/customers/import', json={
+            'students': students, 'trial': {'trial_price': 29.9, 'source': '抖音'}
+        })
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        data = response.get_json()['data']
+
+        assert data['created_customers'] == 30 and data['existing_customers'] == 2
+        assert data['created_trials'] == 31 and data['skipped_trials'] == 1
+        assert [error['index'] for error in data['errors']] == [32, 33, 34]
+        # 已有手机号一次查询，客户与试听课各一条多行 INSERT
+        assert len([s for s in statements if s.lstrip().upper().startswith('INSERT INTO CUSTOMER ')]) == 1
+        assert len([s for s in statements if s.lstrip().upper().startswith('INSERT INTO COURSE ')]) == 1
+        assert len([s for s in statements if 'customer.phone IN' in s]) == 1
+
+        assert Customer.query.count() == 32
+        assert Course.query.filter_by(is_trial=True).count() == 32
+        assert Course.query.filter_by(customer_id=without_trial.id, is_trial=True).one().trial_price == 39
+        item = next(item for item in data['items'] if item['phone'] == '13800000005')
+        assert db.session.get(Course, item['trial_course_id']).customer_id == item['customer_id']
+
+        # 派生数据在同一事务中同步维护
+        assert TrialStatsService.verify() == []
+        hits = SearchService.search('新学员', entity='customer', limit=100)['hits']
+        assert len(hits) == 30
+        assert CustomerLookupService.search('0005')[0]['phone'] == '13800000005'
+        assert DashboardService.get_snapshot()['new_customers'] == 32
+        assert DataVersionService.get_versions(['course'])['course'] > version
+
+
+def test_import_students_dry_run_and_invalid_request(make_app):
+    app = make_app()
+    with app.app_context():
+        client = app.test_client()
+        response = client.post('/api/v1/customers/import', json={
+            'students': [{'phone': '13600000000', 'trial_price': 10}], 'dry_run': True
+        })
+        # 有售价但缺少渠道来源
+        assert response.get_json()['data']['error_count'] == 1
+
+        response = client.post('/api/v1/customers/import', json={
+            'students': [{'phone': '13600000000'}], 'dry_run': True
+        })
+        data = response.get_json()['data']
+        assert data['created_customers'] == 1 and data['items'][0]['trial'] is None
+        assert Customer.query.count() == 0
+
+        assert client.post('/api/v1/customers/import', json={'students': []}).status_code == 400
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+测试刷单订单批量导入：流式解析 xlsx / csv、逐行报错、去重、手续费按配置计算、同步检索索引。
+"""
+
+import sys
+import os
+import io
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from datetime import datetime
+from openpyxl import Workbook
+from sqlalchemy import event
+from app import db
+from app.models import TaobaoOrder
+from app.services import taobao_import_service
+from app.services.data_version_service import DataVersionService
+from app.services.search_service import SearchService
+from app.services.taobao_import_service import TaobaoImportService
+
+
+def _xlsx(rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+HEADER = ['序号', '订单ID', '客户姓名', '等级', '刷单金额', '佣金', '淘宝手续费', '是否已评价', '订单时间', '结算状态', '结算时间']
+
+
+def test_import_xlsx_with_errors_and_duplicates(monkeypatch, make_app):
+    monkeypatch.setattr(taobao_import_service, 'IMPORT_BATCH_SIZE', 2)
+    # 查重查询按批拆分
+    monkeypatch.setattr(taobao_import_service, 'LOOKUP_CHUNK', 1)
+    app = make_app()
+    with app.app_context():
+        db.session.add(TaobaoOrder(name='老买家', amount=50, order_time=datetime(2024, 5, 1, 9)))
+        db.session.commit()
+        version = DataVersionService.get_versions(['taobao_order'])['taobao_order']
+
+        stream = _xlsx([
+            HEADER,
+            [1, 1, '导入买家甲', '钻1', 100, 5, 999, '是', '2024-05-02 10:00:00', '已结算', '2024-05-03 10:00:00'],
+            [2, 2, '导入买家乙', '钻2', '200', '', None, '否', datetime(2024, 5, 2, 11), '未结算', ''],
+            [3, 3, '导入买家甲', '钻1', 100, 5, 999, '是', '2024-05-02 10:00:00', '已结算', ''],  # 文件内重复
+            [4, 4, '老买家', '', 50, 0, 0, '否', '2024-05-01 09:00:00', '未结算', ''],  # 与已有订单重复
+            [5, 5, '错误金额', '', 'abc', 0, 0, '否', '2024-05-02 12:00:00', '未结算', ''],
+            [6, 6, '缺时间', '', 10, 0, 0, '否', '', '未结算', ''],
+            [None] * len(HEADER),
+        ])
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        result = TaobaoImportService.import_file(stream, 'xlsx')
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        db.session.commit()
+        # 每批一条多行 INSERT（两条新订单在同一批中）
+        assert len([s for s in statements if s.lstrip().upper().startswith('INSERT INTO TAOBAO_ORDER ')]) == 1
+
+        assert result['total_rows'] == 6
+        assert result['imported'] == 2 and result['duplicates'] == 2 and result['error_count'] == 2
+        assert [error['row'] for error in result['errors']] == [6, 7]
+
+        first = TaobaoOrder.query.filter_by(name='导入买家甲').one()
+        # 手续费按当前配置计算，忽略文件中的值
+        assert first.taobao_fee == pytest.approx(100 * 0.6 / 100)
+        assert first.evaluated and first.settled and first.settled_at == datetime(2024, 5, 3, 10)
+        second = TaobaoOrder.query.filter_by(name='导入买家乙').one()
+        assert second.amount == 200 and second.commission == 0 and not second.settled
+
+        assert DataVersionService.get_versions(['taobao_order'])['taobao_order'] > version
+        hits = SearchService.search('导入买家', entity='taobao_order')['hits']
+        assert {hit['id'] for hit in hits} == {first.id, second.id}
+
+        # 再次导入同一文件：全部视为重复
+        stream.seek(0)
+        again = TaobaoImportService.import_file(stream, 'xlsx')
+        assert again['imported'] == 0 and again['duplicates'] == 4
+
+
+def test_import_api_csv_and_dry_run(make_app):
+    app = make_app()
+    with app.app_context():
+        client = app.test_client()
+        content = '订单ID,金额,订单时间\n1,88,2024-06-01 08:00\n2,-1,2024-06-01 09:00\n'.encode('utf-8-sig')
+
+        response = client.post('/api/v1/taobao-orders/import', data={
+            'file': (io.BytesIO(content), 'orders.csv'), 'dry_run': 'true'
+        }, content_type='multipart/form-data')
+        data = response.get_json()['data']
+        assert data['dry_run'] and data['imported'] == 1 and data['error_count'] == 1
+        assert TaobaoOrder.query.count() == 0
+
+        response = client.post('/api/v1/taobao-orders/import', data={
+            'file': (io.BytesIO(content), 'orders.csv')
+        }, content_type='multipart/form-data')
+        assert response.get_json()['data']['imported'] == 1
+        assert TaobaoOrder.query.one().amount == 88
+
+        response = client.post('/api/v1/taobao-orders/import', data={
+            'file': (io.BytesIO(b'a,b\n1,2\n'), 'orders.csv')
+        }, content_type='multipart/form-data')
+        assert response.status_code == 400
+        response = client.post('/api/v1/taobao-orders/import', data={
+            'file': (io.BytesIO(b''), 'orders.txt')
+        }, content_type='multipart/form-data')
+        assert response.status_code == 400
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+测试刷单订单列表API：(order_time, id) 键集分页与服务端筛选。
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import TaobaoOrder
+
+
+def _seed(count=30):
+    base_time = datetime(2025, 3, 1, 9, 0)
+    levels = ['钻1', '钻2', '皇冠1']
+    for i in range(count):
+        db.session.add(TaobaoOrder(
+            name=f'买家{i:02d}', level=levels[i % 3],
+            amount=100.0 + i, commission=5.0, taobao_fee=0.6,
+            evaluated=i % 2 == 0, settled=i % 4 == 0,
+            # 每两单同一时间，验证相同排序值下翻页不丢不重
+            order_time=base_time + timedelta(days=i // 2)
+        ))
+    db.session.commit()
+
+
+def _fetch_all(client, query):
+    ids = []
+    cursor = None
+    while True:
+        url = f'/api/v1/taobao-orders?limit=7&{query}' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        assert data['success'] is True
+        ids.extend(item['id'] for item in data['data']['items'])
+        cursor = data['data']['next_cursor']
+        if not cursor:
+            return ids
+
+
+def test_keyset_pagination_and_filters(make_app):
+    app = make_app()
+    with app.app_context():
+        _seed()
+        client = app.test_client()
+
+        # 默认按刷单时间倒序
+        ids = _fetch_all(client, '')
+        assert ids == [o.id for o in TaobaoOrder.query.order_by(TaobaoOrder.order_time.desc(), TaobaoOrder.id.desc())]
+
+        ids = _fetch_all(client, 'sort=amount&order=asc')
+        assert ids == [o.id for o in TaobaoOrder.query.order_by(TaobaoOrder.amount.asc(), TaobaoOrder.id.asc())]
+
+        ids = _fetch_all(client, 'settled=false&evaluated=true&level=钻1')
+        expected = TaobaoOrder.query.filter_by(settled=False, evaluated=True, level='钻1').all()
+        assert sorted(ids) == sorted(o.id for o in expected)
+
+        # 结束日期包含当天：3月1日~3月3日共6单
+        ids = _fetch_all(client, 'date_from=2025-03-01&date_to=2025-03-03')
+        assert len(ids) == 6
+
+        assert len(_fetch_all(client, 'name=买家1')) == 10
+
+        assert client.get('/api/v1/taobao-orders?cursor=bad').status_code == 400
+        assert client.get('/api/v1/taobao-orders?settled=maybe').status_code == 400
+        assert client.get('/api/v1/taobao-orders?sort=level').status_code == 400
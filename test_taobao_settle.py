@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+测试批量结算：单条 UPDATE 只结算未结算订单，返回准确的数量与金额，支持按筛选条件结算。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from datetime import datetime
+from sqlalchemy import event
+from app import db
+from app.models import TaobaoOrder
+from app.services.data_version_service import DataVersionService
+from app.services.taobao_order_service import TaobaoOrderService
+
+
+def _seed():
+    orders = [
+        TaobaoOrder(name='买家1', level='钻1', amount=100, commission=5, order_time=datetime(2024, 5, 1, 10)),
+        TaobaoOrder(name='买家2', level='钻1', amount=200, commission=8, order_time=datetime(2024, 5, 2, 10)),
+        TaobaoOrder(name='买家3', level='钻2', amount=300, commission=9, order_time=datetime(2024, 5, 3, 10)),
+        TaobaoOrder(name='买家4', level='钻1', amount=400, commission=10, order_time=datetime(2024, 6, 1, 10),
+                    settled=True, settled_at=datetime(2024, 6, 2)),
+    ]
+    db.session.add_all(orders)
+    db.session.commit()
+    return [order.id for order in orders]
+
+
+def test_settle_by_ids_and_filter(make_app):
+    app = make_app()
+    with app.app_context():
+        ids = _seed()
+        version = DataVersionService.get_versions(['taobao_order'])['taobao_order']
+        client = app.test_client()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        response = client.post('/api/v1/taobao-orders/settle', json={'order_ids': [ids[0], ids[3], 99999]})
+        event.remove(db.engine, 'before_cursor_execute', listener)
+        data = response.get_json()['data']
+        # 已结算与不存在的订单不计入
+        assert data['settled_count'] == 1
+        assert data['total_amount'] == 100 and data['total_commission'] == 5
+        assert len([s for s in statements if s.lstrip().upper().startswith('UPDATE TAOBAO_ORDER')]) == 1
+        assert not [s for s in statements if s.lstrip().upper().startswith('SELECT') and 'FROM taobao_order' in s]
+        assert DataVersionService.get_versions(['taobao_order'])['taobao_order'] > version
+
+        # 原结算时间不被覆盖
+        settled = db.session.get(TaobaoOrder, ids[3])
+        assert settled.settled_at == datetime(2024, 6, 2)
+
+        # 按筛选条件结算：钻1 + 5月 -> 只剩买家2
+        result = TaobaoOrderService.settle(filters={'level': '钻1', 'date_from': '2024-05-01',
+                                                    'date_to': '2024-05-31'})
+        db.session.commit()
+        assert (result['settled_count'], result['total_amount']) == (1, 200)
+        assert TaobaoOrder.query.filter_by(settled=False).count() == 1
+
+        # 参数校验
+        assert client.post('/api/v1/taobao-orders/settle', json={}).status_code == 400
+        assert client.post('/api/v1/taobao-orders/settle', json={'filters': {'level': ''}}).status_code == 400
+        with pytest.raises(ValueError):
+            TaobaoOrderService.settle(filters={'settled': 'false'})
+        with pytest.raises(ValueError):
+            TaobaoOrderService.settle(order_ids=['abc'])
+
+
+def test_settle_large_id_list_in_chunks(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.execute(TaobaoOrder.__table__.insert(), [
+            {'name': f'批量{i}', 'amount': 1.0, 'commission': 0.5, 'settled': False} for i in range(2500)
+        ])
+        db.session.commit()
+        ids = [row.id for row in db.session.query(TaobaoOrder.id)]
+        result = TaobaoOrderService.settle(order_ids=ids)
+        db.session.commit()
+        assert result['settled_count'] == 2500
+        assert result['total_amount'] == 2500 and result['total_commission'] == 1250
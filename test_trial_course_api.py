@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+测试试听课列表API：键集分页、服务端筛选与筛选统计。
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import Customer, Course
+
+
+def _seed(count=25):
+    base_time = datetime(2025, 1, 1)
+    sources = ['淘宝', '小红书', '抖音']
+    for i in range(count):
+        customer = Customer(name=f'学员{i:02d}', phone=f'1390000{i:04d}')
+        db.session.add(customer)
+        db.session.flush()
+        db.session.add(Course(
+            customer_id=customer.id, is_trial=True, name='试听课',
+            trial_price=10.0 + i, cost=5.0, source=sources[i % 3],
+            trial_status='converted' if i % 5 == 0 else 'registered',
+            # 部分记录创建时间相同，验证 (created_at, id) 联合游标不丢不重
+            created_at=base_time + timedelta(hours=i // 2)
+        ))
+    db.session.commit()
+
+
+def _fetch_all(client, query):
+    ids = []
+    cursor = None
+    while True:
+        url = f'/api/v1/trial-courses?limit=7&{query}' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        assert data['success'] is True
+        ids.extend(item['id'] for item in data['data']['items'])
+        cursor = data['data']['next_cursor']
+        if not cursor:
+            return ids
+
+
+def test_keyset_pagination_and_filters(make_app):
+    app = make_app()
+    with app.app_context():
+        _seed()
+        client = app.test_client()
+
+        # 默认按创建时间倒序，翻页不丢不重
+        ids = _fetch_all(client, '')
+        expected = [c.id for c in Course.query.order_by(Course.created_at.desc(), Course.id.desc())]
+        assert ids == expected
+
+        # 按售价升序
+        ids = _fetch_all(client, 'sort=trial_price&order=asc')
+        assert ids == [c.id for c in Course.query.order_by(Course.trial_price.asc(), Course.id.asc())]
+
+        # 渠道 + 状态 + 关键字筛选
+        ids = _fetch_all(client, 'source=淘宝&status=registered')
+        assert ids and all(
+            db.session.get(Course, i).source == '淘宝' and db.session.get(Course, i).trial_status == 'registered'
+            for i in ids
+        )
+        ids = _fetch_all(client, 'search=学员1')
+        assert len(ids) == 10
+
+        # 空状态按 registered 筛选与显示
+        emptied = Course.query.filter_by(trial_status='converted').first()
+        emptied.trial_status = ''
+        db.session.commit()
+        assert emptied.id in _fetch_all(client, 'status=registered')
+        items = client.get('/api/v1/trial-courses?limit=100&status=registered').get_json()['data']['items']
+        assert {item['trial_status'] for item in items} == {'registered'}
+
+        # 无效参数
+        assert client.get('/api/v1/trial-courses?cursor=bad').status_code == 400
+        assert client.get('/api/v1/trial-courses?sort=name').status_code == 400
+
+
+def test_filtered_stats(make_app):
+    app = make_app()
+    with app.app_context():
+        _seed()
+        client = app.test_client()
+
+        data = client.get('/api/v1/trial-courses/stats?source=小红书').get_json()['data']
+        courses = Course.query.filter_by(source='小红书').all()
+        assert data['count'] == len(courses)
+        assert abs(data['total_price'] - sum(c.trial_price for c in courses)) < 1e-6
+        assert data['source_counts'] == {'小红书': len(courses)}
+        assert data['conversion']['converted'] == sum(1 for c in courses if c.trial_status == 'converted')
+        assert data['total_stats']['total_trials'] == len(courses)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+测试试听课统计物化汇总：增量维护结果应与全量扫描、原逐条计算口径一致。
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import Customer, Course, Config
+from app.services.trial_stats_service import TrialStatsService
+
+
+def _seed():
+    for k, v in {
+        'taobao_fee_rate': 0.6,
+        'xiaohongshu_fee_rate': 1.0,
+        'douyin_fee_rate': 0.8,
+    }.items():
+        db.session.add(Config(key=k, value=str(v)))
+    customers = [Customer(name=f'学员{i}', phone=f'1380000000{i}') for i in range(5)]
+    db.session.add_all(customers)
+    db.session.flush()
+    trials = [
+        Course(customer_id=customers[0].id, is_trial=True, name='试听课', trial_price=100.0, cost=20.0,
+               source='淘宝', trial_status='registered'),
+        Course(customer_id=customers[1].id, is_trial=True, name='试听课', trial_price=200.0, cost=30.0,
+               source='小红书', trial_status='converted'),
+        Course(customer_id=customers[2].id, is_trial=True, name='试听课', trial_price=150.0, cost=25.0,
+               source='抖音', trial_status='no_action'),
+        Course(customer_id=customers[3].id, is_trial=True, name='试听课', trial_price=80.0, cost=10.0,
+               source='淘宝', trial_status='not_registered'),
+        Course(customer_id=customers[4].id, is_trial=False, name='单词课', sessions=10, price=100.0, cost=300.0,
+               payment_channel='淘宝'),
+    ]
+    db.session.add_all(trials)
+    db.session.commit()
+    return customers, trials
+
+
+def test_incremental_stats_match_full_scan(make_app):
+    app = make_app()
+    with app.app_context():
+        customers, trials = _seed()
+        assert TrialStatsService.verify() == []
+
+        status_stats, total_stats = TrialStatsService.get_stats()
+        assert status_stats['registered']['count'] == 1
+        assert abs(status_stats['registered']['fees'] - 0.6) < 1e-6
+        assert abs(status_stats['converted']['fees'] - 2.0) < 1e-6
+        assert status_stats['not_registered']['count'] == 0
+        assert total_stats['total_trials'] == 3
+        assert abs(total_stats['total_revenue'] - 450.0) < 1e-6
+        assert abs(total_stats['total_profit'] - (450.0 - 75.0)) < 1e-6
+
+        # 状态变更为退费（微信渠道未配置费率且未记录手续费 -> 回退淘宝费率估算）
+        trial = db.session.get(Course, trials[0].id)
+        trial.trial_status = 'refunded'
+        trial.refund_channel = '微信'
+        trial.refund_fee = 0
+        db.session.commit()
+
+        # 编辑售价与来源（对象已过期，未加载旧值时也必须正确扣减旧汇总）
+        trials[1].trial_price = 300.0
+        trials[1].source = '抖音'
+        db.session.commit()
+
+        # 删除试听课
+        db.session.delete(db.session.get(Course, trials[2].id))
+        db.session.commit()
+
+        assert TrialStatsService.verify() == []
+        status_stats, total_stats = TrialStatsService.get_stats()
+        assert status_stats['refunded']['count'] == 1
+        assert status_stats['refunded']['revenue'] == 0
+        assert abs(status_stats['refunded']['fees'] - 100.0 * 0.006) < 1e-6
+        assert abs(status_stats['converted']['fees'] - 300.0 * 0.008) < 1e-6
+        assert status_stats['no_action']['count'] == 0
+        assert total_stats['total_trials'] == 2
+
+        # SQL GROUP BY 引擎与物化汇总口径一致
+        sql_status_stats, sql_total_stats = TrialStatsService.sql_stats()
+        for status in status_stats:
+            for field in status_stats[status]:
+                assert abs(sql_status_stats[status][field] - status_stats[status][field]) < 1e-6, (status, field)
+        assert sql_total_stats['total_trials'] == total_stats['total_trials']
+
+
+def test_rollback_and_rebuild(make_app):
+    app = make_app()
+    with app.app_context():
+        _seed()
+
+        # 回滚的写入不应影响汇总
+        db.session.add(Course(customer_id=1, is_trial=True, name='试听课', trial_price=999.0,
+                              source='淘宝', trial_status='registered'))
+        db.session.flush()
+        db.session.rollback()
+        assert TrialStatsService.verify() == []
+
+        # 绕过 ORM 的直接修改会造成偏差，由重建修复
+        db.session.execute(db.text("UPDATE course SET trial_status = 'no_action' WHERE source = '淘宝'"))
+        db.session.commit()
+        assert TrialStatsService.verify() != []
+        TrialStatsService.rebuild()
+        assert TrialStatsService.verify() == []
+
+
+def test_empty_status_counts_as_registered(make_app):
+    app = make_app()
+    with app.app_context():
+        customers, _ = _seed()
+        db.session.add_all([
+            Course(customer_id=customers[0].id, is_trial=True, name='试听课', trial_price=60.0, cost=5.0,
+                   source='淘宝', trial_status=''),
+            Course(customer_id=customers[1].id, is_trial=True, name='试听课', trial_price=40.0, cost=5.0,
+                   source='淘宝', trial_status=None),
+        ])
+        db.session.commit()
+        assert TrialStatsService.verify() == []
+
+        # 空字符串与 NULL 状态都按 registered 统计，SQL 引擎与物化汇总一致
+        status_stats, total_stats = TrialStatsService.get_stats()
+        sql_status_stats, sql_total_stats = TrialStatsService.sql_stats()
+        assert status_stats['registered']['count'] == sql_status_stats['registered']['count'] == 3
+        assert abs(sql_status_stats['registered']['revenue'] - status_stats['registered']['revenue']) < 1e-6
+        assert abs(sql_total_stats['total_revenue'] - total_stats['total_revenue']) < 1e-6
@@ -0,0 +1,135 @@
+"""完整备份基准测试：复制 → 重读计算哈希 → zipfile 单线程压缩 vs 一遍流式读取 + 并行压缩。
+
+在临时目录中生成指定大小的 WAL 模式数据库（默认 1024MB，内容为可压缩的订单文本加随机字节），
+每种方式在独立子进程中运行，记录备份耗时与备份目录的峰值磁盘占用（每 20ms 采样一次）：
+1. legacy：备份API复制出 .sqlite → MD5 重读一遍 → zipfile 压缩（原 create_backup 做法）
+2. stream-1：backup_archive.write_backup_archive，单个压缩线程
+3. stream-N：backup_archive.write_backup_archive，压缩线程数 = CPU 核数
+
+用法: python tools/benchmark_backup.py [数据库大小MB]
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backup_archive import default_workers, write_backup_archive  # noqa: E402
+from backup_database import DatabaseBackup  # noqa: E402
+
+VARIANTS = ('legacy', 'stream-1', 'stream-N')
+
+
+def _seed(db_path: str, size_mb: int) -> None:
+    """用递归 CTE 批量生成约 size_mb 大小的数据（每行约 1KB）"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE taobao_order (id INTEGER PRIMARY KEY, name TEXT, note TEXT, token TEXT)")
+    batch = 100000
+    total = size_mb * 1024
+    for offset in range(0, total, batch):
+        conn.execute("""
+            WITH RECURSIVE seq(i) AS (SELECT ? UNION ALL SELECT i + 1 FROM seq WHERE i < ?)
+            INSERT INTO taobao_order (id, name, note, token)
+            SELECT i, printf('买家%06d', i % 50000),
+                   printf('订单%08d 钻%d 金额%d.00 佣金5.00 已评价 未结算 备注：常规刷单订单，按约定返款。', i, i % 5, i % 500)
+                       || substr(hex(zeroblob(400)), 1, 500 + i % 100),
+                   hex(randomblob(96))
+            FROM seq
+        """, (offset + 1, min(offset + batch, total)))
+        conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def _legacy_backup(db_path: str, backup_dir: str) -> None:
+    """原实现：备份API复制出完整文件，重读计算哈希，再用 zipfile 单线程压缩"""
+    backup_path = os.path.join(backup_dir, 'database_backup_legacy.sqlite')
+    source, target = sqlite3.connect(db_path), sqlite3.connect(backup_path)
+    source.backup(target)
+    source.close()
+    target.close()
+    md5 = hashlib.md5()
+    with open(backup_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(4096), b''):
+            md5.update(chunk)
+    with zipfile.ZipFile(backup_path.replace('.sqlite', '.zip'), 'w', zipfile.ZIP_DEFLATED) as zipf:
+        zipf.write(backup_path, os.path.basename(backup_path))
+    os.remove(backup_path)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for name in os.listdir(path):
+        try:
+            total += os.path.getsize(os.path.join(path, name))
+        except OSError:
+            pass  # 采样时文件刚被删除或重命名
+    return total
+
+
+def run_variant(variant: str, db_path: str) -> dict:
+    """在当前（子）进程中执行一种备份方式，返回测量结果"""
+    backup_dir = tempfile.mkdtemp(dir=os.path.dirname(db_path))
+    peak = [0]
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            peak[0] = max(peak[0], _dir_size(backup_dir))
+            time.sleep(0.02)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    if variant == 'legacy':
+        _legacy_backup(db_path, backup_dir)
+    else:
+        workers = 1 if variant == 'stream-1' else default_workers()
+        write_backup_archive(db_path, os.path.join(backup_dir, 'database_backup_stream.zip'),
+                             'database_backup_stream.sqlite', workers=workers,
+                             copy_database=DatabaseBackup(db_path, backup_dir).copy_database)
+    total = time.perf_counter() - started
+    done.set()
+    sampler.join()
+    size = _dir_size(backup_dir)
+    peak[0] = max(peak[0], size)
+    shutil.rmtree(backup_dir)
+    return {'variant': variant, 'total': total, 'peak_disk': peak[0], 'size': size}
+
+
+def run_benchmark(size_mb: int) -> None:
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'benchmark_backup.sqlite')
+    print(f"生成约 {size_mb}MB 数据库...")
+    _seed(db_path, size_mb)
+    print(f"数据库大小: {os.path.getsize(db_path) / 1024 / 1024:.0f}MB，CPU 核数: {default_workers()}")
+
+    print(f"{'方式':<10}{'耗时(s)':>10}{'峰值磁盘(MB)':>16}{'备份文件(MB)':>16}")
+    try:
+        for variant in VARIANTS:
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--variant', variant, db_path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{variant:<10}{result['total']:>10.2f}{result['peak_disk'] / 1024 / 1024:>16.1f}"
+                  f"{result['size'] / 1024 / 1024:>16.1f}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--variant':
+        print(json.dumps(run_variant(sys.argv[2], sys.argv[3])))
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1024)
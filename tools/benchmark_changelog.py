@@ -0,0 +1,126 @@
+"""变更日志基准测试：关闭 vs 开启（写入操作系统缓存）vs 开启并每次提交 fsync 的写入开销，以及重放速度。
+
+每种方式在独立子进程中用全新的临时 WAL 数据库运行同一组事务（每轮 3 个提交）：
+1. 新增客户 + 试听课（单对象 flush，2 行 INSERT）
+2. 修改试听课状态（单对象 UPDATE）
+3. 批量 INSERT 5 条刷单订单后按条件结算（do_orm_execute 路径）
+记录每次提交的平均与 P95 耗时、总耗时、日志大小；开启变更日志的方式再把日志重放到
+初始数据库的副本上，计时并核对重放结果与实际数据库一致。
+
+用法: python tools/benchmark_changelog.py [轮数]
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, update  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import Course, Customer, TaobaoOrder  # noqa: E402
+from change_log import CAPTURED_TABLES, changelog_dir, replay, segment_stats  # noqa: E402
+from config import Config as AppConfig  # noqa: E402
+
+VARIANTS = ('off', 'on', 'on-fsync')
+
+
+def _captured_rows(db_path: str) -> dict:
+    conn = sqlite3.connect(db_path)
+    try:
+        return {name: conn.execute(f'SELECT * FROM "{name}" ORDER BY id').fetchall() for name in CAPTURED_TABLES}
+    finally:
+        conn.close()
+
+
+def _timed_commit(latencies: list, started: float) -> None:
+    db.session.commit()
+    latencies.append(time.perf_counter() - started)
+
+
+def run_variant(variant: str, rounds: int) -> dict:
+    """在当前（子）进程中执行一种方式，返回测量结果"""
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, 'benchmark_changelog.sqlite')
+
+    class BenchmarkConfig(AppConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+        CHANGELOG_ENABLED = variant != 'off'
+        CHANGELOG_FSYNC = variant == 'on-fsync'
+
+    app = create_app(BenchmarkConfig)
+    base_path = os.path.join(workdir, 'base.sqlite')
+    latencies = []
+    try:
+        with app.app_context():
+            # 初始状态（相当于最近一次完整备份）
+            db.session.execute(db.text("PRAGMA wal_checkpoint(TRUNCATE)"))
+            shutil.copy(db_path, base_path)
+
+            started_all = time.perf_counter()
+            for i in range(rounds):
+                started = time.perf_counter()
+                customer = Customer(name=f'客户{i}', phone=f'139{i:08d}', source='淘宝')
+                db.session.add(customer)
+                db.session.flush()
+                course = Course(name='试听课', customer_id=customer.id, is_trial=True, trial_price=20,
+                                source='淘宝', trial_status='registered')
+                db.session.add(course)
+                _timed_commit(latencies, started)
+
+                started = time.perf_counter()
+                course.trial_status = 'completed'
+                _timed_commit(latencies, started)
+
+                started = time.perf_counter()
+                db.session.execute(insert(TaobaoOrder), [
+                    {'name': f'买家{i}_{n}', 'amount': 100 + n, 'commission': 5} for n in range(5)
+                ])
+                db.session.execute(update(TaobaoOrder).where(TaobaoOrder.name.like(f'买家{i}_%'),
+                                                             TaobaoOrder.amount < 103).values(settled=True))
+                _timed_commit(latencies, started)
+            total = time.perf_counter() - started_all
+            db.session.remove()
+            db.engine.dispose()
+
+        segments, log_bytes = segment_stats(changelog_dir(db_path))
+        result = {'variant': variant, 'total': total, 'commits': len(latencies),
+                  'mean_ms': sum(latencies) / len(latencies) * 1000,
+                  'p95_ms': sorted(latencies)[int(len(latencies) * 0.95)] * 1000,
+                  'log_bytes': log_bytes, 'segments': segments, 'replay': None, 'replay_ok': None}
+        if variant != 'off':
+            started = time.perf_counter()
+            replayed = replay(base_path, changelog_dir(db_path))
+            result['replay'] = time.perf_counter() - started
+            result['replay_ok'] = (replayed['transactions'] == len(latencies) and
+                                   _captured_rows(base_path) == _captured_rows(db_path))
+        return result
+    finally:
+        shutil.rmtree(workdir)
+
+
+def run_benchmark(rounds: int) -> None:
+    print(f"每种方式 {rounds} 轮，共 {rounds * 3} 个提交")
+    print(f"{'方式':<10}{'总耗时(s)':>10}{'平均(ms)':>10}{'P95(ms)':>10}{'日志(KB)':>10}{'重放(s)':>10}  重放结果")
+    for variant in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--variant', variant, str(rounds)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        replayed = '-' if result['replay'] is None else f"{result['replay']:.2f}"
+        checked = '-' if result['replay_ok'] is None else ('一致' if result['replay_ok'] else '不一致')
+        print(f"{variant:<10}{result['total']:>10.2f}{result['mean_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+              f"{result['log_bytes'] / 1024:>10.1f}{replayed:>10}  {checked}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--variant':
+        print(json.dumps(run_variant(sys.argv[2], int(sys.argv[3]))))
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
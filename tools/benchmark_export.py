@@ -0,0 +1,127 @@
+"""刷单数据导出基准测试：字典列表 + pandas DataFrame vs 流式 xlsx / CSV。
+
+在临时 SQLite 数据库中生成指定数量的刷单订单（默认 50 万条），每种方式在独立子进程中运行，
+记录峰值 RSS 增量、首字节时间（TTFB）与总耗时：
+1. legacy：加载全部 ORM 对象 → 字典列表 → DataFrame → ExcelWriter(BytesIO)（原 export_taobao_orders 做法）
+2. xlsx：ExportService 只写模式工作簿，临时文件分块发送
+3. csv：ExportService 分块 CSV
+
+用法: python tools/benchmark_export.py [行数]
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import TaobaoOrder  # noqa: E402
+from app.services.export_service import ExportService  # noqa: E402
+from config import Config as AppConfig  # noqa: E402
+
+VARIANTS = ('legacy', 'xlsx', 'csv')
+
+
+def _make_app(db_path: str):
+    class BenchConfig(AppConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+
+    return create_app(BenchConfig)
+
+
+def _seed(row_count: int) -> None:
+    """批量生成刷单订单（绕过 ORM 以加快准备速度）"""
+    start = datetime(2024, 1, 1)
+    batch = 10000
+    for offset in range(0, row_count, batch):
+        size = min(batch, row_count - offset)
+        db.session.execute(TaobaoOrder.__table__.insert(), [
+            {'name': f'买家{offset + i}', 'level': '钻1', 'amount': 100.0 + (offset + i) % 50,
+             'commission': 5.0, 'taobao_fee': 0.6, 'evaluated': i % 2 == 0, 'settled': i % 3 == 0,
+             'order_time': start + timedelta(minutes=offset + i), 'created_at': start}
+            for i in range(size)
+        ])
+        db.session.commit()
+
+
+def _peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _legacy_export() -> bytes:
+    """原实现：全部 ORM 对象 → 字典列表 → DataFrame → 内存中的 Excel"""
+    import pandas as pd
+    orders = TaobaoOrder.query.order_by(TaobaoOrder.order_time.desc()).all()
+    data = []
+    for i, order in enumerate(orders):
+        data.append({
+            '序号': i + 1, '订单ID': order.id, '客户姓名': order.name or '', '等级': order.level or '',
+            '刷单金额': order.amount or 0, '佣金': order.commission or 0, '淘宝手续费': order.taobao_fee or 0,
+            '本金': (order.amount or 0) + (order.commission or 0),
+            '是否已评价': '是' if order.evaluated else '否',
+            '订单时间': order.order_time.strftime('%Y-%m-%d %H:%M:%S') if order.order_time else '',
+            '结算状态': '已结算' if order.settled else '未结算',
+            '结算时间': order.settled_at.strftime('%Y-%m-%d %H:%M:%S') if order.settled_at else '',
+            '创建时间': order.created_at.strftime('%Y-%m-%d %H:%M:%S') if order.created_at else ''
+        })
+    df = pd.DataFrame(data)
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='刷单数据', index=False)
+    return output.getvalue()
+
+
+def run_variant(variant: str, db_path: str) -> dict:
+    """在当前（子）进程中执行一种导出方式，返回测量结果"""
+    if variant == 'legacy':
+        import pandas  # noqa: F401  预先导入，避免把模块加载计入导出耗时
+    app = _make_app(db_path)
+    with app.app_context(), app.test_request_context():
+        baseline = _peak_rss_mb()
+        started = time.perf_counter()
+        first_byte = None
+        size = 0
+        if variant == 'legacy':
+            body = [_legacy_export()]
+        else:
+            body = ExportService.stream_response('taobao_orders', 'taobao_orders', variant).response
+        for chunk in body:
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk)
+        total = time.perf_counter() - started
+        return {'variant': variant, 'ttfb': first_byte, 'total': total,
+                'rss': _peak_rss_mb() - baseline, 'size': size}
+
+
+def run_benchmark(row_count: int) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(), 'benchmark_export.sqlite')
+    app = _make_app(db_path)
+    with app.app_context():
+        print(f"生成 {row_count} 条刷单订单...")
+        _seed(row_count)
+
+    print(f"{'方式':<10}{'TTFB(s)':>10}{'总耗时(s)':>12}{'峰值RSS增量(MB)':>18}{'文件(MB)':>10}")
+    for variant in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--variant', variant, db_path],
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{variant:<10}{result['ttfb']:>10.2f}{result['total']:>12.2f}"
+              f"{result['rss']:>18.1f}{result['size'] / 1024 / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--variant':
+        print(json.dumps(run_variant(sys.argv[2], sys.argv[3])))
+    else:
+        run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,95 @@
+"""全文检索基准测试：FTS5 二元组索引 vs LIKE '%关键字%' 全表扫描。
+
+在临时 SQLite 数据库中生成指定数量的记录（默认 100 万条，客户与刷单订单各半），
+重建 search_index 后分别用 SearchService（FTS5）与 LIKE 执行一组典型查询，输出各自耗时。
+
+用法: python tools/benchmark_search.py [总行数]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import Customer, TaobaoOrder  # noqa: E402
+from app.services import search_service  # noqa: E402
+from app.services.search_service import SearchService  # noqa: E402
+from config import Config as AppConfig  # noqa: E402
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红'
+REGIONS = ['北京', '上海', '成都', '重庆', '广州', '深圳', '杭州', '武汉', '西安', '南京']
+GRADES = ['小学', '初中', '高中', '大学']
+QUERIES = ['张伟', '李', '王芳娜', '8888', '138', '成都 高中', '不存在的人']
+
+
+def _random_name(rng):
+    return rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN) for _ in range(rng.randint(1, 2)))
+
+
+def _seed(row_count: int) -> None:
+    """批量生成客户与刷单订单（绕过 ORM 以加快准备速度）"""
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    batch = 10000
+    half = row_count // 2
+    for offset in range(0, half, batch):
+        size = min(batch, half - offset)
+        db.session.execute(Customer.__table__.insert(), [
+            {'name': _random_name(rng), 'phone': f'1{rng.choice("3589")}{offset + i:09d}',
+             'region': rng.choice(REGIONS), 'grade': rng.choice(GRADES), 'created_at': start}
+            for i in range(size)
+        ])
+        db.session.execute(TaobaoOrder.__table__.insert(), [
+            {'name': _random_name(rng), 'amount': 100.0, 'commission': 5.0,
+             'order_time': start + timedelta(minutes=offset + i), 'created_at': start}
+            for i in range(size)
+        ])
+        db.session.commit()
+
+
+def _timed(func, repeat=5):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmark(row_count: int) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(), 'benchmark_search.sqlite')
+
+    class BenchConfig(AppConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        print(f"生成 {row_count} 条记录...")
+        _seed(row_count)
+        started = time.perf_counter()
+        SearchService.rebuild()
+        print(f"重建索引耗时 {time.perf_counter() - started:.1f}s，"
+              f"数据库 {os.path.getsize(db_path) / 1024 / 1024:.0f} MB")
+
+        url = str(db.engine.url)
+        print(f"{'查询':<12}{'FTS5(ms)':>10}{'命中':>6}{'LIKE(ms)':>10}{'命中':>6}")
+        for query in QUERIES:
+            fts_ms, fts = _timed(lambda: SearchService.search(query))
+            search_service._enabled_urls.discard(url)
+            try:
+                like_ms, like = _timed(lambda: SearchService.search(query), repeat=1)
+            finally:
+                search_service._enabled_urls.add(url)
+            print(f"{query:<12}{fts_ms:>10.1f}{len(fts['hits']):>6}{like_ms:>10.1f}{len(like['hits']):>6}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,133 @@
+"""SQLite 并发读写基准测试：默认 rollback journal vs WAL + PRAGMA 调优。
+
+每种配置在独立子进程中使用新的临时数据库（默认 2 万条刷单订单），同时启动
+读线程（分页查询 /api/v1/taobao-orders）与写线程（PUT /api/taobao-orders/<id>/quick-edit），
+持续固定时长后统计读写吞吐、P95 延迟与失败数：
+1. legacy：journal_mode=DELETE，默认 synchronous，连接池 10 + 20（原配置）
+2. tuned：Config.SQLITE_PRAGMAS（WAL、synchronous=NORMAL 等）与 SQLite 连接池参数
+
+用法: python tools/benchmark_sqlite_concurrency.py [读线程数] [写线程数] [秒数]
+"""
+
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import TaobaoOrder  # noqa: E402
+from config import Config as AppConfig  # noqa: E402
+
+ORDER_COUNT = 20000
+PROFILES = ('legacy', 'tuned')
+
+
+def _make_app(profile: str, db_path: str):
+    class BenchConfig(AppConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+
+    if profile == 'legacy':
+        BenchConfig.SQLITE_PRAGMAS = {'journal_mode': 'DELETE'}
+        BenchConfig.SQLITE_POOL_SIZE = 10
+        BenchConfig.SQLITE_MAX_OVERFLOW = 20
+    return create_app(BenchConfig)
+
+
+def _seed() -> None:
+    start = datetime(2024, 1, 1)
+    db.session.execute(TaobaoOrder.__table__.insert(), [
+        {'name': f'买家{i}', 'level': '钻1', 'amount': 100.0, 'commission': 5.0, 'taobao_fee': 0.6,
+         'settled': i % 3 == 0, 'order_time': start + timedelta(minutes=i), 'created_at': start}
+        for i in range(ORDER_COUNT)
+    ])
+    db.session.commit()
+
+
+def _percentile(values, ratio):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def run_profile(profile: str, readers: int, writers: int, duration: float) -> dict:
+    """在当前（子）进程中运行一种配置，返回统计结果"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'benchmark_concurrency.sqlite')
+    app = _make_app(profile, db_path)
+    with app.app_context():
+        _seed()
+
+    stop = threading.Event()
+    results = {'read': [], 'write': [], 'read_errors': 0, 'write_errors': 0}
+    lock = threading.Lock()
+
+    def worker(kind: str, seed: int):
+        rng = random.Random(seed)
+        client = app.test_client()
+        latencies, errors = [], 0
+        while not stop.is_set():
+            started = time.perf_counter()
+            if kind == 'read':
+                response = client.get('/api/v1/taobao-orders?settled=false&limit=50&sort=order_time')
+            else:
+                order_id = rng.randint(1, ORDER_COUNT)
+                response = client.put(f'/api/taobao-orders/{order_id}/quick-edit',
+                                      json={'amount': rng.choice([100, 120, 150])})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        with lock:
+            results[kind].extend(latencies)
+            results[f'{kind}_errors'] += errors
+
+    threads = [threading.Thread(target=worker, args=('read', i)) for i in range(readers)]
+    threads += [threading.Thread(target=worker, args=('write', 1000 + i)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'profile': profile,
+        'reads_per_sec': len(results['read']) / duration,
+        'writes_per_sec': len(results['write']) / duration,
+        'read_p95_ms': _percentile(results['read'], 0.95) * 1000,
+        'write_p95_ms': _percentile(results['write'], 0.95) * 1000,
+        'read_errors': results['read_errors'],
+        'write_errors': results['write_errors'],
+    }
+
+
+def run_benchmark(readers: int, writers: int, duration: float) -> None:
+    print(f"读线程 {readers}，写线程 {writers}，持续 {duration:.0f} 秒")
+    print(f"{'配置':<8}{'读/秒':>10}{'写/秒':>10}{'读P95(ms)':>12}{'写P95(ms)':>12}{'读失败':>8}{'写失败':>8}")
+    for profile in PROFILES:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--profile', profile,
+             str(readers), str(writers), str(duration)],
+            check=True, capture_output=True, text=True
+        ).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{profile:<8}{r['reads_per_sec']:>10.1f}{r['writes_per_sec']:>10.1f}"
+              f"{r['read_p95_ms']:>12.1f}{r['write_p95_ms']:>12.1f}{r['read_errors']:>8}{r['write_errors']:>8}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--profile':
+        profile, readers, writers, duration = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), float(sys.argv[5])
+        print(json.dumps(run_profile(profile, readers, writers, duration)))
+    else:
+        args = sys.argv[1:]
+        run_benchmark(int(args[0]) if len(args) > 0 else 8,
+                      int(args[1]) if len(args) > 1 else 2,
+                      float(args[2]) if len(args) > 2 else 10)
@@ -0,0 +1,62 @@
+"""应用启动基准测试：create_app() 的耗时与常驻内存。
+
+每次测量在全新子进程中进行（模块缓存为空），分别记录：
+1. eager：先导入 pandas / openpyxl 再 create_app()（原 routes.py 在模块级导入 pandas 的情况）
+2. lazy：直接 create_app()（导出依赖在首次导出时才加载）
+
+输出多次测量的中位数，以及 create_app() 后已加载的重量级模块。
+
+用法: python tools/benchmark_startup.py [重复次数]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl')
+
+# 在子进程中执行的测量脚本
+PROBE = r'''
+import json, os, resource, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+if {eager!r}:
+    import pandas, openpyxl  # noqa: F401
+from app import create_app
+from config import Config
+
+class ProbeConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + {db_path!r}
+
+create_app(ProbeConfig)
+print(json.dumps({{
+    'seconds': time.perf_counter() - started,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+def measure(eager: bool) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(), 'benchmark_startup.sqlite')
+    code = PROBE.format(root=ROOT, eager=eager, db_path=db_path, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True,
+                            text=True, cwd=ROOT).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_benchmark(repeat: int) -> None:
+    print(f"{'方式':<8}{'启动耗时(ms)':>14}{'峰值RSS(MB)':>14}  已加载的重量级模块")
+    for label, eager in (('eager', True), ('lazy', False)):
+        runs = [measure(eager) for _ in range(repeat)]
+        seconds = statistics.median(r['seconds'] for r in runs)
+        rss = statistics.median(r['rss_mb'] for r in runs)
+        print(f"{label:<8}{seconds * 1000:>14.0f}{rss:>14.1f}  {', '.join(runs[-1]['heavy']) or '-'}")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,226 @@
+"""试听课统计基准测试：ORM 全量加载逐条累计 vs SQL GROUP BY vs 物化汇总。
+
+在临时 SQLite 数据库中生成指定数量的试听课（默认 10 万条），分别计时：
+1. legacy：加载全部 (Course, Customer) ORM 对象并在 Python 中逐条累计（原 manage_trial_courses 做法）
+2. sql：TrialStatsService.sql_stats() 单条 GROUP BY
+3. materialized：TrialStatsService.get_stats() 读取物化汇总表
+
+用法: python tools/benchmark_trial_stats.py [行数]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import Course, Customer, Config  # noqa: E402
+from app.services.trial_stats_service import TrialStatsService, TRIAL_STATUSES  # noqa: E402
+from config import Config as AppConfig  # noqa: E402
+
+SOURCES = ['淘宝', '小红书', '抖音', '转介绍', '视频号']
+REFUND_CHANNELS = ['淘宝', '微信', '支付宝']
+
+
+def _seed(row_count: int) -> None:
+    """批量生成客户与试听课（绕过 ORM 以加快准备速度，完成后重建汇总表）"""
+    for key, value in {'taobao_fee_rate': '0.6', 'xiaohongshu_fee_rate': '1.0',
+                       'douyin_fee_rate': '0.8', 'referral_fee_rate': '0'}.items():
+        db.session.add(Config(key=key, value=value))
+    db.session.commit()
+
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    batch = 10000
+    for offset in range(0, row_count, batch):
+        size = min(batch, row_count - offset)
+        db.session.execute(Customer.__table__.insert(), [
+            {'id': offset + i + 1, 'name': f'学员{offset + i}', 'phone': f'1{offset + i:010d}',
+             'created_at': start + timedelta(minutes=offset + i)}
+            for i in range(size)
+        ])
+        rows = []
+        for i in range(size):
+            # 含空状态（原实现按 registered 统计）
+            status = rng.choice(TRIAL_STATUSES + ['', None])
+            rows.append({
+                'name': '试听课', 'customer_id': offset + i + 1, 'is_trial': True,
+                'trial_price': rng.choice([9.9, 19.9, 29.9, 49.0]), 'cost': 10.0,
+                'source': rng.choice(SOURCES), 'trial_status': status,
+                'refund_channel': rng.choice(REFUND_CHANNELS) if status == 'refunded' else None,
+                'refund_fee': rng.choice([0, 0, 1.5]) if status == 'refunded' else 0,
+                'created_at': start + timedelta(minutes=offset + i),
+            })
+        db.session.execute(Course.__table__.insert(), rows)
+        db.session.commit()
+    TrialStatsService.rebuild()
+
+
+def _legacy_stats():
+    """原实现：hydrate 全部 ORM 对象后在 Python 中逐条累计（照搬原 manage_trial_courses 的统计部分，
+    只去掉了 debug=1 时记录计算明细的分支）"""
+    query = db.session.query(Course, Customer).join(
+        Customer, Course.customer_id == Customer.id
+    ).filter(Course.is_trial == True)
+
+    trial_courses = query.order_by(Course.created_at.desc()).all()
+
+    # 获取多渠道手续费率配置（默认0）
+    fee_keys = ['taobao_fee_rate', 'xiaohongshu_fee_rate', 'douyin_fee_rate', 'referral_fee_rate']
+    fee_configs = {c.key: c.value for c in Config.query.filter(Config.key.in_(fee_keys)).all()}
+    taobao_fee_rate = float(fee_configs.get('taobao_fee_rate', 0)) / 100
+    xhs_fee_rate = float(fee_configs.get('xiaohongshu_fee_rate', 0)) / 100
+    douyin_fee_rate = float(fee_configs.get('douyin_fee_rate', 0)) / 100
+    referral_fee_rate = float(fee_configs.get('referral_fee_rate', 0)) / 100
+
+    def calc_channel_fee_rate(source_name: str) -> float:
+        if source_name == '淘宝':
+            return taobao_fee_rate
+        if source_name == '小红书':
+            return xhs_fee_rate
+        if source_name == '抖音':
+            return douyin_fee_rate
+        if source_name == '转介绍':
+            return referral_fee_rate
+        return 0.0
+
+    trial_courses_list = [course for (course, _) in trial_courses]
+
+    # 初始化各状态统计
+    status_stats = {
+        'registered': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0},
+        'not_registered': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0},
+        'refunded': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0},
+        'converted': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0},
+        'no_action': {'count': 0, 'revenue': 0, 'cost': 0, 'fees': 0, 'profit': 0}
+    }
+
+    # 计算各状态的统计数据
+    for course in trial_courses_list:
+        # 默认状态为空时按“已报名试听课”处理，避免被错误排除
+        status = course.trial_status or 'registered'
+
+        # 未报名：完全不参与统计（不计数、不计收入/成本/费用/利润）
+        if status == 'not_registered':
+            continue
+
+        # 每个状态都需要按来源计算渠道费率
+        channel_rate = calc_channel_fee_rate(course.source or '')
+
+        # 按状态计算
+        if status == 'registered':
+            revenue = course.trial_price or 0
+            cost = course.cost or 0
+            fees = (revenue * channel_rate) if revenue else 0
+            profit = revenue - cost  # 修改为不扣除手续费
+        elif status == 'refunded':
+            # 退费（MIGRATION_GUIDE）：收入=0；成本=基础成本C；不再从利润中扣除手续费
+            revenue = 0
+            cost = course.cost or 0
+            refund_channel = (course.refund_channel or '').strip()
+            if refund_channel == '淘宝':
+                fees = 0.0
+            else:
+                # 以退款渠道计算费率；若未配置该渠道费率则回退到淘宝费率
+                channel_r = calc_channel_fee_rate(refund_channel)
+                if not channel_r:
+                    channel_r = taobao_fee_rate or 0.0
+                base_amount = float(course.trial_price or 0)
+                # 若数据库已记录退款手续费且>0，则以记录值为准（人工覆盖）；否则按费率估算
+                recorded_fee = float(course.refund_fee or 0)
+                fees = recorded_fee if recorded_fee > 0 else base_amount * channel_r
+            profit = -cost
+        elif status == 'converted':
+            # 独立核算：与已报名一致
+            revenue = course.trial_price or 0
+            cost = course.cost or 0
+            fees = (revenue * channel_rate) if revenue else 0
+            profit = revenue - cost  # 修改为不扣除手续费
+        elif status == 'no_action':
+            # 视为已支付并完成试听：与已报名一致
+            revenue = course.trial_price or 0
+            cost = course.cost or 0
+            fees = (revenue * channel_rate) if revenue else 0
+            profit = revenue - cost  # 修改为不扣除手续费
+        else:
+            # 未知状态保护
+            revenue = 0
+            cost = 0
+            fees = 0
+            profit = 0
+
+        # 只有参与统计的状态才累计
+        status_stats[status]['count'] += 1
+
+        # 累加到对应状态
+        status_stats[status]['revenue'] += revenue
+        status_stats[status]['cost'] += cost
+        status_stats[status]['fees'] += fees
+        status_stats[status]['profit'] += profit
+
+    # 计算总统计
+    total_stats = {
+        # 仅统计纳入口径的状态：已报名、转正、无操作、退费；未报名不计入
+        'total_trials': (
+            status_stats['registered']['count']
+            + status_stats['converted']['count']
+            + status_stats['no_action']['count']
+            + status_stats['refunded']['count']
+        ),
+        'total_revenue': sum(s['revenue'] for s in status_stats.values()),
+        # 修改：总成本 = 基础成本合计（不重复计算手续费）
+        'total_cost': sum(s['cost'] for s in status_stats.values()),
+        # 修改：单独计算总手续费
+        'total_fees': sum(s['fees'] for s in status_stats.values()),
+        # 直接计算总利润 = 总收入 - 总成本
+        'total_profit': sum(s['revenue'] for s in status_stats.values()) - sum(s['cost'] for s in status_stats.values())
+    }
+    return status_stats, total_stats
+
+
+def _timed(func, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmark(row_count: int) -> None:
+    db_path = os.path.join(tempfile.mkdtemp(), 'benchmark_trial_stats.sqlite')
+
+    class BenchConfig(AppConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        print(f"生成 {row_count} 条试听课数据...")
+        _seed(row_count)
+
+        legacy_time, (legacy_stats, legacy_totals) = _timed(_legacy_stats)
+        sql_time, (sql_stats, sql_totals) = _timed(TrialStatsService.sql_stats)
+        stored_time, (stored_stats, stored_totals) = _timed(TrialStatsService.get_stats)
+
+        for status in TRIAL_STATUSES:
+            for field, value in legacy_stats[status].items():
+                assert abs(sql_stats[status][field] - value) < 0.01, (status, field)
+                assert abs(stored_stats[status][field] - value) < 0.01, (status, field)
+        for field, value in legacy_totals.items():
+            assert abs(sql_totals[field] - value) < 0.01, field
+            assert abs(stored_totals[field] - value) < 0.01, field
+
+        print(f"{'方式':<14}{'耗时(ms)':>12}{'加速比':>10}")
+        for label, elapsed in (('legacy', legacy_time), ('sql', sql_time), ('materialized', stored_time)):
+            print(f"{label:<14}{elapsed * 1000:>12.1f}{legacy_time / elapsed:>9.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)